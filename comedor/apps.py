@@ -6,3 +6,5 @@ class ComedorConfig(AppConfig):
     name = "comedor"
     verbose_name = "Comedor"
 
+    def ready(self):
+        import comedor.signals  # noqa
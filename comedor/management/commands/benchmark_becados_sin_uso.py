@@ -0,0 +1,251 @@
+import datetime
+import statistics
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from catalogos.models import (
+    CursoLectivo,
+    Nacionalidad,
+    Nivel,
+    Parentesco,
+    Seccion,
+    Sexo,
+    Subgrupo,
+    TipoIdentificacion,
+)
+from comedor.models import BecaComedor, RegistroAlmuerzo
+from comedor.services import becados_sin_uso, calcular_becados_sin_uso
+from core.models import Institucion
+from matricula.models import (
+    EncargadoEstudiante,
+    Estudiante,
+    MatriculaAcademica,
+    PersonaContacto,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _becados_sin_uso_anterior(institucion, curso_lectivo, fecha_inicio, fecha_fin):
+    """Ruta previa del reporte: exclude() sobre el join distinct y mapas en Python."""
+    becas_qs = (
+        BecaComedor.objects.filter(
+            institucion=institucion,
+            curso_lectivo=curso_lectivo,
+            activa=True,
+            estudiante__matriculas_academicas__curso_lectivo=curso_lectivo,
+            estudiante__matriculas_academicas__institucion=institucion,
+            estudiante__matriculas_academicas__estado__iexact=MatriculaAcademica.ACTIVO,
+        )
+        .select_related("estudiante")
+        .distinct()
+    )
+    becados = list(
+        becas_qs.exclude(
+            estudiante__registros_almuerzo__institucion=institucion,
+            estudiante__registros_almuerzo__curso_lectivo=curso_lectivo,
+            estudiante__registros_almuerzo__fecha__range=(fecha_inicio, fecha_fin),
+        ).order_by("estudiante__primer_apellido", "estudiante__segundo_apellido", "estudiante__nombres")
+    )
+    ids = [b.estudiante_id for b in becados]
+    matriculas = {
+        m.estudiante_id: m
+        for m in MatriculaAcademica.objects.filter(
+            institucion=institucion,
+            curso_lectivo=curso_lectivo,
+            estado__iexact=MatriculaAcademica.ACTIVO,
+            estudiante_id__in=ids,
+        ).select_related("subgrupo__seccion__nivel", "seccion__nivel")
+    }
+    encargados = {
+        enc.estudiante_id: enc.persona_contacto
+        for enc in EncargadoEstudiante.objects.filter(
+            estudiante_id__in=ids, principal=True
+        ).select_related("persona_contacto")
+    }
+    return [
+        (b.estudiante.identificacion, str(matriculas[b.estudiante_id].subgrupo or "-"), str(encargados.get(b.estudiante_id) or "-"))
+        for b in becados
+    ]
+
+
+def _crear_datos_sinteticos(n_becados):
+    hoy = timezone.localdate()
+    institucion = Institucion.objects.create(
+        nombre="BENCHMARK BECADOS SIN USO",
+        correo="benchmark_sin_uso@invalid.local",
+        tipo="A",
+        fecha_inicio=hoy - datetime.timedelta(days=30),
+        fecha_fin=hoy + datetime.timedelta(days=365),
+    )
+    curso_lectivo = CursoLectivo.get_activo() or CursoLectivo.objects.create(
+        anio=hoy.year,
+        nombre=f"Curso Lectivo {hoy.year}",
+        fecha_inicio=datetime.date(hoy.year, 1, 1),
+        fecha_fin=datetime.date(hoy.year, 12, 31),
+        activo=True,
+    )
+    tipo_id = (
+        TipoIdentificacion.objects.filter(nombre="OTRO").first()
+        or TipoIdentificacion.objects.create(nombre="OTRO")
+    )
+    sexo, _ = Sexo.objects.get_or_create(codigo="F", defaults={"nombre": "Femenino"})
+    nacionalidad, _ = Nacionalidad.objects.get_or_create(nombre="COSTARRICENSE")
+    parentesco, _ = Parentesco.objects.get_or_create(descripcion="MADRE")
+    subgrupos = []
+    for numero_nivel in range(7, 12):
+        nivel, _ = Nivel.objects.get_or_create(numero=numero_nivel, defaults={"nombre": f"{numero_nivel}°"})
+        for numero_seccion in (1, 2, 3):
+            seccion, _ = Seccion.objects.get_or_create(nivel=nivel, numero=numero_seccion)
+            for letra in ("A", "B"):
+                subgrupo, _ = Subgrupo.objects.get_or_create(seccion=seccion, letra=letra)
+                subgrupos.append((nivel, seccion, subgrupo))
+
+    estudiantes = Estudiante.objects.bulk_create([
+        Estudiante(
+            tipo_identificacion=tipo_id,
+            identificacion=f"BSU{i:06d}",
+            primer_apellido=f"APELLIDO{i % 97:02d}",
+            segundo_apellido=f"SEGUNDO{i % 13:02d}",
+            nombres=f"EST {i}",
+            fecha_nacimiento=datetime.date(hoy.year - 14, 1, 1),
+            sexo=sexo,
+            nacionalidad=nacionalidad,
+        )
+        for i in range(n_becados)
+    ])
+    MatriculaAcademica.objects.bulk_create([
+        MatriculaAcademica(
+            estudiante=est,
+            institucion=institucion,
+            nivel=subgrupos[i % len(subgrupos)][0],
+            seccion=subgrupos[i % len(subgrupos)][1],
+            subgrupo=subgrupos[i % len(subgrupos)][2],
+            curso_lectivo=curso_lectivo,
+            estado=MatriculaAcademica.ACTIVO,
+        )
+        for i, est in enumerate(estudiantes)
+    ])
+    BecaComedor.objects.bulk_create([
+        BecaComedor(institucion=institucion, curso_lectivo=curso_lectivo, estudiante=est)
+        for est in estudiantes
+    ])
+    contactos = PersonaContacto.objects.bulk_create([
+        PersonaContacto(
+            institucion=institucion,
+            tipo_identificacion=tipo_id,
+            identificacion=f"BSUC{i:06d}",
+            primer_apellido=f"ENCARGADO{i % 53:02d}",
+            nombres=f"CONTACTO {i}",
+            celular_avisos=f"8{i:07d}",
+        )
+        for i in range(n_becados)
+    ])
+    EncargadoEstudiante.objects.bulk_create([
+        EncargadoEstudiante(
+            estudiante=est, persona_contacto=contacto, parentesco=parentesco, convivencia=True, principal=True
+        )
+        for i, (est, contacto) in enumerate(zip(estudiantes, contactos))
+        if i % 5
+    ])
+    # Dos tercios de los becados con almuerzos en los últimos 20 días.
+    registros = []
+    for i, est in enumerate(estudiantes):
+        if i % 3 == 0:
+            continue
+        for secuencia, dias in enumerate(range(1, 20, 4), start=1):
+            registros.append(RegistroAlmuerzo(
+                institucion=institucion,
+                curso_lectivo=curso_lectivo,
+                estudiante=est,
+                fecha=hoy - datetime.timedelta(days=dias),
+                secuencia=secuencia,
+            ))
+    RegistroAlmuerzo.objects.bulk_create(registros, batch_size=5000)
+    # Estadísticas al día, como las mantiene autovacuum en producción; sin esto el
+    # planificador estima una fila por tabla y elige nested loops para ambas rutas.
+    with connection.cursor() as cursor:
+        for modelo in (Estudiante, MatriculaAcademica, BecaComedor, PersonaContacto, EncargadoEstudiante, RegistroAlmuerzo):
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}")
+    return institucion, curso_lectivo, len(registros)
+
+
+def _medir(funcion, repeticiones):
+    tiempos, consultas, resultado = [], 0, None
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas = len(ctx)
+    return statistics.median(tiempos), consultas, resultado
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el cálculo de becados sin uso (anti-join NOT EXISTS y caché) contra la "
+        "ruta anterior sobre datos sintéticos. Los datos creados se revierten al finalizar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--becados",
+            type=int,
+            default=2000,
+            help="Cantidad de becados sintéticos (por defecto 2000).",
+        )
+        parser.add_argument(
+            "--repeticiones",
+            type=int,
+            default=5,
+            help="Repeticiones por variante; se reporta la mediana (por defecto 5).",
+        )
+
+    def handle(self, *args, **options):
+        n_becados = max(1, options["becados"])
+        repeticiones = max(1, options["repeticiones"])
+        self.stdout.write(self.style.WARNING("Los datos sintéticos se revierten al finalizar."))
+
+        try:
+            with transaction.atomic():
+                institucion, curso_lectivo, n_registros = _crear_datos_sinteticos(n_becados)
+                hasta = timezone.localdate()
+                desde = hasta - datetime.timedelta(days=30)
+
+                anterior_ms, anterior_q, anterior = _medir(
+                    lambda: _becados_sin_uso_anterior(institucion, curso_lectivo, desde, hasta), repeticiones
+                )
+                nuevo_ms, nuevo_q, nuevo = _medir(
+                    lambda: calcular_becados_sin_uso(institucion.id, curso_lectivo.id, desde, hasta), repeticiones
+                )
+                becados_sin_uso(institucion.id, curso_lectivo.id, desde, hasta)
+                cache_ms, cache_q, _ = _medir(
+                    lambda: becados_sin_uso(institucion.id, curso_lectivo.id, desde, hasta), repeticiones
+                )
+                coinciden = sorted(anterior) == sorted(
+                    (f["identificacion"], f["subgrupo"], f["nombre_encargado"]) for f in nuevo
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(f"- Becados sintéticos: {n_becados} ({n_registros} registros de almuerzo)")
+        self.stdout.write(f"- Becados sin uso: {len(nuevo)}")
+        self.stdout.write(f"- Ruta anterior: {anterior_ms:.2f} ms ({anterior_q} consultas)")
+        self.stdout.write(f"- Anti-join: {nuevo_ms:.2f} ms ({nuevo_q} consultas)")
+        if isinstance(caches["default"], DummyCache):
+            self.stdout.write("- Anti-join en caché: sin medir (la caché configurada es DummyCache)")
+        else:
+            self.stdout.write(f"- Anti-join en caché: {cache_ms:.2f} ms ({cache_q} consultas)")
+        self.stdout.write(f"- Resultados coinciden: {'sí' if coinciden else 'NO'}")
+        self.stdout.write(self.style.SUCCESS("Medición finalizada."))
@@ -0,0 +1,95 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from comedor.models import BecaComedor, TiqueteComedor
+from comedor.services import (
+    cache_key_indice_comedor,
+    curso_lectivo_activo_id,
+    procesar_escaneo_comedor,
+)
+from core.models import Institucion
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, max(0, int(round(p / 100 * (len(ordenados) - 1)))))
+    return ordenados[k]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia del escaneo de almuerzo (p50/p99) con el índice de elegibilidad "
+        "frío y caliente. Los registros creados se revierten al finalizar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--institucion-id", type=int, required=True, help="Institución a medir.")
+        parser.add_argument(
+            "--escaneos",
+            type=int,
+            default=500,
+            help="Cantidad de escaneos a medir (por defecto 500).",
+        )
+
+    def handle(self, *args, **options):
+        institucion_id = options["institucion_id"]
+        n = max(1, options["escaneos"])
+        if not Institucion.objects.filter(pk=institucion_id).exists():
+            raise CommandError(f"No existe institución con id {institucion_id}.")
+        curso_lectivo_id = curso_lectivo_activo_id()
+        if not curso_lectivo_id:
+            raise CommandError("No hay curso lectivo activo.")
+
+        entradas = list(
+            BecaComedor.objects.filter(
+                institucion_id=institucion_id, curso_lectivo_id=curso_lectivo_id, activa=True
+            ).values_list("estudiante__identificacion", flat=True)
+        )
+        entradas += list(
+            TiqueteComedor.objects.filter(institucion_id=institucion_id, activo=True).values_list("codigo", flat=True)
+        )
+        if not entradas:
+            raise CommandError("La institución no tiene becas activas ni tiquetes para medir.")
+
+        self.stdout.write(self.style.WARNING("Los registros creados durante la medición se revierten."))
+        tiempos, consultas, estados = [], [], {}
+        try:
+            with transaction.atomic():
+                cache.delete(cache_key_indice_comedor(institucion_id, curso_lectivo_id))
+                inicio = time.perf_counter()
+                procesar_escaneo_comedor(institucion_id, curso_lectivo_id, entradas[0])
+                frio_ms = (time.perf_counter() - inicio) * 1000
+                for i in range(n):
+                    entrada = entradas[i % len(entradas)]
+                    with CaptureQueriesContext(connection) as ctx:
+                        inicio = time.perf_counter()
+                        payload, _ = procesar_escaneo_comedor(institucion_id, curso_lectivo_id, entrada)
+                        tiempos.append((time.perf_counter() - inicio) * 1000)
+                    consultas.append(len(ctx))
+                    estados[payload["status"]] = estados.get(payload["status"], 0) + 1
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(f"- Entradas distintas: {len(entradas)}")
+        self.stdout.write(f"- Escaneos medidos: {n}")
+        self.stdout.write(f"- Primer escaneo (índice frío): {frio_ms:.2f} ms")
+        self.stdout.write(f"- p50: {_percentil(tiempos, 50):.2f} ms")
+        self.stdout.write(f"- p99: {_percentil(tiempos, 99):.2f} ms")
+        self.stdout.write(f"- Media: {statistics.mean(tiempos):.2f} ms")
+        self.stdout.write(f"- Consultas por escaneo (máx.): {max(consultas)}")
+        self.stdout.write(f"- Resultados: {', '.join(f'{k}={v}' for k, v in sorted(estados.items()))}")
+        self.stdout.write(self.style.SUCCESS("Medición finalizada."))
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from comedor.models import RegistroAlmuerzo, RegistroAlmuerzoTiquete
+from comedor.services import agregar_registros_comedor, cerrar_resumen_comedor, ultimo_dia_cerrado
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra el resumen diario del comedor (ResumenComedorDiario) por institución y "
+        "curso lectivo. Por defecto procesa desde el último día cerrado hasta ayer; "
+        "pensado para ejecutarse cada noche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Guarda los resúmenes. Sin este flag solo muestra lo que se cerraría (dry-run).",
+        )
+        parser.add_argument("--institucion-id", type=int, default=None, help="Opcional: limita a una institución.")
+        parser.add_argument("--curso-lectivo-id", type=int, default=None, help="Opcional: limita a un curso lectivo.")
+        parser.add_argument(
+            "--desde",
+            default=None,
+            help="Opcional: primer día a recalcular (AAAA-MM-DD). Por defecto el día siguiente al último cierre.",
+        )
+        parser.add_argument(
+            "--hasta",
+            default=None,
+            help="Opcional: último día a cerrar (AAAA-MM-DD). Por defecto ayer.",
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get("apply"))
+        hoy = timezone.localdate()
+        hasta = _fecha(options["hasta"]) if options.get("hasta") else hoy - timedelta(days=1)
+        desde_fijo = _fecha(options["desde"]) if options.get("desde") else None
+        if hasta >= hoy:
+            raise CommandError("Solo se pueden cerrar días anteriores a hoy.")
+
+        if apply_changes:
+            self.stdout.write(self.style.WARNING("MODO APPLY: se guardarán los resúmenes diarios."))
+        else:
+            self.stdout.write(self.style.WARNING("MODO DRY-RUN: no se guardarán cambios."))
+
+        # Primer día con registros por (institución, curso lectivo).
+        primeros = {}
+        for modelo in (RegistroAlmuerzo, RegistroAlmuerzoTiquete):
+            qs = modelo.objects.all()
+            if options.get("institucion_id"):
+                qs = qs.filter(institucion_id=options["institucion_id"])
+            if options.get("curso_lectivo_id"):
+                qs = qs.filter(curso_lectivo_id=options["curso_lectivo_id"])
+            for inst_id, cl_id, primero in (
+                qs.values("institucion_id", "curso_lectivo_id")
+                .annotate(primero=Min("fecha"))
+                .values_list("institucion_id", "curso_lectivo_id", "primero")
+            ):
+                clave = (inst_id, cl_id)
+                primeros[clave] = min(primero, primeros.get(clave, primero))
+
+        stats = {"grupos": 0, "al_dia": 0, "dias": 0, "filas": 0, "con_huecos": 0}
+        for (inst_id, cl_id), primero in sorted(primeros.items()):
+            stats["grupos"] += 1
+            if desde_fijo:
+                desde = desde_fijo
+            else:
+                cerrado = ultimo_dia_cerrado(inst_id, cl_id)
+                desde = cerrado + timedelta(days=1) if cerrado else primero
+            if desde > hasta:
+                stats["al_dia"] += 1
+                continue
+            stats["dias"] += (hasta - desde).days + 1
+            if apply_changes:
+                filas = cerrar_resumen_comedor(inst_id, cl_id, desde, hasta)
+            else:
+                filas = len(agregar_registros_comedor(inst_id, cl_id, desde, hasta))
+            stats["filas"] += filas
+            self.stdout.write(
+                f"  Institución {inst_id} / curso lectivo {cl_id}: {desde:%Y-%m-%d} – {hasta:%Y-%m-%d} ({filas} filas)"
+            )
+            cerrado = ultimo_dia_cerrado(inst_id, cl_id)
+            if apply_changes and (cerrado is None or cerrado < hasta):
+                # Cierre parcial: quedan días con registros sin cerrar antes de --desde.
+                stats["con_huecos"] += 1
+                self.stdout.write(self.style.WARNING(
+                    f"    Hay días sin cerrar antes del {desde:%Y-%m-%d}; los reportes leen en crudo "
+                    f"desde {(cerrado + timedelta(days=1)) if cerrado else primero:%Y-%m-%d}."
+                ))
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(f"- Instituciones/cursos con registros: {stats['grupos']}")
+        self.stdout.write(f"- Ya al día: {stats['al_dia']}")
+        self.stdout.write(f"- Días cerrados: {stats['dias']}")
+        self.stdout.write(f"- Filas de resumen: {stats['filas']}")
+        if apply_changes:
+            self.stdout.write(f"- Con días sin cerrar antes del rango: {stats['con_huecos']}")
+
+        if apply_changes:
+            self.stdout.write(self.style.SUCCESS("Proceso finalizado."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Dry-run finalizado."))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0006_alter_cursolectivo_anio'),
+        ('comedor', '0005_rename_comedor_reg_institu_818b72_idx_comedor_reg_institu_ece583_idx_and_more'),
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+        ('matricula', '0009_permiso_eliminar_basura_estudiantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroalmuerzo',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, editable=False, help_text='Clave del escaneo generada por el kiosco (sincronización por lote).', max_length=64, null=True, verbose_name='Clave de idempotencia'),
+        ),
+        migrations.AddField(
+            model_name='registroalmuerzotiquete',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, editable=False, help_text='Clave del escaneo generada por el kiosco (sincronización por lote).', max_length=64, null=True, verbose_name='Clave de idempotencia'),
+        ),
+        migrations.AlterField(
+            model_name='registroalmuerzo',
+            name='fecha_hora',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='registroalmuerzotiquete',
+            name='fecha_hora',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='registroalmuerzo',
+            constraint=models.UniqueConstraint(condition=models.Q(('clave_idempotencia__isnull', False)), fields=('institucion', 'clave_idempotencia'), name='uniq_registro_almuerzo_clave'),
+        ),
+        migrations.AddConstraint(
+            model_name='registroalmuerzotiquete',
+            constraint=models.UniqueConstraint(condition=models.Q(('clave_idempotencia__isnull', False)), fields=('institucion', 'clave_idempotencia'), name='uniq_registro_almuerzo_tiq_clave'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:47
+
+from django.db import migrations, models
+
+# Numera los registros existentes en orden cronológico para poder crear la
+# restricción única (los duplicados históricos quedan con números distintos).
+NUMERAR_REGISTROS = """
+UPDATE comedor_registroalmuerzo r SET secuencia = n.fila
+FROM (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY institucion_id, curso_lectivo_id, estudiante_id ORDER BY fecha_hora, id
+    ) AS fila
+    FROM comedor_registroalmuerzo
+) n
+WHERE r.id = n.id;
+UPDATE comedor_registroalmuerzotiquete r SET secuencia = n.fila
+FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY tiquete_id ORDER BY fecha_hora, id) AS fila
+    FROM comedor_registroalmuerzotiquete
+) n
+WHERE r.id = n.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0006_alter_cursolectivo_anio'),
+        ('comedor', '0006_sincronizacion_lote'),
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+        ('matricula', '0009_permiso_eliminar_basura_estudiantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroalmuerzo',
+            name='secuencia',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Secuencia'),
+        ),
+        migrations.AddField(
+            model_name='registroalmuerzotiquete',
+            name='secuencia',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Secuencia'),
+        ),
+        migrations.RunSQL(NUMERAR_REGISTROS, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='registroalmuerzo',
+            constraint=models.UniqueConstraint(fields=('institucion', 'curso_lectivo', 'estudiante', 'secuencia'), name='uniq_registro_almuerzo_secuencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='registroalmuerzotiquete',
+            constraint=models.UniqueConstraint(fields=('tiquete', 'secuencia'), name='uniq_registro_almuerzo_tiq_secuencia'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0006_alter_cursolectivo_anio'),
+        ('comedor', '0007_registro_secuencia'),
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenComedorDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('tipo', models.CharField(choices=[('BECA', 'Alumno becado'), ('ALUMNO_TIQ', 'Alumno con tiquete'), ('PROFESOR', 'Profesor')], max_length=15, verbose_name='Tipo')),
+                ('registros', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('distintos', models.PositiveIntegerField(default=0, verbose_name='Distintos')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Monto (₡)')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('curso_lectivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_comedor', to='catalogos.cursolectivo', verbose_name='Curso lectivo')),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_comedor', to='core.institucion', verbose_name='Institución')),
+                ('nivel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='catalogos.nivel', verbose_name='Nivel')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de comedor',
+                'verbose_name_plural': 'Resúmenes diarios de comedor',
+                'ordering': ('fecha', 'tipo'),
+                'indexes': [models.Index(fields=['institucion', 'curso_lectivo', 'fecha'], name='comedor_res_institu_ab609f_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('nivel__isnull', False)), fields=('institucion', 'curso_lectivo', 'fecha', 'tipo', 'nivel'), name='uniq_resumen_comedor_nivel'), models.UniqueConstraint(condition=models.Q(('nivel__isnull', True)), fields=('institucion', 'curso_lectivo', 'fecha', 'tipo'), name='uniq_resumen_comedor_sin_nivel')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0006_alter_cursolectivo_anio'),
+        ('comedor', '0008_resumen_comedor_diario'),
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreResumenComedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cerrado_hasta', models.DateField(verbose_name='Cerrado hasta')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('curso_lectivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres_comedor', to='catalogos.cursolectivo', verbose_name='Curso lectivo')),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres_comedor', to='core.institucion', verbose_name='Institución')),
+            ],
+            options={
+                'verbose_name': 'Cierre de resumen de comedor',
+                'verbose_name_plural': 'Cierres de resumen de comedor',
+                'constraints': [models.UniqueConstraint(fields=('institucion', 'curso_lectivo'), name='uniq_cierre_resumen_comedor')],
+            },
+        ),
+    ]
@@ -101,7 +101,20 @@ class RegistroAlmuerzo(models.Model):
         related_name="registros_almuerzo",
     )
     fecha = models.DateField(default=timezone.localdate, db_index=True)
-    fecha_hora = models.DateTimeField(auto_now_add=True, db_index=True)
+    # default (no auto_now_add) para conservar la hora del escaneo en la sincronización por lote.
+    fecha_hora = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    clave_idempotencia = models.CharField(
+        "Clave de idempotencia",
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Clave del escaneo generada por el kiosco (sincronización por lote).",
+    )
+    # Número de registro del estudiante en (institución, curso lectivo). Con la
+    # restricción única, dos escaneos concurrentes que parten del mismo último
+    # registro no pueden insertarse ambos (ver comedor.services).
+    secuencia = models.PositiveIntegerField("Secuencia", default=0, editable=False)
 
     class Meta:
         verbose_name = "Registro de almuerzo"
@@ -111,10 +124,32 @@ class RegistroAlmuerzo(models.Model):
             models.Index(fields=["institucion", "curso_lectivo", "fecha"]),
             models.Index(fields=["institucion", "curso_lectivo", "estudiante", "fecha_hora"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["institucion", "clave_idempotencia"],
+                condition=models.Q(clave_idempotencia__isnull=False),
+                name="uniq_registro_almuerzo_clave",
+            ),
+            models.UniqueConstraint(
+                fields=["institucion", "curso_lectivo", "estudiante", "secuencia"],
+                name="uniq_registro_almuerzo_secuencia",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.estudiante} - {self.fecha_hora:%d/%m/%Y %H:%M}"
 
+    def save(self, *args, **kwargs):
+        # Altas fuera del escaneo (admin, scripts): siguiente número del estudiante.
+        if self._state.adding and not self.secuencia:
+            ultimo = RegistroAlmuerzo.objects.filter(
+                institucion_id=self.institucion_id,
+                curso_lectivo_id=self.curso_lectivo_id,
+                estudiante_id=self.estudiante_id,
+            ).aggregate(m=models.Max("secuencia"))["m"]
+            self.secuencia = (ultimo or 0) + 1
+        super().save(*args, **kwargs)
+
 
 class TiqueteComedor(models.Model):
     ALUMNO_TIQ = "ALUMNO_TIQ"
@@ -184,7 +219,17 @@ class RegistroAlmuerzoTiquete(models.Model):
         verbose_name="Tiquete",
     )
     fecha = models.DateField(default=timezone.localdate, db_index=True)
-    fecha_hora = models.DateTimeField(auto_now_add=True, db_index=True)
+    fecha_hora = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    clave_idempotencia = models.CharField(
+        "Clave de idempotencia",
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Clave del escaneo generada por el kiosco (sincronización por lote).",
+    )
+    # Número de registro del tiquete; ver RegistroAlmuerzo.secuencia.
+    secuencia = models.PositiveIntegerField("Secuencia", default=0, editable=False)
 
     class Meta:
         verbose_name = "Registro de almuerzo (tiquete)"
@@ -194,7 +239,127 @@ class RegistroAlmuerzoTiquete(models.Model):
             models.Index(fields=["institucion", "curso_lectivo", "fecha"]),
             models.Index(fields=["tiquete", "fecha_hora"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["institucion", "clave_idempotencia"],
+                condition=models.Q(clave_idempotencia__isnull=False),
+                name="uniq_registro_almuerzo_tiq_clave",
+            ),
+            models.UniqueConstraint(
+                fields=["tiquete", "secuencia"],
+                name="uniq_registro_almuerzo_tiq_secuencia",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.tiquete.get_tipo_display()} ({self.tiquete.codigo}) – {self.fecha_hora:%d/%m/%Y %H:%M}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.secuencia:
+            ultimo = RegistroAlmuerzoTiquete.objects.filter(
+                tiquete_id=self.tiquete_id,
+            ).aggregate(m=models.Max("secuencia"))["m"]
+            self.secuencia = (ultimo or 0) + 1
+        super().save(*args, **kwargs)
+
+
+
+class ResumenComedorDiario(models.Model):
+    """
+    Totales diarios de uso del comedor por (institución, curso lectivo, fecha, tipo,
+    nivel), calculados desde los registros por el comando cerrar_resumen_comedor.
+    Los reportes leen estos totales hasta CierreResumenComedor.cerrado_hasta y solo
+    agregan los registros crudos posteriores.
+    """
+
+    BECA = "BECA"
+    TIPO_CHOICES = [(BECA, "Alumno becado")] + TiqueteComedor.TIPO_CHOICES
+
+    institucion = models.ForeignKey(
+        "core.Institucion",
+        on_delete=models.CASCADE,
+        related_name="resumenes_comedor",
+        verbose_name="Institución",
+    )
+    curso_lectivo = models.ForeignKey(
+        "catalogos.CursoLectivo",
+        on_delete=models.CASCADE,
+        related_name="resumenes_comedor",
+        verbose_name="Curso lectivo",
+    )
+    fecha = models.DateField("Fecha")
+    tipo = models.CharField("Tipo", max_length=15, choices=TIPO_CHOICES)
+    # Nivel de la matrícula del becado; vacío para tiquetes.
+    nivel = models.ForeignKey(
+        "catalogos.Nivel",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Nivel",
+    )
+    registros = models.PositiveIntegerField("Registros", default=0)
+    # Estudiantes (becas) o tiquetes distintos en el día.
+    distintos = models.PositiveIntegerField("Distintos", default=0)
+    monto = models.DecimalField("Monto (₡)", max_digits=12, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField("Actualizado", auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen diario de comedor"
+        verbose_name_plural = "Resúmenes diarios de comedor"
+        ordering = ("fecha", "tipo")
+        indexes = [
+            models.Index(fields=["institucion", "curso_lectivo", "fecha"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["institucion", "curso_lectivo", "fecha", "tipo", "nivel"],
+                condition=models.Q(nivel__isnull=False),
+                name="uniq_resumen_comedor_nivel",
+            ),
+            models.UniqueConstraint(
+                fields=["institucion", "curso_lectivo", "fecha", "tipo"],
+                condition=models.Q(nivel__isnull=True),
+                name="uniq_resumen_comedor_sin_nivel",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} {self.get_tipo_display()}: {self.registros}"
+
+
+class CierreResumenComedor(models.Model):
+    """
+    Último día hasta el cual ResumenComedorDiario está completo por (institución,
+    curso lectivo): todos los días con registros hasta esa fecha tienen su resumen.
+    Un cierre parcial que deja días con registros sin cerrar antes del rango no lo
+    avanza, aunque haya resúmenes posteriores.
+    """
+
+    institucion = models.ForeignKey(
+        "core.Institucion",
+        on_delete=models.CASCADE,
+        related_name="cierres_comedor",
+        verbose_name="Institución",
+    )
+    curso_lectivo = models.ForeignKey(
+        "catalogos.CursoLectivo",
+        on_delete=models.CASCADE,
+        related_name="cierres_comedor",
+        verbose_name="Curso lectivo",
+    )
+    cerrado_hasta = models.DateField("Cerrado hasta")
+    actualizado_en = models.DateTimeField("Actualizado", auto_now=True)
+
+    class Meta:
+        verbose_name = "Cierre de resumen de comedor"
+        verbose_name_plural = "Cierres de resumen de comedor"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["institucion", "curso_lectivo"],
+                name="uniq_cierre_resumen_comedor",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.institucion_id} / {self.curso_lectivo_id}: {self.cerrado_hasta:%d/%m/%Y}"
@@ -0,0 +1,243 @@
+"""
+Ocupación del comedor en vivo (server-sent events).
+
+Cada registro de almuerzo confirmado suma en contadores del día en la caché
+compartida (cache.incr, atómico en Redis): almuerzos de becados, estudiantes
+distintos, usos y monto por tipo de tiquete y un contador por minuto para el ritmo.
+Así los workers que registran escaneos y el proceso ASGI que sirve el stream ven los
+mismos números sin volver a agregar la base de datos.
+
+Los contadores se siembran desde la base de datos la primera vez que se leen en el
+día y se reconcilian cada OCUPACION_RECONCILIAR segundos. En cada proceso ASGI hay
+un solo lector por (institución, curso lectivo), que consulta la caché una vez por
+intervalo y reparte la foto en memoria a todos los navegadores conectados.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from .models import RegistroAlmuerzo, RegistroAlmuerzoTiquete, TiqueteComedor
+from .services import cache_key_indice_comedor
+
+# Segundos entre lecturas de los contadores por (institución, curso lectivo).
+OCUPACION_INTERVALO = 1
+# Segundos entre reconciliaciones con la base de datos.
+OCUPACION_RECONCILIAR = 60 * 5
+# Comentario SSE para mantener viva la conexión a través de proxies.
+OCUPACION_HEARTBEAT = 15
+# Minutos del promedio de ritmo (almuerzos por minuto).
+OCUPACION_MINUTOS_RITMO = 5
+OCUPACION_CACHE_TIMEOUT = 60 * 60 * 36
+TIPOS_TIQUETE_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def _prefijo(institucion_id, curso_lectivo_id, fecha):
+    return f"comedor:ocupacion:{institucion_id}:{curso_lectivo_id}:{fecha:%Y%m%d}"
+
+
+def _clave_minuto(prefijo, momento):
+    return f"{prefijo}:min:{timezone.localtime(momento):%H%M}"
+
+
+def _claves_contadores(prefijo):
+    claves = [f"{prefijo}:becados", f"{prefijo}:unicos"]
+    for tipo, _ in TiqueteComedor.TIPO_CHOICES:
+        claves += [f"{prefijo}:tiq:{tipo}", f"{prefijo}:monto:{tipo}"]
+    return claves
+
+
+def tipos_tiquete(institucion_id, curso_lectivo_id):
+    """tiquete_id -> (tipo, monto en céntimos); se invalida junto con el índice del comedor."""
+    key = f"{cache_key_indice_comedor(institucion_id, curso_lectivo_id)}:tipos_tiquete"
+    tipos = cache.get(key)
+    if tipos is None:
+        tipos = {
+            tiq_id: (tipo, int(monto * 100))
+            for tiq_id, tipo, monto in TiqueteComedor.objects.filter(
+                institucion_id=institucion_id
+            ).values_list("id", "tipo", "monto")
+        }
+        cache.set(key, tipos, TIPOS_TIQUETE_CACHE_TIMEOUT)
+    return tipos
+
+
+def sembrar_ocupacion(institucion_id, curso_lectivo_id, fecha=None):
+    """
+    (Re)calcula los contadores del día desde los registros y los deja en la caché.
+    Retorna los valores sembrados {clave: valor}.
+    """
+    fecha = fecha or timezone.localdate()
+    prefijo = _prefijo(institucion_id, curso_lectivo_id, fecha)
+    filtros = {"institucion_id": institucion_id, "curso_lectivo_id": curso_lectivo_id, "fecha": fecha}
+
+    becados = RegistroAlmuerzo.objects.filter(**filtros)
+    estudiantes = list(becados.values_list("estudiante_id", flat=True).distinct())
+    valores = dict.fromkeys(_claves_contadores(prefijo), 0)
+    valores[f"{prefijo}:becados"] = becados.count()
+    valores[f"{prefijo}:unicos"] = len(estudiantes)
+    for tipo, usos, monto in (
+        RegistroAlmuerzoTiquete.objects.filter(**filtros)
+        .values("tiquete__tipo")
+        .annotate(usos=Count("id"), monto=Sum("tiquete__monto"))
+        .values_list("tiquete__tipo", "usos", "monto")
+        .order_by()
+    ):
+        valores[f"{prefijo}:tiq:{tipo}"] = usos
+        valores[f"{prefijo}:monto:{tipo}"] = int((monto or 0) * 100)
+
+    desde = timezone.now() - timedelta(minutes=OCUPACION_MINUTOS_RITMO)
+    for modelo in (RegistroAlmuerzo, RegistroAlmuerzoTiquete):
+        for minuto, total in (
+            modelo.objects.filter(**filtros, fecha_hora__gte=desde)
+            .annotate(minuto=TruncMinute("fecha_hora"))
+            .values("minuto")
+            .annotate(total=Count("id"))
+            .values_list("minuto", "total")
+            .order_by()
+        ):
+            clave = _clave_minuto(prefijo, minuto)
+            valores[clave] = valores.get(clave, 0) + total
+
+    vistos = {f"{prefijo}:visto:{est_id}": 1 for est_id in estudiantes}
+    cache.set_many({**valores, **vistos, f"{prefijo}:sembrado": time.time()}, OCUPACION_CACHE_TIMEOUT)
+    return valores
+
+
+def _incrementar(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Sin sembrar (o desalojado): la próxima siembra/reconciliación lo incluye.
+        pass
+
+
+def contar_registro(registro):
+    """Suma un registro confirmado de hoy en los contadores (RegistroAlmuerzo o de tiquete)."""
+    if registro.fecha != timezone.localdate():
+        return
+    prefijo = _prefijo(registro.institucion_id, registro.curso_lectivo_id, registro.fecha)
+    if isinstance(registro, RegistroAlmuerzoTiquete):
+        tipo, monto = tipos_tiquete(registro.institucion_id, registro.curso_lectivo_id).get(
+            registro.tiquete_id, (None, 0)
+        )
+        if tipo is None:
+            return
+        _incrementar(f"{prefijo}:tiq:{tipo}")
+        if monto:
+            _incrementar(f"{prefijo}:monto:{tipo}", monto)
+    else:
+        _incrementar(f"{prefijo}:becados")
+        if cache.add(f"{prefijo}:visto:{registro.estudiante_id}", 1, OCUPACION_CACHE_TIMEOUT):
+            _incrementar(f"{prefijo}:unicos")
+    clave_minuto = _clave_minuto(prefijo, registro.fecha_hora)
+    if not cache.add(clave_minuto, 1, 60 * (OCUPACION_MINUTOS_RITMO + 2)):
+        _incrementar(clave_minuto)
+
+
+def leer_ocupacion(institucion_id, curso_lectivo_id):
+    """
+    Foto de la ocupación de hoy desde los contadores (una lectura get_many). Siembra
+    los contadores si faltan o si pasó el intervalo de reconciliación.
+    """
+    ahora = timezone.now()
+    fecha = timezone.localdate(ahora)
+    prefijo = _prefijo(institucion_id, curso_lectivo_id, fecha)
+    minutos = [_clave_minuto(prefijo, ahora - timedelta(minutes=i)) for i in range(OCUPACION_MINUTOS_RITMO)]
+    claves = _claves_contadores(prefijo)
+    valores = cache.get_many([*claves, *minutos, f"{prefijo}:sembrado"])
+    sembrado = valores.get(f"{prefijo}:sembrado")
+    if sembrado is None or time.time() - sembrado > OCUPACION_RECONCILIAR:
+        valores = sembrar_ocupacion(institucion_id, curso_lectivo_id, fecha)
+
+    etiquetas = dict(TiqueteComedor.TIPO_CHOICES)
+    tiquetes = [
+        {
+            "tipo": tipo,
+            "nombre": etiquetas[tipo],
+            "usos": valores.get(f"{prefijo}:tiq:{tipo}", 0),
+            "monto": valores.get(f"{prefijo}:monto:{tipo}", 0) / 100,
+        }
+        for tipo, _ in TiqueteComedor.TIPO_CHOICES
+    ]
+    return {
+        "fecha": fecha.isoformat(),
+        "becados": valores.get(f"{prefijo}:becados", 0),
+        "unicos": valores.get(f"{prefijo}:unicos", 0),
+        "tiquetes": tiquetes,
+        "tiquetes_total": sum(t["usos"] for t in tiquetes),
+        "monto_total": sum(t["monto"] for t in tiquetes),
+        "por_minuto": round(sum(valores.get(m, 0) for m in minutos) / OCUPACION_MINUTOS_RITMO, 1),
+    }
+
+
+def evento_sse(datos, evento="ocupacion", retry=None):
+    """Mensaje SSE con `datos` en JSON."""
+    lineas = [f"retry: {retry}"] if retry else []
+    lineas += [f"event: {evento}", f"data: {json.dumps(datos, ensure_ascii=False)}"]
+    return "\n".join(lineas) + "\n\n"
+
+
+class _CanalOcupacion:
+    """Lector único por (institución, curso lectivo) en este proceso; reparte la foto a los suscriptores."""
+
+    def __init__(self, institucion_id, curso_lectivo_id):
+        self.clave = (institucion_id, curso_lectivo_id)
+        self.foto = None
+        self.version = 0
+        self.suscriptores = 0
+        self.cambio = asyncio.Condition()
+        self.tarea = None
+
+    async def _leer(self):
+        while self.suscriptores:
+            try:
+                foto = await sync_to_async(leer_ocupacion)(*self.clave)
+            except Exception:
+                # Caída puntual de la caché o la base: se reintenta en el siguiente ciclo.
+                foto = self.foto
+            if foto != self.foto:
+                async with self.cambio:
+                    self.foto = foto
+                    self.version += 1
+                    self.cambio.notify_all()
+            await asyncio.sleep(OCUPACION_INTERVALO)
+        _canales.pop(self.clave, None)
+
+    async def eventos(self):
+        self.suscriptores += 1
+        if self.tarea is None or self.tarea.done():
+            self.tarea = asyncio.create_task(self._leer())
+        visto = 0
+        try:
+            while True:
+                foto = None
+                async with self.cambio:
+                    try:
+                        await asyncio.wait_for(
+                            self.cambio.wait_for(lambda: self.version != visto), OCUPACION_HEARTBEAT
+                        )
+                        visto, foto = self.version, self.foto
+                    except asyncio.TimeoutError:
+                        pass
+                yield evento_sse(foto) if foto is not None else ": ping\n\n"
+        finally:
+            self.suscriptores -= 1
+
+
+_canales = {}
+
+
+def eventos_ocupacion(institucion_id, curso_lectivo_id):
+    """Generador asíncrono de eventos SSE; comparte el lector del proceso para la institución."""
+    clave = (institucion_id, curso_lectivo_id)
+    canal = _canales.get(clave)
+    if canal is None:
+        canal = _canales[clave] = _CanalOcupacion(institucion_id, curso_lectivo_id)
+    return canal.eventos()
@@ -0,0 +1,1251 @@
+"""
+Servicios del comedor: índice de elegibilidad en caché para el escaneo de almuerzo.
+
+El índice por (institución, curso lectivo) guarda identificación → estudiante/beca,
+código → tiquete, el intervalo configurado y una foto de los últimos registros
+dentro del intervalo. Cada registro nuevo actualiza además una clave por
+estudiante/tiquete con su última hora, de modo que un escaneo con el índice caliente
+solo ejecuta el INSERT del registro. El índice se invalida por versión desde
+comedor.signals (becas, matrículas, estudiantes, tiquetes y configuración).
+
+La caché solo descarta rápido los duplicados evidentes: el INSERT es condicional
+(no existe registro dentro del intervalo) y numera el registro con la siguiente
+secuencia del estudiante/tiquete, protegida por una restricción única. Dos escaneos
+simultáneos calculan la misma secuencia y solo uno se inserta; el otro resuelve como
+duplicado, sin bloquear la tabla.
+
+Los reportes leen ResumenComedorDiario (totales por día, tipo y nivel) hasta el día
+marcado en CierreResumenComedor por el comando cerrar_resumen_comedor y agregan en
+crudo solo el resto.
+La lista de becados sin uso sale de una sola consulta (anti-join NOT EXISTS) y se
+cachea hasta el siguiente registro de la institución.
+
+Las becas se asignan por lote (lista o archivo de identificaciones): una consulta de
+validación, bulk_create/bulk_update y una sola invalidación del índice por lote.
+"""
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, FilteredRelation, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from catalogos.models import CursoLectivo
+from core.models import Institucion
+from matricula.models import MatriculaAcademica
+
+try:
+    import openpyxl
+except Exception:  # pragma: no cover - depende del entorno de despliegue
+    openpyxl = None
+
+from .models import (
+    BecaComedor,
+    CierreResumenComedor,
+    ConfiguracionComedor,
+    RegistroAlmuerzo,
+    RegistroAlmuerzoTiquete,
+    ResumenComedorDiario,
+    TiqueteComedor,
+)
+
+INTERVALO_MINUTOS_DEFECTO = 1200
+INDICE_COMEDOR_CACHE_TIMEOUT = 60 * 60 * 6
+# Supera el intervalo por defecto (1200 min); pasado ese tiempo rige la foto del índice.
+ULTIMO_ESCANEO_CACHE_TIMEOUT = 60 * 60 * 48
+# Segundos en los que una relectura del mismo QR se responde como éxito idempotente.
+SEGUNDOS_RELECTURA = 2
+# Sincronización por lote desde kioscos sin conexión.
+MAX_ESCANEOS_LOTE = 1000
+TOLERANCIA_RELOJ_KIOSCO = timedelta(minutes=5)
+ANTIGUEDAD_MAXIMA_ESCANEO = timedelta(days=7)
+# Reintentos de un escaneo sincronizado cuya secuencia tomó un escaneo concurrente.
+REINTENTOS_SECUENCIA = 3
+# Respaldo para cambios de encargados, que no invalidan por versión.
+BECADOS_SIN_USO_CACHE_TIMEOUT = 60 * 10
+# Identificaciones por lote de asignación de becas.
+MAX_BECAS_LOTE = 5000
+
+_KEY_CURSO_LECTIVO_ACTIVO = "comedor:curso_lectivo_activo"
+_KEY_VERSION_INDICE_GLOBAL = "comedor:indice:version"
+
+
+def _cache_key_version_indice_institucion(institucion_id):
+    return f"comedor:indice:version:{institucion_id}"
+
+
+def _cache_key_version_indice_curso(institucion_id, curso_lectivo_id):
+    return f"comedor:indice:version:{institucion_id}:{curso_lectivo_id}"
+
+
+def _cache_key_ultimo_estudiante(institucion_id, curso_lectivo_id, estudiante_id):
+    return f"comedor:ultimo:{institucion_id}:{curso_lectivo_id}:E{estudiante_id}"
+
+
+def _cache_key_ultimo_tiquete(tiquete_id):
+    return f"comedor:ultimo:T{tiquete_id}"
+
+
+def _cache_key_version_registros(institucion_id, curso_lectivo_id):
+    return f"comedor:registros:version:{institucion_id}:{curso_lectivo_id}"
+
+
+def _incrementar_version_cache(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  CURSO LECTIVO ACTIVO
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def curso_lectivo_activo_id():
+    """Id del curso lectivo activo (cacheado; se invalida desde signals de CursoLectivo)."""
+    curso_id = cache.get(_KEY_CURSO_LECTIVO_ACTIVO)
+    if curso_id is None:
+        curso = CursoLectivo.get_activo()
+        curso_id = curso.pk if curso else 0
+        cache.set(_KEY_CURSO_LECTIVO_ACTIVO, curso_id, None)
+    return curso_id or None
+
+
+def invalidar_curso_lectivo_activo():
+    cache.delete(_KEY_CURSO_LECTIVO_ACTIVO)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  ÍNDICE DE ELEGIBILIDAD
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def cache_key_indice_comedor(institucion_id, curso_lectivo_id):
+    claves = [
+        _KEY_VERSION_INDICE_GLOBAL,
+        _cache_key_version_indice_institucion(institucion_id),
+        _cache_key_version_indice_curso(institucion_id, curso_lectivo_id),
+    ]
+    versiones = cache.get_many(claves)
+    v = ".".join(str(versiones.get(k, 0)) for k in claves)
+    return f"comedor:indice:{institucion_id}:{curso_lectivo_id}:v{v}"
+
+
+def invalidar_indice_comedor(institucion_id=None, curso_lectivo_id=None):
+    """
+    Sin argumentos invalida todos los índices (cambios masivos de estudiantes); con
+    solo institución, los de esa institución (tiquetes, configuración).
+    """
+    if institucion_id is None:
+        _incrementar_version_cache(_KEY_VERSION_INDICE_GLOBAL)
+    elif curso_lectivo_id is None:
+        _incrementar_version_cache(_cache_key_version_indice_institucion(institucion_id))
+    else:
+        _incrementar_version_cache(_cache_key_version_indice_curso(institucion_id, curso_lectivo_id))
+
+
+def construir_indice_comedor(institucion_id, curso_lectivo_id):
+    """
+    Índice de elegibilidad desde base de datos. Retorna None si la institución no existe.
+    estudiantes: identificación -> (estudiante_id, nombre, becado)
+    tiquetes: código -> (tiquete_id, tipo_display, activo)
+    ultimos: "E<id>" / "T<id>" -> fecha_hora del último registro dentro del intervalo
+    """
+    if not Institucion.objects.filter(pk=institucion_id).exists():
+        return None
+    config = ConfiguracionComedor.objects.filter(institucion_id=institucion_id).first()
+    intervalo_minutos = config.intervalo_minutos if config else INTERVALO_MINUTOS_DEFECTO
+
+    becados = set(
+        BecaComedor.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            activa=True,
+        ).values_list("estudiante_id", flat=True)
+    )
+    estudiantes = {}
+    matriculas = (
+        MatriculaAcademica.objects.filter(
+            curso_lectivo_id=curso_lectivo_id,
+            institucion_id=institucion_id,
+            estado__iexact=MatriculaAcademica.ACTIVO,
+        )
+        .select_related("estudiante")
+        .order_by("id")
+    )
+    for m in matriculas:
+        est = m.estudiante
+        estudiantes.setdefault(est.identificacion, (est.id, str(est), est.id in becados))
+
+    tipos = dict(TiqueteComedor.TIPO_CHOICES)
+    tiquetes = {
+        codigo: (tiq_id, tipos.get(tipo, tipo), activo)
+        for tiq_id, codigo, tipo, activo in TiqueteComedor.objects.filter(
+            institucion_id=institucion_id
+        ).values_list("id", "codigo", "tipo", "activo")
+    }
+
+    desde = timezone.now() - timedelta(minutes=intervalo_minutos)
+    ultimos = {
+        f"E{est_id}": fecha_hora
+        for est_id, fecha_hora in RegistroAlmuerzo.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            fecha_hora__gte=desde,
+        ).values("estudiante_id").annotate(ultimo=Max("fecha_hora")).values_list("estudiante_id", "ultimo")
+    }
+    ultimos.update({
+        f"T{tiq_id}": fecha_hora
+        for tiq_id, fecha_hora in RegistroAlmuerzoTiquete.objects.filter(
+            tiquete__institucion_id=institucion_id,
+            fecha_hora__gte=desde,
+        ).values("tiquete_id").annotate(ultimo=Max("fecha_hora")).values_list("tiquete_id", "ultimo")
+    })
+    return {
+        "intervalo_minutos": intervalo_minutos,
+        "estudiantes": estudiantes,
+        "tiquetes": tiquetes,
+        "ultimos": ultimos,
+    }
+
+
+def obtener_indice_comedor(institucion_id, curso_lectivo_id):
+    """Índice desde la caché compartida; se construye en el primer uso."""
+    key = cache_key_indice_comedor(institucion_id, curso_lectivo_id)
+    indice = cache.get(key)
+    if indice is None:
+        indice = construir_indice_comedor(institucion_id, curso_lectivo_id)
+        if indice is None:
+            return None
+        cache.set(key, indice, INDICE_COMEDOR_CACHE_TIMEOUT)
+    return indice
+
+
+def registrar_ultimo_escaneo(registro):
+    """
+    Guarda la hora del último registro (RegistroAlmuerzo o RegistroAlmuerzoTiquete) y
+    lo suma en los contadores de ocupación en vivo (comedor.ocupacion).
+    """
+    if isinstance(registro, RegistroAlmuerzoTiquete):
+        key = _cache_key_ultimo_tiquete(registro.tiquete_id)
+    else:
+        key = _cache_key_ultimo_estudiante(registro.institucion_id, registro.curso_lectivo_id, registro.estudiante_id)
+        # Un becado con registro nuevo deja de estar "sin uso".
+        _incrementar_version_cache(
+            _cache_key_version_registros(registro.institucion_id, registro.curso_lectivo_id)
+        )
+    actual = cache.get(key)
+    # Un escaneo sincronizado tarde puede ser anterior al último conocido.
+    if actual is None or registro.fecha_hora > actual:
+        cache.set(key, registro.fecha_hora, ULTIMO_ESCANEO_CACHE_TIMEOUT)
+
+    from .ocupacion import contar_registro
+
+    contar_registro(registro)
+
+
+def olvidar_ultimo_escaneo(registro):
+    """Un registro borrado deja de contar: se descarta la clave y la foto del índice."""
+    if isinstance(registro, RegistroAlmuerzoTiquete):
+        cache.delete(_cache_key_ultimo_tiquete(registro.tiquete_id))
+        invalidar_indice_comedor(registro.institucion_id)
+    else:
+        cache.delete(
+            _cache_key_ultimo_estudiante(registro.institucion_id, registro.curso_lectivo_id, registro.estudiante_id)
+        )
+        invalidar_indice_comedor(registro.institucion_id, registro.curso_lectivo_id)
+
+
+def _ultimo_escaneo(indice, clave_indice, key_cache):
+    """Más reciente entre la foto del índice y la clave por estudiante/tiquete."""
+    candidatos = [f for f in (indice["ultimos"].get(clave_indice), cache.get(key_cache)) if f]
+    return max(candidatos) if candidatos else None
+
+
+def _insertar_si_libre(modelo, sujeto, valores, desde):
+    """
+    INSERT atómico del registro si el sujeto (columnas que identifican al estudiante o
+    al tiquete) no tiene registros desde `desde`. Retorna la instancia creada (sin
+    signals) o None si el intervalo ya estaba ocupado o un escaneo concurrente ganó
+    la secuencia.
+    """
+    q = connection.ops.quote_name
+    tabla = q(modelo._meta.db_table)
+    columnas = {**sujeto, **valores}
+    filtro = " AND ".join(f"{q(col)} = %s" for col in sujeto)
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(q(col) for col in columnas)}, {q('secuencia')}) "
+        f"SELECT {', '.join(['%s'] * len(columnas))}, "
+        f"COALESCE((SELECT MAX({q('secuencia')}) FROM {tabla} WHERE {filtro}), 0) + 1 "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {tabla} WHERE {filtro} AND {q('fecha_hora')} >= %s) "
+        f"ON CONFLICT DO NOTHING RETURNING {q('id')}, {q('secuencia')}"
+    )
+    params = [*columnas.values(), *sujeto.values(), *sujeto.values(), desde]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        fila = cursor.fetchone()
+    if fila is None:
+        return None
+    registro = modelo(id=fila[0], secuencia=fila[1], **columnas)
+    registro._state.adding = False
+    # El INSERT directo no emite post_save: actualizar la última hora al confirmar.
+    transaction.on_commit(lambda: registrar_ultimo_escaneo(registro))
+    return registro
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  ESCANEO
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def _respuesta_reciente(ultimo, ahora, intervalo_minutos, nombre, identificacion, tipo_acceso):
+    delta_sec = (ahora - ultimo).total_seconds()
+    # Doble lectura del QR: misma respuesta que éxito sin mensaje de duplicado
+    if delta_sec < SEGUNDOS_RELECTURA:
+        return {
+            "ok": True,
+            "status": "ok",
+            "message": f"{nombre} — registro confirmado.",
+            "nombre": nombre,
+            "identificacion": identificacion,
+            "tipo_acceso": tipo_acceso,
+            "idempotente": True,
+        }
+    mins_transcurridos = int(delta_sec / 60)
+    mins_restantes = intervalo_minutos - mins_transcurridos
+    return {
+        "ok": True,
+        "status": "duplicado",
+        "message": (
+            f"{nombre} ya registró a las {ultimo:%H:%M}. "
+            f"Debe esperar {mins_restantes} minuto(s) más."
+        ),
+        "nombre": nombre,
+        "identificacion": identificacion,
+    }
+
+
+def procesar_escaneo_comedor(institucion_id, curso_lectivo_id, entrada):
+    """
+    Resuelve un escaneo (identificación de estudiante o código de tiquete) contra el
+    índice y registra el almuerzo si corresponde. Con el índice caliente la única
+    consulta es el INSERT condicional del registro. Retorna (payload, status_http).
+    """
+    indice = obtener_indice_comedor(institucion_id, curso_lectivo_id)
+    if indice is None:
+        return {"ok": False, "status": "error", "message": "Debe seleccionar una institución válida."}, 400
+
+    ahora = timezone.now()
+    intervalo_minutos = indice["intervalo_minutos"]
+    desde = ahora - timedelta(minutes=intervalo_minutos)
+
+    # ── 1. Intentar como identificación de estudiante ──────────────────
+    estudiante = indice["estudiantes"].get(entrada)
+    if estudiante:
+        estudiante_id, nombre, becado = estudiante
+        if not becado:
+            return {
+                "ok": True,
+                "status": "no_beca",
+                "message": f"{nombre} no tiene beca de comedor.",
+                "nombre": nombre,
+                "identificacion": entrada,
+            }, 200
+
+        ultimo = _ultimo_escaneo(
+            indice,
+            f"E{estudiante_id}",
+            _cache_key_ultimo_estudiante(institucion_id, curso_lectivo_id, estudiante_id),
+        )
+        if ultimo and ultimo >= desde:
+            return _respuesta_reciente(
+                ultimo, ahora, intervalo_minutos, nombre, entrada, "Alumno becado"
+            ), 200
+
+        sujeto = {
+            "institucion_id": institucion_id,
+            "curso_lectivo_id": curso_lectivo_id,
+            "estudiante_id": estudiante_id,
+        }
+        registro = _insertar_si_libre(
+            RegistroAlmuerzo, sujeto, {"fecha": timezone.localdate(ahora), "fecha_hora": ahora}, desde
+        )
+        if registro is None:
+            ultimo = RegistroAlmuerzo.objects.filter(**sujeto).aggregate(m=Max("fecha_hora"))["m"]
+            return _respuesta_reciente(
+                min(ultimo or ahora, ahora), ahora, intervalo_minutos, nombre, entrada, "Alumno becado"
+            ), 200
+        return {
+            "ok": True,
+            "status": "ok",
+            "message": f"{nombre} registrado correctamente.",
+            "nombre": nombre,
+            "identificacion": entrada,
+            "tipo_acceso": "Alumno becado",
+        }, 200
+
+    # ── 2. Intentar como código de tiquete ─────────────────────────────
+    tiquete = indice["tiquetes"].get(entrada)
+    if not tiquete:
+        return {
+            "ok": True,
+            "status": "no_encontrado",
+            "message": f"El código «{entrada}» no corresponde a ningún estudiante con beca ni a un tiquete.",
+            "identificacion": entrada,
+        }, 200
+
+    tiquete_id, tipo_display, activo = tiquete
+    if not activo:
+        return {
+            "ok": True,
+            "status": "inactivo",
+            "message": f"El tiquete {entrada} está inactivo.",
+            "identificacion": entrada,
+        }, 200
+
+    ultimo = _ultimo_escaneo(indice, f"T{tiquete_id}", _cache_key_ultimo_tiquete(tiquete_id))
+    if ultimo and ultimo >= desde:
+        return _respuesta_reciente(ultimo, ahora, intervalo_minutos, tipo_display, entrada, tipo_display), 200
+
+    registro = _insertar_si_libre(
+        RegistroAlmuerzoTiquete,
+        {"tiquete_id": tiquete_id},
+        {
+            "institucion_id": institucion_id,
+            "curso_lectivo_id": curso_lectivo_id,
+            "fecha": timezone.localdate(ahora),
+            "fecha_hora": ahora,
+        },
+        desde,
+    )
+    if registro is None:
+        ultimo = RegistroAlmuerzoTiquete.objects.filter(tiquete_id=tiquete_id).aggregate(m=Max("fecha_hora"))["m"]
+        return _respuesta_reciente(
+            min(ultimo or ahora, ahora), ahora, intervalo_minutos, tipo_display, entrada, tipo_display
+        ), 200
+    return {
+        "ok": True,
+        "status": "ok",
+        "message": f"{tipo_display} registrado correctamente.",
+        "nombre": tipo_display,
+        "identificacion": entrada,
+        "tipo_acceso": tipo_display,
+    }, 200
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  SINCRONIZACIÓN POR LOTE (KIOSCOS SIN CONEXIÓN)
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def _parse_fecha_hora_escaneo(valor):
+    """ISO 8601 (naive = hora local) o milisegundos epoch (Date.now() del kiosco)."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            return datetime.fromtimestamp(valor / 1000, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(valor, str):
+        return None
+    try:
+        fecha_hora = parse_datetime(valor.strip())
+    except ValueError:
+        return None
+    if fecha_hora is not None and timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+def _veredicto(clave, payload):
+    payload["clave"] = clave
+    return payload
+
+
+def _evaluar_intervalo(tiempos, fecha_hora, intervalo, intervalo_minutos, nombre, entrada, tipo_acceso):
+    """
+    Veredicto por intervalo a la hora del escaneo, contra registros anteriores y
+    posteriores (un escaneo tardío no puede quedar dentro del intervalo de otro).
+    None si el escaneo se acepta.
+    """
+    cercano = min(tiempos, key=lambda t: abs(t - fecha_hora), default=None)
+    if cercano is None or abs(cercano - fecha_hora) >= intervalo:
+        return None
+    if cercano <= fecha_hora or abs((cercano - fecha_hora).total_seconds()) < SEGUNDOS_RELECTURA:
+        previo = min(cercano, fecha_hora)
+        return _respuesta_reciente(previo, max(cercano, fecha_hora), intervalo_minutos, nombre, entrada, tipo_acceso)
+    return {
+        "ok": True,
+        "status": "duplicado",
+        "message": f"{nombre} ya tiene un registro a las {cercano:%H:%M} dentro del intervalo.",
+        "nombre": nombre,
+        "identificacion": entrada,
+    }
+
+
+def _reintentar_registro(registro, intervalo, intervalo_minutos, nombre, entrada):
+    """
+    Reintenta un escaneo sincronizado que no entró porque un escaneo concurrente tomó
+    su secuencia: relee los registros del estudiante/tiquete alrededor de su hora y, si
+    el intervalo sigue libre, lo inserta con la siguiente secuencia. None si quedó
+    registrado; si no, el veredicto.
+    """
+    modelo = type(registro)
+    if modelo is RegistroAlmuerzo:
+        sujeto = {
+            "institucion_id": registro.institucion_id,
+            "curso_lectivo_id": registro.curso_lectivo_id,
+            "estudiante_id": registro.estudiante_id,
+        }
+        tipo_acceso = "Alumno becado"
+    else:
+        sujeto = {"tiquete_id": registro.tiquete_id}
+        tipo_acceso = nombre
+    for _ in range(REINTENTOS_SECUENCIA):
+        # Otro envío del mismo lote pudo registrar la clave entre tanto.
+        if modelo.objects.filter(
+            institucion_id=registro.institucion_id, clave_idempotencia=registro.clave_idempotencia
+        ).exists():
+            return None
+        tiempos = list(
+            modelo.objects.filter(
+                **sujeto,
+                fecha_hora__gt=registro.fecha_hora - intervalo,
+                fecha_hora__lt=registro.fecha_hora + intervalo,
+            ).values_list("fecha_hora", flat=True)
+        )
+        veredicto = _evaluar_intervalo(
+            tiempos, registro.fecha_hora, intervalo, intervalo_minutos, nombre, entrada, tipo_acceso
+        )
+        if veredicto is not None:
+            return veredicto
+        ultima = modelo.objects.filter(**sujeto).aggregate(m=Max("secuencia"))["m"]
+        registro.secuencia = (ultima or 0) + 1
+        try:
+            with transaction.atomic():
+                modelo.objects.bulk_create([registro])
+            return None
+        except IntegrityError:
+            continue
+    return {
+        "ok": False,
+        "status": "reintentar",
+        "message": f"No se pudo registrar a {nombre} por escaneos simultáneos; reintente la sincronización.",
+        "nombre": nombre,
+        "identificacion": entrada,
+    }
+
+
+def sincronizar_escaneos_comedor(institucion_id, curso_lectivo_id, escaneos):
+    """
+    Aplica un lote de escaneos con hora del kiosco: [{"clave", "entrada", "fecha_hora"}].
+    Usa las mismas reglas de beca/tiquete/intervalo que procesar_escaneo_comedor, evaluadas
+    a la hora de cada escaneo, e inserta los aceptados con bulk_create; los que pierden
+    la secuencia frente a un escaneo concurrente se reintentan (_reintentar_registro).
+    Una clave ya sincronizada no se vuelve a registrar. Retorna la lista de veredictos en el orden
+    recibido, o None si la institución no existe.
+    """
+    indice = obtener_indice_comedor(institucion_id, curso_lectivo_id)
+    if indice is None:
+        return None
+    ahora = timezone.now()
+    intervalo_minutos = indice["intervalo_minutos"]
+    intervalo = timedelta(minutes=intervalo_minutos)
+
+    resultados = [None] * len(escaneos)
+    validos = []
+    for pos, item in enumerate(escaneos):
+        item = item if isinstance(item, dict) else {}
+        clave = str(item.get("clave") or "").strip()[:64]
+        entrada = str(item.get("entrada") or "").strip().upper()
+        fecha_hora = _parse_fecha_hora_escaneo(item.get("fecha_hora"))
+        if not clave or not entrada or fecha_hora is None:
+            resultados[pos] = _veredicto(clave, {
+                "ok": False,
+                "status": "invalido",
+                "message": "El escaneo requiere clave, entrada y fecha_hora válidas.",
+                "identificacion": entrada,
+            })
+        elif not (ahora - ANTIGUEDAD_MAXIMA_ESCANEO <= fecha_hora <= ahora + TOLERANCIA_RELOJ_KIOSCO):
+            resultados[pos] = _veredicto(clave, {
+                "ok": False,
+                "status": "invalido",
+                "message": "La hora del escaneo está fuera del rango permitido.",
+                "identificacion": entrada,
+            })
+        else:
+            validos.append((fecha_hora, pos, clave, entrada))
+    if not validos:
+        return resultados
+
+    claves = [v[2] for v in validos]
+    ya_sincronizadas = set(
+        RegistroAlmuerzo.objects.filter(
+            institucion_id=institucion_id, clave_idempotencia__in=claves
+        ).values_list("clave_idempotencia", flat=True)
+    )
+    ya_sincronizadas.update(
+        RegistroAlmuerzoTiquete.objects.filter(
+            institucion_id=institucion_id, clave_idempotencia__in=claves
+        ).values_list("clave_idempotencia", flat=True)
+    )
+
+    # Registros existentes alrededor del lote para evaluar el intervalo.
+    est_ids = {indice["estudiantes"][v[3]][0] for v in validos if v[3] in indice["estudiantes"]}
+    tiq_ids = {indice["tiquetes"][v[3]][0] for v in validos if v[3] in indice["tiquetes"]}
+    desde = min(v[0] for v in validos) - intervalo
+    hasta = max(v[0] for v in validos) + intervalo
+    tiempos = defaultdict(list)
+    if est_ids:
+        for est_id, fecha_hora in RegistroAlmuerzo.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            estudiante_id__in=est_ids,
+            fecha_hora__gt=desde,
+            fecha_hora__lt=hasta,
+        ).values_list("estudiante_id", "fecha_hora"):
+            tiempos[f"E{est_id}"].append(fecha_hora)
+    if tiq_ids:
+        for tiq_id, fecha_hora in RegistroAlmuerzoTiquete.objects.filter(
+            tiquete_id__in=tiq_ids,
+            fecha_hora__gt=desde,
+            fecha_hora__lt=hasta,
+        ).values_list("tiquete_id", "fecha_hora"):
+            tiempos[f"T{tiq_id}"].append(fecha_hora)
+
+    # Última secuencia por estudiante/tiquete: los nuevos registros continúan la numeración.
+    secuencias = {}
+    if est_ids:
+        secuencias.update({
+            f"E{est_id}": ultima
+            for est_id, ultima in RegistroAlmuerzo.objects.filter(
+                institucion_id=institucion_id,
+                curso_lectivo_id=curso_lectivo_id,
+                estudiante_id__in=est_ids,
+            ).values("estudiante_id").annotate(ultima=Max("secuencia")).values_list("estudiante_id", "ultima")
+        })
+    if tiq_ids:
+        secuencias.update({
+            f"T{tiq_id}": ultima
+            for tiq_id, ultima in RegistroAlmuerzoTiquete.objects.filter(
+                tiquete_id__in=tiq_ids,
+            ).values("tiquete_id").annotate(ultima=Max("secuencia")).values_list("tiquete_id", "ultima")
+        })
+
+    def _siguiente_secuencia(clave_sujeto):
+        secuencias[clave_sujeto] = secuencias.get(clave_sujeto, 0) + 1
+        return secuencias[clave_sujeto]
+
+    nuevos_est, nuevos_tiq = [], []
+    pos_por_clave = {}
+    claves_lote = set()
+    for fecha_hora, pos, clave, entrada in sorted(validos):
+        if clave in ya_sincronizadas or clave in claves_lote:
+            resultados[pos] = _veredicto(clave, {
+                "ok": True,
+                "status": "ya_sincronizado",
+                "message": "El escaneo ya había sido sincronizado.",
+                "identificacion": entrada,
+            })
+            continue
+        claves_lote.add(clave)
+        fecha = timezone.localdate(fecha_hora)
+
+        estudiante = indice["estudiantes"].get(entrada)
+        if estudiante:
+            estudiante_id, nombre, becado = estudiante
+            if not becado:
+                resultados[pos] = _veredicto(clave, {
+                    "ok": True,
+                    "status": "no_beca",
+                    "message": f"{nombre} no tiene beca de comedor.",
+                    "nombre": nombre,
+                    "identificacion": entrada,
+                })
+                continue
+            veredicto = _evaluar_intervalo(
+                tiempos[f"E{estudiante_id}"], fecha_hora, intervalo, intervalo_minutos,
+                nombre, entrada, "Alumno becado",
+            )
+            if veredicto is None:
+                tiempos[f"E{estudiante_id}"].append(fecha_hora)
+                nuevos_est.append(RegistroAlmuerzo(
+                    institucion_id=institucion_id,
+                    curso_lectivo_id=curso_lectivo_id,
+                    estudiante_id=estudiante_id,
+                    fecha=fecha,
+                    fecha_hora=fecha_hora,
+                    clave_idempotencia=clave,
+                    secuencia=_siguiente_secuencia(f"E{estudiante_id}"),
+                ))
+                pos_por_clave[clave] = (pos, nombre, entrada)
+                veredicto = {
+                    "ok": True,
+                    "status": "ok",
+                    "message": f"{nombre} registrado correctamente.",
+                    "nombre": nombre,
+                    "identificacion": entrada,
+                    "tipo_acceso": "Alumno becado",
+                }
+            resultados[pos] = _veredicto(clave, veredicto)
+            continue
+
+        tiquete = indice["tiquetes"].get(entrada)
+        if not tiquete:
+            resultados[pos] = _veredicto(clave, {
+                "ok": True,
+                "status": "no_encontrado",
+                "message": f"El código «{entrada}» no corresponde a ningún estudiante con beca ni a un tiquete.",
+                "identificacion": entrada,
+            })
+            continue
+        tiquete_id, tipo_display, activo = tiquete
+        if not activo:
+            resultados[pos] = _veredicto(clave, {
+                "ok": True,
+                "status": "inactivo",
+                "message": f"El tiquete {entrada} está inactivo.",
+                "identificacion": entrada,
+            })
+            continue
+        veredicto = _evaluar_intervalo(
+            tiempos[f"T{tiquete_id}"], fecha_hora, intervalo, intervalo_minutos,
+            tipo_display, entrada, tipo_display,
+        )
+        if veredicto is None:
+            tiempos[f"T{tiquete_id}"].append(fecha_hora)
+            nuevos_tiq.append(RegistroAlmuerzoTiquete(
+                institucion_id=institucion_id,
+                curso_lectivo_id=curso_lectivo_id,
+                tiquete_id=tiquete_id,
+                fecha=fecha,
+                fecha_hora=fecha_hora,
+                clave_idempotencia=clave,
+                secuencia=_siguiente_secuencia(f"T{tiquete_id}"),
+            ))
+            pos_por_clave[clave] = (pos, tipo_display, entrada)
+            veredicto = {
+                "ok": True,
+                "status": "ok",
+                "message": f"{tipo_display} registrado correctamente.",
+                "nombre": tipo_display,
+                "identificacion": entrada,
+                "tipo_acceso": tipo_display,
+            }
+        resultados[pos] = _veredicto(clave, veredicto)
+
+    if nuevos_est or nuevos_tiq:
+        with transaction.atomic():
+            # ignore_conflicts: otro envío concurrente del mismo lote ya insertó la clave,
+            # o un escaneo en línea concurrente tomó la misma secuencia.
+            RegistroAlmuerzo.objects.bulk_create(nuevos_est, ignore_conflicts=True)
+            RegistroAlmuerzoTiquete.objects.bulk_create(nuevos_tiq, ignore_conflicts=True)
+            insertadas = set(
+                RegistroAlmuerzo.objects.filter(
+                    institucion_id=institucion_id, clave_idempotencia__in=pos_por_clave
+                ).values_list("clave_idempotencia", flat=True)
+            )
+            insertadas.update(
+                RegistroAlmuerzoTiquete.objects.filter(
+                    institucion_id=institucion_id, clave_idempotencia__in=pos_por_clave
+                ).values_list("clave_idempotencia", flat=True)
+            )
+            aceptados = []
+            for registro in nuevos_est + nuevos_tiq:
+                clave = registro.clave_idempotencia
+                if clave not in insertadas:
+                    # Perdió la secuencia frente a un escaneo concurrente: solo se rechaza
+                    # si ahora hay un registro dentro del intervalo.
+                    pos, nombre, entrada = pos_por_clave[clave]
+                    veredicto = _reintentar_registro(registro, intervalo, intervalo_minutos, nombre, entrada)
+                    if veredicto is not None:
+                        resultados[pos] = _veredicto(clave, veredicto)
+                        continue
+                aceptados.append(registro)
+            # bulk_create no emite signals: actualizar la última hora por estudiante/tiquete
+            # y los resúmenes de días ya cerrados que reciben escaneos tardíos.
+            transaction.on_commit(lambda: [registrar_ultimo_escaneo(r) for r in aceptados])
+            fechas = {r.fecha for r in aceptados}
+            transaction.on_commit(
+                lambda: recalcular_dias_cerrados(institucion_id, curso_lectivo_id, fechas)
+            )
+    return resultados
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  RESUMEN DIARIO (REPORTES)
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def agregar_registros_comedor(institucion_id, curso_lectivo_id, desde, hasta):
+    """
+    Totales por (fecha, tipo, nivel) desde los registros crudos del rango. Retorna
+    dicts con fecha, tipo, nivel_id, registros, distintos y monto.
+    """
+    nivel_matricula = (
+        MatriculaAcademica.objects.filter(
+            estudiante_id=OuterRef("estudiante_id"),
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+        )
+        .order_by("-id")
+        .values("nivel_id")[:1]
+    )
+    filas = [
+        {
+            "fecha": fila["fecha"],
+            "tipo": ResumenComedorDiario.BECA,
+            "nivel_id": fila["nivel_id"],
+            "registros": fila["registros"],
+            "distintos": fila["distintos"],
+            "monto": 0,
+        }
+        for fila in RegistroAlmuerzo.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            fecha__range=(desde, hasta),
+        )
+        .annotate(nivel_id=Subquery(nivel_matricula))
+        .values("fecha", "nivel_id")
+        .annotate(registros=Count("id"), distintos=Count("estudiante_id", distinct=True))
+        .order_by()
+    ]
+    filas.extend(
+        {
+            "fecha": fila["fecha"],
+            "tipo": fila["tiquete__tipo"],
+            "nivel_id": None,
+            "registros": fila["registros"],
+            "distintos": fila["distintos"],
+            "monto": fila["monto"] or 0,
+        }
+        for fila in RegistroAlmuerzoTiquete.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            fecha__range=(desde, hasta),
+        )
+        .values("fecha", "tiquete__tipo")
+        .annotate(
+            registros=Count("id"),
+            distintos=Count("tiquete_id", distinct=True),
+            monto=Sum("tiquete__monto"),
+        )
+        .order_by()
+    )
+    return filas
+
+
+def ultimo_dia_cerrado(institucion_id, curso_lectivo_id):
+    """Último día hasta el cual el resumen diario está completo (None si nunca se cerró)."""
+    return (
+        CierreResumenComedor.objects.filter(institucion_id=institucion_id, curso_lectivo_id=curso_lectivo_id)
+        .values_list("cerrado_hasta", flat=True)
+        .first()
+    )
+
+
+def _hay_registros(institucion_id, curso_lectivo_id, desde, hasta):
+    """¿Hay registros de becas o tiquetes en [desde, hasta]? (desde None: sin límite inferior)."""
+    filtro = {"institucion_id": institucion_id, "curso_lectivo_id": curso_lectivo_id, "fecha__lte": hasta}
+    if desde is not None:
+        filtro["fecha__gte"] = desde
+    return (
+        RegistroAlmuerzo.objects.filter(**filtro).exists()
+        or RegistroAlmuerzoTiquete.objects.filter(**filtro).exists()
+    )
+
+
+def cerrar_resumen_comedor(institucion_id, curso_lectivo_id, desde, hasta):
+    """
+    Reemplaza los resúmenes del rango con los totales actuales y avanza
+    CierreResumenComedor hasta `hasta` si no quedan días con registros sin cerrar entre
+    el cierre anterior y `desde`. Retorna las filas creadas.
+    """
+    filas = agregar_registros_comedor(institucion_id, curso_lectivo_id, desde, hasta)
+    with transaction.atomic():
+        ResumenComedorDiario.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            fecha__range=(desde, hasta),
+        ).delete()
+        ResumenComedorDiario.objects.bulk_create([
+            ResumenComedorDiario(
+                institucion_id=institucion_id, curso_lectivo_id=curso_lectivo_id, **fila
+            )
+            for fila in filas
+        ])
+        cerrado = ultimo_dia_cerrado(institucion_id, curso_lectivo_id)
+        if cerrado is None or hasta > cerrado:
+            # Hueco entre el cierre anterior (o el inicio) y el rango: sin registros, sus
+            # días también cuentan como cerrados.
+            inicio_hueco = cerrado + timedelta(days=1) if cerrado else None
+            contiguo = (inicio_hueco is not None and inicio_hueco >= desde) or not _hay_registros(
+                institucion_id, curso_lectivo_id, inicio_hueco, desde - timedelta(days=1)
+            )
+            if contiguo:
+                CierreResumenComedor.objects.update_or_create(
+                    institucion_id=institucion_id,
+                    curso_lectivo_id=curso_lectivo_id,
+                    defaults={"cerrado_hasta": hasta},
+                )
+    return len(filas)
+
+
+def recalcular_dias_cerrados(institucion_id, curso_lectivo_id, fechas):
+    """
+    Registros agregados o borrados en días ya cerrados (sincronización tardía, admin):
+    recalcula esos días. Los posteriores al último cierre se leen en crudo.
+    """
+    fechas = {f for f in fechas if f < timezone.localdate()}
+    if not fechas:
+        return
+    cerrado = ultimo_dia_cerrado(institucion_id, curso_lectivo_id)
+    for fecha in sorted(f for f in fechas if cerrado and f <= cerrado):
+        cerrar_resumen_comedor(institucion_id, curso_lectivo_id, fecha, fecha)
+
+
+def resumen_comedor_periodo(institucion_id, curso_lectivo_id, desde, hasta):
+    """
+    Totales por (fecha, tipo, nivel) del rango: días cerrados desde ResumenComedorDiario
+    y el resto (normalmente solo hoy) agregado desde los registros.
+    """
+    cerrado = ultimo_dia_cerrado(institucion_id, curso_lectivo_id)
+    filas = []
+    if cerrado and cerrado >= desde:
+        filas.extend(
+            ResumenComedorDiario.objects.filter(
+                institucion_id=institucion_id,
+                curso_lectivo_id=curso_lectivo_id,
+                fecha__range=(desde, min(cerrado, hasta)),
+            ).values("fecha", "tipo", "nivel_id", "registros", "distintos", "monto")
+        )
+        desde = cerrado + timedelta(days=1)
+    if desde <= hasta:
+        filas.extend(agregar_registros_comedor(institucion_id, curso_lectivo_id, desde, hasta))
+    return filas
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  BECADOS SIN USO
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def _consulta_becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta):
+    """
+    Matrículas activas con beca activa y sin registro de almuerzo en [desde, hasta]:
+    EXISTS (beca) + NOT EXISTS (registro), con grupo y encargado principal en el
+    mismo SELECT (LEFT JOIN filtrado; hay a lo sumo un encargado principal).
+    """
+    beca = BecaComedor.objects.filter(
+        estudiante_id=OuterRef("estudiante_id"),
+        institucion_id=institucion_id,
+        curso_lectivo_id=curso_lectivo_id,
+        activa=True,
+    )
+    registro = RegistroAlmuerzo.objects.filter(
+        estudiante_id=OuterRef("estudiante_id"),
+        institucion_id=institucion_id,
+        curso_lectivo_id=curso_lectivo_id,
+        fecha__range=(desde, hasta),
+    )
+    return (
+        MatriculaAcademica.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            estado__iexact=MatriculaAcademica.ACTIVO,
+        )
+        .filter(Exists(beca), ~Exists(registro))
+        .annotate(
+            encargado=FilteredRelation(
+                "estudiante__encargadoestudiante",
+                condition=Q(estudiante__encargadoestudiante__principal=True),
+            )
+        )
+        .values(
+            "estudiante_id",
+            "estudiante__identificacion",
+            "estudiante__primer_apellido",
+            "estudiante__segundo_apellido",
+            "estudiante__nombres",
+            "seccion__numero",
+            "seccion__nivel__numero",
+            "subgrupo__letra",
+            "subgrupo__seccion__numero",
+            "subgrupo__seccion__nivel__numero",
+            "encargado__persona_contacto__primer_apellido",
+            "encargado__persona_contacto__segundo_apellido",
+            "encargado__persona_contacto__nombres",
+            "encargado__persona_contacto__celular_avisos",
+            "encargado__persona_contacto__telefono_trabajo",
+        )
+        .order_by("estudiante_id", "-id")
+    )
+
+
+def _fila_becado_sin_uso(v):
+    subgrupo_label = "-"
+    orden_nivel, orden_seccion, orden_letra = 9999, 9999, "z"
+    if v["subgrupo__letra"] is not None:
+        subgrupo_label = f"{v['subgrupo__seccion__nivel__numero']}-{v['subgrupo__seccion__numero']}{v['subgrupo__letra']}"
+        orden_nivel = v["subgrupo__seccion__nivel__numero"]
+        orden_seccion = v["subgrupo__seccion__numero"]
+        orden_letra = (v["subgrupo__letra"] or "").strip().upper() or "z"
+    elif v["seccion__numero"] is not None:
+        subgrupo_label = f"{v['seccion__nivel__numero']}-{v['seccion__numero']}"
+        orden_nivel = v["seccion__nivel__numero"]
+        orden_seccion = v["seccion__numero"]
+        orden_letra = ""
+
+    nombre_encargado = telefono_encargado = "-"
+    if v["encargado__persona_contacto__nombres"] is not None:
+        partes = [
+            v["encargado__persona_contacto__primer_apellido"],
+            (v["encargado__persona_contacto__segundo_apellido"] or "").strip(),
+            v["encargado__persona_contacto__nombres"],
+        ]
+        nombre_encargado = " ".join(p for p in partes if p)
+        telefono_encargado = (
+            v["encargado__persona_contacto__celular_avisos"]
+            or v["encargado__persona_contacto__telefono_trabajo"]
+            or "-"
+        ).strip() or "-"
+
+    return {
+        "estudiante_id": v["estudiante_id"],
+        "subgrupo": subgrupo_label,
+        "orden_nivel": orden_nivel,
+        "orden_seccion": orden_seccion,
+        "orden_letra": orden_letra,
+        "identificacion": v["estudiante__identificacion"],
+        "primer_apellido": v["estudiante__primer_apellido"],
+        "segundo_apellido": v["estudiante__segundo_apellido"] or "",
+        "nombre": v["estudiante__nombres"],
+        "nombre_encargado": nombre_encargado,
+        "telefono_encargado": telefono_encargado,
+    }
+
+
+def calcular_becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta):
+    """Filas del reporte de becados sin uso, ordenadas por grupo y apellidos (sin caché)."""
+    filas, vistos = [], set()
+    for v in _consulta_becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta):
+        # Una fila por estudiante aunque tenga más de una matrícula activa.
+        if v["estudiante_id"] in vistos:
+            continue
+        vistos.add(v["estudiante_id"])
+        filas.append(_fila_becado_sin_uso(v))
+    filas.sort(key=lambda f: (
+        f["orden_nivel"], f["orden_seccion"], f["orden_letra"],
+        f["primer_apellido"], f["segundo_apellido"], f["nombre"],
+    ))
+    return filas
+
+
+def cache_key_becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta):
+    claves = [
+        _KEY_VERSION_INDICE_GLOBAL,
+        _cache_key_version_indice_institucion(institucion_id),
+        _cache_key_version_indice_curso(institucion_id, curso_lectivo_id),
+        _cache_key_version_registros(institucion_id, curso_lectivo_id),
+    ]
+    versiones = cache.get_many(claves)
+    v = ".".join(str(versiones.get(k, 0)) for k in claves)
+    return f"comedor:sin_uso:{institucion_id}:{curso_lectivo_id}:{desde:%Y%m%d}:{hasta:%Y%m%d}:v{v}"
+
+
+def becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta):
+    """
+    Becados sin uso en el rango, cacheados hasta el siguiente registro de almuerzo o
+    cambio de becas/matrículas/estudiantes (mismas versiones que el índice).
+    """
+    key = cache_key_becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta)
+    filas = cache.get(key)
+    if filas is None:
+        filas = calcular_becados_sin_uso(institucion_id, curso_lectivo_id, desde, hasta)
+        cache.set(key, filas, BECADOS_SIN_USO_CACHE_TIMEOUT)
+    return filas
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  ASIGNACIÓN DE BECAS POR LOTE
+# ═══════════════════════════════════════════════════════════════════════════
+
+BECA_CREADA = "creada"
+BECA_REACTIVADA = "reactivada"
+BECA_YA_ACTIVA = "ya_activa"
+BECA_SIN_MATRICULA = "sin_matricula"
+BECA_REPETIDA = "repetida"
+
+_MENSAJES_LOTE_BECAS = {
+    BECA_CREADA: "Beca nueva.",
+    BECA_REACTIVADA: "Beca inactiva: se reactiva.",
+    BECA_YA_ACTIVA: "Ya tiene beca activa.",
+    BECA_SIN_MATRICULA: "Sin matrícula activa en la institución y curso lectivo.",
+    BECA_REPETIDA: "Identificación repetida en el lote.",
+}
+_ENCABEZADOS_IDENTIFICACION = {"identificacion", "identificación", "cedula", "cédula", "id"}
+
+
+def _normalizar_identificacion(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        # Excel guarda las cédulas numéricas como float.
+        valor = int(valor)
+    return str(valor).strip().upper()
+
+
+def identificaciones_desde_texto(texto):
+    """Identificaciones pegadas: una por línea o separadas por comas, punto y coma o espacios."""
+    return [v for v in re.split(r"[\s,;]+", texto or "") if v]
+
+
+def identificaciones_desde_archivo(archivo):
+    """
+    Identificaciones de un CSV o Excel: la columna "Identificación" (o cédula/id) si la
+    primera fila es un encabezado; si no, la primera columna de todas las filas.
+    """
+    nombre = (getattr(archivo, "name", "") or "").lower()
+    if nombre.endswith(".csv"):
+        contenido = archivo.read().decode("utf-8-sig", errors="ignore")
+        filas = list(csv.reader(io.StringIO(contenido), delimiter=";" if ";" in contenido.split("\n", 1)[0] else ","))
+    else:
+        if openpyxl is None:
+            raise ValidationError("No se puede procesar Excel porque openpyxl no está disponible.")
+        try:
+            wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+        except Exception:
+            raise ValidationError("El archivo no es un CSV ni un Excel (.xlsx) válido.")
+        filas = list(wb.active.iter_rows(values_only=True))
+        wb.close()
+    if not filas:
+        return []
+
+    columna = 0
+    encabezado = [_normalizar_identificacion(c).lower() for c in filas[0]]
+    for i, valor in enumerate(encabezado):
+        if valor in _ENCABEZADOS_IDENTIFICACION:
+            columna = i
+            filas = filas[1:]
+            break
+    return [
+        _normalizar_identificacion(fila[columna])
+        for fila in filas
+        if len(fila) > columna and _normalizar_identificacion(fila[columna])
+    ]
+
+
+def guardar_becas_lote(institucion_id, curso_lectivo_id, nuevas_ids, modificadas, usuario=None):
+    """
+    Crea las becas de `nuevas_ids` (activas) y guarda `modificadas` (BecaComedor con
+    `activa` ya cambiado) con bulk_create/bulk_update. Sin signals por fila: el índice
+    de elegibilidad se invalida una sola vez al confirmar la transacción.
+    """
+    if not nuevas_ids and not modificadas:
+        return
+    ahora = timezone.now()
+    for beca in modificadas:
+        beca.usuario_actualizacion = usuario
+        beca.fecha_actualizacion = ahora
+    with transaction.atomic():
+        # ignore_conflicts: si otro usuario creó la misma beca a la vez, la restricción
+        # única la descarta y queda la existente.
+        BecaComedor.objects.bulk_create(
+            [
+                BecaComedor(
+                    institucion_id=institucion_id,
+                    curso_lectivo_id=curso_lectivo_id,
+                    estudiante_id=estudiante_id,
+                    activa=True,
+                    usuario_asignacion=usuario,
+                    usuario_actualizacion=usuario,
+                )
+                for estudiante_id in nuevas_ids
+            ],
+            ignore_conflicts=True,
+        )
+        BecaComedor.objects.bulk_update(
+            modificadas, ["activa", "usuario_actualizacion", "fecha_actualizacion"], batch_size=1000
+        )
+        transaction.on_commit(lambda: invalidar_indice_comedor(institucion_id, curso_lectivo_id))
+
+
+def asignar_becas_lote(institucion_id, curso_lectivo_id, identificaciones, usuario=None, aplicar=False):
+    """
+    Asigna becas a una lista de identificaciones. Valida contra las matrículas activas
+    en una sola consulta y, con `aplicar`, crea y reactiva las becas por lote; sin
+    `aplicar` solo calcula la vista previa.
+
+    Retorna (filas, totales): una fila por identificación recibida (fila, identificacion,
+    nombre, resultado, mensaje) y el conteo por resultado.
+    """
+    identificaciones = [_normalizar_identificacion(i) for i in identificaciones]
+    identificaciones = [i for i in identificaciones if i]
+    if len(identificaciones) > MAX_BECAS_LOTE:
+        raise ValidationError(f"El lote supera el máximo de {MAX_BECAS_LOTE} identificaciones.")
+
+    matriculados = {}
+    for est_id, ident, primer, segundo, nombres in (
+        MatriculaAcademica.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            estado__iexact=MatriculaAcademica.ACTIVO,
+            estudiante__identificacion__in=set(identificaciones),
+        )
+        .order_by("id")
+        .values_list(
+            "estudiante_id",
+            "estudiante__identificacion",
+            "estudiante__primer_apellido",
+            "estudiante__segundo_apellido",
+            "estudiante__nombres",
+        )
+    ):
+        nombre = " ".join(p for p in (primer, (segundo or "").strip(), nombres) if p)
+        matriculados.setdefault(ident.strip().upper(), (est_id, nombre))
+    becas = {
+        beca.estudiante_id: beca
+        for beca in BecaComedor.objects.filter(
+            institucion_id=institucion_id,
+            curso_lectivo_id=curso_lectivo_id,
+            estudiante_id__in=[est_id for est_id, _ in matriculados.values()],
+        )
+    }
+
+    filas, vistos, nuevas_ids, reactivadas = [], set(), [], []
+    totales = dict.fromkeys(_MENSAJES_LOTE_BECAS, 0)
+    for numero, ident in enumerate(identificaciones, start=1):
+        est_id, nombre = matriculados.get(ident, (None, ""))
+        if ident in vistos:
+            resultado = BECA_REPETIDA
+        elif est_id is None:
+            resultado = BECA_SIN_MATRICULA
+        elif est_id not in becas:
+            resultado = BECA_CREADA
+            nuevas_ids.append(est_id)
+        elif becas[est_id].activa:
+            resultado = BECA_YA_ACTIVA
+        else:
+            resultado = BECA_REACTIVADA
+            becas[est_id].activa = True
+            reactivadas.append(becas[est_id])
+        vistos.add(ident)
+        totales[resultado] += 1
+        filas.append({
+            "fila": numero,
+            "identificacion": ident,
+            "nombre": nombre,
+            "resultado": resultado,
+            "mensaje": _MENSAJES_LOTE_BECAS[resultado],
+        })
+
+    if aplicar:
+        guardar_becas_lote(institucion_id, curso_lectivo_id, nuevas_ids, reactivadas, usuario)
+    return filas, totales
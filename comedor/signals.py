@@ -0,0 +1,127 @@
+"""
+Signals del comedor.
+Mantienen coherente el índice de elegibilidad en caché (comedor.services) con becas,
+matrículas, estudiantes, tiquetes y configuración, registran la hora del último
+almuerzo de cada estudiante/tiquete y recalculan el resumen diario de días cerrados.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalogos.models import CursoLectivo
+from matricula.models import Estudiante, MatriculaAcademica
+
+from .models import (
+    BecaComedor,
+    ConfiguracionComedor,
+    RegistroAlmuerzo,
+    RegistroAlmuerzoTiquete,
+    TiqueteComedor,
+)
+from .services import (
+    invalidar_curso_lectivo_activo,
+    invalidar_indice_comedor,
+    olvidar_ultimo_escaneo,
+    recalcular_dias_cerrados,
+    registrar_ultimo_escaneo,
+)
+
+
+@receiver(post_save, sender=BecaComedor)
+@receiver(post_delete, sender=BecaComedor)
+@receiver(post_save, sender=MatriculaAcademica)
+@receiver(post_delete, sender=MatriculaAcademica)
+def invalidar_indice_por_beca_o_matricula(sender, instance, **kwargs):
+    invalidar_indice_comedor(instance.institucion_id, instance.curso_lectivo_id)
+
+
+@receiver(post_save, sender=TiqueteComedor)
+@receiver(post_delete, sender=TiqueteComedor)
+@receiver(post_save, sender=ConfiguracionComedor)
+@receiver(post_delete, sender=ConfiguracionComedor)
+def invalidar_indice_por_institucion(sender, instance, **kwargs):
+    invalidar_indice_comedor(instance.institucion_id)
+
+
+_CAMPOS_INDICE_ESTUDIANTE = {"identificacion", "primer_apellido", "segundo_apellido", "nombres"}
+
+
+@receiver(post_save, sender=Estudiante)
+def invalidar_indice_por_estudiante(sender, instance, created=False, update_fields=None, **kwargs):
+    # Un estudiante nuevo aún no tiene matrícula; solo cambian identificación y nombre.
+    if created:
+        return
+    if update_fields is not None and not _CAMPOS_INDICE_ESTUDIANTE.intersection(update_fields):
+        return
+    # Solo los índices donde aparece: los cursos de sus matrículas activas.
+    cursos = (
+        MatriculaAcademica.objects
+        .filter(estudiante_id=instance.pk, estado__iexact=MatriculaAcademica.ACTIVO)
+        .values_list("institucion_id", "curso_lectivo_id")
+        .distinct()
+    )
+    for institucion_id, curso_lectivo_id in cursos:
+        invalidar_indice_comedor(institucion_id, curso_lectivo_id)
+
+
+@receiver(post_save, sender=CursoLectivo)
+@receiver(post_delete, sender=CursoLectivo)
+def invalidar_curso_activo(sender, instance, **kwargs):
+    invalidar_curso_lectivo_activo()
+
+
+@receiver(post_save, sender=RegistroAlmuerzo)
+@receiver(post_save, sender=RegistroAlmuerzoTiquete)
+def registrar_ultimo_almuerzo(sender, instance, created=False, **kwargs):
+    # Solo al confirmar: un registro revertido no debe bloquear el siguiente escaneo.
+    if created:
+        transaction.on_commit(lambda: registrar_ultimo_escaneo(instance))
+        _recalcular_resumen(instance)
+
+
+@receiver(post_delete, sender=RegistroAlmuerzo)
+@receiver(post_delete, sender=RegistroAlmuerzoTiquete)
+def olvidar_ultimo_almuerzo(sender, instance, **kwargs):
+    olvidar_ultimo_escaneo(instance)
+    _recalcular_resumen(instance)
+
+
+class _RecalculoPendiente:
+    """
+    Callback on_commit que recalcula los días cerrados de un (institución, curso lectivo).
+    Un borrado en bloque emite un post_delete por fila: las fechas se acumulan en el
+    callback ya registrado en la transacción en curso, así cada grupo se recalcula una
+    sola vez. Al vivir en la cola on_commit de la conexión, un rollback lo descarta junto
+    con sus fechas.
+    """
+
+    def __init__(self, clave, fecha):
+        self.clave = clave
+        self.fechas = {fecha}
+        self.ejecutado = False
+
+    def __call__(self):
+        self.ejecutado = True
+        recalcular_dias_cerrados(*self.clave, self.fechas)
+
+
+def _recalculo_registrado(clave):
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        return None
+    for _sids, callback, _robust in conexion.run_on_commit:
+        if isinstance(callback, _RecalculoPendiente) and callback.clave == clave and not callback.ejecutado:
+            return callback
+    return None
+
+
+def _recalcular_resumen(registro):
+    # Los registros de hoy no tienen resumen todavía.
+    if registro.fecha < timezone.localdate():
+        clave = (registro.institucion_id, registro.curso_lectivo_id)
+        recalculo = _recalculo_registrado(clave)
+        if recalculo is None:
+            transaction.on_commit(_RecalculoPendiente(clave, registro.fecha))
+        else:
+            recalculo.fechas.add(registro.fecha)
@@ -0,0 +1,840 @@
+"""
+Tests del comedor.
+Índice de elegibilidad en caché para el escaneo de almuerzo.
+"""
+import datetime
+import threading
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import BecaComedor, RegistroAlmuerzo, RegistroAlmuerzoTiquete, TiqueteComedor
+from .services import obtener_indice_comedor, procesar_escaneo_comedor
+
+CACHE_LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _crear_comedor_prueba(n_estudiantes=3, sufijo="COM"):
+    """
+    Crea institución, curso lectivo activo y n estudiantes matriculados.
+    Retorna dict con los objetos creados.
+    """
+    from catalogos.models import CursoLectivo, Nacionalidad, Nivel, Seccion, Sexo, TipoIdentificacion
+    from core.models import Institucion, User
+    from matricula.models import Estudiante, EstudianteInstitucion, MatriculaAcademica
+
+    hoy = datetime.date.today()
+    user = User.objects.create_user(
+        email=f"comedor_{sufijo.lower()}@test.com",
+        password="test123",
+        first_name="Comedor",
+        last_name="Test",
+    )
+    institucion = Institucion.objects.create(
+        nombre=f"INST {sufijo}",
+        correo=f"inst_{sufijo.lower()}@test.com",
+        tipo="A",
+        fecha_inicio=hoy - datetime.timedelta(days=30),
+        fecha_fin=hoy + datetime.timedelta(days=365),
+    )
+    curso_lectivo, _ = CursoLectivo.objects.get_or_create(
+        anio=hoy.year,
+        defaults={
+            "nombre": f"Curso Lectivo {hoy.year}",
+            "fecha_inicio": datetime.date(hoy.year, 1, 1),
+            "fecha_fin": datetime.date(hoy.year, 12, 31),
+        },
+    )
+    if not curso_lectivo.activo:
+        curso_lectivo.activo = True
+        curso_lectivo.save()
+    nivel, _ = Nivel.objects.get_or_create(numero=7, defaults={"nombre": "7°"})
+    seccion, _ = Seccion.objects.get_or_create(nivel=nivel, numero=1)
+    tipo_id, _ = TipoIdentificacion.objects.get_or_create(nombre="OTRO")
+    sexo, _ = Sexo.objects.get_or_create(codigo="F", defaults={"nombre": "Femenino"})
+    nacionalidad, _ = Nacionalidad.objects.get_or_create(nombre="COSTARRICENSE")
+    estudiantes = []
+    for i in range(n_estudiantes):
+        est = Estudiante.objects.create(
+            tipo_identificacion=tipo_id,
+            identificacion=f"{sufijo}{i:04d}",
+            primer_apellido=f"APELLIDO{i:04d}",
+            nombres="EST",
+            fecha_nacimiento=datetime.date(hoy.year - 13, 1, 1),
+            sexo=sexo,
+            nacionalidad=nacionalidad,
+        )
+        EstudianteInstitucion.objects.create(estudiante=est, institucion=institucion, estado="activo")
+        MatriculaAcademica.objects.create(
+            estudiante=est,
+            institucion=institucion,
+            nivel=nivel,
+            seccion=seccion,
+            curso_lectivo=curso_lectivo,
+            estado="activo",
+        )
+        estudiantes.append(est)
+    return {
+        "user": user,
+        "institucion": institucion,
+        "curso_lectivo": curso_lectivo,
+        "nivel": nivel,
+        "seccion": seccion,
+        "estudiantes": estudiantes,
+    }
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class IndiceElegibilidadTests(TestCase):
+    """Escaneo contra el índice en caché: una sola escritura e invalidación por signals."""
+
+    def setUp(self):
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=3, sufijo="IDX"))
+        for est in self.estudiantes[:2]:
+            BecaComedor.objects.create(
+                institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=est
+            )
+
+    def _escanear(self, entrada):
+        with self.captureOnCommitCallbacks(execute=True):
+            payload, status = procesar_escaneo_comedor(self.institucion.id, self.curso_lectivo.id, entrada)
+        self.assertEqual(status, 200)
+        return payload
+
+    def test_escaneo_caliente_solo_escribe(self):
+        self._escanear(self.estudiantes[0].identificacion)
+        with self.assertNumQueries(1):
+            payload, _ = procesar_escaneo_comedor(
+                self.institucion.id, self.curso_lectivo.id, self.estudiantes[1].identificacion
+            )
+        self.assertEqual(payload["status"], "ok")
+        self.assertEqual(RegistroAlmuerzo.objects.filter(institucion=self.institucion).count(), 2)
+
+    def test_relectura_duplicado_y_sin_beca(self):
+        est = self.estudiantes[0]
+        self.assertEqual(self._escanear(est.identificacion)["status"], "ok")
+        relectura = self._escanear(est.identificacion)
+        self.assertTrue(relectura["idempotente"])
+        self.assertEqual(RegistroAlmuerzo.objects.filter(estudiante=est).count(), 1)
+        self.assertEqual(self._escanear(self.estudiantes[2].identificacion)["status"], "no_beca")
+
+        # Registro previo (sin signals) visible tras reconstruir el índice.
+        otro = self.estudiantes[1]
+        RegistroAlmuerzo.objects.bulk_create([
+            RegistroAlmuerzo(institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=otro)
+        ])
+        RegistroAlmuerzo.objects.filter(estudiante=otro).update(
+            fecha_hora=timezone.now() - datetime.timedelta(minutes=10)
+        )
+        BecaComedor.objects.filter(estudiante=otro).first().save()
+        payload = self._escanear(otro.identificacion)
+        self.assertEqual(payload["status"], "duplicado")
+        self.assertIn("1190 minuto(s)", payload["message"])
+
+    def test_signals_de_beca_tiquete_y_matricula(self):
+        from matricula.models import MatriculaAcademica
+
+        sin_beca = self.estudiantes[2]
+        self.assertEqual(self._escanear(sin_beca.identificacion)["status"], "no_beca")
+        BecaComedor.objects.create(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=sin_beca
+        )
+        self.assertEqual(self._escanear(sin_beca.identificacion)["status"], "ok")
+
+        tiquete = TiqueteComedor.objects.create(
+            tipo=TiqueteComedor.PROFESOR, institucion=self.institucion, activo=False
+        )
+        self.assertEqual(self._escanear(tiquete.codigo)["status"], "inactivo")
+        tiquete.activo = True
+        tiquete.save(update_fields=["activo"])
+        self.assertEqual(self._escanear(tiquete.codigo)["status"], "ok")
+        self.assertEqual(self._escanear("NOEXISTE")["status"], "no_encontrado")
+
+        MatriculaAcademica.objects.filter(estudiante=self.estudiantes[0]).first().delete()
+        indice = obtener_indice_comedor(self.institucion.id, self.curso_lectivo.id)
+        self.assertNotIn(self.estudiantes[0].identificacion, indice["estudiantes"])
+
+    def test_editar_estudiante_solo_invalida_su_institucion(self):
+        otra = _crear_comedor_prueba(n_estudiantes=1, sufijo="IDY")
+        obtener_indice_comedor(self.institucion.id, self.curso_lectivo.id)
+        obtener_indice_comedor(otra["institucion"].id, self.curso_lectivo.id)
+
+        est = self.estudiantes[0]
+        est.nombres = "RENOMBRADO"
+        est.save()
+        with self.assertNumQueries(0):
+            obtener_indice_comedor(otra["institucion"].id, self.curso_lectivo.id)
+        indice = obtener_indice_comedor(self.institucion.id, self.curso_lectivo.id)
+        self.assertIn("RENOMBRADO", indice["estudiantes"][est.identificacion][1])
+
+    def test_endpoint_de_escaneo(self):
+        from django.urls import reverse
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        resp = self.client.post(
+            reverse("comedor:almuerzo"),
+            {"institucion": self.institucion.id, "identificacion": self.estudiantes[0].identificacion.lower()},
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["status"], "ok")
+        resp = self.client.post(reverse("comedor:almuerzo"), {"institucion": "", "identificacion": "X"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_benchmark_reporta_percentiles(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("benchmark_escaneo_comedor", institucion_id=self.institucion.id, escaneos=20, stdout=out)
+        salida = out.getvalue()
+        self.assertIn("p50:", salida)
+        self.assertIn("p99:", salida)
+        self.assertFalse(RegistroAlmuerzo.objects.filter(institucion=self.institucion).exists())
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class SincronizacionLoteTests(TestCase):
+    """Ingesta por lote de kioscos sin conexión: reglas a la hora del escaneo e idempotencia."""
+
+    def setUp(self):
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=3, sufijo="LOT"))
+        for est in self.estudiantes[:2]:
+            BecaComedor.objects.create(
+                institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=est
+            )
+        self.tiquete = TiqueteComedor.objects.create(tipo=TiqueteComedor.PROFESOR, institucion=self.institucion)
+        self.ahora = timezone.now()
+
+    def _hace(self, minutos):
+        return (self.ahora - datetime.timedelta(minutes=minutos)).isoformat()
+
+    def _sincronizar(self, escaneos):
+        from .services import sincronizar_escaneos_comedor
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return sincronizar_escaneos_comedor(self.institucion.id, self.curso_lectivo.id, escaneos)
+
+    def test_veredictos_por_escaneo_y_reenvio(self):
+        a, b, c = (e.identificacion for e in self.estudiantes)
+        lote = [
+            {"clave": "k1", "entrada": a, "fecha_hora": self._hace(30)},
+            {"clave": "k2", "entrada": a, "fecha_hora": self._hace(20)},
+            {"clave": "k3", "entrada": b.lower(), "fecha_hora": self._hace(10)},
+            {"clave": "k4", "entrada": c, "fecha_hora": self._hace(10)},
+            {"clave": "k5", "entrada": self.tiquete.codigo, "fecha_hora": self._hace(5)},
+            {"clave": "k6", "entrada": "NOEXISTE", "fecha_hora": self._hace(5)},
+            {"entrada": a, "fecha_hora": self._hace(5)},
+            {"clave": "k8", "entrada": a, "fecha_hora": (self.ahora + datetime.timedelta(hours=1)).isoformat()},
+        ]
+        resultados = self._sincronizar(lote)
+        self.assertEqual(
+            [r["status"] for r in resultados],
+            ["ok", "duplicado", "ok", "no_beca", "ok", "no_encontrado", "invalido", "invalido"],
+        )
+        self.assertEqual([r["clave"] for r in resultados[:6]], ["k1", "k2", "k3", "k4", "k5", "k6"])
+        registro = RegistroAlmuerzo.objects.get(clave_idempotencia="k1")
+        self.assertEqual(registro.fecha_hora, self.ahora - datetime.timedelta(minutes=30))
+
+        # Reenvío del mismo lote (el kiosco no recibió la respuesta).
+        resultados = self._sincronizar(lote[:3])
+        self.assertEqual([r["status"] for r in resultados], ["ya_sincronizado", "duplicado", "ya_sincronizado"])
+        self.assertEqual(RegistroAlmuerzo.objects.filter(institucion=self.institucion).count(), 2)
+
+        # El escaneo en línea respeta lo sincronizado.
+        payload, _ = procesar_escaneo_comedor(self.institucion.id, self.curso_lectivo.id, a)
+        self.assertEqual(payload["status"], "duplicado")
+
+    def test_escaneo_tardio_dentro_del_intervalo_de_uno_posterior(self):
+        est = self.estudiantes[0].identificacion
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_escaneo_comedor(self.institucion.id, self.curso_lectivo.id, est)
+        resultados = self._sincronizar([{"clave": "tarde", "entrada": est, "fecha_hora": self._hace(5)}])
+        self.assertEqual(resultados[0]["status"], "duplicado")
+        self.assertEqual(RegistroAlmuerzo.objects.filter(institucion=self.institucion).count(), 1)
+
+    def test_conflicto_de_secuencia_se_reintenta(self):
+        from unittest import mock
+
+        from .models import ConfiguracionComedor
+
+        ConfiguracionComedor.objects.create(institucion=self.institucion, intervalo_minutos=60)
+        a, b = self.estudiantes[:2]
+        crear = RegistroAlmuerzo.objects.bulk_create
+        concurrentes = []
+
+        def con_escaneo_concurrente(objs, **kwargs):
+            # Un escaneo en línea toma la secuencia de cada registro del lote antes del INSERT:
+            # el de A fuera del intervalo, el de B dentro.
+            if not concurrentes:
+                for registro, minutos in zip(objs, (5, 280)):
+                    concurrentes.append(RegistroAlmuerzo(
+                        institucion=self.institucion,
+                        curso_lectivo=self.curso_lectivo,
+                        estudiante_id=registro.estudiante_id,
+                        fecha=self.ahora.date(),
+                        fecha_hora=self.ahora - datetime.timedelta(minutes=minutos),
+                        secuencia=registro.secuencia,
+                    ))
+                crear(concurrentes)
+            return crear(objs, **kwargs)
+
+        with mock.patch.object(RegistroAlmuerzo.objects, "bulk_create", side_effect=con_escaneo_concurrente):
+            resultados = self._sincronizar([
+                {"clave": "s1", "entrada": a.identificacion, "fecha_hora": self._hace(300)},
+                {"clave": "s2", "entrada": b.identificacion, "fecha_hora": self._hace(300)},
+            ])
+        self.assertEqual([r["status"] for r in resultados], ["ok", "duplicado"])
+        self.assertEqual(
+            sorted(RegistroAlmuerzo.objects.filter(estudiante=a).values_list("secuencia", flat=True)), [1, 2]
+        )
+        self.assertFalse(RegistroAlmuerzo.objects.filter(clave_idempotencia="s2").exists())
+
+    def test_consultas_constantes_por_lote(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import ConfiguracionComedor
+        from .services import obtener_indice_comedor
+
+        ConfiguracionComedor.objects.create(institucion=self.institucion, intervalo_minutos=60)
+        obtener_indice_comedor(self.institucion.id, self.curso_lectivo.id)
+        conteos = []
+        for n, base in ((2, 5000), (40, 10)):
+            lote = [
+                {
+                    "clave": f"{base}-{i}",
+                    "entrada": self.estudiantes[i % 2].identificacion,
+                    "fecha_hora": self._hace(base + 65 * (i // 2)),
+                }
+                for i in range(n)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                resultados = self._sincronizar(lote)
+            self.assertEqual({r["status"] for r in resultados}, {"ok"})
+            conteos.append(len(ctx))
+        self.assertEqual(conteos[0], conteos[1])
+        self.assertEqual(RegistroAlmuerzo.objects.filter(institucion=self.institucion).count(), 42)
+
+    def test_endpoint_json(self):
+        import json
+
+        from django.urls import reverse
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        url = reverse("comedor:almuerzo_sincronizar")
+        cuerpo = {
+            "institucion": self.institucion.id,
+            "escaneos": [{"clave": "j1", "entrada": self.estudiantes[0].identificacion, "fecha_hora": self._hace(1)}],
+        }
+        resp = self.client.post(url, json.dumps(cuerpo), content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["resumen"], {"ok": 1})
+        resp = self.client.post(url, "no-json", content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class EscaneoConcurrenteTests(TransactionTestCase):
+    """Escaneos simultáneos del mismo QR contra el endpoint: un solo registro."""
+
+    HILOS = 12
+    RONDAS = 3
+
+    def setUp(self):
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=1, sufijo="CONC"))
+        self.user.is_superuser = True
+        self.user.save()
+        BecaComedor.objects.create(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=self.estudiantes[0]
+        )
+        self.tiquete = TiqueteComedor.objects.create(tipo=TiqueteComedor.PROFESOR, institucion=self.institucion)
+
+    def _escanear_en_paralelo(self, entrada):
+        from django.test import Client
+        from django.urls import reverse
+
+        url = reverse("comedor:almuerzo")
+        barrera = threading.Barrier(self.HILOS)
+        respuestas, errores = [], []
+
+        def escanear():
+            try:
+                client = Client()
+                client.force_login(self.user)
+                barrera.wait()
+                resp = client.post(url, {"institucion": self.institucion.id, "identificacion": entrada})
+                respuestas.append((resp.status_code, resp.json()["status"]))
+            except Exception as exc:  # pragma: no cover - se reporta en el assert
+                errores.append(exc)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=escanear) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        self.assertEqual(len(respuestas), self.HILOS)
+        self.assertTrue(all(codigo == 200 and estado in ("ok", "duplicado") for codigo, estado in respuestas))
+
+    def test_sin_duplicados_bajo_concurrencia(self):
+        for _ in range(self.RONDAS):
+            # Sin la última hora en caché todos los hilos llegan al INSERT.
+            cache.clear()
+            self._escanear_en_paralelo(self.estudiantes[0].identificacion)
+            self._escanear_en_paralelo(self.tiquete.codigo)
+            self.assertEqual(RegistroAlmuerzo.objects.filter(estudiante=self.estudiantes[0]).count(), 1)
+            self.assertEqual(RegistroAlmuerzoTiquete.objects.filter(tiquete=self.tiquete).count(), 1)
+
+    def test_registro_tras_el_intervalo_continua_la_secuencia(self):
+        from .models import ConfiguracionComedor
+
+        ConfiguracionComedor.objects.create(institucion=self.institucion, intervalo_minutos=1)
+        est = self.estudiantes[0]
+        payload, _ = procesar_escaneo_comedor(self.institucion.id, self.curso_lectivo.id, est.identificacion)
+        self.assertEqual(payload["status"], "ok")
+        RegistroAlmuerzo.objects.filter(estudiante=est).update(
+            fecha_hora=timezone.now() - datetime.timedelta(minutes=5)
+        )
+        cache.clear()
+        self._escanear_en_paralelo(est.identificacion)
+        self.assertEqual(
+            list(RegistroAlmuerzo.objects.filter(estudiante=est).order_by("secuencia").values_list("secuencia", flat=True)),
+            [1, 2],
+        )
+
+
+class ResumenComedorDiarioTests(TestCase):
+    """Reportes desde el resumen diario: mismos totales que la agregación en crudo."""
+
+    def setUp(self):
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=3, sufijo="RES"))
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.hoy = timezone.localdate()
+        self.tiquete = TiqueteComedor.objects.create(
+            tipo=TiqueteComedor.PROFESOR, institucion=self.institucion, monto=1500
+        )
+        # Se confirman aquí para que los recálculos del montaje no queden pendientes en la
+        # transacción del test.
+        with self.captureOnCommitCallbacks(execute=True):
+            for dias in (1, 2, 3):
+                fecha = self.hoy - datetime.timedelta(days=dias)
+                for est in self.estudiantes[:dias]:
+                    RegistroAlmuerzo.objects.create(
+                        institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=est, fecha=fecha
+                    )
+                RegistroAlmuerzoTiquete.objects.create(
+                    institucion=self.institucion, curso_lectivo=self.curso_lectivo, tiquete=self.tiquete, fecha=fecha
+                )
+        RegistroAlmuerzo.objects.create(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=self.estudiantes[0]
+        )
+
+    def _reporte(self):
+        from django.urls import reverse
+
+        resp = self.client.get(reverse("comedor:reportes"), {
+            "institucion": self.institucion.id,
+            "periodo": "rango",
+            "fecha_inicio": (self.hoy - datetime.timedelta(days=5)).isoformat(),
+            "fecha_fin": self.hoy.isoformat(),
+        })
+        self.assertEqual(resp.status_code, 200)
+        claves = (
+            "total_registros", "total_estudiantes_unicos", "por_dia", "por_nivel",
+            "total_usos_tiquete", "recaudacion_total", "usos_por_tipo_tiquete", "por_dia_tiquete",
+        )
+        return {k: resp.context[k] for k in claves}
+
+    def _cerrar(self, **kwargs):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("cerrar_resumen_comedor", stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_cierre_conserva_los_totales(self):
+        from .models import ResumenComedorDiario
+
+        en_crudo = self._reporte()
+        self.assertEqual(en_crudo["total_registros"], 7)
+        self.assertEqual(en_crudo["total_usos_tiquete"], 3)
+
+        salida = self._cerrar()
+        self.assertIn("Dry-run finalizado.", salida)
+        self.assertFalse(ResumenComedorDiario.objects.exists())
+
+        self._cerrar(apply=True)
+        self.assertEqual(ResumenComedorDiario.objects.filter(fecha=self.hoy).count(), 0)
+        self.assertEqual(
+            ResumenComedorDiario.objects.filter(tipo=ResumenComedorDiario.BECA).values_list("fecha", "registros")
+            .order_by("fecha")[0],
+            (self.hoy - datetime.timedelta(days=3), 3),
+        )
+        self.assertEqual(self._reporte(), en_crudo)
+        self.assertIn("Ya al día: 1", self._cerrar(apply=True))
+
+    def test_registro_tardio_recalcula_el_dia_cerrado(self):
+        from .models import ResumenComedorDiario
+
+        self._cerrar(apply=True)
+        ayer = self.hoy - datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            RegistroAlmuerzo.objects.create(
+                institucion=self.institucion,
+                curso_lectivo=self.curso_lectivo,
+                estudiante=self.estudiantes[2],
+                fecha=ayer,
+            )
+        fila = ResumenComedorDiario.objects.get(fecha=ayer, tipo=ResumenComedorDiario.BECA)
+        self.assertEqual((fila.registros, fila.distintos), (2, 2))
+        self.assertEqual(fila.nivel_id, self.nivel.id)
+        self.assertEqual(self._reporte()["total_registros"], 8)
+
+    def test_cierre_parcial_no_marca_dias_anteriores(self):
+        from .services import ultimo_dia_cerrado
+
+        en_crudo = self._reporte()
+        ayer = (self.hoy - datetime.timedelta(days=1)).isoformat()
+        salida = self._cerrar(apply=True, desde=ayer, hasta=ayer)
+        self.assertIn("Con días sin cerrar antes del rango: 1", salida)
+        self.assertIsNone(ultimo_dia_cerrado(self.institucion.id, self.curso_lectivo.id))
+        self.assertEqual(self._reporte(), en_crudo)
+
+        self._cerrar(apply=True)
+        self.assertEqual(
+            ultimo_dia_cerrado(self.institucion.id, self.curso_lectivo.id), self.hoy - datetime.timedelta(days=1)
+        )
+        self.assertEqual(self._reporte(), en_crudo)
+
+    def test_borrado_en_bloque_recalcula_cada_dia_una_vez(self):
+        from unittest import mock
+
+        from . import signals
+        from .models import ResumenComedorDiario
+
+        self._cerrar(apply=True)
+        with mock.patch.object(signals, "recalcular_dias_cerrados", wraps=signals.recalcular_dias_cerrados) as recalcular:
+            with self.captureOnCommitCallbacks(execute=True):
+                RegistroAlmuerzo.objects.filter(fecha__lt=self.hoy).delete()
+        self.assertEqual(recalcular.call_count, 1)
+        self.assertEqual(len(recalcular.call_args.args[2]), 3)
+        self.assertFalse(ResumenComedorDiario.objects.filter(tipo=ResumenComedorDiario.BECA).exists())
+        self.assertEqual(self._reporte()["total_registros"], 1)
+
+    def test_borrado_revertido_no_deja_dias_pendientes(self):
+        from unittest import mock
+
+        from django.db import transaction
+
+        from . import signals
+
+        self._cerrar(apply=True)
+        ayer = self.hoy - datetime.timedelta(days=1)
+        with mock.patch.object(signals, "recalcular_dias_cerrados") as recalcular:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        RegistroAlmuerzo.objects.filter(fecha__lt=self.hoy).delete()
+                        raise RuntimeError("rollback")
+                except RuntimeError:
+                    pass
+                RegistroAlmuerzo.objects.filter(fecha=ayer).delete()
+        recalcular.assert_called_once()
+        self.assertEqual(recalcular.call_args.args[2], {ayer})
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class BecadosSinUsoTests(TestCase):
+    """Becados sin uso: una consulta anti-join, caché hasta el siguiente registro."""
+
+    def setUp(self):
+        from catalogos.models import Parentesco, Subgrupo
+        from matricula.models import EncargadoEstudiante, MatriculaAcademica, PersonaContacto
+
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=3, sufijo="BSU"))
+        self.hoy = timezone.localdate()
+        for est in self.estudiantes:
+            BecaComedor.objects.create(
+                institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=est
+            )
+        subgrupo = Subgrupo.objects.create(seccion=self.seccion, letra="B")
+        MatriculaAcademica.objects.filter(estudiante=self.estudiantes[1]).update(subgrupo=subgrupo)
+        contacto = PersonaContacto.objects.create(
+            institucion=self.institucion,
+            tipo_identificacion=self.estudiantes[0].tipo_identificacion,
+            identificacion="BSUC0001",
+            primer_apellido="MORA",
+            nombres="ANA",
+            celular_avisos="88887777",
+        )
+        EncargadoEstudiante.objects.create(
+            estudiante=self.estudiantes[1],
+            persona_contacto=contacto,
+            parentesco=Parentesco.objects.create(descripcion="MADRE"),
+            convivencia=True,
+            principal=True,
+        )
+        RegistroAlmuerzo.objects.create(
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            estudiante=self.estudiantes[2],
+            fecha=self.hoy - datetime.timedelta(days=1),
+        )
+
+    def _sin_uso(self):
+        from .services import becados_sin_uso
+
+        return becados_sin_uso(
+            self.institucion.id, self.curso_lectivo.id, self.hoy - datetime.timedelta(days=7), self.hoy
+        )
+
+    def test_filas_en_una_consulta_y_cache(self):
+        with self.assertNumQueries(1):
+            filas = self._sin_uso()
+        self.assertEqual(
+            [(f["identificacion"], f["subgrupo"], f["nombre_encargado"], f["telefono_encargado"]) for f in filas],
+            [("BSU0000", "7-1", "-", "-"), ("BSU0001", "7-1B", "MORA ANA", "88887777")],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self._sin_uso(), filas)
+
+        # Un registro nuevo invalida la lista.
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_escaneo_comedor(self.institucion.id, self.curso_lectivo.id, self.estudiantes[0].identificacion)
+        self.assertEqual([f["identificacion"] for f in self._sin_uso()], ["BSU0001"])
+
+    def test_reportes_usan_el_anti_join(self):
+        from django.urls import reverse
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        params = {"institucion": self.institucion.id, "periodo": "semana"}
+        resp = self.client.get(reverse("comedor:reporte_becados_sin_uso"), params)
+        self.assertEqual([f["identificacion"] for f in resp.context["filas"]], ["BSU0000", "BSU0001"])
+        self.assertContains(resp, "MORA ANA")
+        resp = self.client.get(reverse("comedor:reportes"), params)
+        self.assertEqual(len(resp.context["becados_sin_uso"]), 2)
+
+    def test_benchmark_compara_con_la_ruta_anterior(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("benchmark_becados_sin_uso", becados=30, repeticiones=1, stdout=out)
+        self.assertIn("Resultados coinciden: sí", out.getvalue())
+        self.assertFalse(BecaComedor.objects.filter(institucion__nombre="BENCHMARK BECADOS SIN USO").exists())
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class ImprimirTiquetesTests(TestCase):
+    """La hoja de impresión enlaza los QR por URL en lugar de incrustarlos."""
+
+    def setUp(self):
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=0, sufijo="QR"))
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.tiquetes = [
+            TiqueteComedor.objects.create(tipo=TiqueteComedor.ALUMNO_TIQ, institucion=self.institucion)
+            for _ in range(3)
+        ]
+
+    def test_hoja_con_urls_y_qr_servido_desde_cache(self):
+        from django.urls import reverse
+
+        from core.qr import SVG, qr_bytes
+
+        resp = self.client.get(
+            reverse("comedor:imprimir_tiquetes"), {"institucion": self.institucion.id, "formato": SVG}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, "data:image/png;base64")
+        url = reverse("comedor:qr_tiquete", args=[self.tiquetes[0].codigo, SVG])
+        self.assertContains(resp, url)
+
+        resp = self.client.get(url)
+        self.assertEqual(resp["Content-Type"], "image/svg+xml")
+        self.assertEqual(resp.content, qr_bytes(self.tiquetes[0].codigo, SVG))
+        self.assertEqual(self.client.get(url.replace(".svg", ".gif")).status_code, 404)
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class BecasLoteTests(TestCase):
+    """Asignación de becas por lote: vista previa, aplicación en bloque e índice al día."""
+
+    def setUp(self):
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=4, sufijo="BLT"))
+        BecaComedor.objects.create(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=self.estudiantes[1], activa=False
+        )
+        BecaComedor.objects.create(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=self.estudiantes[2]
+        )
+        self.lote = ["blt0000", "BLT0001", "BLT0002", "NOEXISTE", "BLT0000"]
+
+    def _asignar(self, aplicar):
+        from .services import asignar_becas_lote
+
+        return asignar_becas_lote(
+            self.institucion.id, self.curso_lectivo.id, self.lote, usuario=self.user, aplicar=aplicar
+        )
+
+    def test_vista_previa_no_guarda(self):
+        with self.assertNumQueries(2):
+            filas, totales = self._asignar(aplicar=False)
+        self.assertEqual(
+            [(f["identificacion"], f["resultado"]) for f in filas],
+            [
+                ("BLT0000", "creada"),
+                ("BLT0001", "reactivada"),
+                ("BLT0002", "ya_activa"),
+                ("NOEXISTE", "sin_matricula"),
+                ("BLT0000", "repetida"),
+            ],
+        )
+        self.assertEqual(filas[0]["nombre"], "APELLIDO0000 EST")
+        self.assertEqual(totales["creada"], 1)
+        self.assertEqual(BecaComedor.objects.filter(activa=True).count(), 1)
+
+    def test_aplicar_en_bloque_invalida_el_indice_una_vez(self):
+        indice = obtener_indice_comedor(self.institucion.id, self.curso_lectivo.id)
+        self.assertFalse(indice["estudiantes"]["BLT0000"][2])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self._asignar(aplicar=True)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            set(BecaComedor.objects.filter(activa=True).values_list("estudiante__identificacion", flat=True)),
+            {"BLT0000", "BLT0001", "BLT0002"},
+        )
+        beca = BecaComedor.objects.get(estudiante=self.estudiantes[1])
+        self.assertEqual(beca.usuario_actualizacion, self.user)
+        indice = obtener_indice_comedor(self.institucion.id, self.curso_lectivo.id)
+        self.assertTrue(indice["estudiantes"]["BLT0000"][2])
+        self.assertTrue(indice["estudiantes"]["BLT0001"][2])
+
+        # Volver a aplicar el mismo lote no cambia nada.
+        filas, totales = self._asignar(aplicar=True)
+        self.assertEqual(totales["ya_activa"], 3)
+
+    def test_vista_con_archivo(self):
+        from io import BytesIO
+
+        import openpyxl
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.urls import reverse
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        url = reverse("comedor:registrar_beca")
+        datos = {"curso_lectivo_id": self.curso_lectivo.id, "institucion": self.institucion.id}
+
+        csv_archivo = SimpleUploadedFile("becas.csv", "Nombre;Identificación\nA;BLT0003\nB;NOEXISTE\n".encode())
+        resp = self.client.post(url, {**datos, "accion": "previsualizar_lote", "archivo_lote": csv_archivo})
+        self.assertEqual(
+            [(f["identificacion"], f["resultado"]) for f in resp.context["lote_filas"]],
+            [("BLT0003", "creada"), ("NOEXISTE", "sin_matricula")],
+        )
+        self.assertEqual(resp.context["lote_texto"], "BLT0003\nNOEXISTE")
+        self.assertFalse(BecaComedor.objects.filter(estudiante=self.estudiantes[3]).exists())
+
+        wb = openpyxl.Workbook()
+        wb.active.append(["BLT0003"])
+        buf = BytesIO()
+        wb.save(buf)
+        xlsx = SimpleUploadedFile("becas.xlsx", buf.getvalue())
+        resp = self.client.post(url, {**datos, "accion": "aplicar_lote", "archivo_lote": xlsx})
+        self.assertTrue(resp.context["lote_aplicado"])
+        self.assertContains(resp, "Becas nuevas: 1")
+        self.assertTrue(BecaComedor.objects.get(estudiante=self.estudiantes[3]).activa)
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class OcupacionEnVivoTests(TestCase):
+    """Ocupación en vivo: contadores en caché sin reconsultar y un lector por institución."""
+
+    def setUp(self):
+        cache.clear()
+        self.__dict__.update(_crear_comedor_prueba(n_estudiantes=3, sufijo="OCU"))
+        for est in self.estudiantes:
+            BecaComedor.objects.create(
+                institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=est
+            )
+        RegistroAlmuerzo.objects.create(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, estudiante=self.estudiantes[0]
+        )
+        self.tiquete = TiqueteComedor.objects.create(
+            tipo=TiqueteComedor.PROFESOR, monto=1500, institucion=self.institucion
+        )
+        self.user.is_superuser = True
+        self.user.save()
+
+    def _escanear(self, entrada):
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_escaneo_comedor(self.institucion.id, self.curso_lectivo.id, entrada)
+
+    def test_contadores_se_actualizan_sin_consultas(self):
+        from .ocupacion import leer_ocupacion
+
+        foto = leer_ocupacion(self.institucion.id, self.curso_lectivo.id)
+        self.assertEqual((foto["becados"], foto["unicos"], foto["tiquetes_total"]), (1, 1, 0))
+
+        self._escanear(self.estudiantes[1].identificacion)
+        self._escanear(self.tiquete.codigo)
+        with self.assertNumQueries(0):
+            foto = leer_ocupacion(self.institucion.id, self.curso_lectivo.id)
+        self.assertEqual((foto["becados"], foto["unicos"], foto["tiquetes_total"]), (2, 2, 1))
+        self.assertEqual(foto["monto_total"], 1500)
+        profesor = next(t for t in foto["tiquetes"] if t["tipo"] == TiqueteComedor.PROFESOR)
+        self.assertEqual(profesor["usos"], 1)
+        self.assertEqual(foto["por_minuto"], 0.6)
+
+    def test_stream_sobre_wsgi_responde_una_foto(self):
+        from django.urls import reverse
+
+        self.client.force_login(self.user)
+        url = reverse("comedor:ocupacion_stream")
+        resp = self.client.get(url, {"institucion": self.institucion.id})
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        contenido = b"".join(resp.streaming_content).decode()
+        self.assertIn("retry: 5000", contenido)
+        self.assertIn('"becados": 1', contenido)
+        self.assertEqual(self.client.get(url).status_code, 204)
+
+    async def test_stream_asgi_comparte_el_lector(self):
+        import asyncio
+
+        from . import ocupacion
+
+        primero = ocupacion.eventos_ocupacion(self.institucion.id, self.curso_lectivo.id)
+        segundo = ocupacion.eventos_ocupacion(self.institucion.id, self.curso_lectivo.id)
+        try:
+            evento = await asyncio.wait_for(anext(primero), 5)
+            self.assertIn("event: ocupacion", evento)
+            self.assertEqual(await asyncio.wait_for(anext(segundo), 5), evento)
+            self.assertEqual(len(ocupacion._canales), 1)
+        finally:
+            await primero.aclose()
+            await segundo.aclose()
@@ -4,10 +4,13 @@ from .views import (
     almuerzo_comedor,
     gestionar_tiquetes,
     imprimir_tiquetes,
+    ocupacion_comedor_stream,
+    qr_tiquete,
     registrar_beca_comedor,
     reportes_comedor,
     reporte_becados_por_nivel,
     reporte_becados_sin_uso,
+    sincronizar_almuerzo_comedor,
     toggle_tiquete,
 )
 
@@ -16,10 +19,13 @@ app_name = "comedor"
 urlpatterns = [
     path("registrar-beca/", registrar_beca_comedor, name="registrar_beca"),
     path("almuerzo/", almuerzo_comedor, name="almuerzo"),
+    path("almuerzo/sincronizar/", sincronizar_almuerzo_comedor, name="almuerzo_sincronizar"),
     path("reportes/", reportes_comedor, name="reportes"),
+    path("reportes/ocupacion/stream/", ocupacion_comedor_stream, name="ocupacion_stream"),
     path("reportes/becados-por-nivel/", reporte_becados_por_nivel, name="reporte_becados_por_nivel"),
     path("reportes/becados-sin-uso/", reporte_becados_sin_uso, name="reporte_becados_sin_uso"),
     path("tiquetes/", gestionar_tiquetes, name="tiquetes"),
     path("tiquetes/<int:tiquete_id>/toggle/", toggle_tiquete, name="toggle_tiquete"),
     path("tiquetes/imprimir/", imprimir_tiquetes, name="imprimir_tiquetes"),
+    path("tiquetes/qr/<str:codigo>.<str:formato>", qr_tiquete, name="qr_tiquete"),
 ]
@@ -1,26 +1,44 @@
-import base64
-import io
+import json
 from datetime import datetime, timedelta
 
-import qrcode
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.db.models import Count, Q, Sum
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from django.utils import timezone
 
 from catalogos.models import CursoLectivo, Nivel
 from core.models import Institucion
-from matricula.models import EncargadoEstudiante, MatriculaAcademica, PlantillaImpresionMatricula
+from core.qr import FORMATOS, PNG, SVG, precalentar_qr, respuesta_qr
+from matricula.models import MatriculaAcademica, PlantillaImpresionMatricula
 
 from .models import (
     BecaComedor,
     ConfiguracionComedor,
     RegistroAlmuerzo,
-    RegistroAlmuerzoTiquete,
+    ResumenComedorDiario,
     TiqueteComedor,
 )
+from .ocupacion import evento_sse, eventos_ocupacion, leer_ocupacion
+from .services import (
+    BECA_CREADA,
+    BECA_REACTIVADA,
+    MAX_ESCANEOS_LOTE,
+    asignar_becas_lote,
+    becados_sin_uso,
+    curso_lectivo_activo_id,
+    guardar_becas_lote,
+    identificaciones_desde_archivo,
+    identificaciones_desde_texto,
+    procesar_escaneo_comedor,
+    resumen_comedor_periodo,
+    sincronizar_escaneos_comedor,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -39,22 +57,6 @@ def _resolver_institucion(request, institucion_param=None):
     return Institucion.objects.filter(pk=institucion_id).first()
 
 
-def _qr_base64(texto):
-    """Genera un QR y lo devuelve como string base64 para usar en <img src>."""
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=6,
-        border=2,
-    )
-    qr.add_data(texto)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode("ascii")
-
-
 # ---------------------------------------------------------------------------
 # Registrar beca
 # ---------------------------------------------------------------------------
@@ -97,6 +99,39 @@ def registrar_beca_comedor(request):
     seccion_id  = (request.POST.get("seccion_id")  or request.GET.get("seccion_id")  or "").strip()
     subgrupo_id = (request.POST.get("subgrupo_id") or request.GET.get("subgrupo_id") or "").strip()
 
+    # Asignación por lote: lista pegada o archivo (CSV/Excel) de identificaciones.
+    # "previsualizar_lote" no guarda; "aplicar_lote" crea y reactiva en bloque.
+    accion = request.POST.get("accion") if request.method == "POST" else ""
+    lote_texto = request.POST.get("identificaciones_lote", "") if accion else ""
+    lote_filas, lote_totales, lote_aplicado, lote_error = [], {}, False, ""
+    if accion in ("previsualizar_lote", "aplicar_lote") and not error:
+        if not (curso_lectivo and institucion):
+            lote_error = "Seleccione curso lectivo e institución para asignar becas por lote."
+        else:
+            try:
+                if request.FILES.get("archivo_lote"):
+                    identificaciones = identificaciones_desde_archivo(request.FILES["archivo_lote"])
+                else:
+                    identificaciones = identificaciones_desde_texto(lote_texto)
+                aplicar = accion == "aplicar_lote"
+                lote_filas, lote_totales = asignar_becas_lote(
+                    institucion.id, curso_lectivo.id, identificaciones, usuario=request.user, aplicar=aplicar
+                )
+            except ValidationError as exc:
+                lote_error = exc.messages[0]
+            else:
+                # El texto queda con la lista leída para aplicar la vista previa sin volver a subir el archivo.
+                lote_texto = "\n".join(f["identificacion"] for f in lote_filas)
+                if not lote_filas:
+                    lote_error = "No se recibieron identificaciones."
+                elif aplicar:
+                    lote_aplicado = True
+                    messages.success(
+                        request,
+                        f"Lote aplicado. Becas nuevas: {lote_totales[BECA_CREADA]} | "
+                        f"Reactivadas: {lote_totales[BECA_REACTIVADA]}.",
+                    )
+
     matriculas = []
     becas_ids = set()
     mostrar_tabla = False
@@ -144,7 +179,8 @@ def registrar_beca_comedor(request):
                     estudiante_id__in=ids_estudiantes,
                 )
             }
-            creadas = activadas = desactivadas = 0
+            nuevas_ids, modificadas = [], []
+            activadas = desactivadas = 0
 
             for estudiante_id in ids_estudiantes:
                 debe_activa = estudiante_id in ids_marcados
@@ -152,22 +188,15 @@ def registrar_beca_comedor(request):
                 if beca:
                     if beca.activa != debe_activa:
                         beca.activa = debe_activa
-                        beca.usuario_actualizacion = request.user
-                        beca.save(update_fields=["activa", "usuario_actualizacion", "fecha_actualizacion"])
+                        modificadas.append(beca)
                         if debe_activa:
                             activadas += 1
                         else:
                             desactivadas += 1
                 elif debe_activa:
-                    BecaComedor.objects.create(
-                        institucion=institucion,
-                        curso_lectivo=curso_lectivo,
-                        estudiante_id=estudiante_id,
-                        activa=True,
-                        usuario_asignacion=request.user,
-                        usuario_actualizacion=request.user,
-                    )
-                    creadas += 1
+                    nuevas_ids.append(estudiante_id)
+            guardar_becas_lote(institucion.id, curso_lectivo.id, nuevas_ids, modificadas, request.user)
+            creadas = len(nuevas_ids)
 
             messages.success(
                 request,
@@ -197,6 +226,11 @@ def registrar_beca_comedor(request):
         "matriculas": matriculas,
         "becas_ids": becas_ids,
         "mostrar_tabla": mostrar_tabla,
+        "lote_texto": lote_texto,
+        "lote_filas": lote_filas,
+        "lote_totales": lote_totales,
+        "lote_aplicado": lote_aplicado,
+        "lote_error": lote_error,
         "error": error,
     }
     return render(request, "comedor/registrar_beca.html", context)
@@ -209,19 +243,22 @@ def registrar_beca_comedor(request):
 @login_required
 @permission_required("comedor.access_almuerzo_comedor", raise_exception=True)
 def almuerzo_comedor(request):
-    curso_lectivo = CursoLectivo.get_activo()
-    instituciones = Institucion.objects.all().order_by("nombre") if request.user.is_superuser else []
-
     if request.method == "POST":
-        institucion = _resolver_institucion(request, request.POST.get("institucion"))
+        # Escaneo: se resuelve contra el índice de elegibilidad en caché (comedor.services).
+        curso_lectivo_id = curso_lectivo_activo_id()
+        if request.user.is_superuser:
+            raw = request.POST.get("institucion")
+            institucion_id = int(raw) if raw and str(raw).isdigit() else None
+        else:
+            institucion_id = getattr(request, "institucion_activa_id", None)
         entrada = (request.POST.get("identificacion") or "").strip().upper()
 
-        if not curso_lectivo:
+        if not curso_lectivo_id:
             return JsonResponse(
                 {"ok": False, "status": "error", "message": "No hay curso lectivo activo."},
                 status=400,
             )
-        if not institucion:
+        if not institucion_id:
             return JsonResponse(
                 {"ok": False, "status": "error", "message": "Debe seleccionar una institución válida."},
                 status=400,
@@ -232,189 +269,11 @@ def almuerzo_comedor(request):
                 status=400,
             )
 
-        config = ConfiguracionComedor.objects.filter(institucion=institucion).first()
-        intervalo_minutos = config.intervalo_minutos if config else 1200
-        desde = timezone.now() - timedelta(minutes=intervalo_minutos)
-
-        # ── 1. Intentar como identificación de estudiante ──────────────────
-        matricula = (
-            MatriculaAcademica.objects.filter(
-                curso_lectivo=curso_lectivo,
-                institucion=institucion,
-                estado__iexact=MatriculaAcademica.ACTIVO,
-                estudiante__identificacion=entrada,
-            )
-            .select_related("estudiante")
-            .first()
-        )
-
-        if matricula:
-            nombre = str(matricula.estudiante)
-
-            beca_activa = BecaComedor.objects.filter(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                estudiante=matricula.estudiante,
-                activa=True,
-            ).exists()
-
-            if not beca_activa:
-                return JsonResponse(
-                    {
-                        "ok": True,
-                        "status": "no_beca",
-                        "message": f"{nombre} no tiene beca de comedor.",
-                        "nombre": nombre,
-                        "identificacion": matricula.estudiante.identificacion,
-                    }
-                )
-
-            registro_reciente = (
-                RegistroAlmuerzo.objects.filter(
-                    institucion=institucion,
-                    curso_lectivo=curso_lectivo,
-                    estudiante=matricula.estudiante,
-                    fecha_hora__gte=desde,
-                )
-                .order_by("-fecha_hora")
-                .first()
-            )
-
-            if registro_reciente:
-                delta_sec = (
-                    timezone.now() - registro_reciente.fecha_hora
-                ).total_seconds()
-                # Doble lectura del QR: misma respuesta que éxito sin mensaje de duplicado
-                if delta_sec < 2:
-                    return JsonResponse(
-                        {
-                            "ok": True,
-                            "status": "ok",
-                            "message": f"{nombre} — registro confirmado.",
-                            "nombre": nombre,
-                            "identificacion": matricula.estudiante.identificacion,
-                            "tipo_acceso": "Alumno becado",
-                            "idempotente": True,
-                        }
-                    )
-                mins_transcurridos = int(delta_sec / 60)
-                mins_restantes = intervalo_minutos - mins_transcurridos
-                return JsonResponse(
-                    {
-                        "ok": True,
-                        "status": "duplicado",
-                        "message": (
-                            f"{nombre} ya registró a las {registro_reciente.fecha_hora:%H:%M}. "
-                            f"Debe esperar {mins_restantes} minuto(s) más."
-                        ),
-                        "nombre": nombre,
-                        "identificacion": matricula.estudiante.identificacion,
-                    }
-                )
-
-            RegistroAlmuerzo.objects.create(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                estudiante=matricula.estudiante,
-                fecha=timezone.localdate(),
-            )
-
-            return JsonResponse(
-                {
-                    "ok": True,
-                    "status": "ok",
-                    "message": f"{nombre} registrado correctamente.",
-                    "nombre": nombre,
-                    "identificacion": matricula.estudiante.identificacion,
-                    "tipo_acceso": "Alumno becado",
-                }
-            )
-
-        # ── 2. Intentar como código de tiquete ─────────────────────────────
-        tiquete = TiqueteComedor.objects.filter(
-            codigo=entrada,
-            institucion=institucion,
-        ).first()
-
-        if not tiquete:
-            return JsonResponse(
-                {
-                    "ok": True,
-                    "status": "no_encontrado",
-                    "message": f"El código «{entrada}» no corresponde a ningún estudiante con beca ni a un tiquete.",
-                    "identificacion": entrada,
-                }
-            )
-
-        if not tiquete.activo:
-            return JsonResponse(
-                {
-                    "ok": True,
-                    "status": "inactivo",
-                    "message": f"El tiquete {entrada} está inactivo.",
-                    "identificacion": entrada,
-                }
-            )
-
-        registro_reciente_tiq = (
-            RegistroAlmuerzoTiquete.objects.filter(
-                tiquete=tiquete,
-                fecha_hora__gte=desde,
-            )
-            .order_by("-fecha_hora")
-            .first()
-        )
-
-        if registro_reciente_tiq:
-            delta_sec = (
-                timezone.now() - registro_reciente_tiq.fecha_hora
-            ).total_seconds()
-            if delta_sec < 2:
-                return JsonResponse(
-                    {
-                        "ok": True,
-                        "status": "ok",
-                        "message": f"{tiquete.get_tipo_display()} — registro confirmado.",
-                        "nombre": tiquete.get_tipo_display(),
-                        "identificacion": tiquete.codigo,
-                        "tipo_acceso": tiquete.get_tipo_display(),
-                        "idempotente": True,
-                    }
-                )
-            mins_transcurridos = int(delta_sec / 60)
-            mins_restantes = intervalo_minutos - mins_transcurridos
-            return JsonResponse(
-                {
-                    "ok": True,
-                    "status": "duplicado",
-                    "message": (
-                        f"{tiquete.get_tipo_display()} ya registró a las "
-                        f"{registro_reciente_tiq.fecha_hora:%H:%M}. "
-                        f"Debe esperar {mins_restantes} minuto(s) más."
-                    ),
-                    "nombre": tiquete.get_tipo_display(),
-                    "identificacion": tiquete.codigo,
-                }
-            )
-
-        RegistroAlmuerzoTiquete.objects.create(
-            institucion=institucion,
-            curso_lectivo=curso_lectivo,
-            tiquete=tiquete,
-            fecha=timezone.localdate(),
-        )
-
-        return JsonResponse(
-            {
-                "ok": True,
-                "status": "ok",
-                "message": f"{tiquete.get_tipo_display()} registrado correctamente.",
-                "nombre": tiquete.get_tipo_display(),
-                "identificacion": tiquete.codigo,
-                "tipo_acceso": tiquete.get_tipo_display(),
-            }
-        )
+        payload, status = procesar_escaneo_comedor(institucion_id, curso_lectivo_id, entrada)
+        return JsonResponse(payload, status=status)
 
+    curso_lectivo = CursoLectivo.get_activo()
+    instituciones = Institucion.objects.all().order_by("nombre") if request.user.is_superuser else []
     institucion = _resolver_institucion(request, request.GET.get("institucion"))
     config = ConfiguracionComedor.objects.filter(institucion=institucion).first() if institucion else None
     intervalo_minutos = config.intervalo_minutos if config else 1200
@@ -430,6 +289,56 @@ def almuerzo_comedor(request):
     return render(request, "comedor/almuerzo.html", context)
 
 
+@login_required
+@permission_required("comedor.access_almuerzo_comedor", raise_exception=True)
+def sincronizar_almuerzo_comedor(request):
+    """
+    Ingesta por lote para kioscos sin conexión. Recibe JSON
+    {"institucion": id (solo superusuario), "escaneos": [{"clave", "entrada", "fecha_hora"}]}
+    y responde un veredicto por escaneo en el mismo orden.
+    """
+    if request.method != "POST":
+        return JsonResponse({"ok": False}, status=405)
+    try:
+        datos = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"ok": False, "status": "error", "message": "JSON inválido."}, status=400)
+    escaneos = datos.get("escaneos") if isinstance(datos, dict) else None
+    if not isinstance(escaneos, list):
+        return JsonResponse(
+            {"ok": False, "status": "error", "message": "Debe enviar la lista de escaneos."},
+            status=400,
+        )
+    if len(escaneos) > MAX_ESCANEOS_LOTE:
+        return JsonResponse(
+            {"ok": False, "status": "error", "message": f"Máximo {MAX_ESCANEOS_LOTE} escaneos por lote."},
+            status=400,
+        )
+
+    curso_lectivo_id = curso_lectivo_activo_id()
+    if request.user.is_superuser:
+        raw = datos.get("institucion")
+        institucion_id = int(raw) if raw and str(raw).isdigit() else None
+    else:
+        institucion_id = getattr(request, "institucion_activa_id", None)
+    if not curso_lectivo_id:
+        return JsonResponse(
+            {"ok": False, "status": "error", "message": "No hay curso lectivo activo."},
+            status=400,
+        )
+    resultados = sincronizar_escaneos_comedor(institucion_id, curso_lectivo_id, escaneos) if institucion_id else None
+    if resultados is None:
+        return JsonResponse(
+            {"ok": False, "status": "error", "message": "Debe seleccionar una institución válida."},
+            status=400,
+        )
+
+    resumen = {}
+    for r in resultados:
+        resumen[r["status"]] = resumen.get(r["status"], 0) + 1
+    return JsonResponse({"ok": True, "resultados": resultados, "resumen": resumen})
+
+
 # ---------------------------------------------------------------------------
 # Gestionar tiquetes
 # ---------------------------------------------------------------------------
@@ -550,12 +459,17 @@ def imprimir_tiquetes(request):
         if filtro_tipo:
             tiquetes_qs = tiquetes_qs.filter(tipo=filtro_tipo)
 
-    tiquetes_con_qr = []
-    for t in tiquetes_qs.order_by("tipo", "codigo"):
-        tiquetes_con_qr.append({
-            "tiquete": t,
-            "qr_b64": _qr_base64(t.codigo),
-        })
+    formato = request.GET.get("formato", PNG)
+    if formato not in FORMATOS:
+        formato = PNG
+
+    tiquetes = list(tiquetes_qs.order_by("tipo", "codigo"))
+    # Los QR faltantes se generan aquí en paralelo; la hoja los pide por URL a la caché.
+    precalentar_qr([t.codigo for t in tiquetes], formato)
+    tiquetes_con_qr = [
+        {"tiquete": t, "qr_url": reverse("comedor:qr_tiquete", args=[t.codigo, formato])}
+        for t in tiquetes
+    ]
 
     context = {
         "tiquetes_con_qr": tiquetes_con_qr,
@@ -566,10 +480,21 @@ def imprimir_tiquetes(request):
         "tipos": TiqueteComedor.TIPO_CHOICES,
         "filtro_tipo": filtro_tipo,
         "ids_raw": ids_raw,
+        "formato": formato,
+        "formatos": [(PNG, "PNG"), (SVG, "SVG (vectorial)")],
     }
     return render(request, "comedor/imprimir_tiquetes.html", context)
 
 
+@login_required
+@permission_required("comedor.access_tiquetes_comedor", raise_exception=True)
+def qr_tiquete(request, codigo, formato):
+    """Imagen QR de un tiquete desde la caché de QR (URL cacheable por el navegador)."""
+    if formato not in FORMATOS or len(codigo) > TiqueteComedor._meta.get_field("codigo").max_length:
+        raise Http404
+    return respuesta_qr(request, codigo, formato)
+
+
 # ---------------------------------------------------------------------------
 # Reportes
 # ---------------------------------------------------------------------------
@@ -610,7 +535,8 @@ def reportes_comedor(request):
     total_registros_beca = 0
     total_estudiantes_unicos = 0
     por_dia = []
-    becados_sin_uso = []
+    por_nivel = []
+    sin_uso = []
 
     total_tiquetes_activos = 0
     total_usos_tiquete = 0
@@ -634,68 +560,69 @@ def reportes_comedor(request):
         )
         total_becados = becas_qs.count()
 
-        registros_beca_qs = RegistroAlmuerzo.objects.filter(
-            institucion=institucion,
-            curso_lectivo=curso_lectivo,
-            fecha__range=(fecha_inicio, fecha_fin),
-        )
-        total_registros_beca = registros_beca_qs.count()
-        total_estudiantes_unicos = registros_beca_qs.values("estudiante_id").distinct().count()
-
-        por_dia = list(
-            registros_beca_qs.values("fecha")
-            .annotate(
-                total_registros=Count("id"),
-                total_estudiantes=Count("estudiante_id", distinct=True),
-            )
-            .order_by("fecha")
-        )
+        # Totales por día/tipo/nivel: días cerrados desde ResumenComedorDiario.
+        resumen = resumen_comedor_periodo(institucion.id, curso_lectivo.id, fecha_inicio, fecha_fin)
+        filas_beca = [f for f in resumen if f["tipo"] == ResumenComedorDiario.BECA]
+        filas_tiquete = [f for f in resumen if f["tipo"] != ResumenComedorDiario.BECA]
 
-        becados_sin_uso = list(
-            becas_qs.exclude(
-                estudiante__registros_almuerzo__institucion=institucion,
-                estudiante__registros_almuerzo__curso_lectivo=curso_lectivo,
-                estudiante__registros_almuerzo__fecha__range=(fecha_inicio, fecha_fin),
+        total_registros_beca = sum(f["registros"] for f in filas_beca)
+        # Los únicos del periodo no se derivan de los totales diarios.
+        total_estudiantes_unicos = (
+            RegistroAlmuerzo.objects.filter(
+                institucion=institucion,
+                curso_lectivo=curso_lectivo,
+                fecha__range=(fecha_inicio, fecha_fin),
             )
-            .order_by(
-                "estudiante__primer_apellido",
-                "estudiante__segundo_apellido",
-                "estudiante__nombres",
-            )[:250]
+            .values("estudiante_id")
+            .distinct()
+            .count()
         )
 
+        dias = {}
+        for f in filas_beca:
+            dia = dias.setdefault(f["fecha"], {"fecha": f["fecha"], "total_registros": 0, "total_estudiantes": 0})
+            dia["total_registros"] += f["registros"]
+            # Cada estudiante tiene un solo nivel: los distintos por nivel se suman.
+            dia["total_estudiantes"] += f["distintos"]
+        por_dia = [dias[fecha] for fecha in sorted(dias)]
+
+        nombres_nivel = dict(Nivel.objects.values_list("id", "nombre"))
+        niveles_uso = {}
+        for f in filas_beca:
+            niveles_uso[f["nivel_id"]] = niveles_uso.get(f["nivel_id"], 0) + f["registros"]
+        por_nivel = [
+            {"nivel": nombres_nivel.get(nivel_id, "Sin matrícula"), "total_registros": total}
+            for nivel_id, total in sorted(niveles_uso.items(), key=lambda x: (x[0] is None, x[0] or 0))
+        ]
+
+        sin_uso = sorted(
+            becados_sin_uso(institucion.id, curso_lectivo.id, fecha_inicio, fecha_fin),
+            key=lambda f: (f["primer_apellido"], f["segundo_apellido"], f["nombre"]),
+        )[:250]
+
         # ── Tiquetes ─────────────────────────────────────────────────────────
         total_tiquetes_activos = TiqueteComedor.objects.filter(
             institucion=institucion, activo=True
         ).count()
 
-        registros_tiq_qs = RegistroAlmuerzoTiquete.objects.filter(
-            institucion=institucion,
-            curso_lectivo=curso_lectivo,
-            fecha__range=(fecha_inicio, fecha_fin),
-        )
-        total_usos_tiquete = registros_tiq_qs.count()
-        recaudacion_total = registros_tiq_qs.aggregate(
-            total=Sum("tiquete__monto")
-        )["total"] or 0
+        total_usos_tiquete = sum(f["registros"] for f in filas_tiquete)
+        recaudacion_total = sum(f["monto"] for f in filas_tiquete)
 
         tipo_labels = dict(TiqueteComedor.TIPO_CHOICES)
 
-        usos_por_tipo_tiquete = list(
-            registros_tiq_qs.values("tiquete__tipo")
-            .annotate(total=Count("id"), monto_total=Sum("tiquete__monto"))
-            .order_by("tiquete__tipo")
-        )
-        for item in usos_por_tipo_tiquete:
-            item["tipo_display"] = tipo_labels.get(item["tiquete__tipo"], item["tiquete__tipo"])
-
-        por_dia_tiquete = list(
-            registros_tiq_qs.values("fecha", "tiquete__tipo")
-            .annotate(total=Count("id"), monto_total=Sum("tiquete__monto"))
-            .order_by("fecha", "tiquete__tipo")
-        )
-        for item in por_dia_tiquete:
-            item["tipo_display"] = tipo_labels.get(item["tiquete__tipo"], item["tiquete__tipo"])
+        por_tipo, por_dia_tipo = {}, {}
+        for f in filas_tiquete:
+            for agrupado, clave, base in (
+                (por_tipo, f["tipo"], {"tiquete__tipo": f["tipo"]}),
+                (por_dia_tipo, (f["fecha"], f["tipo"]), {"fecha": f["fecha"], "tiquete__tipo": f["tipo"]}),
+            ):
+                item = agrupado.setdefault(
+                    clave, {**base, "total": 0, "monto_total": 0, "tipo_display": tipo_labels.get(f["tipo"], f["tipo"])}
+                )
+                item["total"] += f["registros"]
+                item["monto_total"] += f["monto"]
+        usos_por_tipo_tiquete = [por_tipo[tipo] for tipo in sorted(por_tipo)]
+        por_dia_tiquete = [por_dia_tipo[clave] for clave in sorted(por_dia_tipo)]
 
     contexto = {
         "curso_lectivo": curso_lectivo,
@@ -710,7 +637,8 @@ def reportes_comedor(request):
         "total_registros": total_registros_beca,
         "total_estudiantes_unicos": total_estudiantes_unicos,
         "por_dia": por_dia,
-        "becados_sin_uso": becados_sin_uso,
+        "por_nivel": por_nivel,
+        "becados_sin_uso": sin_uso,
         # tiquetes
         "total_tiquetes_activos": total_tiquetes_activos,
         "total_usos_tiquete": total_usos_tiquete,
@@ -725,6 +653,38 @@ def reportes_comedor(request):
 # Reporte becados sin uso (PDF)
 # ---------------------------------------------------------------------------
 
+# Reintento (ms) del navegador cuando el stream no corre sobre ASGI.
+OCUPACION_REINTENTO_WSGI = 5000
+
+
+@login_required
+@permission_required("comedor.access_reportes_comedor", raise_exception=True)
+async def ocupacion_comedor_stream(request):
+    """
+    Ocupación de hoy por server-sent events (comedor.ocupacion). Sobre ASGI la conexión
+    queda abierta y recibe un evento por cambio; sobre WSGI responde una foto y el
+    navegador se reconecta cada OCUPACION_REINTENTO_WSGI ms.
+    """
+    institucion = await sync_to_async(_resolver_institucion)(request, request.GET.get("institucion"))
+    curso_lectivo_id = await sync_to_async(curso_lectivo_activo_id)()
+    if not institucion or not curso_lectivo_id:
+        # 204 detiene la reconexión automática de EventSource.
+        return HttpResponse(status=204)
+
+    if isinstance(request, ASGIRequest):
+        respuesta = StreamingHttpResponse(
+            eventos_ocupacion(institucion.id, curso_lectivo_id), content_type="text/event-stream"
+        )
+    else:
+        foto = await sync_to_async(leer_ocupacion)(institucion.id, curso_lectivo_id)
+        respuesta = StreamingHttpResponse(
+            [evento_sse(foto, retry=OCUPACION_REINTENTO_WSGI)], content_type="text/event-stream"
+        )
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"
+    return respuesta
+
+
 @login_required
 @permission_required("comedor.access_reportes_comedor", raise_exception=True)
 def reporte_becados_sin_uso(request):
@@ -768,86 +728,7 @@ def reporte_becados_sin_uso(request):
     if curso_lectivo and institucion:
         plantilla = PlantillaImpresionMatricula.objects.filter(institucion=institucion).first()
 
-        becas_qs = (
-            BecaComedor.objects.filter(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                activa=True,
-                estudiante__matriculas_academicas__curso_lectivo=curso_lectivo,
-                estudiante__matriculas_academicas__institucion=institucion,
-                estudiante__matriculas_academicas__estado__iexact=MatriculaAcademica.ACTIVO,
-            )
-            .select_related("estudiante")
-            .distinct()
-        )
-
-        becados_sin_uso = list(
-            becas_qs.exclude(
-                estudiante__registros_almuerzo__institucion=institucion,
-                estudiante__registros_almuerzo__curso_lectivo=curso_lectivo,
-                estudiante__registros_almuerzo__fecha__range=(fecha_inicio, fecha_fin),
-            )
-            .order_by(
-                "estudiante__primer_apellido",
-                "estudiante__segundo_apellido",
-                "estudiante__nombres",
-            )
-        )
-
-        matricula_map = {}
-        for m in MatriculaAcademica.objects.filter(
-            institucion=institucion,
-            curso_lectivo=curso_lectivo,
-            estado__iexact=MatriculaAcademica.ACTIVO,
-            estudiante_id__in=[b.estudiante_id for b in becados_sin_uso],
-        ).select_related("subgrupo__seccion__nivel", "seccion__nivel"):
-            matricula_map[m.estudiante_id] = m
-
-        encargados = {}
-        for enc in EncargadoEstudiante.objects.filter(
-            estudiante_id__in=[b.estudiante_id for b in becados_sin_uso],
-            principal=True,
-        ).select_related("persona_contacto"):
-            encargados[enc.estudiante_id] = enc.persona_contacto
-
-        for beca in becados_sin_uso:
-            mat = matricula_map.get(beca.estudiante_id)
-            subgrupo_label = "-"
-            orden_nivel, orden_seccion, orden_letra = 9999, 9999, "z"
-            if mat:
-                if mat.subgrupo_id:
-                    sg = mat.subgrupo
-                    subgrupo_label = str(sg)
-                    orden_nivel = sg.seccion.nivel.numero
-                    orden_seccion = sg.seccion.numero
-                    orden_letra = (sg.letra or "").strip().upper() or "z"
-                elif mat.seccion_id:
-                    sec = mat.seccion
-                    subgrupo_label = str(sec)
-                    orden_nivel = sec.nivel.numero
-                    orden_seccion = sec.numero
-                    orden_letra = ""
-
-            contacto = encargados.get(beca.estudiante_id)
-            nombre_encargado = str(contacto) if contacto else "-"
-            telefono_encargado = "-"
-            if contacto:
-                telefono_encargado = (contacto.celular_avisos or contacto.telefono_trabajo or "-").strip() or "-"
-
-            filas.append({
-                "subgrupo": subgrupo_label,
-                "orden_nivel": orden_nivel,
-                "orden_seccion": orden_seccion,
-                "orden_letra": orden_letra,
-                "identificacion": beca.estudiante.identificacion,
-                "primer_apellido": beca.estudiante.primer_apellido,
-                "segundo_apellido": beca.estudiante.segundo_apellido or "",
-                "nombre": beca.estudiante.nombres,
-                "nombre_encargado": nombre_encargado,
-                "telefono_encargado": telefono_encargado,
-            })
-
-        filas.sort(key=lambda f: (f["orden_nivel"], f["orden_seccion"], f["orden_letra"], f["primer_apellido"], f["segundo_apellido"], f["nombre"]))
+        filas = becados_sin_uso(institucion.id, curso_lectivo.id, fecha_inicio, fecha_fin)
 
     periodo_label = (
         "Hoy" if periodo == "dia"
@@ -0,0 +1,156 @@
+"""
+Códigos QR con caché por contenido.
+
+La imagen de un QR depende solo del texto y de los parámetros de dibujo, así que se
+guarda en la caché compartida bajo un hash de ambos y no se vuelve a generar. Sirve
+para tiquetes de comedor y para cualquier carné/QR de estudiantes:
+
+- qr_bytes / qr_base64: imagen (PNG o SVG) desde la caché, generándola si falta.
+- precalentar_qr: genera en un pool de procesos los que faltan de una lista (p. ej.
+  antes de una hoja de impresión), para que las imágenes se sirvan desde la caché.
+- respuesta_qr: HttpResponse con ETag y Cache-Control para servir el QR por URL.
+"""
+import base64
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.http import HttpResponse, HttpResponseNotModified
+
+PNG = "png"
+SVG = "svg"
+FORMATOS = {PNG: "image/png", SVG: "image/svg+xml"}
+
+# Un QR no cambia para el mismo texto y parámetros.
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# Por debajo de esta cantidad de faltantes no compensa levantar el pool.
+QR_MIN_PARALELO = 48
+# Parámetros del QR de carnés y comprobantes de estudiantes (identificación).
+QR_CARNE = {"box_size": 10, "border": 1, "correccion": "L"}
+
+_NIVELES_CORRECCION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+def procesos_qr():
+    """Procesos del pool: settings.QR_PROCESOS o hasta 4 según CPUs."""
+    return getattr(settings, "QR_PROCESOS", None) or min(4, os.cpu_count() or 1)
+
+
+def _parametros(formato, box_size, border, correccion):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de QR no soportado: {formato}")
+    if correccion not in _NIVELES_CORRECCION:
+        raise ValueError(f"Nivel de corrección no soportado: {correccion}")
+    return (formato, int(box_size), int(border), correccion)
+
+
+def huella_qr(texto, formato=PNG, box_size=6, border=2, correccion="M"):
+    """Hash del contenido: identifica la imagen en la caché y sirve de ETag."""
+    parametros = _parametros(formato, box_size, border, correccion)
+    datos = "\x1f".join([texto, *map(str, parametros)])
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()[:32]
+
+
+def _cache_key_qr(huella):
+    return f"qr:{huella}"
+
+
+def generar_qr(texto, formato=PNG, box_size=6, border=2, correccion="M"):
+    """Imagen del QR sin caché (bytes PNG o SVG)."""
+    formato, box_size, border, correccion = _parametros(formato, box_size, border, correccion)
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=_NIVELES_CORRECCION[correccion],
+        box_size=box_size,
+        border=border,
+        image_factory=qrcode.image.svg.SvgPathImage if formato == SVG else None,
+    )
+    qr.add_data(texto)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    if formato == SVG:
+        qr.make_image().save(buf)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _generar_qr_tarea(args):
+    return generar_qr(*args)
+
+
+def qr_bytes(texto, formato=PNG, box_size=6, border=2, correccion="M"):
+    """Imagen del QR desde la caché; se genera y guarda si no está."""
+    key = _cache_key_qr(huella_qr(texto, formato, box_size, border, correccion))
+    contenido = cache.get(key)
+    if contenido is None:
+        contenido = generar_qr(texto, formato, box_size, border, correccion)
+        cache.set(key, contenido, QR_CACHE_TIMEOUT)
+    return contenido
+
+
+def qr_base64(texto, formato=PNG, box_size=6, border=2, correccion="M"):
+    """QR en base64 para <img src="data:..."> (PDF/HTML que no pueden pedir URLs)."""
+    return base64.b64encode(qr_bytes(texto, formato, box_size, border, correccion)).decode("ascii")
+
+
+def precalentar_qr(textos, formato=PNG, box_size=6, border=2, correccion="M", procesos=None):
+    """
+    Deja en la caché los QR de `textos`. Los faltantes se generan en un pool de
+    procesos cuando son muchos. Retorna la cantidad generada. Con DummyCache no hace
+    nada: lo generado no se conservaría.
+    """
+    if isinstance(caches["default"], DummyCache):
+        return 0
+    textos = list(dict.fromkeys(textos))
+    keys = {
+        _cache_key_qr(huella_qr(texto, formato, box_size, border, correccion)): texto
+        for texto in textos
+    }
+    encontrados = cache.get_many(list(keys))
+    faltantes = [(key, texto) for key, texto in keys.items() if key not in encontrados]
+    if not faltantes:
+        return 0
+
+    tareas = [(texto, formato, box_size, border, correccion) for _, texto in faltantes]
+    procesos = procesos or procesos_qr()
+    if procesos <= 1 or len(tareas) < QR_MIN_PARALELO:
+        imagenes = [_generar_qr_tarea(t) for t in tareas]
+    else:
+        metodos = multiprocessing.get_all_start_methods()
+        contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        chunksize = max(1, len(tareas) // (procesos * 4))
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            imagenes = list(pool.map(_generar_qr_tarea, tareas, chunksize=chunksize))
+    cache.set_many({key: img for (key, _), img in zip(faltantes, imagenes)}, QR_CACHE_TIMEOUT)
+    return len(imagenes)
+
+
+def respuesta_qr(request, texto, formato=PNG, box_size=6, border=2, correccion="M"):
+    """
+    Respuesta HTTP con el QR. La URL identifica el contenido, así que el navegador
+    puede guardarlo (privado: las vistas que lo usan requieren sesión).
+    """
+    etag = f'"{huella_qr(texto, formato, box_size, border, correccion)}"'
+    cache_control = f"private, max-age={QR_CACHE_TIMEOUT}, immutable"
+    if etag in request.headers.get("If-None-Match", ""):
+        respuesta = HttpResponseNotModified()
+    else:
+        respuesta = HttpResponse(
+            qr_bytes(texto, formato, box_size, border, correccion), content_type=FORMATOS[formato]
+        )
+    respuesta["ETag"] = etag
+    respuesta["Cache-Control"] = cache_control
+    return respuesta
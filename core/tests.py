@@ -1,3 +1,50 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
 
-# Create your tests here.
+from core.qr import (
+    PNG,
+    QR_MIN_PARALELO,
+    SVG,
+    generar_qr,
+    huella_qr,
+    precalentar_qr,
+    qr_bytes,
+    respuesta_qr,
+)
+
+CACHE_LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class QrCacheTests(TestCase):
+    """Caché de QR por contenido: misma imagen, generada una sola vez."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_huella_depende_del_texto_y_los_parametros(self):
+        base = huella_qr("TIQ-0001")
+        self.assertEqual(base, huella_qr("TIQ-0001", PNG, 6, 2, "M"))
+        self.assertNotEqual(base, huella_qr("TIQ-0002"))
+        self.assertNotEqual(base, huella_qr("TIQ-0001", SVG))
+        self.assertNotEqual(base, huella_qr("TIQ-0001", box_size=10))
+        with self.assertRaises(ValueError):
+            huella_qr("TIQ-0001", "gif")
+
+    def test_formatos(self):
+        self.assertTrue(qr_bytes("TIQ-0001").startswith(b"\x89PNG"))
+        self.assertIn(b"<svg", qr_bytes("TIQ-0001", SVG))
+
+    def test_precalentar_en_paralelo(self):
+        textos = [f"TIQ-{i:04d}" for i in range(QR_MIN_PARALELO + 2)]
+        self.assertEqual(precalentar_qr(textos, SVG, procesos=2), len(textos))
+        self.assertEqual(precalentar_qr(textos, SVG, procesos=2), 0)
+        self.assertEqual(qr_bytes(textos[-1], SVG), generar_qr(textos[-1], SVG))
+
+    def test_respuesta_con_etag(self):
+        factory = RequestFactory()
+        resp = respuesta_qr(factory.get("/"), "TIQ-0001", SVG)
+        self.assertEqual(resp["Content-Type"], "image/svg+xml")
+        self.assertIn("immutable", resp["Cache-Control"])
+        resp = respuesta_qr(factory.get("/", HTTP_IF_NONE_MATCH=resp["ETag"]), "TIQ-0001", SVG)
+        self.assertEqual(resp.status_code, 304)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from core.mixins import InstitucionScopedAdmin
-from .models import RegistroIngreso
+from .models import DispositivoIngreso, NotificacionIngreso, RegistroIngreso
 
 
 @admin.register(RegistroIngreso)
@@ -31,3 +31,21 @@ class RegistroIngresoAdmin(InstitucionScopedAdmin):
 
 
 
+
+
+@admin.register(DispositivoIngreso)
+class DispositivoIngresoAdmin(InstitucionScopedAdmin):
+    list_display = ("institucion", "nombre", "activo")
+    list_filter = ("institucion", "activo")
+    search_fields = ("nombre",)
+    readonly_fields = ("token",)
+
+
+@admin.register(NotificacionIngreso)
+class NotificacionIngresoAdmin(InstitucionScopedAdmin):
+    list_display = ("institucion", "canal", "destino", "estado", "intentos", "creada", "enviada")
+    list_filter = ("institucion", "canal", "estado")
+    search_fields = ("destino", "registro__identificacion")
+    ordering = ("-creada",)
+    readonly_fields = ("registro", "institucion", "creada", "enviada", "ultimo_error")
+    raw_id_fields = ("registro",)
@@ -5,6 +5,9 @@ class IngresoClasesConfig(AppConfig):
     name = "ingreso_clases"
     verbose_name = "Ingreso a Clases"
 
+    def ready(self):
+        import ingreso_clases.signals  # noqa
+
 
 
 
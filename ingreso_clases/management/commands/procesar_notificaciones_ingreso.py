@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from ingreso_clases.models import NotificacionIngreso
+from ingreso_clases.services import LOTE_NOTIFICACIONES, envios_por_minuto, procesar_notificaciones
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los avisos de ingreso/salida pendientes (correo y WhatsApp) de la bandeja "
+        "NotificacionIngreso, por lotes y con reintentos. Con --continuo queda como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Envía las notificaciones. Sin este flag solo lista las pendientes (dry-run).",
+        )
+        parser.add_argument(
+            "--limite",
+            type=int,
+            default=LOTE_NOTIFICACIONES,
+            help=f"Notificaciones por lote (por defecto {LOTE_NOTIFICACIONES}).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Con --apply: procesa lotes sin detenerse, esperando --intervalo segundos cuando no hay pendientes.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5,
+            help="Segundos de espera entre ciclos sin pendientes en modo continuo (por defecto 5).",
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get("apply"))
+        limite = max(1, options["limite"])
+
+        if not apply_changes:
+            self.stdout.write(self.style.WARNING("MODO DRY-RUN: solo se listarán las notificaciones pendientes."))
+            pendientes = (
+                NotificacionIngreso.objects.filter(estado=NotificacionIngreso.PENDIENTE)
+                .values("institucion_id", "institucion__nombre", "canal")
+                .annotate(n=Count("id"))
+                .order_by("institucion__nombre", "canal")
+            )
+            total = 0
+            for fila in pendientes:
+                total += fila["n"]
+                self.stdout.write(f"  {fila['institucion__nombre']} / {fila['canal']}: {fila['n']} pendientes")
+            vencidas = NotificacionIngreso.objects.filter(
+                estado=NotificacionIngreso.PENDIENTE, proximo_intento__lte=timezone.now()
+            ).count()
+            self.stdout.write("")
+            self.stdout.write("Resumen:")
+            self.stdout.write(f"- Pendientes: {total}")
+            self.stdout.write(f"- Listas para enviar: {vencidas}")
+            self.stdout.write(f"- Límite por institución: {envios_por_minuto()} por minuto")
+            self.stdout.write(self.style.SUCCESS("Dry-run finalizado."))
+            return
+
+        self.stdout.write(self.style.WARNING("MODO APPLY: se enviarán las notificaciones pendientes."))
+        totales = {"ciclos": 0, "enviadas": 0, "reintentos": 0, "fallidas": 0}
+        try:
+            while True:
+                stats = procesar_notificaciones(limite=limite)
+                totales["ciclos"] += 1
+                for clave in ("enviadas", "reintentos", "fallidas"):
+                    totales[clave] += stats[clave]
+                if stats["reclamadas"]:
+                    self.stdout.write(
+                        f"  Lote: {stats['enviadas']} enviadas, {stats['reintentos']} a reintentar, "
+                        f"{stats['fallidas']} fallidas"
+                    )
+                if not options.get("continuo"):
+                    break
+                if not stats["reclamadas"]:
+                    time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(f"- Lotes procesados: {totales['ciclos']}")
+        self.stdout.write(f"- Enviadas: {totales['enviadas']}")
+        self.stdout.write(f"- A reintentar: {totales['reintentos']}")
+        self.stdout.write(f"- Fallidas: {totales['fallidas']}")
+        self.stdout.write(self.style.SUCCESS("Proceso finalizado."))
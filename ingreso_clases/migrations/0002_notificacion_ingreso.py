@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+        ('ingreso_clases', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionIngreso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(choices=[('EMAIL', 'Correo'), ('WHATSAPP', 'WhatsApp')], max_length=10, verbose_name='Canal')),
+                ('destino', models.CharField(max_length=254, verbose_name='Destino')),
+                ('asunto', models.CharField(blank=True, max_length=200, verbose_name='Asunto')),
+                ('mensaje', models.TextField(verbose_name='Mensaje')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADA', 'Enviada'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=10, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('creada', models.DateTimeField(auto_now_add=True, verbose_name='Creada')),
+                ('enviada', models.DateTimeField(blank=True, null=True, verbose_name='Enviada')),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='core.institucion', verbose_name='Institución')),
+                ('registro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='ingreso_clases.registroingreso', verbose_name='Registro')),
+            ],
+            options={
+                'verbose_name': 'Notificación de ingreso',
+                'verbose_name_plural': 'Notificaciones de ingreso',
+                'ordering': ('-creada',),
+                'indexes': [models.Index(fields=['estado', 'institucion', 'proximo_intento'], name='notif_ingreso_pendientes'), models.Index(fields=['institucion', 'estado', 'enviada'], name='notif_ingreso_enviadas')],
+            },
+        ),
+    ]
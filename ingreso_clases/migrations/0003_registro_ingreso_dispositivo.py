@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingreso_clases', '0002_notificacion_ingreso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroingreso',
+            name='dispositivo',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Dispositivo'),
+        ),
+        migrations.AlterField(
+            model_name='registroingreso',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
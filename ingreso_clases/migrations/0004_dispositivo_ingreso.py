@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:55
+
+import django.db.models.deletion
+import ingreso_clases.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+        ('ingreso_clases', '0003_registro_ingreso_dispositivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispositivoIngreso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, verbose_name='Nombre')),
+                ('token', models.CharField(default=ingreso_clases.models.generar_token_dispositivo, max_length=64, unique=True, verbose_name='Token')),
+                ('activo', models.BooleanField(default=True, verbose_name='Activo')),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.institucion', verbose_name='Institución')),
+            ],
+            options={
+                'verbose_name': 'Dispositivo de ingreso',
+                'verbose_name_plural': 'Dispositivos de ingreso',
+                'ordering': ('institucion', 'nombre'),
+                'constraints': [models.UniqueConstraint(fields=('institucion', 'nombre'), name='unique_dispositivo_ingreso_por_institucion')],
+            },
+        ),
+    ]
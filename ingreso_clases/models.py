@@ -1,18 +1,26 @@
+import secrets
+
 from django.db import models
+from django.utils import timezone
+
 from core.models import Institucion
 
 
 class RegistroIngreso(models.Model):
     institucion = models.ForeignKey(Institucion, on_delete=models.PROTECT, verbose_name="Institución")
     identificacion = models.CharField("Identificación estudiante", max_length=20, db_index=True)
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    # Hora del evento en el dispositivo (los torniquetes reenvían eventos tras una caída).
+    fecha_hora = models.DateTimeField(default=timezone.now)
     es_entrada = models.BooleanField(default=True)
     observacion = models.CharField(max_length=255, blank=True)
+    dispositivo = models.CharField("Dispositivo", max_length=50, blank=True)
 
     class Meta:
         verbose_name = "Registro de ingreso/salida"
         verbose_name_plural = "Registros de ingreso/salida"
         ordering = ("-fecha_hora",)
+        # El índice de la restricción (institución, identificación, fecha_hora) resuelve
+        # el último estado de cada estudiante y descarta los eventos reenviados.
         constraints = [
             models.UniqueConstraint(
                 fields=["institucion", "identificacion", "fecha_hora"],
@@ -46,3 +54,81 @@ class RegistroIngreso(models.Model):
 
 
 
+
+
+def generar_token_dispositivo():
+    return secrets.token_urlsafe(32)
+
+
+class DispositivoIngreso(models.Model):
+    """
+    Torniquete o lector autorizado a enviar eventos por lote. Se autentica con su token
+    en la cabecera X-Dispositivo-Token y solo registra eventos de su institución.
+    """
+
+    institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, verbose_name="Institución")
+    nombre = models.CharField("Nombre", max_length=50)
+    token = models.CharField("Token", max_length=64, unique=True, default=generar_token_dispositivo)
+    activo = models.BooleanField("Activo", default=True)
+
+    class Meta:
+        verbose_name = "Dispositivo de ingreso"
+        verbose_name_plural = "Dispositivos de ingreso"
+        ordering = ("institucion", "nombre")
+        constraints = [
+            models.UniqueConstraint(fields=["institucion", "nombre"], name="unique_dispositivo_ingreso_por_institucion")
+        ]
+
+    def __str__(self):
+        return f"{self.institucion} - {self.nombre}"
+
+
+class NotificacionIngreso(models.Model):
+    """
+    Bandeja de salida de avisos de ingreso/salida al encargado. Se escribe en la misma
+    transacción que el RegistroIngreso y la vacía el comando
+    procesar_notificaciones_ingreso, fuera de la petición del torniquete.
+    """
+
+    EMAIL = "EMAIL"
+    WHATSAPP = "WHATSAPP"
+    CANAL_CHOICES = [
+        (EMAIL, "Correo"),
+        (WHATSAPP, "WhatsApp"),
+    ]
+
+    PENDIENTE = "PENDIENTE"
+    ENVIADA = "ENVIADA"
+    FALLIDA = "FALLIDA"
+    ESTADO_CHOICES = [
+        (PENDIENTE, "Pendiente"),
+        (ENVIADA, "Enviada"),
+        (FALLIDA, "Fallida"),
+    ]
+
+    registro = models.ForeignKey(
+        RegistroIngreso, on_delete=models.CASCADE, related_name="notificaciones", verbose_name="Registro"
+    )
+    institucion = models.ForeignKey(Institucion, on_delete=models.PROTECT, verbose_name="Institución")
+    canal = models.CharField("Canal", max_length=10, choices=CANAL_CHOICES)
+    destino = models.CharField("Destino", max_length=254)
+    asunto = models.CharField("Asunto", max_length=200, blank=True)
+    mensaje = models.TextField("Mensaje")
+    estado = models.CharField("Estado", max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField("Intentos", default=0)
+    proximo_intento = models.DateTimeField("Próximo intento", default=timezone.now)
+    ultimo_error = models.TextField("Último error", blank=True)
+    creada = models.DateTimeField("Creada", auto_now_add=True)
+    enviada = models.DateTimeField("Enviada", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Notificación de ingreso"
+        verbose_name_plural = "Notificaciones de ingreso"
+        ordering = ("-creada",)
+        indexes = [
+            models.Index(fields=["estado", "institucion", "proximo_intento"], name="notif_ingreso_pendientes"),
+            models.Index(fields=["institucion", "estado", "enviada"], name="notif_ingreso_enviadas"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_canal_display()} a {self.destino} ({self.get_estado_display()})"
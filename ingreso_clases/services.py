@@ -0,0 +1,478 @@
+"""
+Servicios de ingreso a clases: registro de eventos del torniquete por lote y avisos
+de ingreso/salida al encargado principal por bandeja de salida.
+
+Los eventos (identificación, hora, dispositivo) se resuelven contra un mapa
+identificación → (estudiante, institución) en la caché compartida, que se invalida
+por versión desde ingreso_clases.signals. El estado entrada/salida de cada evento sale
+de una tabla en memoria armada con dos consultas por lote sobre el índice
+(institución, identificación, fecha_hora): el último registro anterior al lote y los
+posteriores, de modo que los eventos reenviados tras una caída se intercalan en orden,
+los repetidos se descartan y los registros que quedan después de un evento intercalado
+se corrigen para mantener la alternancia. Se insertan con bulk_create.
+
+marcar_ingreso solo escribe las filas de NotificacionIngreso en la misma transacción
+que el RegistroIngreso; el envío (correo y WhatsApp) lo hace el comando
+procesar_notificaciones_ingreso:
+
+- Reclama por lote las notificaciones vencidas con SELECT ... FOR UPDATE SKIP LOCKED
+  y las aparta por PLAZO_RECLAMO, así varios workers no envían la misma fila y una
+  caída del worker solo retrasa el envío.
+- Envía todos los correos del lote por una sola conexión SMTP.
+- Reintenta con espera exponencial hasta MAX_INTENTOS y respeta un máximo de envíos
+  por minuto por institución.
+"""
+import bisect
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import Institucion
+from matricula.models import EncargadoEstudiante, EstudianteInstitucion
+
+from .models import NotificacionIngreso, RegistroIngreso
+from .utils import WhatsAppConfig, send_whatsapp_message
+
+MAX_INTENTOS = 5
+# Espera antes del reintento n: ESPERA_BASE * 2**(n-1), hasta ESPERA_MAXIMA.
+ESPERA_BASE = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=1)
+# Una fila reclamada que no se resolvió en este plazo vuelve a estar disponible.
+PLAZO_RECLAMO = timedelta(minutes=10)
+LOTE_NOTIFICACIONES = 500
+ENVIOS_POR_MINUTO_DEFECTO = 120
+ASUNTO_INGRESO = "Aviso de ingreso/salida"
+
+MAX_EVENTOS_LOTE = 1000
+TOLERANCIA_RELOJ_DISPOSITIVO = timedelta(minutes=5)
+ANTIGUEDAD_MAXIMA_EVENTO = timedelta(days=7)
+ESTUDIANTES_CACHE_TIMEOUT = 60 * 60 * 6
+_KEY_VERSION_ESTUDIANTES = "ingreso:estudiantes:version"
+
+
+def envios_por_minuto():
+    """Envíos por minuto por institución: settings.INGRESO_NOTIFICACIONES_POR_MINUTO o 120."""
+    return getattr(settings, "INGRESO_NOTIFICACIONES_POR_MINUTO", None) or ENVIOS_POR_MINUTO_DEFECTO
+
+
+def mensaje_ingreso(nombre, registro):
+    accion = "ingresó a la institución" if registro.es_entrada else "salió de la institución"
+    fecha_hora = timezone.localtime(registro.fecha_hora)
+    return f"El estudiante {nombre} {accion} a las {fecha_hora:%H:%M} del {fecha_hora:%d/%m/%Y}."
+
+
+def _whatsapp_config(institucion):
+    return WhatsAppConfig(
+        phone_from=getattr(institucion, "whatsapp_phone", None),
+        token=getattr(institucion, "whatsapp_token", None),
+        from_id=getattr(institucion, "whatsapp_from_id", None),
+    )
+
+
+def _notificaciones_ingreso(registro, institucion, nombre, persona_contacto):
+    """Avisos (sin guardar) del registro para el encargado: correo y/o WhatsApp."""
+    if persona_contacto is None:
+        return []
+    mensaje = mensaje_ingreso(nombre, registro)
+    notificaciones = []
+    if persona_contacto.correo:
+        notificaciones.append(NotificacionIngreso(
+            registro=registro,
+            institucion=institucion,
+            canal=NotificacionIngreso.EMAIL,
+            destino=persona_contacto.correo,
+            asunto=ASUNTO_INGRESO,
+            mensaje=mensaje,
+        ))
+    cfg = _whatsapp_config(institucion)
+    tel_destino = getattr(persona_contacto, "celular_avisos", "")
+    if tel_destino and cfg.token and (cfg.from_id or cfg.phone_from):
+        # Se asume el celular ya con prefijo de país (E.164).
+        notificaciones.append(NotificacionIngreso(
+            registro=registro,
+            institucion=institucion,
+            canal=NotificacionIngreso.WHATSAPP,
+            destino=tel_destino,
+            mensaje=mensaje,
+        ))
+    return notificaciones
+
+
+def encolar_notificaciones_ingreso(registro, estudiante, persona_contacto):
+    """
+    Agrega a la bandeja los avisos del registro para el encargado: correo si tiene, y
+    WhatsApp si tiene celular y la institución lo tiene configurado. Debe llamarse en
+    la transacción que crea el registro. Retorna las notificaciones creadas.
+    """
+    nombre = f"{estudiante.primer_apellido} {estudiante.nombres}"
+    return NotificacionIngreso.objects.bulk_create(
+        _notificaciones_ingreso(registro, registro.institucion, nombre, persona_contacto)
+    )
+
+
+def espera_reintento(intentos):
+    return min(ESPERA_BASE * 2 ** max(intentos - 1, 0), ESPERA_MAXIMA)
+
+
+def cupos_por_institucion(ahora=None):
+    """institucion_id -> envíos disponibles en el último minuto (solo las que tienen pendientes)."""
+    ahora = ahora or timezone.now()
+    limite = envios_por_minuto()
+    pendientes = (
+        NotificacionIngreso.objects.filter(estado=NotificacionIngreso.PENDIENTE, proximo_intento__lte=ahora)
+        .values_list("institucion_id", flat=True)
+        .distinct()
+    )
+    cupos = {inst_id: limite for inst_id in pendientes}
+    for inst_id, enviadas in (
+        NotificacionIngreso.objects.filter(
+            institucion_id__in=list(cupos),
+            estado=NotificacionIngreso.ENVIADA,
+            enviada__gt=ahora - timedelta(minutes=1),
+        )
+        .values("institucion_id")
+        .annotate(n=Count("id"))
+        .values_list("institucion_id", "n")
+        .order_by()
+    ):
+        cupos[inst_id] = max(limite - enviadas, 0)
+    return cupos
+
+
+def reclamar_notificaciones(limite=LOTE_NOTIFICACIONES, ahora=None):
+    """
+    Aparta hasta `limite` notificaciones vencidas, repartidas por institución según su
+    cupo por minuto. Las filas bloqueadas por otro worker se saltan.
+    """
+    ahora = ahora or timezone.now()
+    reclamadas = []
+    for inst_id, cupo in sorted(cupos_por_institucion(ahora).items()):
+        cantidad = min(cupo, limite - len(reclamadas))
+        if cantidad <= 0:
+            continue
+        with transaction.atomic():
+            lote = list(
+                NotificacionIngreso.objects.select_for_update(skip_locked=True)
+                .filter(
+                    institucion_id=inst_id,
+                    estado=NotificacionIngreso.PENDIENTE,
+                    proximo_intento__lte=ahora,
+                )
+                .select_related("institucion")
+                .order_by("proximo_intento", "id")[:cantidad]
+            )
+            NotificacionIngreso.objects.filter(id__in=[n.id for n in lote]).update(
+                proximo_intento=ahora + PLAZO_RECLAMO
+            )
+        reclamadas.extend(lote)
+    return reclamadas
+
+
+def _enviar_whatsapp(notificacion, enviar_whatsapp):
+    if not enviar_whatsapp(_whatsapp_config(notificacion.institucion), notificacion.destino, notificacion.mensaje):
+        raise RuntimeError("WhatsApp no configurado o envío rechazado.")
+
+
+def procesar_notificaciones(limite=LOTE_NOTIFICACIONES, enviar_whatsapp=send_whatsapp_message, ahora=None):
+    """
+    Envía un lote de la bandeja. Retorna un dict con enviadas, reintentos y fallidas.
+    `enviar_whatsapp` recibe (WhatsAppConfig, teléfono, texto) y retorna bool.
+    """
+    ahora = ahora or timezone.now()
+    notificaciones = reclamar_notificaciones(limite, ahora)
+    stats = {"reclamadas": len(notificaciones), "enviadas": 0, "reintentos": 0, "fallidas": 0}
+    if not notificaciones:
+        return stats
+
+    def _resolver(notificacion, error=None):
+        notificacion.intentos += 1
+        if error is None:
+            notificacion.estado = NotificacionIngreso.ENVIADA
+            notificacion.enviada = timezone.now()
+            notificacion.ultimo_error = ""
+            stats["enviadas"] += 1
+        elif notificacion.intentos >= MAX_INTENTOS:
+            notificacion.estado = NotificacionIngreso.FALLIDA
+            notificacion.ultimo_error = error
+            stats["fallidas"] += 1
+        else:
+            notificacion.proximo_intento = timezone.now() + espera_reintento(notificacion.intentos)
+            notificacion.ultimo_error = error
+            stats["reintentos"] += 1
+
+    correos = [n for n in notificaciones if n.canal == NotificacionIngreso.EMAIL]
+    if correos:
+        try:
+            conexion = get_connection()
+            conexion.open()
+        except Exception as exc:
+            for n in correos:
+                _resolver(n, f"Conexión de correo: {exc}")
+        else:
+            try:
+                for n in correos:
+                    mensaje = EmailMessage(n.asunto, n.mensaje, None, [n.destino], connection=conexion)
+                    try:
+                        mensaje.send()
+                    except Exception as exc:
+                        _resolver(n, str(exc) or exc.__class__.__name__)
+                    else:
+                        _resolver(n)
+            finally:
+                conexion.close()
+
+    for n in notificaciones:
+        if n.canal == NotificacionIngreso.WHATSAPP:
+            try:
+                _enviar_whatsapp(n, enviar_whatsapp)
+            except Exception as exc:
+                _resolver(n, str(exc) or exc.__class__.__name__)
+            else:
+                _resolver(n)
+
+    NotificacionIngreso.objects.bulk_update(
+        notificaciones, ["estado", "intentos", "proximo_intento", "ultimo_error", "enviada"], batch_size=500
+    )
+    return stats
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  EVENTOS DEL TORNIQUETE
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def invalidar_mapa_estudiantes():
+    """Descarta el mapa identificación → (estudiante, institución) de todas las claves."""
+    try:
+        cache.incr(_KEY_VERSION_ESTUDIANTES)
+    except ValueError:
+        cache.set(_KEY_VERSION_ESTUDIANTES, 1, None)
+
+
+def resolver_estudiantes(identificaciones):
+    """
+    identificación -> (estudiante_id, institucion_id, nombre) para las que tienen
+    institución activa. Lee la caché y consulta solo las que faltan.
+    """
+    identificaciones = set(identificaciones)
+    version = cache.get(_KEY_VERSION_ESTUDIANTES, 0)
+    claves = {f"ingreso:estudiante:v{version}:{ident}": ident for ident in identificaciones}
+    mapa = {claves[k]: v for k, v in cache.get_many(list(claves)).items()}
+    faltantes = identificaciones - mapa.keys()
+    if faltantes:
+        # Las desconocidas también se guardan (vacías): una tarjeta inválida que se
+        # sigue pasando no consulta la base en cada lote.
+        nuevos = dict.fromkeys(faltantes, ())
+        for est_id, inst_id, ident, primer, nombres in (
+            EstudianteInstitucion.objects.filter(
+                estado=EstudianteInstitucion.ACTIVO, estudiante__identificacion__in=faltantes
+            )
+            .order_by("id")
+            .values_list(
+                "estudiante_id",
+                "institucion_id",
+                "estudiante__identificacion",
+                "estudiante__primer_apellido",
+                "estudiante__nombres",
+            )
+        ):
+            if not nuevos[ident]:
+                nuevos[ident] = (est_id, inst_id, f"{primer} {nombres}")
+        cache.set_many(
+            {f"ingreso:estudiante:v{version}:{ident}": v for ident, v in nuevos.items()},
+            ESTUDIANTES_CACHE_TIMEOUT,
+        )
+        mapa.update(nuevos)
+    return {ident: valor for ident, valor in mapa.items() if valor}
+
+
+def _parse_fecha_hora_evento(valor):
+    """ISO 8601 (naive = hora local) o milisegundos epoch; None/"" = ahora."""
+    if valor in (None, ""):
+        return timezone.now()
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            return datetime.fromtimestamp(valor / 1000, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(valor, str):
+        return None
+    try:
+        fecha_hora = parse_datetime(valor.strip())
+    except ValueError:
+        return None
+    if fecha_hora is not None and timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+def _historial_ingresos(claves, desde):
+    """
+    Tabla en memoria (institucion_id, identificacion) -> [[fecha_hora, es_entrada, id]]
+    ordenada: el último registro anterior a `desde` y todos los posteriores, que son los
+    que un evento reenviado puede desplazar.
+    """
+    historial = defaultdict(list)
+    if not claves:
+        return historial
+    inst_ids = {inst_id for inst_id, _ in claves}
+    idents = {ident for _, ident in claves}
+    base = RegistroIngreso.objects.filter(institucion_id__in=inst_ids, identificacion__in=idents)
+    campos = ("institucion_id", "identificacion", "fecha_hora", "es_entrada", "id")
+    previos = (
+        base.filter(fecha_hora__lt=desde)
+        .order_by("institucion_id", "identificacion", "-fecha_hora")
+        .distinct("institucion_id", "identificacion")
+        .values_list(*campos)
+    )
+    posteriores = base.filter(fecha_hora__gte=desde).order_by("fecha_hora").values_list(*campos)
+    for inst_id, ident, fecha_hora, es_entrada, reg_id in [*previos, *posteriores]:
+        if (inst_id, ident) in claves:
+            historial[(inst_id, ident)].append([fecha_hora, es_entrada, reg_id])
+    return historial
+
+
+def registrar_eventos_ingreso(eventos, avisar=True, dispositivo=None):
+    """
+    Registra eventos del torniquete [{"identificacion", "fecha_hora", "dispositivo"}].
+    Cada evento es entrada o salida según el registro anterior del estudiante a esa
+    hora; un evento con la misma hora que uno ya registrado (reenvío) es duplicado, y
+    los registros posteriores a un evento intercalado invierten su sentido con
+    bulk_update. Con `dispositivo` (DispositivoIngreso autenticado) solo se aceptan
+    estudiantes de su institución y cada registro lleva su nombre. Con `avisar`, los nuevos del día encolan el aviso al encargado en la misma
+    transacción. Retorna un resultado por evento, en el mismo orden.
+    """
+    ahora = timezone.now()
+    resultados = [None] * len(eventos)
+    validos = []
+    for pos, evento in enumerate(eventos):
+        if not isinstance(evento, dict):
+            resultados[pos] = {"ok": False, "status": "invalido", "error": "Evento inválido"}
+            continue
+        identificacion = str(evento.get("identificacion") or "").strip().upper()
+        fecha_hora = _parse_fecha_hora_evento(evento.get("fecha_hora"))
+        if not identificacion:
+            resultados[pos] = {"ok": False, "status": "invalido", "error": "Identificación requerida"}
+        elif fecha_hora is None or not (
+            ahora - ANTIGUEDAD_MAXIMA_EVENTO <= fecha_hora <= ahora + TOLERANCIA_RELOJ_DISPOSITIVO
+        ):
+            resultados[pos] = {
+                "ok": False, "status": "invalido", "identificacion": identificacion, "error": "Fecha y hora inválidas"
+            }
+        else:
+            origen = dispositivo.nombre if dispositivo else str(evento.get("dispositivo") or "")[:50]
+            validos.append((pos, identificacion, fecha_hora, origen))
+
+    estudiantes = resolver_estudiantes(ident for _, ident, _, _ in validos)
+    por_estudiante = defaultdict(list)
+    for pos, ident, fecha_hora, origen in validos:
+        if ident not in estudiantes or (dispositivo and estudiantes[ident][1] != dispositivo.institucion_id):
+            resultados[pos] = {
+                "ok": False, "status": "no_encontrado", "identificacion": ident, "error": "Estudiante no encontrado"
+            }
+            continue
+        por_estudiante[(estudiantes[ident][1], ident)].append((fecha_hora, pos, origen))
+    if not por_estudiante:
+        return resultados
+
+    desde = min(fecha_hora for lista in por_estudiante.values() for fecha_hora, _, _ in lista)
+    historial = _historial_ingresos(set(por_estudiante), desde)
+
+    nuevos = []
+    corregidos = []
+    for (inst_id, ident), lista in por_estudiante.items():
+        linea = historial[(inst_id, ident)]
+        horas = [fila[0] for fila in linea]
+        duplicados = []
+        for fecha_hora, pos, origen in sorted(lista, key=lambda e: (e[0], e[1])):
+            i = bisect.bisect_left(horas, fecha_hora)
+            if i < len(horas) and horas[i] == fecha_hora:
+                duplicados.append((pos, linea[i]))
+                continue
+            registro = RegistroIngreso(
+                institucion_id=inst_id, identificacion=ident, fecha_hora=fecha_hora, dispositivo=origen
+            )
+            horas.insert(i, fecha_hora)
+            linea.insert(i, [fecha_hora, None, registro])
+            nuevos.append(registro)
+            resultados[pos] = registro
+
+        # Un evento reenviado que cae antes de registros existentes corre la alternancia
+        # entrada/salida de todos los posteriores: se vuelve a derivar desde el último
+        # registro anterior al lote (o desde una entrada si el estudiante no tiene).
+        anterior = None
+        for fila in linea:
+            if anterior is None and fila[0] < desde:
+                es_entrada = fila[1]
+            else:
+                es_entrada = True if anterior is None else not anterior
+            anterior = es_entrada
+            if isinstance(fila[2], RegistroIngreso):
+                fila[1] = fila[2].es_entrada = es_entrada
+            elif fila[1] != es_entrada:
+                fila[1] = es_entrada
+                corregidos.append(RegistroIngreso(id=fila[2], es_entrada=es_entrada))
+        for pos, fila in duplicados:
+            resultados[pos] = {
+                "ok": True, "status": "duplicado", "identificacion": ident, "entrada": fila[1], "fecha_hora": fila[0]
+            }
+
+    for pos, registro in enumerate(resultados):
+        if isinstance(registro, RegistroIngreso):
+            resultados[pos] = {
+                "ok": True,
+                "status": "ok",
+                "identificacion": registro.identificacion,
+                "entrada": registro.es_entrada,
+                "fecha_hora": registro.fecha_hora,
+            }
+
+    if nuevos:
+        with transaction.atomic():
+            # ignore_conflicts: otro dispositivo reenvió el mismo evento a la vez.
+            RegistroIngreso.objects.bulk_create(nuevos, ignore_conflicts=True)
+            if corregidos:
+                RegistroIngreso.objects.bulk_update(corregidos, ["es_entrada"])
+            if avisar:
+                _encolar_avisos_lote(nuevos, estudiantes, ahora)
+    return resultados
+
+
+def _encolar_avisos_lote(registros, estudiantes, ahora):
+    """Avisos de los registros nuevos del día, con tres consultas para todo el lote."""
+    hoy = timezone.localdate(ahora)
+    registros = [r for r in registros if timezone.localdate(r.fecha_hora) == hoy]
+    if not registros:
+        return
+    ids_registro = dict(
+        ((inst_id, ident, fecha_hora), reg_id)
+        for reg_id, inst_id, ident, fecha_hora in RegistroIngreso.objects.filter(
+            institucion_id__in={r.institucion_id for r in registros},
+            identificacion__in={r.identificacion for r in registros},
+            fecha_hora__range=(min(r.fecha_hora for r in registros), max(r.fecha_hora for r in registros)),
+        ).values_list("id", "institucion_id", "identificacion", "fecha_hora")
+    )
+    instituciones = Institucion.objects.in_bulk({r.institucion_id for r in registros})
+    contactos = {}
+    for enc in EncargadoEstudiante.objects.filter(
+        estudiante_id__in={estudiantes[r.identificacion][0] for r in registros}, principal=True
+    ).select_related("persona_contacto").order_by("id"):
+        contactos.setdefault(enc.estudiante_id, enc.persona_contacto)
+    notificaciones = []
+    for registro in registros:
+        registro.id = ids_registro.get((registro.institucion_id, registro.identificacion, registro.fecha_hora))
+        if registro.id is None:
+            continue
+        est_id, _, nombre = estudiantes[registro.identificacion]
+        notificaciones += _notificaciones_ingreso(
+            registro, instituciones[registro.institucion_id], nombre, contactos.get(est_id)
+        )
+    NotificacionIngreso.objects.bulk_create(notificaciones)
@@ -0,0 +1,29 @@
+"""
+Signals de ingreso a clases.
+Mantienen coherente el mapa identificación → (estudiante, institución) en caché
+(ingreso_clases.services) con estudiantes y su institución activa.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from matricula.models import Estudiante, EstudianteInstitucion
+
+from .services import invalidar_mapa_estudiantes
+
+_CAMPOS_MAPA_ESTUDIANTE = {"identificacion", "primer_apellido", "nombres"}
+
+
+@receiver(post_save, sender=EstudianteInstitucion)
+@receiver(post_delete, sender=EstudianteInstitucion)
+def invalidar_mapa_por_institucion(sender, instance, **kwargs):
+    invalidar_mapa_estudiantes()
+
+
+@receiver(post_save, sender=Estudiante)
+def invalidar_mapa_por_estudiante(sender, instance, created=False, update_fields=None, **kwargs):
+    # Un estudiante nuevo aún no tiene institución activa.
+    if created:
+        return
+    if update_fields is not None and not _CAMPOS_MAPA_ESTUDIANTE.intersection(update_fields):
+        return
+    invalidar_mapa_estudiantes()
@@ -0,0 +1,253 @@
+"""
+Tests de ingreso a clases.
+Bandeja de salida de avisos al encargado: marcar_ingreso no envía, el worker sí.
+"""
+import datetime
+from io import StringIO
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import DispositivoIngreso, NotificacionIngreso, RegistroIngreso
+from .services import encolar_notificaciones_ingreso, procesar_notificaciones, registrar_eventos_ingreso
+
+CACHE_LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class ContadorConexionesBackend(EmailBackend):
+    """Backend locmem que cuenta las conexiones abiertas."""
+
+    aperturas = 0
+
+    def open(self):
+        ContadorConexionesBackend.aperturas += 1
+        return super().open()
+
+
+class WhatsAppStub:
+    """Sustituto de send_whatsapp_message: falla las primeras `fallos` llamadas."""
+
+    def __init__(self, fallos=0):
+        self.fallos = fallos
+        self.enviados = []
+
+    def __call__(self, cfg, telefono, texto):
+        if self.fallos:
+            self.fallos -= 1
+            return False
+        self.enviados.append((telefono, texto))
+        return True
+
+
+def _crear_estudiante_con_encargado(test):
+    from catalogos.models import Nacionalidad, Parentesco, Sexo, TipoIdentificacion
+    from core.models import Institucion
+    from matricula.models import EncargadoEstudiante, Estudiante, EstudianteInstitucion, PersonaContacto
+
+    hoy = datetime.date.today()
+    test.institucion = Institucion.objects.create(
+        nombre="INST INGRESO",
+        correo="inst_ingreso@test.com",
+        tipo="A",
+        fecha_inicio=hoy - datetime.timedelta(days=30),
+        fecha_fin=hoy + datetime.timedelta(days=365),
+        whatsapp_token="token",
+        whatsapp_from_id="123",
+    )
+    tipo_id, _ = TipoIdentificacion.objects.get_or_create(nombre="OTRO")
+    test.estudiante = Estudiante.objects.create(
+        tipo_identificacion=tipo_id,
+        identificacion="ING0001",
+        primer_apellido="MORA",
+        nombres="LUIS",
+        fecha_nacimiento=datetime.date(hoy.year - 13, 1, 1),
+        sexo=Sexo.objects.get_or_create(codigo="M", defaults={"nombre": "Masculino"})[0],
+        nacionalidad=Nacionalidad.objects.get_or_create(nombre="COSTARRICENSE")[0],
+    )
+    test.relacion = EstudianteInstitucion.objects.create(
+        estudiante=test.estudiante, institucion=test.institucion, estado="activo"
+    )
+    test.contacto = PersonaContacto.objects.create(
+        institucion=test.institucion,
+        tipo_identificacion=tipo_id,
+        identificacion="INGC0001",
+        primer_apellido="MORA",
+        nombres="ANA",
+        celular_avisos="+50688887777",
+        correo="ana@test.com",
+    )
+    EncargadoEstudiante.objects.create(
+        estudiante=test.estudiante,
+        persona_contacto=test.contacto,
+        parentesco=Parentesco.objects.get_or_create(descripcion="MADRE")[0],
+        convivencia=True,
+        principal=True,
+    )
+
+
+@override_settings(EMAIL_BACKEND="ingreso_clases.tests.ContadorConexionesBackend")
+class NotificacionIngresoTests(TestCase):
+    def setUp(self):
+        _crear_estudiante_con_encargado(self)
+        ContadorConexionesBackend.aperturas = 0
+
+    def _encolar(self, n):
+        inicio = timezone.now() - datetime.timedelta(hours=1)
+        for i in range(n):
+            registro = RegistroIngreso.objects.create(
+                institucion=self.institucion, identificacion="ING0001", es_entrada=bool(i % 2)
+            )
+            RegistroIngreso.objects.filter(pk=registro.pk).update(fecha_hora=inicio + datetime.timedelta(minutes=i))
+            encolar_notificaciones_ingreso(registro, self.estudiante, self.contacto)
+
+    def test_marcar_ingreso_solo_encola(self):
+        resp = self.client.post(reverse("marcar_ingreso"), {"identificacion": "ING0001"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()["entrada"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(NotificacionIngreso.objects.values_list("canal", "destino")),
+            [("EMAIL", "ana@test.com"), ("WHATSAPP", "+50688887777")],
+        )
+        resp = self.client.post(reverse("marcar_ingreso"), {"identificacion": "ING0001"})
+        self.assertFalse(resp.json()["entrada"])
+
+    def test_worker_una_conexion_y_reintentos(self):
+        self._encolar(4)
+        whatsapp = WhatsAppStub(fallos=1)
+        stats = procesar_notificaciones(enviar_whatsapp=whatsapp)
+        self.assertEqual((stats["enviadas"], stats["reintentos"]), (7, 1))
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertIn("MORA LUIS", mail.outbox[0].body)
+        self.assertEqual(ContadorConexionesBackend.aperturas, 1)
+
+        pendiente = NotificacionIngreso.objects.get(estado=NotificacionIngreso.PENDIENTE)
+        self.assertEqual(pendiente.intentos, 1)
+        self.assertGreater(pendiente.proximo_intento, timezone.now())
+        # Antes de la espera no se reintenta; después sí.
+        self.assertEqual(procesar_notificaciones(enviar_whatsapp=whatsapp)["reclamadas"], 0)
+        stats = procesar_notificaciones(
+            enviar_whatsapp=whatsapp, ahora=timezone.now() + datetime.timedelta(minutes=1)
+        )
+        self.assertEqual(stats["enviadas"], 1)
+        self.assertEqual(len(whatsapp.enviados), 4)
+
+    def test_fallida_tras_max_intentos(self):
+        from .services import MAX_INTENTOS
+
+        self._encolar(1)
+        NotificacionIngreso.objects.filter(canal=NotificacionIngreso.EMAIL).delete()
+        ahora = timezone.now()
+        for i in range(MAX_INTENTOS):
+            procesar_notificaciones(enviar_whatsapp=WhatsAppStub(fallos=1), ahora=ahora + datetime.timedelta(hours=i))
+        notificacion = NotificacionIngreso.objects.get()
+        self.assertEqual(notificacion.estado, NotificacionIngreso.FALLIDA)
+        self.assertIn("WhatsApp", notificacion.ultimo_error)
+
+    @override_settings(INGRESO_NOTIFICACIONES_POR_MINUTO=3)
+    def test_limite_por_institucion(self):
+        self._encolar(3)
+        self.assertEqual(procesar_notificaciones(enviar_whatsapp=WhatsAppStub())["enviadas"], 3)
+        self.assertEqual(procesar_notificaciones(enviar_whatsapp=WhatsAppStub())["reclamadas"], 0)
+        self.assertEqual(NotificacionIngreso.objects.filter(estado=NotificacionIngreso.PENDIENTE).count(), 3)
+
+    def test_comando_dry_run_y_apply(self):
+        self._encolar(2)
+        out = StringIO()
+        call_command("procesar_notificaciones_ingreso", stdout=out)
+        self.assertIn("- Pendientes: 4", out.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+
+        out = StringIO()
+        call_command("procesar_notificaciones_ingreso", "--apply", stdout=out)
+        self.assertIn("- Enviadas: 4", out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+@override_settings(CACHES=CACHE_LOCMEM)
+class IngresoLoteTests(TestCase):
+    """Eventos del torniquete por lote: mapa en caché, estado en memoria y reenvíos."""
+
+    def setUp(self):
+        cache.clear()
+        _crear_estudiante_con_encargado(self)
+        self.base = timezone.now() - datetime.timedelta(minutes=30)
+
+    def _hora(self, minutos):
+        return (self.base + datetime.timedelta(minutes=minutos)).isoformat()
+
+    def test_reenvio_intercala_y_descarta_repetidos(self):
+        registrar_eventos_ingreso([{"identificacion": "ING0001", "fecha_hora": self._hora(0)}])
+        registrar_eventos_ingreso([{"identificacion": "ING0001", "fecha_hora": self._hora(20)}])
+
+        # Torniquete que vuelve de una caída: eventos viejos, uno repetido y uno inválido.
+        # Consultas fijas por lote: identificación desconocida, tabla de estado (2),
+        # inserción (savepoint + INSERT + corrección de los posteriores) y avisos
+        # (ids, institución, encargados, INSERT).
+        with self.assertNumQueries(11):
+            resultados = registrar_eventos_ingreso([
+                {"identificacion": "ing0001", "fecha_hora": self._hora(25), "dispositivo": "T1"},
+                {"identificacion": "ING0001", "fecha_hora": self._hora(10), "dispositivo": "T1"},
+                {"identificacion": "ING0001", "fecha_hora": self._hora(20), "dispositivo": "T1"},
+                {"identificacion": "NOEXISTE", "fecha_hora": self._hora(5)},
+                {"identificacion": "ING0001", "fecha_hora": "ayer"},
+            ])
+        self.assertEqual(
+            [(r["status"], r.get("entrada")) for r in resultados],
+            [("ok", False), ("ok", False), ("duplicado", True), ("no_encontrado", None), ("invalido", None)],
+        )
+        self.assertEqual(
+            list(RegistroIngreso.objects.order_by("fecha_hora").values_list("es_entrada", "dispositivo")),
+            [(True, ""), (False, "T1"), (True, ""), (False, "T1")],
+        )
+        self.assertEqual(NotificacionIngreso.objects.filter(canal=NotificacionIngreso.EMAIL).count(), 4)
+
+    def test_endpoint_y_mapa_invalidado(self):
+        url = reverse("marcar_ingresos_lote")
+        dispositivo = DispositivoIngreso.objects.create(institucion=self.institucion, nombre="T2")
+        cabecera = {"HTTP_X_DISPOSITIVO_TOKEN": dispositivo.token}
+        resp = self.client.post(
+            url,
+            data={"eventos": [{"identificacion": "ING0001", "fecha_hora": self._hora(0), "dispositivo": "OTRO"}]},
+            content_type="application/json",
+            **cabecera,
+        )
+        self.assertEqual(resp.json()["registrados"], 1)
+        self.assertEqual(RegistroIngreso.objects.get().dispositivo, "T2")
+        self.assertEqual(self.client.post(url, data="{", content_type="application/json", **cabecera).status_code, 400)
+
+        self.relacion.estado = "retirado"
+        self.relacion.save()
+        resp = self.client.post(
+            url, data={"eventos": [{"identificacion": "ING0001"}]}, content_type="application/json", **cabecera
+        )
+        self.assertEqual(resp.json()["resultados"][0]["status"], "no_encontrado")
+
+    def test_endpoint_requiere_dispositivo_de_la_institucion(self):
+        from core.models import Institucion
+
+        url = reverse("marcar_ingresos_lote")
+        datos = {"eventos": [{"identificacion": "ING0001", "fecha_hora": self._hora(0)}]}
+        self.assertEqual(self.client.post(url, data=datos, content_type="application/json").status_code, 401)
+        inactivo = DispositivoIngreso.objects.create(institucion=self.institucion, nombre="T3", activo=False)
+        resp = self.client.post(
+            url, data=datos, content_type="application/json", HTTP_X_DISPOSITIVO_TOKEN=inactivo.token
+        )
+        self.assertEqual(resp.status_code, 401)
+
+        otra = Institucion.objects.create(
+            nombre="OTRA INGRESO",
+            correo="otra_ingreso@test.com",
+            tipo="A",
+            fecha_inicio=self.institucion.fecha_inicio,
+            fecha_fin=self.institucion.fecha_fin,
+        )
+        ajeno = DispositivoIngreso.objects.create(institucion=otra, nombre="T1")
+        resp = self.client.post(url, data=datos, content_type="application/json", HTTP_X_DISPOSITIVO_TOKEN=ajeno.token)
+        self.assertEqual(resp.json()["resultados"][0]["status"], "no_encontrado")
+        self.assertFalse(RegistroIngreso.objects.exists())
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import marcar_ingreso
+from .views import marcar_ingreso, marcar_ingresos_lote
 
 
 urlpatterns = [
     path("marcar/", marcar_ingreso, name="marcar_ingreso"),
+    path("marcar/lote/", marcar_ingresos_lote, name="marcar_ingresos_lote"),
 ]
 
 
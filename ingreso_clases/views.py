@@ -1,21 +1,10 @@
+import json
+
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
-from django.core.mail import send_mail
-from core.models import Institucion
-from ingreso_clases.utils import WhatsAppConfig, send_whatsapp_message
-
-from matricula.models import Estudiante, EncargadoEstudiante
-from .models import RegistroIngreso
 
-
-def _obtener_encargado_principal(estudiante):
-    return (
-        EncargadoEstudiante.objects
-        .filter(estudiante=estudiante, principal=True)
-        .select_related("persona_contacto")
-        .first()
-    )
+from .models import DispositivoIngreso
+from .services import MAX_EVENTOS_LOTE, registrar_eventos_ingreso
 
 
 @csrf_exempt
@@ -27,58 +16,46 @@ def marcar_ingreso(request):
     if not identificacion:
         return JsonResponse({"ok": False, "error": "Identificación requerida"}, status=400)
 
-    try:
-        estudiante = Estudiante.objects.get(identificacion=identificacion)
-    except Estudiante.DoesNotExist:
+    # Entrada o salida según el último registro; el aviso al encargado principal
+    # (correo y/o WhatsApp) queda en la bandeja de salida en la misma transacción.
+    resultado = registrar_eventos_ingreso([{"identificacion": identificacion}])[0]
+    if resultado["status"] == "no_encontrado":
         return JsonResponse({"ok": False, "error": "Estudiante no encontrado"}, status=404)
+    if not resultado["ok"]:
+        return JsonResponse({"ok": False, "error": resultado["error"]}, status=400)
+    return JsonResponse({"ok": True, "entrada": resultado["entrada"], "fecha_hora": resultado["fecha_hora"]})
 
-    # Determinar si el último registro fue entrada o salida
-    ultimo = RegistroIngreso.objects.filter(
-        institucion=estudiante.institucion,
-        identificacion=identificacion
-    ).order_by("-fecha_hora").first()
-    es_entrada = True if not ultimo else not ultimo.es_entrada
 
-    registro = RegistroIngreso.objects.create(
-        institucion=estudiante.institucion,
-        identificacion=identificacion,
-        fecha_hora=timezone.now(),
-        es_entrada=es_entrada,
+@csrf_exempt
+def marcar_ingresos_lote(request):
+    """
+    Ingesta por lote para torniquetes (incluye el reenvío de eventos guardados durante
+    una caída). Recibe JSON {"eventos": [{"identificacion", "fecha_hora"}]} y responde un
+    resultado por evento en el mismo orden. El dispositivo se autentica con su token en
+    la cabecera X-Dispositivo-Token y solo registra estudiantes de su institución.
+    """
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "error": "Método no permitido"}, status=405)
+    token = request.headers.get("X-Dispositivo-Token", "").strip()
+    dispositivo = (
+        DispositivoIngreso.objects.filter(token=token, activo=True).only("id", "institucion_id", "nombre").first()
+        if token else None
     )
-
-    # Notificar al encargado principal (correo y/o WhatsApp)
-    encargado_p = _obtener_encargado_principal(estudiante)
-    if encargado_p and encargado_p.persona_contacto.correo:
-        accion = "ingresó a la institución" if es_entrada else "salió de la institución"
-        mensaje = (
-            f"El estudiante {estudiante.primer_apellido} {estudiante.nombres} {accion} "
-            f"a las {registro.fecha_hora:%H:%M} del {registro.fecha_hora:%d/%m/%Y}."
-        )
-        try:
-            send_mail(
-                subject="Aviso de ingreso/salida",
-                message=mensaje,
-                from_email=None,
-                recipient_list=[encargado_p.persona_contacto.correo],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-
-        # WhatsApp si está configurado en la institución
-        institucion = estudiante.institucion
-        cfg = WhatsAppConfig(
-            phone_from=getattr(institucion, 'whatsapp_phone', None),
-            token=getattr(institucion, 'whatsapp_token', None),
-            from_id=getattr(institucion, 'whatsapp_from_id', None),
-        )
-        tel_destino = getattr(encargado_p.persona_contacto, 'celular_avisos', '')
-        if tel_destino:
-            # Normalizar a E.164 si fuera necesario (se asume ya con prefijo país)
-            try:
-                send_whatsapp_message(cfg, tel_destino, mensaje)
-            except Exception:
-                pass
-
-    return JsonResponse({"ok": True, "entrada": es_entrada, "fecha_hora": registro.fecha_hora})
-
+    if dispositivo is None:
+        return JsonResponse({"ok": False, "error": "Dispositivo no autorizado"}, status=401)
+    try:
+        datos = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"ok": False, "error": "JSON inválido"}, status=400)
+    eventos = datos.get("eventos") if isinstance(datos, dict) else None
+    if not isinstance(eventos, list):
+        return JsonResponse({"ok": False, "error": "Debe enviar la lista de eventos"}, status=400)
+    if len(eventos) > MAX_EVENTOS_LOTE:
+        return JsonResponse({"ok": False, "error": f"Máximo {MAX_EVENTOS_LOTE} eventos por lote"}, status=400)
+
+    resultados = registrar_eventos_ingreso(eventos, dispositivo=dispositivo)
+    return JsonResponse({
+        "ok": True,
+        "registrados": sum(1 for r in resultados if r["status"] == "ok"),
+        "resultados": resultados,
+    })
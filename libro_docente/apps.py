@@ -5,3 +5,6 @@ class LibroDocenteConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "libro_docente"
     verbose_name = "Libro del Docente"
+
+    def ready(self):
+        import libro_docente.signals  # noqa
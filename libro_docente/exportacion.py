@@ -0,0 +1,256 @@
+"""
+Exportación institucional del resumen general por (curso lectivo, período).
+
+El cálculo por asignación (resumen de evaluación + asistencia) se reparte en un
+pool de procesos; el proceso que coordina recibe las filas en orden y las escribe
+por streaming: Excel con openpyxl en modo write_only (una hoja por asignación) o
+un único CSV largo. El avance se guarda en ExportacionInstitucional.procesadas.
+
+La solicitud web solo crea la exportación PENDIENTE: la procesa el comando
+procesar_exportaciones_institucionales --continuo, fuera de los workers web (que no
+deben hacer fork de un pool ni sostener hilos que un reinicio cortaría). En el
+despliegue corre como proceso aparte dentro del servicio web (Procfile/render.yaml),
+porque el archivo se guarda en MEDIA_ROOT y el disco de media solo se monta ahí.
+Una exportación que quedó PROCESANDO sin avance durante PLAZO_RECLAMO (el proceso
+murió) se vuelve a tomar en la siguiente revisión de la cola.
+"""
+import csv
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import repeat
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from evaluaciones.models import DocenteAsignacion
+
+from .models import ExportacionInstitucional
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas asignaciones se persiste el avance (y se renueva el reclamo).
+PASO_PROGRESO = 5
+# Una exportación PROCESANDO sin avance en este plazo se considera abandonada.
+PLAZO_RECLAMO = timedelta(minutes=15)
+
+_ORDEN_ASIGNACIONES = (
+    "subarea_curso__subarea__nombre",
+    "seccion__nivel__numero",
+    "seccion__numero",
+    "subgrupo__seccion__nivel__numero",
+    "subgrupo__seccion__numero",
+    "subgrupo__letra",
+    "id",
+)
+_CARACTERES_INVALIDOS_HOJA = re.compile(r"[\[\]:*?/\\]")
+ENCABEZADOS_CSV = [
+    "asignacion_id", "Materia", "Grupo", "Docente",
+    "id", "Nombre", "Trabajo cotidiano", "Tareas", "Proyecto", "Pruebas", "Asistencia",
+]
+
+
+def procesos_exportacion():
+    """Procesos del pool: settings.LIBRO_DOCENTE_EXPORT_PROCESOS o hasta 4 según CPUs."""
+    return getattr(settings, "LIBRO_DOCENTE_EXPORT_PROCESOS", None) or min(4, os.cpu_count() or 1)
+
+
+def exportaciones_disponibles(ahora=None):
+    """Exportaciones pendientes y las PROCESANDO cuyo reclamo venció."""
+    limite = (ahora or timezone.now()) - PLAZO_RECLAMO
+    return ExportacionInstitucional.objects.filter(
+        Q(estado=ExportacionInstitucional.PENDIENTE)
+        | (
+            Q(estado=ExportacionInstitucional.PROCESANDO)
+            & (Q(reclamado_en__lt=limite) | Q(reclamado_en__isnull=True))
+        )
+    )
+
+
+def asignaciones_a_exportar(exportacion):
+    return list(
+        DocenteAsignacion.objects
+        .filter(
+            activo=True,
+            subarea_curso__institucion_id=exportacion.institucion_id,
+            curso_lectivo_id=exportacion.curso_lectivo_id,
+        )
+        .order_by(*_ORDEN_ASIGNACIONES)
+        .values_list("id", flat=True)
+    )
+
+
+def _inicializar_proceso():
+    # Con "fork" Django ya está configurado; con "spawn" hay que inicializarlo.
+    import django
+
+    django.setup()
+
+
+def calcular_hoja_asignacion(asignacion_id, periodo_id):
+    """
+    Tarea del pool: resumen general de una asignación en valores planos (picklables).
+    Retorna dict con asignacion_id, materia, grupo, docente, has_proyecto y filas.
+    """
+    from .views import _datos_resumen_general_export, _valores_resumen_general
+
+    asignacion = (
+        DocenteAsignacion.objects
+        .select_related(
+            "subarea_curso__subarea", "subarea_curso__institucion", "curso_lectivo",
+            "seccion__nivel", "subgrupo__seccion__nivel", "docente__usuario",
+        )
+        .get(pk=asignacion_id)
+    )
+    has_proyecto, filas_general = _datos_resumen_general_export(asignacion, periodo_id)
+    return {
+        "asignacion_id": asignacion.id,
+        "materia": asignacion.subarea_curso.subarea.nombre,
+        "grupo": str(asignacion.subgrupo or asignacion.seccion or ""),
+        "docente": asignacion.docente.usuario.full_name(),
+        "has_proyecto": has_proyecto,
+        "filas": [_valores_resumen_general(r, has_proyecto) for r in filas_general],
+    }
+
+
+def _hojas(asignacion_ids, periodo_id, procesos):
+    """Resultados de calcular_hoja_asignacion en el orden de asignacion_ids."""
+    if procesos <= 1 or len(asignacion_ids) <= 1:
+        for asignacion_id in asignacion_ids:
+            yield calcular_hoja_asignacion(asignacion_id, periodo_id)
+        return
+    # Los procesos hijos no deben heredar la conexión abierta de este hilo.
+    connections.close_all()
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+    chunksize = max(1, len(asignacion_ids) // (procesos * 4))
+    with ProcessPoolExecutor(
+        max_workers=procesos, mp_context=contexto, initializer=_inicializar_proceso
+    ) as pool:
+        yield from pool.map(
+            calcular_hoja_asignacion, asignacion_ids, repeat(periodo_id), chunksize=chunksize
+        )
+
+
+def _titulo_hoja(hoja, usados):
+    """Título de hoja Excel válido (máx. 31 caracteres, sin []:*?/\\) y único."""
+    base = _CARACTERES_INVALIDOS_HOJA.sub(" ", f"{hoja['grupo']} {hoja['materia']}").strip()
+    base = base[:31] or f"Asignación {hoja['asignacion_id']}"
+    titulo, n = base, 2
+    while titulo.lower() in usados:
+        sufijo = f" ({n})"
+        titulo = base[:31 - len(sufijo)] + sufijo
+        n += 1
+    usados.add(titulo.lower())
+    return titulo
+
+
+class _EscritorXlsx:
+    def __init__(self, ruta):
+        from .views import _encabezados_resumen_general
+
+        self._encabezados = _encabezados_resumen_general
+        self.ruta = ruta
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.titulos = set()
+
+    def agregar(self, hoja):
+        ws = self.wb.create_sheet(title=_titulo_hoja(hoja, self.titulos))
+        ws.append([f"{hoja['materia']} · {hoja['grupo']} · {hoja['docente']}"])
+        ws.append(self._encabezados(hoja["has_proyecto"]))
+        for row in hoja["filas"]:
+            ws.append(row[:2] + [float(v) for v in row[2:]])
+
+    def cerrar(self):
+        if not self.titulos:
+            self.wb.create_sheet(title="Sin asignaciones")
+        self.wb.save(self.ruta)
+
+
+class _EscritorCsv:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.archivo = open(ruta, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.archivo)
+        self.writer.writerow(ENCABEZADOS_CSV)
+
+    def agregar(self, hoja):
+        prefijo = [hoja["asignacion_id"], hoja["materia"], hoja["grupo"], hoja["docente"]]
+        for row in hoja["filas"]:
+            aportes = [f"{v:.2f}" for v in row[2:]]
+            if not hoja["has_proyecto"]:
+                aportes.insert(2, "")
+            self.writer.writerow(prefijo + row[:2] + aportes)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+def ejecutar_exportacion(exportacion_id, procesos=None):
+    """
+    Procesa una exportación PENDIENTE o abandonada (la toma de forma atómica para que
+    dos corridas del comando no la procesen a la vez). Retorna la exportación actualizada.
+    """
+    ahora = timezone.now()
+    tomada = exportaciones_disponibles(ahora).filter(pk=exportacion_id).update(
+        estado=ExportacionInstitucional.PROCESANDO, reclamado_en=ahora
+    )
+    exportacion = ExportacionInstitucional.objects.get(pk=exportacion_id)
+    if not tomada:
+        return exportacion
+    procesos = procesos or procesos_exportacion()
+
+    ruta = None
+    try:
+        if exportacion.formato == ExportacionInstitucional.XLSX and openpyxl is None:
+            raise RuntimeError("openpyxl no está disponible en el servidor.")
+        asignacion_ids = asignaciones_a_exportar(exportacion)
+        exportacion.total = len(asignacion_ids)
+        exportacion.procesadas = 0
+        exportacion.save(update_fields=["total", "procesadas"])
+
+        extension = "xlsx" if exportacion.formato == ExportacionInstitucional.XLSX else "csv"
+        fd, ruta = tempfile.mkstemp(suffix=f".{extension}")
+        os.close(fd)
+        escritor = (_EscritorXlsx if extension == "xlsx" else _EscritorCsv)(ruta)
+        for i, hoja in enumerate(_hojas(asignacion_ids, exportacion.periodo_id, procesos), start=1):
+            escritor.agregar(hoja)
+            if i % PASO_PROGRESO == 0 or i == len(asignacion_ids):
+                ExportacionInstitucional.objects.filter(pk=exportacion.pk).update(
+                    procesadas=i, reclamado_en=timezone.now()
+                )
+        escritor.cerrar()
+
+        nombre = (
+            f"resumen_general_{exportacion.institucion_id}_{exportacion.curso_lectivo_id}_"
+            f"{exportacion.periodo_id}_{exportacion.pk}.{extension}"
+        )
+        with open(ruta, "rb") as f:
+            exportacion.archivo.save(nombre, File(f), save=False)
+        exportacion.procesadas = len(asignacion_ids)
+        exportacion.estado = ExportacionInstitucional.COMPLETADA
+        exportacion.finalizado_en = timezone.now()
+        exportacion.save(update_fields=["archivo", "procesadas", "estado", "finalizado_en"])
+    except Exception as exc:
+        logger.exception("Falló la exportación institucional %s", exportacion_id)
+        exportacion.estado = ExportacionInstitucional.ERROR
+        exportacion.error = str(exc)[:2000]
+        exportacion.finalizado_en = timezone.now()
+        exportacion.save(update_fields=["estado", "error", "finalizado_en"])
+    finally:
+        if ruta and os.path.exists(ruta):
+            os.remove(ruta)
+    return exportacion
+
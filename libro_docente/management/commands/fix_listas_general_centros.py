@@ -5,6 +5,7 @@ from django.db import connection, transaction
 
 from evaluaciones.models import DocenteAsignacion
 from libro_docente.models import ListaEstudiantesDocente, ListaEstudiantesDocenteItem
+from libro_docente.services import invalidar_roster_curso
 
 
 class Command(BaseCommand):
@@ -176,6 +177,7 @@ class Command(BaseCommand):
                         )
                 if nuevos:
                     ListaEstudiantesDocenteItem.objects.bulk_create(nuevos)
+                    invalidar_roster_curso(target.institucion_id, target.curso_lectivo_id)
                     stats["items_movidos"] += len(nuevos)
                 stats["grupos_aplicados"] += 1
 
@@ -0,0 +1,119 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from libro_docente.exportacion import ejecutar_exportacion, exportaciones_disponibles, procesos_exportacion
+from libro_docente.models import ExportacionInstitucional
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa las exportaciones institucionales pendientes (resumen general por "
+        "curso lectivo y período) y retoma las que quedaron en proceso sin avance. "
+        "Con --continuo queda como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Procesa las exportaciones. Sin este flag solo lista las pendientes (dry-run).",
+        )
+        parser.add_argument(
+            "--exportacion-id",
+            type=int,
+            default=None,
+            help="Opcional: limita el proceso a una exportación (ExportacionInstitucional.id).",
+        )
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=None,
+            help="Opcional: procesos del pool de cálculo (por defecto LIBRO_DOCENTE_EXPORT_PROCESOS).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Con --apply: revisa la cola sin detenerse, esperando --intervalo segundos cuando no hay pendientes.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=10,
+            help="Segundos de espera entre revisiones sin pendientes en modo continuo (por defecto 10).",
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get("apply"))
+        exportacion_id = options.get("exportacion_id")
+        procesos = options.get("procesos") or procesos_exportacion()
+
+        if apply_changes:
+            self.stdout.write(self.style.WARNING(f"MODO APPLY: se procesarán las exportaciones ({procesos} procesos)."))
+        else:
+            self.stdout.write(self.style.WARNING("MODO DRY-RUN: solo se listarán las exportaciones pendientes."))
+
+        stats = {"pendientes": 0, "retomadas": 0, "completadas": 0, "errores": 0, "asignaciones": 0}
+        continuo = apply_changes and bool(options.get("continuo"))
+        try:
+            while True:
+                try:
+                    atendidas = self._procesar_cola(stats, exportacion_id, procesos, apply_changes)
+                except Exception:
+                    # En modo continuo un fallo transitorio (p. ej. la conexión a la base)
+                    # no debe detener el worker: se registra y se reintenta en el próximo ciclo.
+                    if not continuo:
+                        raise
+                    logger.exception("Fallo al procesar la cola de exportaciones institucionales")
+                    atendidas = 0
+                if not continuo:
+                    break
+                if not atendidas:
+                    time.sleep(options["intervalo"])
+                    # Descarta la conexión vencida o rota antes de volver a revisar la cola.
+                    close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(f"- Exportaciones pendientes: {stats['pendientes']}")
+        self.stdout.write(f"- Retomadas tras vencer el plazo: {stats['retomadas']}")
+        self.stdout.write(f"- Completadas: {stats['completadas']}")
+        self.stdout.write(f"- Con error: {stats['errores']}")
+        self.stdout.write(f"- Asignaciones exportadas: {stats['asignaciones']}")
+
+        if apply_changes:
+            self.stdout.write(self.style.SUCCESS("Proceso finalizado."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Dry-run finalizado."))
+
+    def _procesar_cola(self, stats, exportacion_id, procesos, apply_changes):
+        """Recorre las exportaciones disponibles una vez; devuelve cuántas atendió."""
+        pendientes = exportaciones_disponibles().order_by("created_at")
+        if exportacion_id:
+            pendientes = pendientes.filter(id=exportacion_id)
+
+        atendidas = 0
+        for pendiente_id, estado in list(pendientes.values_list("id", "estado")):
+            atendidas += 1
+            stats["pendientes"] += 1
+            retomada = estado == ExportacionInstitucional.PROCESANDO
+            stats["retomadas"] += retomada
+            if not apply_changes:
+                detalle = "abandonada en proceso" if retomada else "pendiente"
+                self.stdout.write(f"  Exportación {pendiente_id} {detalle}")
+                continue
+            exportacion = ejecutar_exportacion(pendiente_id, procesos=procesos)
+            stats["asignaciones"] += exportacion.procesadas
+            if exportacion.estado == ExportacionInstitucional.COMPLETADA:
+                stats["completadas"] += 1
+                self.stdout.write(f"  Exportación {pendiente_id}: {exportacion.archivo.name}")
+            elif exportacion.estado == ExportacionInstitucional.ERROR:
+                stats["errores"] += 1
+                self.stdout.write(self.style.ERROR(f"  Exportación {pendiente_id}: {exportacion.error}"))
+        return atendidas
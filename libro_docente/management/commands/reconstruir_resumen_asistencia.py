@@ -0,0 +1,124 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from evaluaciones.models import DocenteAsignacion, PeriodoCursoLectivo
+from libro_docente.models import ResumenAsistenciaEstudiante
+from libro_docente.services import recalcular_resumen_asistencia, verificar_resumen_asistencia
+from libro_docente.views import _roster_asignacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica los totales de asistencia persistidos (ResumenAsistenciaEstudiante) "
+        "contra el cálculo en vivo y, con --apply, los reconstruye."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Reconstruye las filas en base de datos. Sin este flag solo verifica (dry-run).",
+        )
+        parser.add_argument(
+            "--asignacion-id",
+            type=int,
+            default=None,
+            help="Opcional: limita el proceso a una asignación (DocenteAsignacion.id).",
+        )
+        parser.add_argument(
+            "--institucion-id",
+            type=int,
+            default=None,
+            help="Opcional: limita el proceso a una institución.",
+        )
+        parser.add_argument(
+            "--periodo-id",
+            type=int,
+            default=None,
+            help="Opcional: limita el proceso a un período (Periodo.id).",
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get("apply"))
+        asignacion_id = options.get("asignacion_id")
+        institucion_id = options.get("institucion_id")
+        periodo_id = options.get("periodo_id")
+
+        if apply_changes:
+            self.stdout.write(self.style.WARNING("MODO APPLY: se reconstruirá el resumen de asistencia."))
+        else:
+            self.stdout.write(self.style.WARNING("MODO DRY-RUN: solo se verificará el resumen de asistencia."))
+
+        asignaciones_qs = (
+            DocenteAsignacion.objects
+            .filter(activo=True)
+            .select_related("subarea_curso__institucion", "curso_lectivo")
+            .order_by("id")
+        )
+        if asignacion_id:
+            asignaciones_qs = asignaciones_qs.filter(id=asignacion_id)
+            if not asignaciones_qs.exists():
+                raise CommandError(f"No existe asignación activa con id {asignacion_id}.")
+        if institucion_id:
+            asignaciones_qs = asignaciones_qs.filter(subarea_curso__institucion_id=institucion_id)
+
+        periodos_por_clave = {}
+        stats = {
+            "asignaciones": 0,
+            "periodos": 0,
+            "estudiantes": 0,
+            "diferencias": 0,
+            "filas_reconstruidas": 0,
+        }
+
+        for asignacion in asignaciones_qs:
+            clave = (asignacion.subarea_curso.institucion_id, asignacion.curso_lectivo_id)
+            if clave not in periodos_por_clave:
+                pcl_qs = PeriodoCursoLectivo.objects.filter(
+                    institucion_id=clave[0],
+                    curso_lectivo_id=clave[1],
+                )
+                if periodo_id:
+                    pcl_qs = pcl_qs.filter(periodo_id=periodo_id)
+                periodos_por_clave[clave] = list(pcl_qs.values_list("periodo_id", flat=True))
+            periodos = periodos_por_clave[clave]
+            if not periodos:
+                continue
+            est_ids = list(_roster_asignacion(asignacion)["estudiante_ids"])
+            if not est_ids:
+                continue
+            stats["asignaciones"] += 1
+            stats["estudiantes"] += len(est_ids)
+
+            for per_id in periodos:
+                stats["periodos"] += 1
+                diferencias = verificar_resumen_asistencia(asignacion, per_id, est_ids)
+                stats["diferencias"] += len(diferencias)
+                for est_id, guardado, en_vivo in diferencias[:5]:
+                    self.stdout.write(
+                        f"  Asignación {asignacion.id} / período {per_id} / estudiante {est_id}: "
+                        f"persistido={guardado} en_vivo={en_vivo}"
+                    )
+                if apply_changes:
+                    with transaction.atomic():
+                        ResumenAsistenciaEstudiante.objects.filter(
+                            docente_asignacion=asignacion,
+                            periodo_id=per_id,
+                        ).delete()
+                        totales = recalcular_resumen_asistencia(asignacion, per_id, est_ids)
+                    stats["filas_reconstruidas"] += len(totales)
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(f"- Asignaciones procesadas: {stats['asignaciones']}")
+        self.stdout.write(f"- Asignación/período verificados: {stats['periodos']}")
+        self.stdout.write(f"- Estudiantes: {stats['estudiantes']}")
+        self.stdout.write(f"- Diferencias encontradas: {stats['diferencias']}")
+        self.stdout.write(f"- Filas reconstruidas: {stats['filas_reconstruidas']}")
+
+        if apply_changes:
+            self.stdout.write(self.style.SUCCESS("Reconstrucción finalizada."))
+        elif stats["diferencias"]:
+            self.stdout.write(self.style.WARNING("Verificación con diferencias; ejecute con --apply."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Verificación finalizada sin diferencias."))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluaciones', '0006_docenteasignacion_nombre_corto'),
+        ('libro_docente', '0022_remove_listaestudiantesdocente_uniq_libdoc_lista_doc_curso_seccion_and_more'),
+        ('matricula', '0009_permiso_eliminar_basura_estudiantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenComponenteEstudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_componente', models.CharField(choices=[('TAREA', 'Tarea'), ('COTIDIANO', 'Cotidiano'), ('PRUEBA', 'Prueba'), ('PROYECTO', 'Proyecto')], max_length=20, verbose_name='Tipo')),
+                ('puntos_obtenidos', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='Puntos obtenidos')),
+                ('puntos_maximos', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='Puntos máximos')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('docente_asignacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_componente', to='evaluaciones.docenteasignacion', verbose_name='Asignación docente')),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_componente', to='matricula.estudiante', verbose_name='Estudiante')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_componente', to='evaluaciones.periodo', verbose_name='Período')),
+            ],
+            options={
+                'verbose_name': 'Resumen por componente',
+                'verbose_name_plural': 'Resúmenes por componente',
+                'db_table': 'evaluacion_resumen_componente',
+                'indexes': [models.Index(fields=['docente_asignacion', 'periodo'], name='eval_res_asig_per_idx')],
+                'constraints': [models.UniqueConstraint(fields=('docente_asignacion', 'periodo', 'estudiante', 'tipo_componente'), name='uniq_eval_resumen_comp_est')],
+            },
+        ),
+    ]
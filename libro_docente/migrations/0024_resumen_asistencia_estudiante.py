@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluaciones', '0006_docenteasignacion_nombre_corto'),
+        ('libro_docente', '0023_resumen_componente_estudiante'),
+        ('matricula', '0009_permiso_eliminar_basura_estudiantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAsistenciaEstudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_sesiones', models.PositiveIntegerField(default=0, verbose_name='Sesiones del período')),
+                ('total_lecciones', models.PositiveIntegerField(default=0, verbose_name='Lecciones del período')),
+                ('presentes', models.DecimalField(decimal_places=1, default=0, max_digits=8, verbose_name='Presentes')),
+                ('tardias_media', models.DecimalField(decimal_places=1, default=0, max_digits=8, verbose_name='Tardías TM')),
+                ('tardias_completa', models.DecimalField(decimal_places=1, default=0, max_digits=8, verbose_name='Tardías TC')),
+                ('ausentes_ai', models.DecimalField(decimal_places=1, default=0, max_digits=8, verbose_name='Ausencias AI')),
+                ('ausentes_just', models.DecimalField(decimal_places=1, default=0, max_digits=8, verbose_name='Ausencias AJ')),
+                ('ausentes_inj', models.DecimalField(decimal_places=1, default=0, max_digits=8, verbose_name='Lecciones injustificadas equivalentes')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('docente_asignacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_asistencia', to='evaluaciones.docenteasignacion', verbose_name='Asignación docente')),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_asistencia', to='matricula.estudiante', verbose_name='Estudiante')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_asistencia', to='evaluaciones.periodo', verbose_name='Período')),
+            ],
+            options={
+                'verbose_name': 'Resumen de asistencia',
+                'verbose_name_plural': 'Resúmenes de asistencia',
+                'db_table': 'asistencia_resumen_estudiante',
+                'constraints': [models.UniqueConstraint(fields=('docente_asignacion', 'periodo', 'estudiante'), name='uniq_asis_resumen_est')],
+            },
+        ),
+    ]
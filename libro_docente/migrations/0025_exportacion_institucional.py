@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0006_alter_cursolectivo_anio'),
+        ('core', '0008_user_tiempo_cierre_sesion_min'),
+        ('evaluaciones', '0006_docenteasignacion_nombre_corto'),
+        ('libro_docente', '0024_resumen_asistencia_estudiante'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacionInstitucional',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('XLSX', 'Excel (una hoja por asignación)'), ('CSV', 'CSV (una sola tabla)')], default='XLSX', max_length=4, verbose_name='Formato')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('COMPLETADA', 'Completada'), ('ERROR', 'Error')], default='PENDIENTE', max_length=12, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Asignaciones')),
+                ('procesadas', models.PositiveIntegerField(default=0, verbose_name='Asignaciones procesadas')),
+                ('archivo', models.FileField(blank=True, upload_to='libro_docente/exportaciones/%Y/%m/', verbose_name='Archivo')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finalizado_en', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado en')),
+                ('curso_lectivo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='exportaciones_libro_docente', to='catalogos.cursolectivo', verbose_name='Curso lectivo')),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportaciones_libro_docente', to='core.institucion', verbose_name='Institución')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='exportaciones_libro_docente', to='evaluaciones.periodo', verbose_name='Período')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exportaciones_libro_docente', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Exportación institucional',
+                'verbose_name_plural': 'Exportaciones institucionales',
+                'db_table': 'libro_docente_exportacion_institucional',
+                'ordering': ('-created_at',),
+                'permissions': [('access_exportacion_institucional', 'Puede exportar el resumen general de la institución')],
+                'indexes': [models.Index(fields=['institucion', '-created_at'], name='ld_export_inst_fecha_idx'), models.Index(fields=['estado'], name='ld_export_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libro_docente', '0025_exportacion_institucional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacioninstitucional',
+            name='reclamado_en',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Reclamado en'),
+        ),
+    ]
@@ -388,6 +388,73 @@ class PuntajeSimple(models.Model):
         super().clean()
 
 
+class ResumenComponenteEstudiante(models.Model):
+    """
+    Acumulado persistido de puntos por (asignación, período, estudiante, componente).
+    Se mantiene desde services/signals al cambiar puntajes, indicadores, actividades
+    o adecuaciones; el % de logro y el aporte se derivan al leer con el % vigente del esquema.
+    """
+    docente_asignacion = models.ForeignKey(
+        "evaluaciones.DocenteAsignacion",
+        on_delete=models.CASCADE,
+        related_name="resumenes_componente",
+        verbose_name="Asignación docente",
+    )
+    periodo = models.ForeignKey(
+        "evaluaciones.Periodo",
+        on_delete=models.CASCADE,
+        related_name="resumenes_componente",
+        verbose_name="Período",
+    )
+    estudiante = models.ForeignKey(
+        "matricula.Estudiante",
+        on_delete=models.CASCADE,
+        related_name="resumenes_componente",
+        verbose_name="Estudiante",
+    )
+    tipo_componente = models.CharField(
+        "Tipo",
+        max_length=20,
+        choices=ActividadEvaluacion.TIPO_CHOICES,
+    )
+    puntos_obtenidos = models.DecimalField(
+        "Puntos obtenidos",
+        max_digits=9,
+        decimal_places=2,
+        default=0,
+    )
+    puntos_maximos = models.DecimalField(
+        "Puntos máximos",
+        max_digits=9,
+        decimal_places=2,
+        default=0,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "evaluacion_resumen_componente"
+        verbose_name = "Resumen por componente"
+        verbose_name_plural = "Resúmenes por componente"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["docente_asignacion", "periodo", "estudiante", "tipo_componente"],
+                name="uniq_eval_resumen_comp_est",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["docente_asignacion", "periodo"],
+                name="eval_res_asig_per_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.docente_asignacion_id}/{self.periodo_id} – {self.estudiante_id} "
+            f"{self.tipo_componente}: {self.puntos_obtenidos}/{self.puntos_maximos}"
+        )
+
+
 class EstudianteOcultoAsignacion(models.Model):
     """
     Oculta estudiantes solo para una asignación docente específica
@@ -982,3 +1049,147 @@ class AsistenciaRegistro(models.Model):
         # Acepta incrementos de 0.5
         if (valor * 2) != (valor * 2).to_integral_value():
             raise ValidationError("Las lecciones injustificadas deben avanzar en pasos de 0.5.")
+
+
+class ResumenAsistenciaEstudiante(models.Model):
+    """
+    Totales de asistencia persistidos por (asignación, período, estudiante).
+    Se mantienen desde asistencia_view y signals (sesiones, registros y límites
+    de PeriodoCursoLectivo); el %, la nota MEP y el aporte se derivan al leer.
+    """
+    docente_asignacion = models.ForeignKey(
+        "evaluaciones.DocenteAsignacion",
+        on_delete=models.CASCADE,
+        related_name="resumenes_asistencia",
+        verbose_name="Asignación docente",
+    )
+    periodo = models.ForeignKey(
+        "evaluaciones.Periodo",
+        on_delete=models.CASCADE,
+        related_name="resumenes_asistencia",
+        verbose_name="Período",
+    )
+    estudiante = models.ForeignKey(
+        "matricula.Estudiante",
+        on_delete=models.CASCADE,
+        related_name="resumenes_asistencia",
+        verbose_name="Estudiante",
+    )
+    total_sesiones = models.PositiveIntegerField("Sesiones del período", default=0)
+    total_lecciones = models.PositiveIntegerField("Lecciones del período", default=0)
+    presentes = models.DecimalField("Presentes", max_digits=8, decimal_places=1, default=0)
+    tardias_media = models.DecimalField("Tardías TM", max_digits=8, decimal_places=1, default=0)
+    tardias_completa = models.DecimalField("Tardías TC", max_digits=8, decimal_places=1, default=0)
+    ausentes_ai = models.DecimalField("Ausencias AI", max_digits=8, decimal_places=1, default=0)
+    ausentes_just = models.DecimalField("Ausencias AJ", max_digits=8, decimal_places=1, default=0)
+    ausentes_inj = models.DecimalField(
+        "Lecciones injustificadas equivalentes",
+        max_digits=8,
+        decimal_places=1,
+        default=0,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "asistencia_resumen_estudiante"
+        verbose_name = "Resumen de asistencia"
+        verbose_name_plural = "Resúmenes de asistencia"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["docente_asignacion", "periodo", "estudiante"],
+                name="uniq_asis_resumen_est",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.docente_asignacion_id} / {self.periodo_id} – {self.estudiante_id}"
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  EXPORTACIÓN INSTITUCIONAL (TRABAJO EN SEGUNDO PLANO)
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+class ExportacionInstitucional(models.Model):
+    """
+    Exportación del resumen general de todas las asignaciones activas de una
+    institución para un (curso lectivo, período). La procesa el comando
+    procesar_exportaciones_institucionales (ver libro_docente.exportacion) y guarda
+    el archivo generado.
+    """
+    XLSX = "XLSX"
+    CSV = "CSV"
+    FORMATO_CHOICES = [
+        (XLSX, "Excel (una hoja por asignación)"),
+        (CSV, "CSV (una sola tabla)"),
+    ]
+    PENDIENTE = "PENDIENTE"
+    PROCESANDO = "PROCESANDO"
+    COMPLETADA = "COMPLETADA"
+    ERROR = "ERROR"
+    ESTADO_CHOICES = [
+        (PENDIENTE, "Pendiente"),
+        (PROCESANDO, "Procesando"),
+        (COMPLETADA, "Completada"),
+        (ERROR, "Error"),
+    ]
+
+    institucion = models.ForeignKey(
+        "core.Institucion",
+        on_delete=models.CASCADE,
+        related_name="exportaciones_libro_docente",
+        verbose_name="Institución",
+    )
+    curso_lectivo = models.ForeignKey(
+        "catalogos.CursoLectivo",
+        on_delete=models.PROTECT,
+        related_name="exportaciones_libro_docente",
+        verbose_name="Curso lectivo",
+    )
+    periodo = models.ForeignKey(
+        "evaluaciones.Periodo",
+        on_delete=models.PROTECT,
+        related_name="exportaciones_libro_docente",
+        verbose_name="Período",
+    )
+    formato = models.CharField("Formato", max_length=4, choices=FORMATO_CHOICES, default=XLSX)
+    estado = models.CharField("Estado", max_length=12, choices=ESTADO_CHOICES, default=PENDIENTE)
+    total = models.PositiveIntegerField("Asignaciones", default=0)
+    procesadas = models.PositiveIntegerField("Asignaciones procesadas", default=0)
+    archivo = models.FileField("Archivo", upload_to="libro_docente/exportaciones/%Y/%m/", blank=True)
+    error = models.TextField("Error", blank=True)
+    solicitado_por = models.ForeignKey(
+        "core.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="exportaciones_libro_docente",
+        verbose_name="Solicitado por",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Hora en que el proceso la tomó o informó avance por última vez; si pasa el plazo
+    # sin avance, el comando la vuelve a tomar.
+    reclamado_en = models.DateTimeField("Reclamado en", null=True, blank=True)
+    finalizado_en = models.DateTimeField("Finalizado en", null=True, blank=True)
+
+    class Meta:
+        db_table = "libro_docente_exportacion_institucional"
+        verbose_name = "Exportación institucional"
+        verbose_name_plural = "Exportaciones institucionales"
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["institucion", "-created_at"], name="ld_export_inst_fecha_idx"),
+            models.Index(fields=["estado"], name="ld_export_estado_idx"),
+        ]
+        permissions = [
+            ("access_exportacion_institucional", "Puede exportar el resumen general de la institución"),
+        ]
+
+    def __str__(self):
+        return f"{self.institucion_id} / {self.curso_lectivo_id} / {self.periodo_id} – {self.get_estado_display()}"
+
+    @property
+    def porcentaje(self):
+        if not self.total:
+            return 100 if self.estado == self.COMPLETADA else 0
+        return int(self.procesadas * 100 / self.total)
@@ -0,0 +1,119 @@
+"""
+Motor matricial del resumen de asistencia por período.
+
+Codifica las sesiones como un arreglo de lecciones y los registros como matrices
+estudiantes × sesiones (estado y cantidad), en décimas enteras (int64), de modo que
+las sumas son exactas. Las reglas por celda replican las de
+views._calcular_detalle_dia_asistencia con legacy_full_day_ai=True y
+cantidad_es_equivalente=True (incluido el respaldo legacy cuando la cantidad
+persistida es inválida):
+
+- Sin registro: lecciones completas como AI.
+- P / AJ: 0 injustificadas (AJ cuenta las lecciones del día como justificadas).
+- TM / TC / AI con cantidad válida (0 <= cantidad <= lecciones): la cantidad ya es equivalente.
+- TM / TC / AI sin cantidad o fuera de rango: TM = 0.5, TC = 1, AI = día completo.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from .models import AsistenciaRegistro
+
+# Códigos de estado en la matriz
+_SIN_REGISTRO = 0
+_PRESENTE = 1
+_TARDIA_MEDIA = 2
+_TARDIA_COMPLETA = 3
+_AUSENTE_INJ = 4
+_AUSENTE_JUST = 5
+
+_CODIGOS_ESTADO = {
+    AsistenciaRegistro.PRESENTE: _PRESENTE,
+    AsistenciaRegistro.TARDIA_MEDIA: _TARDIA_MEDIA,
+    "T": _TARDIA_MEDIA,  # legacy
+    AsistenciaRegistro.TARDIA_COMPLETA: _TARDIA_COMPLETA,
+    AsistenciaRegistro.AUSENTE_INJUSTIFICADA: _AUSENTE_INJ,
+    AsistenciaRegistro.AUSENTE_JUSTIFICADA: _AUSENTE_JUST,
+}
+
+
+def _a_decimas(valor):
+    return int(Decimal(str(valor)) * 10)
+
+
+def _desde_decimas(valor):
+    return Decimal(int(valor)).scaleb(-1)
+
+
+def cargar_matriz_asistencia(sesiones, est_ids):
+    """
+    sesiones: lista de (sesion_id, lecciones).
+    Retorna (lecciones, estados, cantidades, con_cantidad): lecciones por sesión en
+    décimas y matrices estudiantes × sesiones con el estado codificado, la cantidad
+    persistida en décimas y si la cantidad existe.
+    """
+    n_est, n_ses = len(est_ids), len(sesiones)
+    lecciones = np.array([(lecc or 1) * 10 for _, lecc in sesiones], dtype=np.int64)
+    estados = np.zeros((n_est, n_ses), dtype=np.int8)
+    cantidades = np.zeros((n_est, n_ses), dtype=np.int64)
+    con_cantidad = np.zeros((n_est, n_ses), dtype=bool)
+    if not n_est or not n_ses:
+        return lecciones, estados, cantidades, con_cantidad
+
+    col_sesion = {ses_id: j for j, (ses_id, _) in enumerate(sesiones)}
+    fila_est = {est_id: i for i, est_id in enumerate(est_ids)}
+    filas, cols, codigos, cant_filas, cant_cols, cant_vals = [], [], [], [], [], []
+    for ses_id, est_id, estado, cantidad in AsistenciaRegistro.objects.filter(
+        sesion_id__in=list(col_sesion.keys()),
+        estudiante_id__in=est_ids,
+    ).values_list("sesion_id", "estudiante_id", "estado", "lecciones_injustificadas"):
+        i, j = fila_est[est_id], col_sesion[ses_id]
+        filas.append(i)
+        cols.append(j)
+        codigos.append(_CODIGOS_ESTADO.get(estado, _PRESENTE))
+        if cantidad is not None:
+            cant_filas.append(i)
+            cant_cols.append(j)
+            cant_vals.append(_a_decimas(cantidad))
+    if filas:
+        estados[filas, cols] = codigos
+    if cant_filas:
+        cantidades[cant_filas, cant_cols] = cant_vals
+        con_cantidad[cant_filas, cant_cols] = True
+    return lecciones, estados, cantidades, con_cantidad
+
+
+def totales_asistencia(sesiones, est_ids):
+    """
+    Totales del período para todo el grupo en una sola pasada.
+    Retorna dict est_id -> {presentes, tardias_media, tardias_completa,
+    ausentes_ai, ausentes_just, ausentes_inj} (Decimal).
+    """
+    est_ids = list(dict.fromkeys(est_ids))
+    lecciones, estados, cantidades, con_cantidad = cargar_matriz_asistencia(sesiones, est_ids)
+    lecc = lecciones[None, :]
+
+    sin_registro = estados == _SIN_REGISTRO
+    tm = estados == _TARDIA_MEDIA
+    tc = estados == _TARDIA_COMPLETA
+    ai = estados == _AUSENTE_INJ
+    aj = estados == _AUSENTE_JUST
+
+    valida = con_cantidad & (cantidades >= 0) & (cantidades <= lecc)
+    legacy = np.where(tm, np.minimum(5, lecc), np.where(tc, np.minimum(10, lecc), lecc))
+    equiv = np.where(tm | tc | ai, np.where(valida, cantidades, legacy), 0)
+    lecc_sin_registro = np.where(sin_registro, lecc, 0)
+
+    sumas = {
+        "presentes": np.where(sin_registro, 0, np.maximum(0, lecc - equiv)).sum(axis=1),
+        "tardias_media": np.where(tm, equiv * 2, 0).sum(axis=1),
+        "tardias_completa": np.where(tc, equiv, 0).sum(axis=1),
+        "ausentes_ai": (np.where(ai, equiv, 0) + lecc_sin_registro).sum(axis=1),
+        "ausentes_just": np.where(aj, lecc, 0).sum(axis=1),
+        "ausentes_inj": (equiv + lecc_sin_registro).sum(axis=1),
+    }
+    columnas = {clave: valores.tolist() for clave, valores in sumas.items()}
+    return {
+        est_id: {clave: _desde_decimas(valores[i]) for clave, valores in columnas.items()}
+        for i, est_id in enumerate(est_ids)
+    }
@@ -0,0 +1,163 @@
+"""
+Motor matricial del resumen de evaluación (TAREAS / COTIDIANOS / PRUEBAS / PROYECTOS).
+
+Carga en bloque actividades, indicadores y puntajes de una (asignación, período)
+y arma una matriz estudiantes × actividades en centésimas enteras (int64), de modo
+que las sumas por componente son exactas. Las reglas de alcance de
+_actividad_aplica_a_estudiante se aplican como máscaras por fila (adecuación).
+
+El % de logro y el aporte se derivan de los puntos con la misma aritmética Decimal
+de services._resumen_desde_puntos, por lo que el redondeo MEP (_redondear,
+ROUND_HALF_UP) coincide exactamente con el cálculo por estudiante.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from .models import ActividadEvaluacion, PuntajeIndicador, PuntajeSimple
+
+TIPOS_SIMPLES = (ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO)
+TIPOS_CON_ALCANCE = (ActividadEvaluacion.TAREA, ActividadEvaluacion.COTIDIANO)
+
+# Códigos de alcance en la matriz
+_ALC_TODOS = 0
+_ALC_REGULARES = 1
+_ALC_ADECUACION = 2
+
+
+def _a_centesimas(valor):
+    """Decimal con hasta 2 decimales -> entero en centésimas."""
+    return int((valor or Decimal("0")) * 100)
+
+
+def _desde_centesimas(valor):
+    """Entero en centésimas -> Decimal con 2 decimales."""
+    return Decimal(int(valor)).scaleb(-2)
+
+
+def _codigo_alcance(actividad):
+    if actividad.tipo_componente not in TIPOS_CON_ALCANCE:
+        return _ALC_TODOS
+    alcance = actividad.alcance_estudiantes or ActividadEvaluacion.ALCANCE_TODOS
+    if alcance == ActividadEvaluacion.ALCANCE_TODOS:
+        return _ALC_TODOS
+    if alcance == ActividadEvaluacion.ALCANCE_ADECUACION:
+        return _ALC_ADECUACION
+    # REGULARES y el legacy "GRUPO"
+    return _ALC_REGULARES
+
+
+def cargar_matriz_periodo(asignacion, periodo_id, est_ids, tipos):
+    """
+    Una carga en bloque para todos los tipos pedidos:
+    actividades (+ indicadores), puntajes por indicador y puntajes simples.
+    Retorna (actividades, max_cent, tipo_idx, alcance, puntajes) donde puntajes es
+    la matriz int64 estudiantes × actividades en centésimas.
+    """
+    from .services import ACTIVIDADES_ACUMULADO_ESTADOS
+
+    actividades_qs = (
+        ActividadEvaluacion.objects.filter(
+            docente_asignacion=asignacion,
+            periodo_id=periodo_id,
+            tipo_componente__in=list(tipos),
+            estado__in=ACTIVIDADES_ACUMULADO_ESTADOS,
+        )
+        .prefetch_related("indicadores")
+        .order_by("titulo")
+    )
+    actividades = []
+    max_cent = []
+    ind_to_col = {}
+    simples_col = {}
+    for act in actividades_qs:
+        if act.tipo_componente in TIPOS_SIMPLES:
+            max_act = act.puntaje_total or Decimal("0")
+            if max_act <= 0:
+                continue
+            simples_col[act.id] = len(actividades)
+        else:
+            inds = [i for i in act.indicadores.all() if i.activo]
+            if not inds:
+                continue
+            max_act = sum(i.escala_max for i in inds)
+            for i in inds:
+                ind_to_col[i.id] = len(actividades)
+        actividades.append(act)
+        max_cent.append(_a_centesimas(max_act))
+
+    tipos = list(tipos)
+    tipo_idx = np.array([tipos.index(a.tipo_componente) for a in actividades], dtype=np.int64)
+    alcance = np.array([_codigo_alcance(a) for a in actividades], dtype=np.int8)
+    puntajes = np.zeros((len(est_ids), len(actividades)), dtype=np.int64)
+    if not actividades:
+        return actividades, np.array(max_cent, dtype=np.int64), tipo_idx, alcance, puntajes
+
+    fila_est = {est_id: i for i, est_id in enumerate(est_ids)}
+    filas, cols, vals = [], [], []
+    if ind_to_col:
+        for ind_id, est_id, valor in (
+            PuntajeIndicador.objects.filter(
+                indicador_id__in=list(ind_to_col.keys()),
+                estudiante_id__in=est_ids,
+            )
+            .exclude(puntaje_obtenido__isnull=True)
+            .values_list("indicador_id", "estudiante_id", "puntaje_obtenido")
+        ):
+            filas.append(fila_est[est_id])
+            cols.append(ind_to_col[ind_id])
+            vals.append(_a_centesimas(valor))
+    if simples_col:
+        for act_id, est_id, valor in (
+            PuntajeSimple.objects.filter(
+                actividad_id__in=list(simples_col.keys()),
+                estudiante_id__in=est_ids,
+            )
+            .exclude(puntos_obtenidos__isnull=True)
+            .values_list("actividad_id", "estudiante_id", "puntos_obtenidos")
+        ):
+            filas.append(fila_est[est_id])
+            cols.append(simples_col[act_id])
+            vals.append(_a_centesimas(valor))
+    if vals:
+        # Varios indicadores caen en la misma columna: acumular, no sobrescribir.
+        np.add.at(puntajes, (np.array(filas), np.array(cols)), np.array(vals, dtype=np.int64))
+    return actividades, np.array(max_cent, dtype=np.int64), tipo_idx, alcance, puntajes
+
+
+def puntos_por_componente(asignacion, periodo_id, est_ids, adecuacion_ids, tipos):
+    """
+    Puntos (obtenidos, máximos) de todos los componentes en una sola pasada.
+    Retorna dict tipo -> {est_id: (puntos_obtenidos, puntos_maximos)}.
+    """
+    tipos = list(tipos)
+    est_ids = list(dict.fromkeys(est_ids))
+    actividades, max_cent, tipo_idx, alcance, puntajes = cargar_matriz_periodo(
+        asignacion, periodo_id, est_ids, tipos
+    )
+    n_est, n_act = puntajes.shape
+    if n_act:
+        es_adecuacion = np.array([e in adecuacion_ids for e in est_ids], dtype=bool)[:, None]
+        aplica = np.where(
+            alcance == _ALC_TODOS,
+            True,
+            np.where(alcance == _ALC_ADECUACION, es_adecuacion, ~es_adecuacion),
+        )
+        # Matriz actividad -> tipo (one-hot) para sumar todos los componentes a la vez.
+        por_tipo = np.zeros((n_act, len(tipos)), dtype=np.int64)
+        por_tipo[np.arange(n_act), tipo_idx] = 1
+        obtenidos = (puntajes * aplica) @ por_tipo
+        maximos = (aplica * max_cent) @ por_tipo
+    else:
+        obtenidos = np.zeros((n_est, len(tipos)), dtype=np.int64)
+        maximos = np.zeros((n_est, len(tipos)), dtype=np.int64)
+
+    resultado = {}
+    for j, tipo in enumerate(tipos):
+        col_obt = obtenidos[:, j].tolist()
+        col_max = maximos[:, j].tolist()
+        resultado[tipo] = {
+            est_id: (_desde_centesimas(col_obt[i]), _desde_centesimas(col_max[i]))
+            for i, est_id in enumerate(est_ids)
+        }
+    return resultado
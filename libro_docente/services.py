@@ -4,6 +4,8 @@ Cálculos, validaciones y helpers CRUD.
 """
 from decimal import Decimal, ROUND_HALF_UP
 
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q, Sum
 
 # Redondeo consistente: 2 decimales en cálculos y visualización
@@ -18,16 +20,23 @@ def _redondear(valor):
     return valor.quantize(q, rounding=ROUND_HALF_UP)
 
 
-from evaluaciones.models import EsquemaEvalComponente
+from evaluaciones.models import DocenteAsignacion, EsquemaEvalComponente, PeriodoCursoLectivo
 
 from .models import (
     ActividadEvaluacion,
+    AsistenciaSesion,
     EstudianteAdecuacionAsignacion,
     EstudianteAdecuacionNoSignificativaAsignacion,
+    HorarioDocenteBloque,
     IndicadorActividad,
+    ObservacionActividadEstudiante,
     PuntajeIndicador,
     PuntajeSimple,
+    ResumenAsistenciaEstudiante,
+    ResumenComponenteEstudiante,
 )
+from .motor_asistencia import totales_asistencia
+from .motor_evaluacion import puntos_por_componente
 
 
 def calcular_total_maximo_actividad(actividad):
@@ -112,12 +121,19 @@ def validar_puntaje_en_rango(indicador, valor):
         raise ValueError(f"El puntaje {valor} debe ser <= {ind.escala_max}.")
 
 
+def _conteos_guardado():
+    return {"insertados": 0, "actualizados": 0, "sin_cambios": 0}
+
+
 def guardar_puntajes_masivo(actividad, estudiante_ids, datos_puntajes, indicadores_ids=None):
     """
     Guarda puntajes en masa.
     datos_puntajes: dict (indicador_id, estudiante_id) -> puntaje_obtenido (Decimal o None)
     Valida que indicador pertenezca a actividad y estudiante esté en estudiante_ids.
-    Retorna (guardados, errores) donde errores es lista de mensajes.
+    Carga los puntajes existentes una vez y escribe solo las celdas que cambian
+    (un upsert para todo el lote). Vaciar una celda deja el puntaje en NULL.
+    Retorna (conteos, errores): conteos con insertados/actualizados/sin_cambios y
+    errores como lista de mensajes.
     """
     from decimal import Decimal, InvalidOperation
 
@@ -133,8 +149,17 @@ def guardar_puntajes_masivo(actividad, estudiante_ids, datos_puntajes, indicador
         )
     }
     errores = []
-    guardados = 0
+    conteos = _conteos_guardado()
 
+    existentes = {
+        (p[0], p[1]): p[2]
+        for p in PuntajeIndicador.objects.filter(
+            indicador_id__in=list(indicadores),
+            estudiante_id__in=list(estudiante_ids_set),
+        ).values_list("indicador_id", "estudiante_id", "puntaje_obtenido")
+    } if indicadores and estudiante_ids_set else {}
+
+    cambios = []
     for (ind_id, est_id), valor in datos_puntajes.items():
         if ind_id not in indicadores_ids or est_id not in estudiante_ids_set:
             continue
@@ -154,14 +179,130 @@ def guardar_puntajes_masivo(actividad, estudiante_ids, datos_puntajes, indicador
                 errores.append(str(e))
                 continue
 
-        obj, created = PuntajeIndicador.objects.update_or_create(
-            indicador_id=ind_id,
-            estudiante_id=est_id,
-            defaults={"puntaje_obtenido": puntaje},
+        clave = (ind_id, est_id)
+        if clave in existentes:
+            if existentes[clave] == puntaje:
+                conteos["sin_cambios"] += 1
+                continue
+            conteos["actualizados"] += 1
+        elif puntaje is None:
+            # Celda vacía sin fila previa: equivale a no calificado.
+            conteos["sin_cambios"] += 1
+            continue
+        else:
+            conteos["insertados"] += 1
+        cambios.append(PuntajeIndicador(indicador_id=ind_id, estudiante_id=est_id, puntaje_obtenido=puntaje))
+
+    if cambios:
+        PuntajeIndicador.objects.bulk_create(
+            cambios,
+            update_conflicts=True,
+            unique_fields=["indicador", "estudiante"],
+            update_fields=["puntaje_obtenido", "updated_at"],
+        )
+        # bulk_create no emite signals: el acumulado se recalcula aquí, en la misma transacción.
+        recalcular_resumen_componentes(
+            actividad.docente_asignacion,
+            actividad.periodo_id,
+            {p.estudiante_id for p in cambios},
+            tipos=[actividad.tipo_componente],
+        )
+    return conteos, errores
+
+
+def guardar_observaciones_masivo(actividad, observaciones):
+    """
+    Guarda observaciones por estudiante de una actividad.
+    observaciones: dict estudiante_id -> texto ("" elimina la observación).
+    Escribe solo lo que cambia: un upsert y un delete como máximo.
+    Retorna conteos con insertados/actualizados/sin_cambios/eliminados.
+    """
+    conteos = _conteos_guardado()
+    conteos["eliminados"] = 0
+    if not observaciones:
+        return conteos
+    existentes = dict(
+        ObservacionActividadEstudiante.objects.filter(
+            actividad=actividad,
+            estudiante_id__in=list(observaciones),
+        ).values_list("estudiante_id", "observacion")
+    )
+    cambios = []
+    eliminar = []
+    for est_id, texto in observaciones.items():
+        texto = (texto or "").strip()
+        if not texto:
+            if est_id in existentes:
+                eliminar.append(est_id)
+            else:
+                conteos["sin_cambios"] += 1
+            continue
+        if est_id in existentes:
+            if (existentes[est_id] or "") == texto:
+                conteos["sin_cambios"] += 1
+                continue
+            conteos["actualizados"] += 1
+        else:
+            conteos["insertados"] += 1
+        cambios.append(ObservacionActividadEstudiante(actividad=actividad, estudiante_id=est_id, observacion=texto))
+    if cambios:
+        ObservacionActividadEstudiante.objects.bulk_create(
+            cambios,
+            update_conflicts=True,
+            unique_fields=["actividad", "estudiante"],
+            update_fields=["observacion", "updated_at"],
         )
-        guardados += 1
+    if eliminar:
+        conteos["eliminados"] = ObservacionActividadEstudiante.objects.filter(
+            actividad=actividad,
+            estudiante_id__in=eliminar,
+        ).delete()[0]
+    return conteos
 
-    return guardados, errores
+
+def guardar_puntajes_simples_masivo(actividad, puntajes):
+    """
+    Guarda puntajes de Prueba/Proyecto ya validados.
+    puntajes: dict estudiante_id -> puntos (Decimal) o None para dejar sin calificar.
+    Escribe solo lo que cambia en un upsert y recalcula el acumulado de esos estudiantes.
+    Retorna conteos con insertados/actualizados/sin_cambios.
+    """
+    conteos = _conteos_guardado()
+    if not puntajes:
+        return conteos
+    existentes = dict(
+        PuntajeSimple.objects.filter(
+            actividad=actividad,
+            estudiante_id__in=list(puntajes),
+        ).values_list("estudiante_id", "puntos_obtenidos")
+    )
+    cambios = []
+    for est_id, puntos in puntajes.items():
+        if est_id in existentes:
+            if existentes[est_id] == puntos:
+                conteos["sin_cambios"] += 1
+                continue
+            conteos["actualizados"] += 1
+        elif puntos is None:
+            conteos["sin_cambios"] += 1
+            continue
+        else:
+            conteos["insertados"] += 1
+        cambios.append(PuntajeSimple(actividad=actividad, estudiante_id=est_id, puntos_obtenidos=puntos))
+    if cambios:
+        PuntajeSimple.objects.bulk_create(
+            cambios,
+            update_conflicts=True,
+            unique_fields=["actividad", "estudiante"],
+            update_fields=["puntos_obtenidos", "updated_at"],
+        )
+        recalcular_resumen_componentes(
+            actividad.docente_asignacion,
+            actividad.periodo_id,
+            {p.estudiante_id for p in cambios},
+            tipos=[actividad.tipo_componente],
+        )
+    return conteos
 
 
 def guardar_o_actualizar_puntaje(indicador_id, estudiante_id, puntaje_obtenido, observacion=""):
@@ -234,6 +375,14 @@ TIPO_TO_CODIGO_ESQUEMA = {
     "ASISTENCIA": ["ASISTENCIA", "ASIS"],
 }
 
+# Componentes que se acumulan por estudiante (orden de cálculo del resumen)
+TIPOS_RESUMEN = (
+    ActividadEvaluacion.TAREA,
+    ActividadEvaluacion.COTIDIANO,
+    ActividadEvaluacion.PRUEBA,
+    ActividadEvaluacion.PROYECTO,
+)
+
 
 def obtener_porcentaje_componente_esquema(asignacion, tipo_componente):
     """
@@ -274,231 +423,737 @@ def calcular_resumen_componente_estudiante(asignacion, periodo_id, tipo_componen
     - puntos_obtenidos, puntos_maximos, porcentaje_logro, porcentaje_componente, aporte
     - detalle_actividades: [(actividad, max_act, obt_act), ...]
     """
-    from django.db.models import Sum
+    return calcular_detalle_componentes(
+        asignacion, periodo_id, [estudiante_id], tipos=[tipo_componente]
+    )[estudiante_id][tipo_componente]
 
-    es_simple = tipo_componente in (ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO)
-    es_adecuacion = EstudianteAdecuacionAsignacion.objects.filter(
-        docente_asignacion=asignacion,
-        estudiante_id=estudiante_id,
-    ).exists()
-    actividades = (
+
+def calcular_detalle_componentes(asignacion, periodo_id, estudiante_ids, tipos=None):
+    """
+    Desglose por actividad (detalle_actividades con detalle_indicadores) de uno o varios
+    estudiantes y componentes, en un número fijo de consultas:
+    adecuaciones, actividades + indicadores, puntajes por indicador, puntajes simples y % de esquema.
+    Retorna dict est_id -> {tipo: resumen} con el formato de calcular_resumen_componente_estudiante.
+    """
+    tipos = list(tipos or TIPOS_RESUMEN)
+    est_ids = list(dict.fromkeys(estudiante_ids))
+    if not est_ids:
+        return {}
+    adecuacion_ids = set(
+        EstudianteAdecuacionAsignacion.objects.filter(
+            docente_asignacion=asignacion,
+            estudiante_id__in=est_ids,
+        ).values_list("estudiante_id", flat=True)
+    )
+    actividades_por_tipo = {tipo: [] for tipo in tipos}
+    for act in (
         ActividadEvaluacion.objects
         .filter(
             docente_asignacion=asignacion,
             periodo_id=periodo_id,
-            tipo_componente=tipo_componente,
+            tipo_componente__in=tipos,
             estado__in=ACTIVIDADES_ACUMULADO_ESTADOS,
         )
         .prefetch_related("indicadores")
         .order_by("titulo")
+    ):
+        actividades_por_tipo[act.tipo_componente].append(act)
+
+    # Indicadores activos por actividad (orden de pantalla) y máximos por actividad
+    indicadores_act = {}
+    max_por_act = {}
+    simples_ids = []
+    for tipo, actividades in actividades_por_tipo.items():
+        for act in actividades:
+            if tipo in (ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO):
+                max_por_act[act.id] = act.puntaje_total or Decimal("0")
+                if max_por_act[act.id] > 0:
+                    simples_ids.append(act.id)
+            else:
+                inds = sorted((i for i in act.indicadores.all() if i.activo), key=lambda i: (i.orden, i.id))
+                indicadores_act[act.id] = inds
+                max_por_act[act.id] = sum((i.escala_max for i in inds), Decimal("0"))
+
+    ind_ids = [i.id for inds in indicadores_act.values() for i in inds]
+    puntajes_ind = {
+        (p[0], p[1]): p[2]
+        for p in PuntajeIndicador.objects.filter(
+            indicador_id__in=ind_ids,
+            estudiante_id__in=est_ids,
+        ).values_list("indicador_id", "estudiante_id", "puntaje_obtenido")
+    } if ind_ids else {}
+    puntajes_simples = {
+        (p[0], p[1]): p[2]
+        for p in PuntajeSimple.objects.filter(
+            actividad_id__in=simples_ids,
+            estudiante_id__in=est_ids,
+        ).values_list("actividad_id", "estudiante_id", "puntos_obtenidos")
+    } if simples_ids else {}
+    pct_por_tipo = {tipo: obtener_porcentaje_componente_esquema(asignacion, tipo) for tipo in tipos}
+
+    resultado = {}
+    for est_id in est_ids:
+        es_adecuacion = est_id in adecuacion_ids
+        por_tipo = {}
+        for tipo in tipos:
+            es_simple = tipo in (ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO)
+            puntos_obtenidos = Decimal("0")
+            puntos_maximos = Decimal("0")
+            detalle = []
+            for act in actividades_por_tipo[tipo]:
+                if not _actividad_aplica_a_estudiante(act, es_adecuacion):
+                    continue
+                max_act = max_por_act[act.id]
+                if es_simple:
+                    if max_act <= 0:
+                        continue
+                    ps = puntajes_simples.get((act.id, est_id))
+                    obt_act = ps if ps is not None else Decimal("0")
+                    detalle_indicadores = []
+                else:
+                    inds = indicadores_act[act.id]
+                    if not inds:
+                        continue
+                    obt_act = Decimal("0")
+                    detalle_indicadores = []
+                    for ind in inds:
+                        puntaje = puntajes_ind.get((ind.id, est_id))
+                        if puntaje is not None:
+                            obt_act += puntaje
+                        detalle_indicadores.append(
+                            {"indicador": ind, "puntaje": puntaje, "escala_max": ind.escala_max}
+                        )
+                puntos_maximos += max_act
+                puntos_obtenidos += obt_act
+                pct_act = (obt_act / max_act * Decimal("100")) if max_act > 0 else Decimal("0")
+                aporte_act = None
+                if es_simple:
+                    peso_act = act.porcentaje_actividad or Decimal("0")
+                    aporte_act = (pct_act / Decimal("100")) * peso_act if peso_act > 0 else Decimal("0")
+                detalle.append({
+                    "actividad": act,
+                    "maximo": max_act,
+                    "obtenido": obt_act,
+                    "porcentaje_logro": pct_act,  # Nota sobre 100 para pruebas/proyecto
+                    "nota": pct_act,
+                    "aporte_actividad": aporte_act,
+                    "detalle_indicadores": detalle_indicadores,
+                })
+            resumen = _resumen_desde_puntos(puntos_obtenidos, puntos_maximos, pct_por_tipo[tipo])
+            resumen["detalle_actividades"] = detalle
+            por_tipo[tipo] = resumen
+        resultado[est_id] = por_tipo
+    return resultado
+
+
+def _ids_adecuacion(asignacion, est_ids):
+    """Conjuntos (adecuación significativa, no significativa) de la asignación para est_ids."""
+    adecuacion_ids = set(
+        EstudianteAdecuacionAsignacion.objects.filter(
+            docente_asignacion=asignacion,
+            estudiante_id__in=est_ids,
+        ).values_list("estudiante_id", flat=True)
+    )
+    adecuacion_no_sig_ids = set(
+        EstudianteAdecuacionNoSignificativaAsignacion.objects.filter(
+            docente_asignacion=asignacion,
+            estudiante_id__in=est_ids,
+        ).values_list("estudiante_id", flat=True)
     )
+    return adecuacion_ids, adecuacion_no_sig_ids
 
-    puntos_obtenidos = Decimal("0")
-    puntos_maximos = Decimal("0")
-    detalle = []
 
-    for act in actividades:
-        if not _actividad_aplica_a_estudiante(act, es_adecuacion):
-            continue
-        if es_simple:
+def _puntos_por_tipo(asignacion, periodo_id, tipo_componente, est_ids, adecuacion_ids):
+    """
+    Puntos (obtenidos, máximos) por estudiante para un componente.
+    Una query de actividades (+ prefetch indicadores) y una de puntajes.
+    Retorna dict est_id -> (puntos_obtenidos, puntos_maximos).
+    Implementación de referencia (Decimal, actividad por actividad): el resumen usa
+    motor_evaluacion.puntos_por_componente y este cálculo se usa para verificarlo.
+    """
+    es_simple = tipo_componente in (ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO)
+    actividades = list(
+        ActividadEvaluacion.objects.filter(
+            docente_asignacion=asignacion,
+            periodo_id=periodo_id,
+            tipo_componente=tipo_componente,
+            estado__in=ACTIVIDADES_ACUMULADO_ESTADOS,
+        )
+        .prefetch_related("indicadores")
+        .order_by("titulo")
+    )
+    act_max = {}  # actividad_id -> max
+    obt_por_est_act = {}  # (est_id, act_id) -> sum
+    if es_simple:
+        for act in actividades:
             max_act = act.puntaje_total or Decimal("0")
-            if max_act <= 0:
-                continue
-            ps = (
-                PuntajeSimple.objects
-                .filter(actividad=act, estudiante_id=estudiante_id)
-                .values_list("puntos_obtenidos", flat=True)
-                .first()
+            if max_act > 0:
+                act_max[act.id] = max_act
+        puntajes_raw = list(
+            PuntajeSimple.objects.filter(
+                actividad_id__in=list(act_max.keys()),
+                estudiante_id__in=est_ids,
             )
-            obt_act = ps if ps is not None else Decimal("0")
-            detalle_indicadores = []
-        else:
-            ind_ids = list(act.indicadores.filter(activo=True).values_list("id", flat=True))
-            if not ind_ids:
+            .exclude(puntos_obtenidos__isnull=True)
+            .values("actividad_id", "estudiante_id", "puntos_obtenidos")
+        ) if act_max else []
+        for p in puntajes_raw:
+            key = (p["estudiante_id"], p["actividad_id"])
+            obt_por_est_act[key] = p["puntos_obtenidos"]
+    else:
+        act_ind_ids = {}  # actividad_id -> [ind_ids]
+        for act in actividades:
+            inds = [i for i in act.indicadores.all() if i.activo]
+            if not inds:
                 continue
-            max_act = (
-                IndicadorActividad.objects.filter(actividad=act, activo=True)
-                .aggregate(s=Sum("escala_max"))["s"] or Decimal("0")
-            )
-            obt_act = (
-                PuntajeIndicador.objects
-                .filter(indicador_id__in=ind_ids, estudiante_id=estudiante_id)
-                .exclude(puntaje_obtenido__isnull=True)
-                .aggregate(s=Sum("puntaje_obtenido"))["s"] or Decimal("0")
-            )
-            indicadores_act = list(act.indicadores.filter(activo=True).order_by("orden", "id"))
-            puntajes_raw = list(
+            act_ind_ids[act.id] = [i.id for i in inds]
+            act_max[act.id] = sum(i.escala_max for i in inds)
+
+        ind_ids_flat = [iid for ids in act_ind_ids.values() for iid in ids]
+        puntajes_raw = (
+            list(
                 PuntajeIndicador.objects.filter(
-                    indicador_id__in=ind_ids, estudiante_id=estudiante_id
-                ).values("indicador_id", "puntaje_obtenido")
+                    indicador_id__in=ind_ids_flat,
+                    estudiante_id__in=est_ids,
+                )
+                .exclude(puntaje_obtenido__isnull=True)
+                .values("indicador_id", "estudiante_id", "puntaje_obtenido")
             )
-            puntajes_ind = {p["indicador_id"]: p["puntaje_obtenido"] for p in puntajes_raw}
-            detalle_indicadores = [
-                {"indicador": ind, "puntaje": puntajes_ind.get(ind.id), "escala_max": ind.escala_max}
-                for ind in indicadores_act
-            ]
-        puntos_maximos += max_act
-        puntos_obtenidos += obt_act
-        pct_act = (obt_act / max_act * Decimal("100")) if max_act > 0 else Decimal("0")
-        aporte_act = None
-        if es_simple:
-            peso_act = act.porcentaje_actividad or Decimal("0")
-            aporte_act = (pct_act / Decimal("100")) * peso_act if peso_act > 0 else Decimal("0")
-        detalle.append({
-            "actividad": act,
-            "maximo": max_act,
-            "obtenido": obt_act,
-            "porcentaje_logro": pct_act,  # Nota sobre 100 para pruebas/proyecto
-            "nota": pct_act,
-            "aporte_actividad": aporte_act,
-            "detalle_indicadores": detalle_indicadores,
-        })
-
-    pct_logro = (puntos_obtenidos / puntos_maximos * Decimal("100")) if puntos_maximos > 0 else Decimal("0")
-    pct_comp = obtener_porcentaje_componente_esquema(asignacion, tipo_componente)
-    aporte = (pct_logro / Decimal("100")) * pct_comp
+            if ind_ids_flat
+            else []
+        )
+
+        ind_to_act = {}
+        for act_id, ind_ids in act_ind_ids.items():
+            for iid in ind_ids:
+                ind_to_act[iid] = act_id
+
+        for p in puntajes_raw:
+            act_id = ind_to_act.get(p["indicador_id"])
+            if act_id:
+                key = (p["estudiante_id"], act_id)
+                obt_por_est_act[key] = obt_por_est_act.get(key, Decimal("0")) + p["puntaje_obtenido"]
+
+    actividades_map = {a.id: a for a in actividades}
+    puntos = {}
+    for est_id in est_ids:
+        puntos_obt = Decimal("0")
+        puntos_max = Decimal("0")
+        for act_id, max_act in act_max.items():
+            actividad_obj = actividades_map.get(act_id)
+            if actividad_obj and not _actividad_aplica_a_estudiante(
+                actividad_obj, est_id in adecuacion_ids
+            ):
+                continue
+            puntos_max += max_act
+            puntos_obt += obt_por_est_act.get((est_id, act_id), Decimal("0"))
+        puntos[est_id] = (puntos_obt, puntos_max)
+    return puntos
 
+
+def _resumen_desde_puntos(puntos_obt, puntos_max, pct_comp):
+    """Arma el dict de resumen de un componente a partir de sus puntos acumulados."""
+    pct_logro = (puntos_obt / puntos_max * Decimal("100")) if puntos_max > 0 else Decimal("0")
+    aporte = (pct_logro / Decimal("100")) * pct_comp
     return {
-        "puntos_obtenidos": puntos_obtenidos,
-        "puntos_maximos": puntos_maximos,
+        "puntos_obtenidos": puntos_obt,
+        "puntos_maximos": puntos_max,
         "porcentaje_logro": pct_logro,
         "porcentaje_componente": pct_comp,
         "aporte": aporte,
-        "detalle_actividades": detalle,
+        "detalle_actividades": [],  # no usado en grilla principal
     }
 
 
+def _filas_resumen(matriculas, puntos_por_tipo, pct_por_tipo, adecuacion_ids, adecuacion_no_sig_ids):
+    """
+    Filas de resumen por estudiante en el formato de calcular_resumen_evaluacion_completo.
+    puntos_por_tipo: tipo -> {est_id: (obtenidos, maximos)}; pct_por_tipo: tipo -> % esquema.
+    """
+    claves = (
+        ("tareas", ActividadEvaluacion.TAREA),
+        ("cotidianos", ActividadEvaluacion.COTIDIANO),
+        ("pruebas", ActividadEvaluacion.PRUEBA),
+        ("proyectos", ActividadEvaluacion.PROYECTO),
+    )
+    filas = []
+    for m in matriculas:
+        est = m.estudiante
+        fila = {"matricula": m, "estudiante": est}
+        for clave, tipo in claves:
+            pts = puntos_por_tipo.get(tipo, {}).get(est.id)
+            fila[clave] = _resumen_desde_puntos(pts[0], pts[1], pct_por_tipo[tipo]) if pts else {}
+        fila["adecuacion"] = est.id in adecuacion_ids
+        fila["adecuacion_no_sig"] = est.id in adecuacion_no_sig_ids
+        filas.append(fila)
+    return filas
+
+
 def calcular_resumen_evaluacion_completo(asignacion, periodo_id, matriculas):
     """
-    Resumen por estudiante con TAREAS y COTIDIANOS.
+    Resumen por estudiante con TAREAS, COTIDIANOS, PRUEBAS y PROYECTOS.
     Retorna lista de dicts con estudiante y datos por componente.
-    Optimizado: prefetch actividades e indicadores, una query de puntajes por tipo.
+    Una sola carga de actividades/indicadores/puntajes (motor matricial).
+    Cálculo en vivo desde puntajes; las pantallas usan obtener_resumen_evaluacion.
     """
     est_ids = [m.estudiante_id for m in matriculas]
     if not est_ids:
         return []
-    adecuacion_ids = set(
-        EstudianteAdecuacionAsignacion.objects.filter(
+    adecuacion_ids, adecuacion_no_sig_ids = _ids_adecuacion(asignacion, est_ids)
+    puntos_por_tipo = puntos_por_componente(asignacion, periodo_id, est_ids, adecuacion_ids, TIPOS_RESUMEN)
+    pct_por_tipo = {tipo: obtener_porcentaje_componente_esquema(asignacion, tipo) for tipo in TIPOS_RESUMEN}
+    return _filas_resumen(matriculas, puntos_por_tipo, pct_por_tipo, adecuacion_ids, adecuacion_no_sig_ids)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  RESUMEN PERSISTIDO (ResumenComponenteEstudiante)
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Espacios de pg_advisory_xact_lock(espacio, asignación) de los resúmenes persistidos.
+BLOQUEO_RESUMEN_EVALUACION = 1
+BLOQUEO_RESUMEN_ASISTENCIA = 2
+
+
+def _bloquear_resumen(espacio, asignacion_ids):
+    """
+    Serializa recálculo e invalidación del resumen de cada asignación hasta el fin de la
+    transacción. Sin esto, una lectura que calculó con datos previos a un cambio podría
+    guardar sus filas después de que el cambio las borró y dejarlas desactualizadas.
+    Solo PostgreSQL; en otros motores no bloquea.
+    """
+    conexion = transaction.get_connection()
+    if conexion.vendor != "postgresql":
+        return
+    with conexion.cursor() as cursor:
+        # Orden fijo para que dos transacciones con varias asignaciones no se bloqueen mutuamente.
+        for clave in sorted({asignacion_id % 2**31 for asignacion_id in asignacion_ids}):
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [espacio, clave])
+
+
+def invalidar_resumen_componentes(asignacion_id, periodo_id=None, tipo_componente=None, estudiante_ids=None):
+    """
+    Borra filas persistidas afectadas por un cambio; se recalculan al próximo uso.
+    Se ejecuta dentro de la transacción del cambio (signals / services).
+    """
+    qs = ResumenComponenteEstudiante.objects.filter(docente_asignacion_id=asignacion_id)
+    if periodo_id is not None:
+        qs = qs.filter(periodo_id=periodo_id)
+    if tipo_componente is not None:
+        qs = qs.filter(tipo_componente=tipo_componente)
+    if estudiante_ids is not None:
+        qs = qs.filter(estudiante_id__in=list(estudiante_ids))
+    with transaction.atomic():
+        _bloquear_resumen(BLOQUEO_RESUMEN_EVALUACION, [asignacion_id])
+        return qs.delete()[0]
+
+
+def recalcular_resumen_componentes(asignacion, periodo_id, estudiante_ids, tipos=None):
+    """
+    Recalcula y guarda (upsert) el acumulado persistido de los estudiantes indicados.
+    Retorna dict tipo -> {est_id: (obtenidos, maximos)} con lo guardado.
+    """
+    est_ids = list(estudiante_ids)
+    if not est_ids:
+        return {}
+    with transaction.atomic():
+        # El bloqueo va antes del cálculo: se leen los puntajes ya confirmados por cualquier
+        # cambio que lo tuviera, y los cambios posteriores esperan a que se guarde lo calculado.
+        _bloquear_resumen(BLOQUEO_RESUMEN_EVALUACION, [asignacion.id])
+        adecuacion_ids, _ = _ids_adecuacion(asignacion, est_ids)
+        puntos_por_tipo = puntos_por_componente(
+            asignacion, periodo_id, est_ids, adecuacion_ids, tipos or TIPOS_RESUMEN
+        )
+        objs = []
+        for tipo, puntos in puntos_por_tipo.items():
+            for est_id, (obt, mx) in puntos.items():
+                objs.append(ResumenComponenteEstudiante(
+                    docente_asignacion_id=asignacion.id,
+                    periodo_id=periodo_id,
+                    estudiante_id=est_id,
+                    tipo_componente=tipo,
+                    puntos_obtenidos=obt,
+                    puntos_maximos=mx,
+                ))
+        if objs:
+            ResumenComponenteEstudiante.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=["docente_asignacion", "periodo", "estudiante", "tipo_componente"],
+                update_fields=["puntos_obtenidos", "puntos_maximos", "updated_at"],
+            )
+    return puntos_por_tipo
+
+
+def obtener_resumen_evaluacion(asignacion, periodo_id, matriculas):
+    """
+    Igual que calcular_resumen_evaluacion_completo pero leyendo el acumulado persistido.
+    Los estudiantes sin filas (invalidadas o nuevos en el grupo) se recalculan y guardan.
+    """
+    est_ids = [m.estudiante_id for m in matriculas]
+    if not est_ids:
+        return []
+    adecuacion_ids, adecuacion_no_sig_ids = _ids_adecuacion(asignacion, est_ids)
+    puntos_por_tipo = {tipo: {} for tipo in TIPOS_RESUMEN}
+    for r in ResumenComponenteEstudiante.objects.filter(
+        docente_asignacion=asignacion,
+        periodo_id=periodo_id,
+        estudiante_id__in=est_ids,
+    ).values_list("estudiante_id", "tipo_componente", "puntos_obtenidos", "puntos_maximos"):
+        if r[1] in puntos_por_tipo:
+            puntos_por_tipo[r[1]][r[0]] = (r[2], r[3])
+
+    faltantes = [
+        est_id for est_id in est_ids
+        if any(est_id not in puntos_por_tipo[tipo] for tipo in TIPOS_RESUMEN)
+    ]
+    if faltantes:
+        nuevos = recalcular_resumen_componentes(asignacion, periodo_id, faltantes)
+        for tipo, puntos in nuevos.items():
+            puntos_por_tipo[tipo].update(puntos)
+
+    pct_por_tipo = {tipo: obtener_porcentaje_componente_esquema(asignacion, tipo) for tipo in TIPOS_RESUMEN}
+    return _filas_resumen(matriculas, puntos_por_tipo, pct_por_tipo, adecuacion_ids, adecuacion_no_sig_ids)
+
+
+def verificar_resumen_componentes(asignacion, periodo_id, estudiante_ids):
+    """
+    Compara el acumulado persistido contra el cálculo en vivo de referencia (_puntos_por_tipo).
+    Retorna lista de (est_id, tipo, persistido, en_vivo) con diferencias; None = fila faltante.
+    """
+    est_ids = list(estudiante_ids)
+    if not est_ids:
+        return []
+    adecuacion_ids, _ = _ids_adecuacion(asignacion, est_ids)
+    persistido = {
+        (r[0], r[1]): (r[2], r[3])
+        for r in ResumenComponenteEstudiante.objects.filter(
             docente_asignacion=asignacion,
+            periodo_id=periodo_id,
             estudiante_id__in=est_ids,
-        ).values_list("estudiante_id", flat=True)
+        ).values_list("estudiante_id", "tipo_componente", "puntos_obtenidos", "puntos_maximos")
+    }
+    diferencias = []
+    for tipo in TIPOS_RESUMEN:
+        en_vivo = _puntos_por_tipo(asignacion, periodo_id, tipo, est_ids, adecuacion_ids)
+        for est_id, valor in en_vivo.items():
+            guardado = persistido.get((est_id, tipo))
+            if guardado != valor:
+                diferencias.append((est_id, tipo, guardado, valor))
+    return diferencias
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  RESUMEN DE ASISTENCIA PERSISTIDO (ResumenAsistenciaEstudiante)
+# ═══════════════════════════════════════════════════════════════════════════
+
+CAMPOS_RESUMEN_ASISTENCIA = (
+    "total_sesiones",
+    "total_lecciones",
+    "presentes",
+    "tardias_media",
+    "tardias_completa",
+    "ausentes_ai",
+    "ausentes_just",
+    "ausentes_inj",
+)
+
+
+def sesiones_por_periodo(asignacion, periodo):
+    """
+    Obtiene sesiones de una asignación para un período, priorizando rango de fechas
+    del PeriodoCursoLectivo para incluir registros retroactivos válidos.
+    """
+    qs = AsistenciaSesion.objects.filter(docente_asignacion=asignacion)
+    if not periodo:
+        return qs.none()
+
+    pcl = (
+        PeriodoCursoLectivo.objects
+        .filter(
+            institucion_id=asignacion.subarea_curso.institucion_id,
+            curso_lectivo_id=asignacion.curso_lectivo_id,
+            periodo=periodo,
+        )
+        .first()
     )
-    adecuacion_no_sig_ids = set(
-        EstudianteAdecuacionNoSignificativaAsignacion.objects.filter(
+    if pcl and pcl.fecha_inicio and pcl.fecha_fin:
+        return qs.filter(fecha__range=(pcl.fecha_inicio, pcl.fecha_fin)).order_by("fecha", "sesion_numero")
+    return qs.filter(periodo=periodo).order_by("fecha", "sesion_numero")
+
+
+def _totales_asistencia_en_vivo(asignacion, periodo_id, est_ids):
+    sesiones = list(sesiones_por_periodo(asignacion, periodo_id).values_list("id", "lecciones"))
+    totales = totales_asistencia(sesiones, est_ids)
+    total_lecciones = sum((lecc or 1) for _, lecc in sesiones)
+    for fila in totales.values():
+        fila["total_sesiones"] = len(sesiones)
+        fila["total_lecciones"] = total_lecciones
+    return totales
+
+
+def invalidar_resumen_asistencia(asignacion_ids=None, periodo_id=None, estudiante_ids=None,
+                                 institucion_id=None, curso_lectivo_id=None):
+    """
+    Borra filas persistidas afectadas por un cambio; se recalculan al próximo uso.
+    institucion_id/curso_lectivo_id permiten invalidar todo un curso (cambio de límites de período).
+    """
+    qs = ResumenAsistenciaEstudiante.objects.all()
+    asignaciones = DocenteAsignacion.objects.all()
+    if asignacion_ids is not None:
+        asignacion_ids = list(asignacion_ids)
+        qs = qs.filter(docente_asignacion_id__in=asignacion_ids)
+    if institucion_id is not None:
+        qs = qs.filter(docente_asignacion__subarea_curso__institucion_id=institucion_id)
+        asignaciones = asignaciones.filter(subarea_curso__institucion_id=institucion_id)
+    if curso_lectivo_id is not None:
+        qs = qs.filter(docente_asignacion__curso_lectivo_id=curso_lectivo_id)
+        asignaciones = asignaciones.filter(curso_lectivo_id=curso_lectivo_id)
+    if periodo_id is not None:
+        qs = qs.filter(periodo_id=periodo_id)
+    if estudiante_ids is not None:
+        qs = qs.filter(estudiante_id__in=list(estudiante_ids))
+    with transaction.atomic():
+        # Invalidar todo un curso bloquea todas sus asignaciones, tengan filas o no.
+        if asignacion_ids is None:
+            asignacion_ids = list(asignaciones.values_list("id", flat=True))
+        _bloquear_resumen(BLOQUEO_RESUMEN_ASISTENCIA, asignacion_ids)
+        return qs.delete()[0]
+
+
+def recalcular_resumen_asistencia(asignacion, periodo_id, estudiante_ids):
+    """
+    Recalcula y guarda (upsert) los totales de asistencia de los estudiantes indicados.
+    Retorna dict est_id -> totales guardados.
+    """
+    est_ids = list(dict.fromkeys(estudiante_ids))
+    if not est_ids or not periodo_id:
+        return {}
+    with transaction.atomic():
+        # Igual que recalcular_resumen_componentes: bloqueo antes de leer las sesiones.
+        _bloquear_resumen(BLOQUEO_RESUMEN_ASISTENCIA, [asignacion.id])
+        totales = _totales_asistencia_en_vivo(asignacion, periodo_id, est_ids)
+        ResumenAsistenciaEstudiante.objects.bulk_create(
+            [
+                ResumenAsistenciaEstudiante(
+                    docente_asignacion_id=asignacion.id,
+                    periodo_id=periodo_id,
+                    estudiante_id=est_id,
+                    **fila,
+                )
+                for est_id, fila in totales.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["docente_asignacion", "periodo", "estudiante"],
+            update_fields=[*CAMPOS_RESUMEN_ASISTENCIA, "updated_at"],
+        )
+    return totales
+
+
+def obtener_resumen_asistencia(asignacion, periodo_id, estudiante_ids):
+    """
+    Totales de asistencia por estudiante leídos del resumen persistido (una consulta).
+    Los estudiantes sin fila (invalidada o nuevos en el grupo) se recalculan y guardan.
+    """
+    est_ids = list(dict.fromkeys(estudiante_ids))
+    if not est_ids or not periodo_id:
+        return {}
+    totales = {
+        r["estudiante_id"]: r
+        for r in ResumenAsistenciaEstudiante.objects.filter(
             docente_asignacion=asignacion,
+            periodo_id=periodo_id,
             estudiante_id__in=est_ids,
-        ).values_list("estudiante_id", flat=True)
-    )
+        ).values("estudiante_id", *CAMPOS_RESUMEN_ASISTENCIA)
+    }
+    for fila in totales.values():
+        del fila["estudiante_id"]
+    faltantes = [est_id for est_id in est_ids if est_id not in totales]
+    if faltantes:
+        totales.update(recalcular_resumen_asistencia(asignacion, periodo_id, faltantes))
+    return totales
 
-    def _resumen_por_tipo(tipo_componente):
-        es_simple = tipo_componente in (ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO)
-        actividades = list(
-            ActividadEvaluacion.objects.filter(
-                docente_asignacion=asignacion,
-                periodo_id=periodo_id,
-                tipo_componente=tipo_componente,
-                estado__in=ACTIVIDADES_ACUMULADO_ESTADOS,
-            )
-            .prefetch_related("indicadores")
-            .order_by("titulo")
+
+def verificar_resumen_asistencia(asignacion, periodo_id, estudiante_ids):
+    """
+    Compara el resumen persistido contra el cálculo en vivo.
+    Retorna lista de (est_id, persistido, en_vivo) con diferencias; None = fila faltante.
+    """
+    est_ids = list(dict.fromkeys(estudiante_ids))
+    if not est_ids:
+        return []
+    persistido = {
+        r["estudiante_id"]: r
+        for r in ResumenAsistenciaEstudiante.objects.filter(
+            docente_asignacion=asignacion,
+            periodo_id=periodo_id,
+            estudiante_id__in=est_ids,
+        ).values("estudiante_id", *CAMPOS_RESUMEN_ASISTENCIA)
+    }
+    diferencias = []
+    for est_id, en_vivo in _totales_asistencia_en_vivo(asignacion, periodo_id, est_ids).items():
+        guardado = persistido.get(est_id)
+        if guardado is not None:
+            guardado = {campo: guardado[campo] for campo in CAMPOS_RESUMEN_ASISTENCIA}
+        if guardado != en_vivo:
+            diferencias.append((est_id, guardado, en_vivo))
+    return diferencias
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  HORARIO SEMANAL COMPILADO
+# ═══════════════════════════════════════════════════════════════════════════
+
+HORARIO_CACHE_TIMEOUT = 60 * 60 * 12
+
+
+def _cache_key_horario(docente_id):
+    return f"libro_docente:horario_semanal:{docente_id}"
+
+
+def _clave_equivalencia_horario(curso_lectivo_id, subarea_id, subgrupo_id, seccion_id, centro_trabajo_id):
+    """Asignaciones equivalentes: mismo docente/curso/materia/grupo/centro."""
+    if subgrupo_id:
+        return (curso_lectivo_id, subarea_id, "SG", subgrupo_id, centro_trabajo_id)
+    return (curso_lectivo_id, subarea_id, "SE", seccion_id, centro_trabajo_id)
+
+
+def compilar_horario_docente(docente_id):
+    """
+    Índice semanal del docente en una consulta:
+    {"directo": {asignacion_id: {dia: lecciones}}, "equivalente": {clave: {dia: lecciones}}}.
+    Las lecciones son números de lección distintos del día (igual que el conteo previo).
+    """
+    directo = {}
+    equivalente = {}
+    for asig_id, dia, leccion, cl_id, subarea_id, subgrupo_id, seccion_id, centro_id in (
+        HorarioDocenteBloque.objects.filter(docente_asignacion__docente_id=docente_id).values_list(
+            "docente_asignacion_id",
+            "dia_semana",
+            "leccion_numero",
+            "docente_asignacion__curso_lectivo_id",
+            "docente_asignacion__subarea_curso__subarea_id",
+            "docente_asignacion__subgrupo_id",
+            "docente_asignacion__seccion_id",
+            "docente_asignacion__centro_trabajo_id",
         )
-        act_max = {}  # actividad_id -> max
-        obt_por_est_act = {}  # (est_id, act_id) -> sum
-        if es_simple:
-            for act in actividades:
-                max_act = act.puntaje_total or Decimal("0")
-                if max_act > 0:
-                    act_max[act.id] = max_act
-            puntajes_raw = list(
-                PuntajeSimple.objects.filter(
-                    actividad_id__in=list(act_max.keys()),
-                    estudiante_id__in=est_ids,
-                )
-                .exclude(puntos_obtenidos__isnull=True)
-                .values("actividad_id", "estudiante_id", "puntos_obtenidos")
-            )
-            for p in puntajes_raw:
-                key = (p["estudiante_id"], p["actividad_id"])
-                obt_por_est_act[key] = p["puntos_obtenidos"]
-        else:
-            act_ind_ids = {}  # actividad_id -> [ind_ids]
-            for act in actividades:
-                inds = [i for i in act.indicadores.all() if i.activo]
-                if not inds:
-                    continue
-                act_ind_ids[act.id] = [i.id for i in inds]
-                act_max[act.id] = sum(i.escala_max for i in inds)
-
-            ind_ids_flat = [iid for ids in act_ind_ids.values() for iid in ids]
-            puntajes_raw = (
-                list(
-                    PuntajeIndicador.objects.filter(
-                        indicador_id__in=ind_ids_flat,
-                        estudiante_id__in=est_ids,
-                    )
-                    .exclude(puntaje_obtenido__isnull=True)
-                    .values("indicador_id", "estudiante_id", "puntaje_obtenido")
-                )
-                if ind_ids_flat
-                else []
-            )
+    ):
+        directo.setdefault(asig_id, {}).setdefault(dia, set()).add(leccion)
+        clave = _clave_equivalencia_horario(cl_id, subarea_id, subgrupo_id, seccion_id, centro_id)
+        equivalente.setdefault(clave, {}).setdefault(dia, set()).add(leccion)
+    return {
+        "directo": {k: {dia: len(lecs) for dia, lecs in dias.items()} for k, dias in directo.items()},
+        "equivalente": {k: {dia: len(lecs) for dia, lecs in dias.items()} for k, dias in equivalente.items()},
+    }
 
-            ind_to_act = {}
-            for act_id, ind_ids in act_ind_ids.items():
-                for iid in ind_ids:
-                    ind_to_act[iid] = act_id
-
-            for p in puntajes_raw:
-                act_id = ind_to_act.get(p["indicador_id"])
-                if act_id:
-                    key = (p["estudiante_id"], act_id)
-                    obt_por_est_act[key] = obt_por_est_act.get(key, Decimal("0")) + p["puntaje_obtenido"]
-
-        pct_comp = obtener_porcentaje_componente_esquema(asignacion, tipo_componente)
-        actividades_map = {a.id: a for a in actividades}
-        resumen = {}
-        for est_id in est_ids:
-            puntos_obt = Decimal("0")
-            puntos_max = Decimal("0")
-            for act_id, max_act in act_max.items():
-                actividad_obj = actividades_map.get(act_id)
-                if actividad_obj and not _actividad_aplica_a_estudiante(
-                    actividad_obj, est_id in adecuacion_ids
-                ):
-                    continue
-                puntos_max += max_act
-                puntos_obt += obt_por_est_act.get((est_id, act_id), Decimal("0"))
-            pct_logro = (puntos_obt / puntos_max * Decimal("100")) if puntos_max > 0 else Decimal("0")
-            aporte = (pct_logro / Decimal("100")) * pct_comp
-            resumen[est_id] = {
-                "puntos_obtenidos": puntos_obt,
-                "puntos_maximos": puntos_max,
-                "porcentaje_logro": pct_logro,
-                "porcentaje_componente": pct_comp,
-                "aporte": aporte,
-                "detalle_actividades": [],  # no usado en grilla principal
-            }
-        return resumen
-
-    resumen_tareas = _resumen_por_tipo(ActividadEvaluacion.TAREA)
-    resumen_cotidianos = _resumen_por_tipo(ActividadEvaluacion.COTIDIANO)
-    resumen_pruebas = _resumen_por_tipo(ActividadEvaluacion.PRUEBA)
-    resumen_proyectos = _resumen_por_tipo(ActividadEvaluacion.PROYECTO)
 
-    filas = []
-    for m in matriculas:
-        est = m.estudiante
-        filas.append({
-            "matricula": m,
-            "estudiante": est,
-            "tareas": resumen_tareas.get(est.id, {}),
-            "cotidianos": resumen_cotidianos.get(est.id, {}),
-            "pruebas": resumen_pruebas.get(est.id, {}),
-            "proyectos": resumen_proyectos.get(est.id, {}),
-            "adecuacion": est.id in adecuacion_ids,
-            "adecuacion_no_sig": est.id in adecuacion_no_sig_ids,
-        })
-    return filas
+def obtener_horario_docente(docente_id):
+    """Índice semanal compilado del docente, desde caché o recién compilado."""
+    key = _cache_key_horario(docente_id)
+    indice = cache.get(key)
+    if indice is None:
+        indice = compilar_horario_docente(docente_id)
+        cache.set(key, indice, HORARIO_CACHE_TIMEOUT)
+    return indice
+
+
+def invalidar_horario_docente(docente_id):
+    cache.delete(_cache_key_horario(docente_id))
+
+
+def lecciones_horario_asignacion(asignacion, dia_iso, indice=None):
+    """
+    Lecciones programadas de la asignación para un día de la semana.
+    Si la asignación no tiene bloques ese día, usa los de asignaciones equivalentes.
+    Retorna (total, es_equivalente).
+    """
+    if indice is None:
+        indice = obtener_horario_docente(asignacion.docente_id)
+    total = indice["directo"].get(asignacion.id, {}).get(dia_iso, 0)
+    if total:
+        return total, False
+    clave = _clave_equivalencia_horario(
+        asignacion.curso_lectivo_id,
+        asignacion.subarea_curso.subarea_id,
+        asignacion.subgrupo_id,
+        asignacion.seccion_id,
+        asignacion.centro_trabajo_id,
+    )
+    return indice["equivalente"].get(clave, {}).get(dia_iso, 0), True
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  CACHÉ DEL HOME DOCENTE
+# ═══════════════════════════════════════════════════════════════════════════
+
+HOME_DOCENTE_CACHE_TIMEOUT = 60 * 60
+
+
+def _incrementar_version_cache(key):
+    """Incrementa un contador de versión; las claves que lo incluyen quedan obsoletas."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _cache_key_version_home(profesor_id):
+    return f"libro_docente:home_docente:version:{profesor_id}"
+
+
+def cache_key_home_docente(profesor_id, institucion_id, fecha, centro_id=0):
+    """
+    Clave de las tarjetas del home por (profesor, institución, fecha, centro).
+    Incluye una versión por profesor para invalidar todas sus variantes de una vez.
+    """
+    version = cache.get(_cache_key_version_home(profesor_id)) or 0
+    return f"libro_docente:home_docente:{profesor_id}:{institucion_id}:{fecha.isoformat()}:{centro_id or 0}:v{version}"
+
+
+def invalidar_home_docente(profesor_id):
+    _incrementar_version_cache(_cache_key_version_home(profesor_id))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  CACHÉ DE LISTA DE ESTUDIANTES (ROSTER) POR ASIGNACIÓN
+# ═══════════════════════════════════════════════════════════════════════════
+
+ROSTER_CACHE_TIMEOUT = 60 * 60 * 6
+_KEY_VERSION_ROSTER_GLOBAL = "libro_docente:roster:version:global"
+
+
+def _cache_key_version_roster_curso(institucion_id, curso_lectivo_id):
+    return f"libro_docente:roster:version:curso:{institucion_id}:{curso_lectivo_id}"
+
+
+def _cache_key_version_roster_asignacion(asignacion_id):
+    return f"libro_docente:roster:version:asignacion:{asignacion_id}"
+
+
+def cache_key_roster(asignacion):
+    """
+    Clave versionada del roster de una asignación. Combina tres versiones:
+    global (nombres de estudiantes), curso (matrículas y listas privadas) y
+    asignación (ocultos y adecuaciones).
+    """
+    claves = (
+        _KEY_VERSION_ROSTER_GLOBAL,
+        _cache_key_version_roster_curso(asignacion.subarea_curso.institucion_id, asignacion.curso_lectivo_id),
+        _cache_key_version_roster_asignacion(asignacion.id),
+    )
+    versiones = cache.get_many(claves)
+    return "libro_docente:roster:{}:v{}.{}.{}".format(asignacion.id, *(versiones.get(k) or 0 for k in claves))
+
+
+def invalidar_roster_asignacion(asignacion_id):
+    _incrementar_version_cache(_cache_key_version_roster_asignacion(asignacion_id))
+
+
+def invalidar_roster_curso(institucion_id, curso_lectivo_id):
+    _incrementar_version_cache(_cache_key_version_roster_curso(institucion_id, curso_lectivo_id))
+
+
+def invalidar_roster_global():
+    _incrementar_version_cache(_KEY_VERSION_ROSTER_GLOBAL)
 
 
 def _actividad_aplica_a_estudiante(actividad, es_adecuacion):
@@ -0,0 +1,235 @@
+"""
+Signals del Libro del Docente.
+Mantienen el acumulado persistido (ResumenComponenteEstudiante) coherente con
+puntajes, indicadores, actividades y marcas de adecuación, y el resumen de
+asistencia (ResumenAsistenciaEstudiante) con sesiones, registros y períodos.
+También invalidan el horario semanal compilado, las tarjetas del home del docente y la
+lista de estudiantes (roster) de cada asignación (caché).
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from evaluaciones.models import DocenteAsignacion, EsquemaEval, EsquemaEvalComponente, PeriodoCursoLectivo
+from matricula.models import Estudiante, MatriculaAcademica
+
+from .models import (
+    ActividadEvaluacion,
+    AsistenciaRegistro,
+    AsistenciaSesion,
+    EstudianteAdecuacionAsignacion,
+    EstudianteAdecuacionNoSignificativaAsignacion,
+    EstudianteOcultoAsignacion,
+    HorarioDocenteBloque,
+    HorarioDocenteConfiguracion,
+    IndicadorActividad,
+    ListaEstudiantesDocente,
+    ListaEstudiantesDocenteItem,
+    PuntajeIndicador,
+    PuntajeSimple,
+)
+from .services import (
+    invalidar_home_docente,
+    invalidar_horario_docente,
+    invalidar_resumen_asistencia,
+    invalidar_resumen_componentes,
+    invalidar_roster_asignacion,
+    invalidar_roster_curso,
+    invalidar_roster_global,
+)
+
+
+def _docente_id_de_asignacion(asignacion_id):
+    return (
+        DocenteAsignacion.objects
+        .filter(pk=asignacion_id)
+        .values_list("docente_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=PuntajeIndicador)
+@receiver(post_delete, sender=PuntajeIndicador)
+def invalidar_resumen_por_puntaje_indicador(sender, instance, **kwargs):
+    act = (
+        IndicadorActividad.objects
+        .filter(pk=instance.indicador_id)
+        .values_list("actividad__docente_asignacion_id", "actividad__periodo_id", "actividad__tipo_componente")
+        .first()
+    )
+    if act:
+        invalidar_resumen_componentes(act[0], act[1], act[2], [instance.estudiante_id])
+
+
+@receiver(post_save, sender=PuntajeSimple)
+@receiver(post_delete, sender=PuntajeSimple)
+def invalidar_resumen_por_puntaje_simple(sender, instance, **kwargs):
+    act = (
+        ActividadEvaluacion.objects
+        .filter(pk=instance.actividad_id)
+        .values_list("docente_asignacion_id", "periodo_id", "tipo_componente")
+        .first()
+    )
+    if act:
+        invalidar_resumen_componentes(act[0], act[1], act[2], [instance.estudiante_id])
+
+
+@receiver(post_save, sender=IndicadorActividad)
+@receiver(post_delete, sender=IndicadorActividad)
+def invalidar_resumen_por_indicador(sender, instance, **kwargs):
+    act = (
+        ActividadEvaluacion.objects
+        .filter(pk=instance.actividad_id)
+        .values_list("docente_asignacion_id", "periodo_id", "tipo_componente")
+        .first()
+    )
+    if act:
+        invalidar_resumen_componentes(act[0], act[1], act[2])
+
+
+@receiver(post_save, sender=ActividadEvaluacion)
+@receiver(post_delete, sender=ActividadEvaluacion)
+def invalidar_resumen_por_actividad(sender, instance, **kwargs):
+    # Estado, alcance, período o tipo pueden haber cambiado: se invalida toda la asignación.
+    invalidar_resumen_componentes(instance.docente_asignacion_id)
+
+
+@receiver(post_save, sender=EstudianteAdecuacionAsignacion)
+@receiver(post_delete, sender=EstudianteAdecuacionAsignacion)
+def invalidar_resumen_por_adecuacion(sender, instance, **kwargs):
+    invalidar_resumen_componentes(instance.docente_asignacion_id, estudiante_ids=[instance.estudiante_id])
+    invalidar_roster_asignacion(instance.docente_asignacion_id)
+
+
+@receiver(post_save, sender=AsistenciaSesion)
+@receiver(post_delete, sender=AsistenciaSesion)
+def invalidar_resumen_por_sesion(sender, instance, **kwargs):
+    # Lecciones, fecha o período pueden haber cambiado: se invalida toda la asignación.
+    invalidar_resumen_asistencia(asignacion_ids=[instance.docente_asignacion_id])
+    # Conteo "sesiones hoy" de las tarjetas del home.
+    docente_id = _docente_id_de_asignacion(instance.docente_asignacion_id)
+    if docente_id:
+        invalidar_home_docente(docente_id)
+
+
+# Solo post_save: un receptor de borrado desactivaría el borrado rápido de registros en
+# cascada al eliminar una sesión, que ya invalida la asignación completa.
+@receiver(post_save, sender=AsistenciaRegistro)
+def invalidar_resumen_por_registro(sender, instance, **kwargs):
+    asignacion_id = (
+        AsistenciaSesion.objects
+        .filter(pk=instance.sesion_id)
+        .values_list("docente_asignacion_id", flat=True)
+        .first()
+    )
+    if asignacion_id:
+        invalidar_resumen_asistencia(asignacion_ids=[asignacion_id], estudiante_ids=[instance.estudiante_id])
+
+
+@receiver(post_save, sender=PeriodoCursoLectivo)
+@receiver(post_delete, sender=PeriodoCursoLectivo)
+def invalidar_resumen_por_limites_periodo(sender, instance, **kwargs):
+    # Cambiar el rango de fechas mueve sesiones entre períodos del curso.
+    invalidar_resumen_asistencia(
+        institucion_id=instance.institucion_id,
+        curso_lectivo_id=instance.curso_lectivo_id,
+    )
+
+
+def _invalidar_por_esquema(esquema_id):
+    docente_ids = (
+        DocenteAsignacion.objects
+        .filter(eval_scheme_snapshot_id=esquema_id)
+        .values_list("docente_id", flat=True)
+        .distinct()
+    )
+    for docente_id in docente_ids:
+        invalidar_home_docente(docente_id)
+
+
+@receiver(post_save, sender=EsquemaEvalComponente)
+@receiver(post_delete, sender=EsquemaEvalComponente)
+def invalidar_por_componente_esquema(sender, instance, **kwargs):
+    # El % de cada componente se muestra en las tarjetas del home. El acumulado persistido
+    # guarda puntos crudos y el % se aplica al leer, así que no se invalida.
+    _invalidar_por_esquema(instance.esquema_id)
+
+
+# pre_delete: al borrar el esquema, SET_NULL suelta las asignaciones antes del post_delete.
+@receiver(post_save, sender=EsquemaEval)
+@receiver(pre_delete, sender=EsquemaEval)
+def invalidar_por_esquema(sender, instance, **kwargs):
+    _invalidar_por_esquema(instance.pk)
+
+
+# horario_docente_view reemplaza los bloques con delete + bulk_create e invalida al confirmar;
+# estos receptores cubren ediciones sueltas (admin) y cambios de la asignación. Sin post_delete:
+# haría que el borrado de la vista perdiera el fast delete; las cascadas desde la asignación las
+# cubre invalidar_horario_por_asignacion.
+@receiver(post_save, sender=HorarioDocenteBloque)
+def invalidar_horario_por_bloque(sender, instance, **kwargs):
+    docente_id = _docente_id_de_asignacion(instance.docente_asignacion_id)
+    if docente_id:
+        invalidar_horario_docente(docente_id)
+        invalidar_home_docente(docente_id)
+
+
+@receiver(post_save, sender=HorarioDocenteConfiguracion)
+@receiver(post_delete, sender=HorarioDocenteConfiguracion)
+def invalidar_horario_por_configuracion(sender, instance, **kwargs):
+    invalidar_horario_docente(instance.docente_id)
+    invalidar_home_docente(instance.docente_id)
+
+
+@receiver(post_save, sender=DocenteAsignacion)
+@receiver(post_delete, sender=DocenteAsignacion)
+def invalidar_horario_por_asignacion(sender, instance, **kwargs):
+    # Grupo, materia o centro de la asignación definen las equivalencias del horario
+    # y las tarjetas del home.
+    invalidar_horario_docente(instance.docente_id)
+    invalidar_home_docente(instance.docente_id)
+
+
+# Roster: la lista de estudiantes de una asignación depende de matrículas, listas privadas,
+# ocultos, marcas de adecuación y el nombre de los estudiantes (orden).
+@receiver(post_save, sender=MatriculaAcademica)
+@receiver(post_delete, sender=MatriculaAcademica)
+def invalidar_roster_por_matricula(sender, instance, **kwargs):
+    invalidar_roster_curso(instance.institucion_id, instance.curso_lectivo_id)
+
+
+@receiver(post_save, sender=ListaEstudiantesDocente)
+@receiver(post_delete, sender=ListaEstudiantesDocente)
+def invalidar_roster_por_lista(sender, instance, **kwargs):
+    invalidar_roster_curso(instance.institucion_id, instance.curso_lectivo_id)
+
+
+@receiver(post_save, sender=ListaEstudiantesDocenteItem)
+@receiver(post_delete, sender=ListaEstudiantesDocenteItem)
+def invalidar_roster_por_item_lista(sender, instance, **kwargs):
+    lista = (
+        ListaEstudiantesDocente.objects
+        .filter(pk=instance.lista_id)
+        .values_list("institucion_id", "curso_lectivo_id")
+        .first()
+    )
+    if lista:
+        invalidar_roster_curso(*lista)
+
+
+@receiver(post_save, sender=EstudianteOcultoAsignacion)
+@receiver(post_delete, sender=EstudianteOcultoAsignacion)
+@receiver(post_save, sender=EstudianteAdecuacionNoSignificativaAsignacion)
+@receiver(post_delete, sender=EstudianteAdecuacionNoSignificativaAsignacion)
+def invalidar_roster_por_marca_estudiante(sender, instance, **kwargs):
+    invalidar_roster_asignacion(instance.docente_asignacion_id)
+
+
+_CAMPOS_ORDEN_ESTUDIANTE = {"primer_apellido", "segundo_apellido", "nombres"}
+
+
+@receiver(post_save, sender=Estudiante)
+def invalidar_roster_por_estudiante(sender, instance, update_fields=None, **kwargs):
+    # El orden del roster usa apellidos y nombres; otros cambios no lo afectan.
+    if update_fields is not None and not _CAMPOS_ORDEN_ESTUDIANTE.intersection(update_fields):
+        return
+    invalidar_roster_global()
@@ -2,17 +2,28 @@
 Tests para el módulo Libro del Docente.
 Cálculo de puntaje base y aporte real de asistencia.
 Evaluación por indicadores (TAREAS/COTIDIANOS).
+Resumen persistido por componente.
 """
 from decimal import Decimal
 
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 
-from .models import ActividadEvaluacion, IndicadorActividad, PuntajeIndicador
+from .models import (
+    ActividadEvaluacion,
+    EstudianteAdecuacionAsignacion,
+    IndicadorActividad,
+    PuntajeIndicador,
+    ResumenComponenteEstudiante,
+)
 from .services import (
     calcular_porcentaje_logro,
+    calcular_resumen_evaluacion_completo,
     calcular_total_maximo_actividad,
     calcular_total_obtenido_estudiante,
+    guardar_puntajes_masivo,
+    obtener_resumen_evaluacion,
     validar_puntaje_en_rango,
+    verificar_resumen_componentes,
 )
 from .views import _nota_mep
 
@@ -256,3 +267,1361 @@ class EvaluacionIndicadoresTests(TestCase):
             validar_puntaje_en_rango(ind, Decimal("4"))
         self.assertIn("4", str(ctx.exception))
         self.assertIn("<=", str(ctx.exception) or "3" in str(ctx.exception))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  RESUMEN PERSISTIDO POR COMPONENTE
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def _crear_grupo_prueba(n_estudiantes=3, sufijo="RES"):
+    """
+    Crea institución, asignación académica, período y n estudiantes matriculados.
+    Retorna dict con los objetos creados.
+    """
+    import datetime
+
+    from catalogos.models import CursoLectivo, Nacionalidad, Nivel, Seccion, Sexo, SubArea, TipoIdentificacion
+    from config_institucional.models import Profesor
+    from core.models import Institucion, User
+    from evaluaciones.models import DocenteAsignacion, Periodo, PeriodoCursoLectivo, SubareaCursoLectivo
+    from matricula.models import Estudiante, EstudianteInstitucion, MatriculaAcademica
+
+    hoy = datetime.date.today()
+    user = User.objects.create_user(
+        email=f"docente_{sufijo.lower()}@test.com",
+        password="test123",
+        first_name="Doc",
+        last_name="Test",
+    )
+    institucion = Institucion.objects.create(
+        nombre=f"INST {sufijo}",
+        correo=f"inst_{sufijo.lower()}@test.com",
+        tipo="A",
+        fecha_inicio=hoy - datetime.timedelta(days=30),
+        fecha_fin=hoy + datetime.timedelta(days=365),
+    )
+    curso_lectivo, _ = CursoLectivo.objects.get_or_create(
+        anio=hoy.year,
+        defaults={
+            "nombre": f"Curso Lectivo {hoy.year}",
+            "fecha_inicio": datetime.date(hoy.year, 1, 1),
+            "fecha_fin": datetime.date(hoy.year, 12, 31),
+        },
+    )
+    nivel, _ = Nivel.objects.get_or_create(numero=7, defaults={"nombre": "7°"})
+    seccion, _ = Seccion.objects.get_or_create(nivel=nivel, numero=1)
+    profesor = Profesor.objects.create(
+        usuario=user,
+        institucion=institucion,
+        identificacion=f"P{sufijo}",
+    )
+    periodo, _ = Periodo.objects.get_or_create(numero=1, defaults={"nombre": "1ER PERÍODO"})
+    subarea = SubArea.objects.create(nombre=f"MATEMÁTICA {sufijo}", es_academica=True)
+    subarea_curso = SubareaCursoLectivo.objects.create(
+        institucion=institucion,
+        curso_lectivo=curso_lectivo,
+        subarea=subarea,
+        activa=True,
+    )
+    asignacion = DocenteAsignacion.objects.create(
+        docente=profesor,
+        subarea_curso=subarea_curso,
+        curso_lectivo=curso_lectivo,
+        seccion=seccion,
+        activo=True,
+    )
+    PeriodoCursoLectivo.objects.get_or_create(
+        institucion=institucion,
+        curso_lectivo=curso_lectivo,
+        periodo=periodo,
+        defaults={"activo": True},
+    )
+    tipo_id, _ = TipoIdentificacion.objects.get_or_create(nombre="OTRO")
+    sexo, _ = Sexo.objects.get_or_create(codigo="F", defaults={"nombre": "Femenino"})
+    nacionalidad, _ = Nacionalidad.objects.get_or_create(nombre="COSTARRICENSE")
+    estudiantes = []
+    for i in range(n_estudiantes):
+        est = Estudiante.objects.create(
+            tipo_identificacion=tipo_id,
+            identificacion=f"{sufijo}{i:04d}",
+            primer_apellido=f"APELLIDO{i:04d}",
+            nombres="EST",
+            fecha_nacimiento=datetime.date(hoy.year - 13, 1, 1),
+            sexo=sexo,
+            nacionalidad=nacionalidad,
+        )
+        EstudianteInstitucion.objects.create(estudiante=est, institucion=institucion, estado="activo")
+        MatriculaAcademica.objects.create(
+            estudiante=est,
+            institucion=institucion,
+            nivel=nivel,
+            seccion=seccion,
+            curso_lectivo=curso_lectivo,
+            estado="activo",
+        )
+        estudiantes.append(est)
+    return {
+        "institucion": institucion,
+        "curso_lectivo": curso_lectivo,
+        "periodo": periodo,
+        "asignacion": asignacion,
+        "estudiantes": estudiantes,
+    }
+
+
+class ResumenPersistidoTests(TestCase):
+    """Acumulado persistido (ResumenComponenteEstudiante) vs cálculo en vivo."""
+
+    def setUp(self):
+        from .views import _get_estudiantes
+
+        datos = _crear_grupo_prueba(n_estudiantes=3)
+        self.__dict__.update(datos)
+        self.matriculas = list(_get_estudiantes(self.asignacion))
+        self.tarea = ActividadEvaluacion.objects.create(
+            docente_asignacion=self.asignacion,
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            tipo_componente=ActividadEvaluacion.TAREA,
+            titulo="Tarea 1",
+            estado=ActividadEvaluacion.ACTIVA,
+        )
+        self.ind1 = IndicadorActividad.objects.create(
+            actividad=self.tarea, orden=1, descripcion="Ind 1", escala_min=0, escala_max=3, activo=True
+        )
+        self.ind2 = IndicadorActividad.objects.create(
+            actividad=self.tarea, orden=2, descripcion="Ind 2", escala_min=0, escala_max=5, activo=True
+        )
+
+    def _filas_por_est(self, filas):
+        return {f["estudiante"].id: f for f in filas}
+
+    def _assert_igual_a_en_vivo(self):
+        persistido = self._filas_por_est(
+            obtener_resumen_evaluacion(self.asignacion, self.periodo.id, self.matriculas)
+        )
+        en_vivo = self._filas_por_est(
+            calcular_resumen_evaluacion_completo(self.asignacion, self.periodo.id, self.matriculas)
+        )
+        self.assertEqual(persistido.keys(), en_vivo.keys())
+        for est_id, fila in en_vivo.items():
+            for clave in ("tareas", "cotidianos", "pruebas", "proyectos"):
+                self.assertEqual(persistido[est_id][clave], fila[clave], (est_id, clave))
+            self.assertEqual(persistido[est_id]["adecuacion"], fila["adecuacion"])
+
+    def test_lectura_crea_filas_y_coincide(self):
+        est = self.estudiantes[0]
+        PuntajeIndicador.objects.create(indicador=self.ind1, estudiante=est, puntaje_obtenido=3)
+        self._assert_igual_a_en_vivo()
+        self.assertEqual(
+            ResumenComponenteEstudiante.objects.filter(docente_asignacion=self.asignacion).count(),
+            len(self.estudiantes) * 4,
+        )
+
+    def test_guardado_masivo_actualiza_en_la_misma_transaccion(self):
+        est_ids = [e.id for e in self.estudiantes]
+        obtener_resumen_evaluacion(self.asignacion, self.periodo.id, self.matriculas)
+        guardar_puntajes_masivo(
+            self.tarea,
+            est_ids,
+            {(self.ind1.id, est_ids[0]): "2", (self.ind2.id, est_ids[0]): "4"},
+        )
+        fila = ResumenComponenteEstudiante.objects.get(
+            docente_asignacion=self.asignacion,
+            periodo=self.periodo,
+            estudiante_id=est_ids[0],
+            tipo_componente=ActividadEvaluacion.TAREA,
+        )
+        self.assertEqual(fila.puntos_obtenidos, Decimal("6"))
+        self.assertEqual(fila.puntos_maximos, Decimal("8"))
+        self._assert_igual_a_en_vivo()
+
+    def test_cambios_de_indicador_actividad_y_adecuacion_invalidan(self):
+        est = self.estudiantes[1]
+        PuntajeIndicador.objects.create(indicador=self.ind2, estudiante=est, puntaje_obtenido=5)
+        self._assert_igual_a_en_vivo()
+
+        self.ind2.activo = False
+        self.ind2.save()
+        self._assert_igual_a_en_vivo()
+
+        self.tarea.alcance_estudiantes = ActividadEvaluacion.ALCANCE_REGULARES
+        self.tarea.save()
+        EstudianteAdecuacionAsignacion.objects.create(docente_asignacion=self.asignacion, estudiante=est)
+        self._assert_igual_a_en_vivo()
+
+        self.tarea.estado = ActividadEvaluacion.CERRADA
+        self.tarea.save()
+        self.ind1.delete()
+        self._assert_igual_a_en_vivo()
+        self.assertEqual(
+            verificar_resumen_componentes(self.asignacion, self.periodo.id, [e.id for e in self.estudiantes]),
+            [],
+        )
+
+    def test_comando_verifica_y_reconstruye(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        est = self.estudiantes[0]
+        obtener_resumen_evaluacion(self.asignacion, self.periodo.id, self.matriculas)
+        # Cambio sin signals (update masivo): el acumulado queda desfasado.
+        PuntajeIndicador.objects.bulk_create(
+            [PuntajeIndicador(indicador=self.ind1, estudiante=est, puntaje_obtenido=1)]
+        )
+        out = StringIO()
+        call_command("reconstruir_resumen_evaluacion", stdout=out)
+        self.assertIn("Diferencias encontradas: 1", out.getvalue())
+
+        call_command("reconstruir_resumen_evaluacion", "--apply", stdout=StringIO())
+        self.assertEqual(
+            verificar_resumen_componentes(self.asignacion, self.periodo.id, [e.id for e in self.estudiantes]),
+            [],
+        )
+        self._assert_igual_a_en_vivo()
+
+    def test_recalculo_bloquea_la_asignacion(self):
+        from .services import BLOQUEO_RESUMEN_EVALUACION
+        from .views import _get_estudiantes
+
+        # Grupo sin cambios previos: el bloqueo solo puede venir del recálculo, y se
+        # mantiene hasta el fin de la transacción (la del test).
+        otro = _crear_grupo_prueba(n_estudiantes=2, sufijo="BLQ")
+        asignacion = otro["asignacion"]
+        self.assertFalse(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_EVALUACION, asignacion.id))
+        obtener_resumen_evaluacion(asignacion, otro["periodo"].id, list(_get_estudiantes(asignacion)))
+        self.assertTrue(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_EVALUACION, asignacion.id))
+
+    def test_invalidacion_bloquea_la_asignacion(self):
+        from .services import BLOQUEO_RESUMEN_EVALUACION, invalidar_resumen_componentes
+
+        invalidar_resumen_componentes(self.asignacion.id, self.periodo.id)
+        self.assertTrue(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_EVALUACION, self.asignacion.id))
+
+
+def _bloqueo_resumen_tomado(espacio, asignacion_id):
+    """pg_advisory_xact_lock(espacio, asignación) tomado por esta conexión."""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND classid = %s "
+            "AND objid = %s AND objsubid = 2 AND pid = pg_backend_pid() AND granted)",
+            [espacio, asignacion_id],
+        )
+        return cursor.fetchone()[0]
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  MOTOR MATRICIAL: PARIDAD CON EL CÁLCULO POR ACTIVIDAD
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def _asignar_esquema(asignacion, porcentajes):
+    """Crea un esquema con {codigo_componente: porcentaje} y lo fija como snapshot."""
+    from evaluaciones.models import ComponenteEval, EsquemaEval, EsquemaEvalComponente
+
+    esquema = EsquemaEval.objects.create(nombre=f"ESQ {asignacion.id}", tipo=EsquemaEval.ACADEMICO)
+    for codigo, pct in porcentajes.items():
+        comp, _ = ComponenteEval.objects.get_or_create(codigo=codigo, defaults={"nombre": codigo})
+        EsquemaEvalComponente.objects.create(esquema=esquema, componente=comp, porcentaje=Decimal(pct))
+    type(asignacion).objects.filter(pk=asignacion.pk).update(eval_scheme_snapshot=esquema)
+    asignacion.refresh_from_db()
+    return esquema
+
+
+class MotorEvaluacionParidadTests(TestCase):
+    """El motor matricial debe producir exactamente lo mismo que el cálculo Decimal por actividad."""
+
+    def setUp(self):
+        from .views import _get_estudiantes
+
+        datos = _crear_grupo_prueba(n_estudiantes=12, sufijo="MOT")
+        self.__dict__.update(datos)
+        self.matriculas = list(_get_estudiantes(self.asignacion))
+        self.est_ids = [m.estudiante_id for m in self.matriculas]
+        _asignar_esquema(
+            self.asignacion,
+            {"TAREAS": "10", "COTIDIANO": "35", "PRUEBA": "35.5", "PROYECTO": "9.75"},
+        )
+
+    def _actividad(self, tipo, titulo, **kwargs):
+        return ActividadEvaluacion.objects.create(
+            docente_asignacion=self.asignacion,
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            tipo_componente=tipo,
+            titulo=titulo,
+            **kwargs,
+        )
+
+    def _poblar_aleatorio(self, semilla):
+        import random
+
+        from .models import PuntajeSimple
+
+        rnd = random.Random(semilla)
+        for est_id in rnd.sample(self.est_ids, 3):
+            EstudianteAdecuacionAsignacion.objects.get_or_create(docente_asignacion=self.asignacion, estudiante_id=est_id)
+        alcances = [
+            ActividadEvaluacion.ALCANCE_TODOS,
+            ActividadEvaluacion.ALCANCE_REGULARES,
+            ActividadEvaluacion.ALCANCE_ADECUACION,
+            "GRUPO",
+            "",
+        ]
+        estados = [ActividadEvaluacion.BORRADOR, ActividadEvaluacion.ACTIVA, ActividadEvaluacion.CERRADA]
+        for n in range(8):
+            tipo = rnd.choice([ActividadEvaluacion.TAREA, ActividadEvaluacion.COTIDIANO])
+            act = self._actividad(
+                tipo, f"Ind {semilla}-{n}", estado=rnd.choice(estados), alcance_estudiantes=rnd.choice(alcances)
+            )
+            for orden in range(rnd.randint(0, 4)):
+                escala_max = rnd.randint(1, 7)
+                ind = IndicadorActividad.objects.create(
+                    actividad=act,
+                    orden=orden,
+                    descripcion=f"I{orden}",
+                    escala_min=0,
+                    escala_max=escala_max,
+                    activo=rnd.random() > 0.2,
+                )
+                PuntajeIndicador.objects.bulk_create([
+                    PuntajeIndicador(
+                        indicador=ind,
+                        estudiante_id=est_id,
+                        puntaje_obtenido=rnd.choice([None, rnd.randint(0, escala_max)]),
+                    )
+                    for est_id in self.est_ids
+                    if rnd.random() > 0.15
+                ])
+        for n in range(5):
+            tipo = rnd.choice([ActividadEvaluacion.PRUEBA, ActividadEvaluacion.PROYECTO])
+            total = rnd.choice([None, 0, rnd.randint(10, 60)])
+            act = self._actividad(
+                tipo,
+                f"Sim {semilla}-{n}",
+                estado=rnd.choice(estados),
+                puntaje_total=total,
+                porcentaje_actividad=Decimal(rnd.randint(5, 20)),
+            )
+            PuntajeSimple.objects.bulk_create([
+                PuntajeSimple(
+                    actividad=act,
+                    estudiante_id=est_id,
+                    puntos_obtenidos=rnd.choice([None, rnd.randint(0, total or 10)]),
+                )
+                for est_id in self.est_ids
+                if rnd.random() > 0.1
+            ])
+
+    def _assert_paridad(self):
+        from .motor_evaluacion import puntos_por_componente
+        from .services import (
+            TIPOS_RESUMEN,
+            _ids_adecuacion,
+            _puntos_por_tipo,
+            _redondear,
+            calcular_resumen_componente_estudiante,
+        )
+
+        adecuacion_ids, _ = _ids_adecuacion(self.asignacion, self.est_ids)
+        motor = puntos_por_componente(self.asignacion, self.periodo.id, self.est_ids, adecuacion_ids, TIPOS_RESUMEN)
+        for tipo in TIPOS_RESUMEN:
+            referencia = _puntos_por_tipo(self.asignacion, self.periodo.id, tipo, self.est_ids, adecuacion_ids)
+            self.assertEqual(motor[tipo], referencia, tipo)
+
+        claves = {
+            ActividadEvaluacion.TAREA: "tareas",
+            ActividadEvaluacion.COTIDIANO: "cotidianos",
+            ActividadEvaluacion.PRUEBA: "pruebas",
+            ActividadEvaluacion.PROYECTO: "proyectos",
+        }
+        filas = calcular_resumen_evaluacion_completo(self.asignacion, self.periodo.id, self.matriculas)
+        for fila in filas:
+            est_id = fila["estudiante"].id
+            for tipo, clave in claves.items():
+                ref = calcular_resumen_componente_estudiante(self.asignacion, self.periodo.id, tipo, est_id)
+                obtenido = fila[clave]
+                for campo in ("puntos_obtenidos", "puntos_maximos", "porcentaje_logro", "porcentaje_componente", "aporte"):
+                    self.assertEqual(obtenido[campo], ref[campo], (est_id, tipo, campo))
+                    self.assertEqual(_redondear(obtenido[campo]), _redondear(ref[campo]), (est_id, tipo, campo))
+
+    def test_paridad_datos_aleatorios(self):
+        for semilla in (1, 7, 42):
+            with self.subTest(semilla=semilla):
+                self._poblar_aleatorio(semilla)
+                self._assert_paridad()
+
+    def test_paridad_sin_actividades(self):
+        self._assert_paridad()
+
+    def test_redondeo_en_el_limite_half_up(self):
+        """1 de 56 puntos con componente 35% => aporte exacto 0.625; redondeo idéntico."""
+        act = self._actividad(ActividadEvaluacion.COTIDIANO, "Límite", estado=ActividadEvaluacion.ACTIVA)
+        ind = IndicadorActividad.objects.create(
+            actividad=act, orden=1, descripcion="I", escala_min=1, escala_max=56, activo=True
+        )
+        PuntajeIndicador.objects.create(indicador=ind, estudiante_id=self.est_ids[0], puntaje_obtenido=1)
+        self._assert_paridad()
+
+    def test_consultas_constantes_por_cantidad_de_actividades(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # 2 adecuaciones + actividades/indicadores + 2 puntajes + esquema y sus 4 %
+        for semilla in (3, 4, 5):
+            self._poblar_aleatorio(semilla)
+            with CaptureQueriesContext(connection) as ctx:
+                calcular_resumen_evaluacion_completo(self.asignacion, self.periodo.id, self.matriculas)
+            self.assertLessEqual(len(ctx), 11)
+
+
+class DetalleComponentesLoteTests(TestCase):
+    """Desglose por actividad por lotes: consultas fijas y modo multi-estudiante."""
+
+    def setUp(self):
+        from .views import _get_estudiantes
+
+        datos = _crear_grupo_prueba(n_estudiantes=4, sufijo="DET")
+        self.__dict__.update(datos)
+        self.matriculas = list(_get_estudiantes(self.asignacion))
+        self.est_ids = [m.estudiante_id for m in self.matriculas]
+        _asignar_esquema(self.asignacion, {"TAREAS": "20", "PRUEBA": "50"})
+
+    def _crear_actividades(self, n):
+        from .models import PuntajeSimple
+
+        for i in range(n):
+            tarea = ActividadEvaluacion.objects.create(
+                docente_asignacion=self.asignacion,
+                institucion=self.institucion,
+                curso_lectivo=self.curso_lectivo,
+                periodo=self.periodo,
+                tipo_componente=ActividadEvaluacion.TAREA,
+                titulo=f"Tarea {i:02d}",
+                estado=ActividadEvaluacion.ACTIVA,
+            )
+            for orden in (2, 1):
+                ind = IndicadorActividad.objects.create(
+                    actividad=tarea, orden=orden, descripcion=f"I{orden}", escala_min=0, escala_max=4, activo=True
+                )
+                PuntajeIndicador.objects.create(indicador=ind, estudiante_id=self.est_ids[0], puntaje_obtenido=orden)
+            prueba = ActividadEvaluacion.objects.create(
+                docente_asignacion=self.asignacion,
+                institucion=self.institucion,
+                curso_lectivo=self.curso_lectivo,
+                periodo=self.periodo,
+                tipo_componente=ActividadEvaluacion.PRUEBA,
+                titulo=f"Prueba {i:02d}",
+                estado=ActividadEvaluacion.ACTIVA,
+                puntaje_total=Decimal("40"),
+                porcentaje_actividad=Decimal("10"),
+            )
+            PuntajeSimple.objects.create(actividad=prueba, estudiante_id=self.est_ids[0], puntos_obtenidos=30)
+
+    def test_detalle_de_un_estudiante(self):
+        from .services import calcular_resumen_componente_estudiante
+
+        self._crear_actividades(2)
+        tareas = calcular_resumen_componente_estudiante(
+            self.asignacion, self.periodo.id, ActividadEvaluacion.TAREA, self.est_ids[0]
+        )
+        self.assertEqual(tareas["puntos_obtenidos"], Decimal("6"))
+        self.assertEqual(tareas["puntos_maximos"], Decimal("16"))
+        self.assertEqual(tareas["aporte"], Decimal("7.5"))
+        self.assertEqual([d["actividad"].titulo for d in tareas["detalle_actividades"]], ["Tarea 00", "Tarea 01"])
+        indicadores = tareas["detalle_actividades"][0]["detalle_indicadores"]
+        self.assertEqual([di["indicador"].orden for di in indicadores], [1, 2])
+        self.assertEqual([di["puntaje"] for di in indicadores], [Decimal("1"), Decimal("2")])
+
+        pruebas = calcular_resumen_componente_estudiante(
+            self.asignacion, self.periodo.id, ActividadEvaluacion.PRUEBA, self.est_ids[0]
+        )
+        self.assertEqual(pruebas["detalle_actividades"][0]["nota"], Decimal("75"))
+        self.assertEqual(pruebas["detalle_actividades"][0]["aporte_actividad"], Decimal("7.5"))
+        self.assertEqual(pruebas["aporte"], Decimal("37.5"))
+
+    def test_consultas_fijas_y_modo_grupo(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .services import calcular_detalle_componentes
+
+        self._crear_actividades(1)
+        self.asignacion.eval_scheme_snapshot  # el esquema queda cacheado en la instancia
+        with CaptureQueriesContext(connection) as pocas:
+            uno = calcular_detalle_componentes(self.asignacion, self.periodo.id, self.est_ids[:1])
+        self._crear_actividades(10)
+        with CaptureQueriesContext(connection) as muchas:
+            grupo = calcular_detalle_componentes(self.asignacion, self.periodo.id, self.est_ids)
+        self.assertEqual(len(pocas), len(muchas))
+        self.assertEqual(set(grupo), set(self.est_ids))
+        self.assertEqual(len(uno[self.est_ids[0]][ActividadEvaluacion.TAREA]["detalle_actividades"]), 1)
+        self.assertEqual(len(grupo[self.est_ids[0]][ActividadEvaluacion.TAREA]["detalle_actividades"]), 11)
+        # Los totales del desglose coinciden con el resumen de la grilla
+        filas = calcular_resumen_evaluacion_completo(self.asignacion, self.periodo.id, self.matriculas)
+        for fila in filas:
+            est_id = fila["estudiante"].id
+            self.assertEqual(fila["tareas"]["aporte"], grupo[est_id][ActividadEvaluacion.TAREA]["aporte"])
+            self.assertEqual(fila["pruebas"]["aporte"], grupo[est_id][ActividadEvaluacion.PRUEBA]["aporte"])
+
+    def test_vista_detalle_grupo(self):
+        from django.urls import reverse
+
+        from core.models import User
+
+        self._crear_actividades(1)
+        admin = User.objects.create_superuser(email="admin_det@test.com", password="test123")
+        self.client.force_login(admin)
+        url = reverse("libro_docente:resumen_detalle_grupo", args=[self.asignacion.id])
+        resp = self.client.get(url, {"periodo": self.periodo.id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["estudiantes"]), len(self.est_ids))
+        self.assertContains(resp, "Tarea 00")
+
+
+class GuardadoMasivoTests(TestCase):
+    """Guardado por diferencias de la grilla de calificación: conteos y consultas O(1)."""
+
+    def setUp(self):
+        from .views import _get_estudiantes
+
+        datos = _crear_grupo_prueba(n_estudiantes=10, sufijo="GUA")
+        self.__dict__.update(datos)
+        self.est_ids = [m.estudiante_id for m in _get_estudiantes(self.asignacion)]
+        self.tarea = ActividadEvaluacion.objects.create(
+            docente_asignacion=self.asignacion,
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            tipo_componente=ActividadEvaluacion.TAREA,
+            titulo="Tarea",
+            estado=ActividadEvaluacion.ACTIVA,
+        )
+        self.indicadores = [
+            IndicadorActividad.objects.create(
+                actividad=self.tarea, orden=i, descripcion=f"I{i}", escala_min=0, escala_max=5, activo=True
+            )
+            for i in range(6)
+        ]
+        self.ind_ids = {ind.id for ind in self.indicadores}
+
+    def _grilla(self, est_ids, valor):
+        return {(ind.id, est_id): valor for ind in self.indicadores for est_id in est_ids}
+
+    def _guardar(self, est_ids, datos):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            conteos, errores = guardar_puntajes_masivo(self.tarea, est_ids, datos, indicadores_ids=self.ind_ids)
+        self.assertEqual(errores, [])
+        return conteos, len(ctx)
+
+    def test_conteos_insertados_actualizados_sin_cambios(self):
+        conteos, _ = self._guardar(self.est_ids, self._grilla(self.est_ids, "3"))
+        self.assertEqual(conteos, {"insertados": 60, "actualizados": 0, "sin_cambios": 0})
+
+        datos = self._grilla(self.est_ids, "3")
+        datos[(self.indicadores[0].id, self.est_ids[0])] = "4"
+        datos[(self.indicadores[1].id, self.est_ids[1])] = ""
+        conteos, _ = self._guardar(self.est_ids, datos)
+        self.assertEqual(conteos, {"insertados": 0, "actualizados": 2, "sin_cambios": 58})
+        self.assertIsNone(
+            PuntajeIndicador.objects.get(indicador=self.indicadores[1], estudiante_id=self.est_ids[1]).puntaje_obtenido
+        )
+        # Las filas presentes coinciden con el cálculo en vivo (las faltantes se calculan al leer).
+        diferencias = verificar_resumen_componentes(self.asignacion, self.periodo.id, self.est_ids)
+        self.assertEqual([d for d in diferencias if d[2] is not None], [])
+
+    def test_consultas_no_crecen_con_el_tamano_de_la_grilla(self):
+        _, pocas = self._guardar(self.est_ids[:2], self._grilla(self.est_ids[:2], "2"))
+        _, muchas = self._guardar(self.est_ids, self._grilla(self.est_ids, "5"))
+        self.assertEqual(pocas, muchas)
+        self.assertLessEqual(muchas, 12)
+        # Sin cambios: solo lecturas, sin escrituras ni recálculo
+        _, sin_cambios = self._guardar(self.est_ids, self._grilla(self.est_ids, "5"))
+        self.assertLessEqual(sin_cambios, 2)
+
+    def test_observaciones_y_puntajes_simples(self):
+        from .models import ObservacionActividadEstudiante
+        from .services import guardar_observaciones_masivo, guardar_puntajes_simples_masivo
+
+        obs = {est_id: "Bien" for est_id in self.est_ids[:3]}
+        self.assertEqual(guardar_observaciones_masivo(self.tarea, obs)["insertados"], 3)
+        obs[self.est_ids[0]] = ""
+        obs[self.est_ids[1]] = "Mejorar"
+        conteos = guardar_observaciones_masivo(self.tarea, obs)
+        self.assertEqual(
+            conteos, {"insertados": 0, "actualizados": 1, "sin_cambios": 1, "eliminados": 1}
+        )
+        self.assertEqual(ObservacionActividadEstudiante.objects.filter(actividad=self.tarea).count(), 2)
+
+        prueba = ActividadEvaluacion.objects.create(
+            docente_asignacion=self.asignacion,
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            tipo_componente=ActividadEvaluacion.PRUEBA,
+            titulo="Prueba",
+            estado=ActividadEvaluacion.ACTIVA,
+            puntaje_total=Decimal("50"),
+            porcentaje_actividad=Decimal("20"),
+        )
+        puntajes = {est_id: Decimal("40") for est_id in self.est_ids}
+        self.assertEqual(guardar_puntajes_simples_masivo(prueba, puntajes)["insertados"], 10)
+        puntajes[self.est_ids[0]] = None
+        conteos = guardar_puntajes_simples_masivo(prueba, puntajes)
+        self.assertEqual(conteos, {"insertados": 0, "actualizados": 1, "sin_cambios": 9})
+        # Las filas presentes coinciden con el cálculo en vivo (las faltantes se calculan al leer).
+        diferencias = verificar_resumen_componentes(self.asignacion, self.periodo.id, self.est_ids)
+        self.assertEqual([d for d in diferencias if d[2] is not None], [])
+
+
+class MotorAsistenciaParidadTests(TestCase):
+    """El motor matricial de asistencia reproduce las reglas por celda del cálculo anterior."""
+
+    ESTADOS = ["P", "TM", "TC", "AI", "AJ", "T", "X"]
+
+    def _crear_sesiones(self, datos, n_sesiones, seed):
+        import datetime
+        import random
+
+        from .models import AsistenciaRegistro, AsistenciaSesion
+
+        rnd = random.Random(seed)
+        inicio = datetime.date(datos["curso_lectivo"].anio, 2, 1)
+        sesiones = AsistenciaSesion.objects.bulk_create([
+            AsistenciaSesion(
+                docente_asignacion=datos["asignacion"],
+                institucion=datos["institucion"],
+                curso_lectivo=datos["curso_lectivo"],
+                periodo=datos["periodo"],
+                fecha=inicio + datetime.timedelta(days=i),
+                sesion_numero=1,
+                lecciones=rnd.choice([0, 1, 2, 3, 4, 6]),
+            )
+            for i in range(n_sesiones)
+        ])
+        registros = []
+        for ses in sesiones:
+            for est in datos["estudiantes"]:
+                if rnd.random() < 0.15:
+                    continue  # sin registro
+                cantidad = rnd.choice([None, None, Decimal("0"), Decimal("0.5"), Decimal("1"),
+                                       Decimal("1.5"), Decimal("3"), Decimal("9"), Decimal("-1")])
+                registros.append(AsistenciaRegistro(
+                    sesion=ses,
+                    estudiante=est,
+                    estado=rnd.choice(self.ESTADOS),
+                    lecciones_injustificadas=cantidad,
+                ))
+        AsistenciaRegistro.objects.bulk_create(registros)
+        return sesiones
+
+    def _referencia(self, sesiones, est):
+        """Reglas por celda tal como las aplicaba _calcular_resumen antes del motor."""
+        from django.core.exceptions import ValidationError
+
+        from .models import AsistenciaRegistro
+        from .views import _calcular_detalle_dia_asistencia, _normalizar_estado_asistencia
+
+        regs = {r.sesion_id: r for r in AsistenciaRegistro.objects.filter(estudiante=est)}
+        tot = {k: Decimal("0") for k in ("presentes", "tm", "tc", "ai", "aj", "inj")}
+        for s in sesiones:
+            lecciones = Decimal(str(s.lecciones or 1))
+            reg = regs.get(s.id)
+            if reg is None:
+                tot["inj"] += lecciones
+                tot["ai"] += lecciones
+                continue
+            estado = _normalizar_estado_asistencia(reg.estado)
+            try:
+                d = _calcular_detalle_dia_asistencia(
+                    estado=estado, lecciones_dia=lecciones, cantidad_ingresada=reg.lecciones_injustificadas,
+                    legacy_full_day_ai=True, cantidad_es_equivalente=True,
+                )
+            except ValidationError:
+                d = _calcular_detalle_dia_asistencia(
+                    estado=estado, lecciones_dia=lecciones, cantidad_ingresada=None, legacy_full_day_ai=True,
+                )
+            tot["inj"] += d["lecc_inj_equiv"]
+            tot["presentes"] += d["presentes"]
+            tot["tm"] += d["tm_cantidad"]
+            tot["tc"] += d["tc_cantidad"]
+            tot["ai"] += d["ai_cantidad"]
+            tot["aj"] += d["aj_cantidad"]
+        return tot
+
+    def test_paridad_con_reglas_por_celda(self):
+        from .views import _calcular_porcentajes_asistencia, _calcular_resumen, _get_estudiantes
+
+        for seed in (1, 2, 3):
+            datos = _crear_grupo_prueba(n_estudiantes=8, sufijo=f"ASI{seed}")
+            sesiones = self._crear_sesiones(datos, 25, seed)
+            resumen = _calcular_resumen(datos["asignacion"], datos["periodo"], _get_estudiantes(datos["asignacion"]))
+            total_lecciones = sum((s.lecciones or 1) for s in sesiones)
+            self.assertEqual(resumen["total_sesiones"], 25)
+            self.assertEqual(resumen["total_lecciones_periodo"], total_lecciones)
+            for fila in resumen["estudiantes"]:
+                ref = self._referencia(sesiones, fila["estudiante"])
+                pct, pct_asistencia = _calcular_porcentajes_asistencia(total_lecciones, ref["inj"])
+                self.assertEqual(fila["presentes"], ref["presentes"].quantize(Decimal("0.1")))
+                self.assertEqual(fila["tardias_media"], ref["tm"].quantize(Decimal("0.1")))
+                self.assertEqual(fila["tardias_completa"], ref["tc"].quantize(Decimal("0.1")))
+                self.assertEqual(fila["ausentes_inj_lecciones"], ref["ai"].quantize(Decimal("0.1")))
+                self.assertEqual(fila["ausentes_just"], ref["aj"].quantize(Decimal("0.1")))
+                self.assertEqual(fila["ausentes_inj_equiv"], ref["inj"].quantize(Decimal("0.01")))
+                self.assertEqual(fila["pct"], round(pct, 2))
+                self.assertEqual(fila["nota_mep"], _nota_mep(pct))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_consultas_constantes_en_periodo_grande(self):
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .views import _calcular_resumen, _get_estudiantes
+
+        cache.clear()
+        datos = _crear_grupo_prueba(n_estudiantes=40, sufijo="ASIG")
+        self._crear_sesiones(datos, 120, 7)
+        matriculas = list(_get_estudiantes(datos["asignacion"]))
+        with CaptureQueriesContext(connection) as ctx:
+            resumen = _calcular_resumen(datos["asignacion"], datos["periodo"], matriculas)
+        self.assertEqual(len(resumen["estudiantes"]), 40)
+        # Incluye el guardado del resumen persistido (upsert + savepoint).
+        self.assertLessEqual(len(ctx), 10)
+        with CaptureQueriesContext(connection) as ctx:
+            _calcular_resumen(datos["asignacion"], datos["periodo"], matriculas)
+        self.assertLessEqual(len(ctx), 4)
+
+
+class ResumenAsistenciaPersistidoTests(TestCase):
+    """Resumen de asistencia persistido: mantenimiento incremental, lectura y comando."""
+
+    def setUp(self):
+        import datetime
+
+        from evaluaciones.models import PeriodoCursoLectivo
+
+        from .views import _get_estudiantes
+
+        datos = _crear_grupo_prueba(n_estudiantes=4, sufijo="RAS")
+        self.__dict__.update(datos)
+        self.matriculas = list(_get_estudiantes(self.asignacion))
+        self.est_ids = [m.estudiante_id for m in self.matriculas]
+        anio = self.curso_lectivo.anio
+        self.pcl = PeriodoCursoLectivo.objects.get(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, periodo=self.periodo
+        )
+        self.pcl.fecha_inicio = datetime.date(anio, 2, 1)
+        self.pcl.fecha_fin = datetime.date(anio, 6, 30)
+        self.pcl.save()
+        self.fecha = datetime.date(anio, 3, 2)
+
+    def _sesion(self, fecha, lecciones=4):
+        from .models import AsistenciaSesion
+
+        return AsistenciaSesion.objects.create(
+            docente_asignacion=self.asignacion,
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            fecha=fecha,
+            sesion_numero=1,
+            lecciones=lecciones,
+        )
+
+    def _filas(self):
+        from .models import ResumenAsistenciaEstudiante
+
+        return {
+            r.estudiante_id: r
+            for r in ResumenAsistenciaEstudiante.objects.filter(
+                docente_asignacion=self.asignacion, periodo=self.periodo
+            )
+        }
+
+    def test_lectura_persistida_y_signals_invalidan(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import AsistenciaRegistro
+        from .services import verificar_resumen_asistencia
+        from .views import _calcular_resumen
+
+        sesion = self._sesion(self.fecha)
+        AsistenciaRegistro.objects.create(sesion=sesion, estudiante_id=self.est_ids[0], estado="P")
+        resumen = _calcular_resumen(self.asignacion, self.periodo, self.matriculas)
+        self.assertEqual(len(self._filas()), 4)
+        self.assertEqual(resumen["total_lecciones_periodo"], 4)
+
+        with CaptureQueriesContext(connection) as ctx:
+            segundo = _calcular_resumen(self.asignacion, self.periodo, self.matriculas)
+        self.assertEqual(
+            [f["ausentes_inj_equiv"] for f in segundo["estudiantes"]],
+            [f["ausentes_inj_equiv"] for f in resumen["estudiantes"]],
+        )
+        self.assertFalse(any("asistencia_registro" in q["sql"] for q in ctx.captured_queries))
+
+        # Registro editado: solo se invalida la fila de ese estudiante.
+        reg = AsistenciaRegistro.objects.get(sesion=sesion, estudiante_id=self.est_ids[0])
+        reg.estado = "AI"
+        reg.save()
+        self.assertEqual(set(self._filas()), set(self.est_ids[1:]))
+        _calcular_resumen(self.asignacion, self.periodo, self.matriculas)
+        self.assertEqual(self._filas()[self.est_ids[0]].ausentes_inj, Decimal("4"))
+
+        # Cambio de límites del período: se invalida el curso completo.
+        self.pcl.fecha_fin = self.fecha.replace(day=1)
+        self.pcl.save()
+        self.assertEqual(self._filas(), {})
+        resumen = _calcular_resumen(self.asignacion, self.periodo, self.matriculas)
+        self.assertEqual(resumen["total_sesiones"], 0)
+        self.assertEqual(verificar_resumen_asistencia(self.asignacion, self.periodo.id, self.est_ids), [])
+
+    def test_asistencia_view_mantiene_resumen_al_guardar_y_eliminar(self):
+        from django.urls import reverse
+
+        user = self.asignacion.docente.usuario
+        user.is_superuser = True
+        user.save()
+        self.client.force_login(user)
+        url = reverse("libro_docente:asistencia", args=[self.asignacion.id])
+        post = {"fecha": self.fecha.isoformat(), "lecciones": "5"}
+        post.update({f"estado_{est_id}": "P" for est_id in self.est_ids})
+        post[f"estado_{self.est_ids[1]}"] = "AI"
+        post[f"inj_{self.est_ids[1]}"] = "2"
+        self.client.post(url, post)
+
+        filas = self._filas()
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[self.est_ids[1]].ausentes_inj, Decimal("2"))
+        self.assertEqual(filas[self.est_ids[0]].presentes, Decimal("5"))
+        self.assertEqual(filas[self.est_ids[0]].total_lecciones, 5)
+
+        self.client.post(url, {"fecha": self.fecha.isoformat(), "accion": "eliminar"})
+        filas = self._filas()
+        self.assertEqual(len(filas), 4)
+        self.assertTrue(all(f.total_sesiones == 0 and f.ausentes_inj == 0 for f in filas.values()))
+
+    def test_comando_verifica_y_reconstruye(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from .models import AsistenciaRegistro, ResumenAsistenciaEstudiante
+        from .services import recalcular_resumen_asistencia
+
+        sesion = self._sesion(self.fecha)
+        AsistenciaRegistro.objects.create(sesion=sesion, estudiante_id=self.est_ids[0], estado="TC")
+        recalcular_resumen_asistencia(self.asignacion, self.periodo.id, self.est_ids)
+        ResumenAsistenciaEstudiante.objects.filter(estudiante_id=self.est_ids[0]).update(ausentes_inj=Decimal("0"))
+
+        out = StringIO()
+        call_command("reconstruir_resumen_asistencia", asignacion_id=self.asignacion.id, stdout=out)
+        self.assertIn("Diferencias encontradas: 1", out.getvalue())
+        call_command("reconstruir_resumen_asistencia", asignacion_id=self.asignacion.id, apply=True, stdout=StringIO())
+        self.assertEqual(self._filas()[self.est_ids[0]].ausentes_inj, Decimal("1"))
+
+    def test_recalculo_e_invalidacion_del_curso_bloquean_asignaciones(self):
+        from catalogos.models import Seccion
+        from evaluaciones.models import DocenteAsignacion
+
+        from .services import BLOQUEO_RESUMEN_ASISTENCIA, invalidar_resumen_asistencia, obtener_resumen_asistencia
+
+        # Asignaciones creadas después del montaje: ningún cambio previo las bloqueó. El
+        # bloqueo dura hasta el fin de la transacción (la del test).
+        leida, sin_filas = (
+            DocenteAsignacion.objects.create(
+                docente=self.asignacion.docente,
+                subarea_curso=self.asignacion.subarea_curso,
+                curso_lectivo=self.curso_lectivo,
+                seccion=Seccion.objects.get_or_create(nivel=self.asignacion.seccion.nivel, numero=numero)[0],
+            )
+            for numero in (2, 3)
+        )
+        self.assertFalse(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_ASISTENCIA, leida.id))
+        obtener_resumen_asistencia(leida, self.periodo.id, self.est_ids[:1])
+        self.assertTrue(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_ASISTENCIA, leida.id))
+
+        self.assertFalse(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_ASISTENCIA, sin_filas.id))
+        invalidar_resumen_asistencia(institucion_id=self.institucion.id, curso_lectivo_id=self.curso_lectivo.id)
+        self.assertTrue(_bloqueo_resumen_tomado(BLOQUEO_RESUMEN_ASISTENCIA, sin_filas.id))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class HorarioCompiladoTests(TestCase):
+    """Horario semanal compilado: conteos por día, respaldo equivalente y caché."""
+
+    def setUp(self):
+        import datetime
+
+        from django.core.cache import cache
+
+        from evaluaciones.models import DocenteAsignacion
+
+        from .models import HorarioDocenteBloque, HorarioDocenteConfiguracion
+
+        cache.clear()
+        datos = _crear_grupo_prueba(n_estudiantes=1, sufijo="HOR")
+        self.asignacion = datos["asignacion"]
+        # Asignación equivalente legacy (mismo docente/materia/grupo) sin bloques propios;
+        # bulk_create evita el anti-duplicado de save() para simular el dato heredado.
+        (self.equivalente,) = DocenteAsignacion.objects.bulk_create([DocenteAsignacion(
+            docente=self.asignacion.docente,
+            subarea_curso=self.asignacion.subarea_curso,
+            curso_lectivo=self.asignacion.curso_lectivo,
+            seccion=self.asignacion.seccion,
+            activo=True,
+        )])
+        self.config = HorarioDocenteConfiguracion.objects.create(
+            docente=self.asignacion.docente,
+            institucion=datos["institucion"],
+        )
+        for dia, leccion in ((1, 1), (1, 2), (1, 3), (3, 5)):
+            HorarioDocenteBloque.objects.create(
+                configuracion=self.config, dia_semana=dia, leccion_numero=leccion,
+                docente_asignacion=self.asignacion,
+            )
+        self.lunes = datetime.date(2026, 3, 2)
+
+    def test_directo_equivalente_y_dia_forzado(self):
+        from .views import _lecciones_programadas_para_fecha
+
+        self.assertEqual(_lecciones_programadas_para_fecha(self.asignacion, self.lunes), 3)
+        self.assertEqual(_lecciones_programadas_para_fecha(self.asignacion, self.lunes, dia_iso_forzado=3), 1)
+        self.assertEqual(_lecciones_programadas_para_fecha(self.asignacion, self.lunes, dia_iso_forzado=2), 0)
+        self.assertEqual(_lecciones_programadas_para_fecha(self.equivalente, self.lunes), 3)
+
+    def test_lectura_desde_cache_e_invalidacion_al_editar_horario(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+
+        from .views import _lecciones_programadas_para_fecha
+
+        _lecciones_programadas_para_fecha(self.asignacion, self.lunes)
+        with CaptureQueriesContext(connection) as ctx:
+            for dia in range(1, 8):
+                _lecciones_programadas_para_fecha(self.asignacion, self.lunes, dia_iso_forzado=dia)
+        self.assertEqual(len(ctx), 0)
+
+        user = self.asignacion.docente.usuario
+        user.is_superuser = True
+        user.save()
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("libro_docente:horario_docente"), {
+                "accion": "guardar_horario",
+                "max_lecciones_dia": "8",
+                "h_1_1": str(self.asignacion.id),
+                "h_1_4": str(self.asignacion.id),
+            })
+        self.assertEqual(_lecciones_programadas_para_fecha(self.asignacion, self.lunes), 2)
+        self.assertEqual(_lecciones_programadas_para_fecha(self.asignacion, self.lunes, dia_iso_forzado=3), 0)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class HomeDocenteTests(TestCase):
+    """Home docente: consultas constantes por número de asignaciones y caché invalidada por signals."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        datos = _crear_grupo_prueba(n_estudiantes=1, sufijo="HOME")
+        self.__dict__.update(datos)
+        self.user = self.asignacion.docente.usuario
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+    def _agregar_asignaciones(self, n):
+        from catalogos.models import SubArea
+        from evaluaciones.models import DocenteAsignacion, SubareaCursoLectivo
+
+        for i in range(n):
+            subarea = SubArea.objects.create(nombre=f"MATERIA HOME {i:02d}", es_academica=True)
+            subarea_curso = SubareaCursoLectivo.objects.create(
+                institucion=self.institucion,
+                curso_lectivo=self.curso_lectivo,
+                subarea=subarea,
+                activa=True,
+            )
+            DocenteAsignacion.objects.create(
+                docente=self.asignacion.docente,
+                subarea_curso=subarea_curso,
+                curso_lectivo=self.curso_lectivo,
+                seccion=self.asignacion.seccion,
+                activo=True,
+            )
+
+    def _consultas_home(self, **params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("libro_docente:home"), params)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx), resp
+
+    def test_consultas_planas_de_1_a_30_asignaciones(self):
+        una, resp = self._consultas_home()
+        self.assertEqual(len(resp.context["asignaciones"]), 1)
+        self._agregar_asignaciones(29)
+        treinta, resp = self._consultas_home()
+        self.assertEqual(len(resp.context["asignaciones"]), 30)
+        self.assertEqual(una, treinta)
+
+    def test_cache_y_invalidacion_por_sesion_de_asistencia(self):
+        from django.utils import timezone
+
+        from .models import AsistenciaSesion
+
+        fria, resp = self._consultas_home()
+        self.assertEqual(resp.context["asignaciones"][0]["sesiones_hoy"], 0)
+        caliente, _ = self._consultas_home()
+        self.assertLess(caliente, fria)
+
+        AsistenciaSesion.objects.create(
+            docente_asignacion=self.asignacion,
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            fecha=timezone.localdate(),
+            sesion_numero=1,
+            lecciones=2,
+        )
+        _, resp = self._consultas_home()
+        self.assertEqual(resp.context["asignaciones"][0]["sesiones_hoy"], 1)
+        # Los filtros se aplican sobre las tarjetas cacheadas.
+        self._agregar_asignaciones(2)
+        _, resp = self._consultas_home(materia=self.asignacion.subarea_curso.subarea_id)
+        self.assertEqual([t["obj"].id for t in resp.context["asignaciones"]], [self.asignacion.id])
+        self.assertEqual(len(resp.context["materias_filtro"]), 3)
+
+    def test_invalidacion_por_cambio_de_esquema(self):
+        from .models import ResumenComponenteEstudiante
+
+        esquema = _asignar_esquema(self.asignacion, {"TAR": "30", "PRU": "70"})
+        _, resp = self._consultas_home()
+        self.assertEqual(
+            sorted(c["porcentaje"] for c in resp.context["asignaciones"][0]["componentes"]),
+            [Decimal("30"), Decimal("70")],
+        )
+        ResumenComponenteEstudiante.objects.create(
+            docente_asignacion=self.asignacion,
+            periodo=self.periodo,
+            estudiante=self.estudiantes[0],
+            tipo_componente="TAREA",
+        )
+
+        componente = esquema.componentes_esquema.get(componente__codigo="TAR")
+        componente.porcentaje = Decimal("40")
+        componente.save()
+        _, resp = self._consultas_home()
+        self.assertIn(Decimal("40"), [c["porcentaje"] for c in resp.context["asignaciones"][0]["componentes"]])
+        # El acumulado guarda puntos crudos (el % se aplica al leer): no se invalida.
+        self.assertTrue(ResumenComponenteEstudiante.objects.filter(docente_asignacion=self.asignacion).exists())
+
+        componente.delete()
+        _, resp = self._consultas_home()
+        self.assertEqual(len(resp.context["asignaciones"][0]["componentes"]), 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RosterCacheTests(TestCase):
+    """Roster cacheado por asignación: aciertos sin consultas de matrícula e invalidación por signals."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        datos = _crear_grupo_prueba(n_estudiantes=4, sufijo="ROS")
+        self.__dict__.update(datos)
+
+    def _roster(self):
+        from .views import _roster_asignacion
+
+        return _roster_asignacion(self.asignacion)
+
+    def test_acierto_de_cache_sin_consultas(self):
+        fria = self._roster()
+        self.assertEqual(fria["estudiante_ids"], [e.id for e in self.estudiantes])
+        with self.assertNumQueries(0):
+            caliente = self._roster()
+        self.assertEqual(caliente, fria)
+
+    def test_ocultos_y_adecuacion_invalidan(self):
+        from .models import EstudianteOcultoAsignacion
+        from .views import _get_estudiantes, _get_estudiantes_base, _get_ids_adecuacion
+
+        self._roster()
+        oculto = self.estudiantes[1]
+        EstudianteOcultoAsignacion.objects.create(docente_asignacion=self.asignacion, estudiante=oculto)
+        roster = self._roster()
+        self.assertNotIn(oculto.id, roster["estudiante_ids"])
+        self.assertEqual(len(roster["base_matricula_ids"]), 4)
+        self.assertEqual(_get_estudiantes(self.asignacion).count(), 3)
+        self.assertEqual(_get_estudiantes_base(self.asignacion).count(), 4)
+
+        EstudianteAdecuacionAsignacion.objects.create(
+            docente_asignacion=self.asignacion, estudiante=self.estudiantes[0]
+        )
+        self.assertEqual(_get_ids_adecuacion(self.asignacion), {self.estudiantes[0].id})
+
+    def test_nueva_matricula_y_cambio_de_nombre(self):
+        from matricula.models import Estudiante, MatriculaAcademica
+
+        self._roster()
+        nuevo = Estudiante.objects.create(
+            tipo_identificacion=self.estudiantes[0].tipo_identificacion,
+            identificacion="ROSNUEVO",
+            primer_apellido="AAAA",
+            nombres="EST",
+            fecha_nacimiento=self.estudiantes[0].fecha_nacimiento,
+            sexo=self.estudiantes[0].sexo,
+            nacionalidad=self.estudiantes[0].nacionalidad,
+        )
+        MatriculaAcademica.objects.create(
+            estudiante=nuevo,
+            institucion=self.institucion,
+            nivel=self.asignacion.seccion.nivel,
+            seccion=self.asignacion.seccion,
+            curso_lectivo=self.curso_lectivo,
+            estado="activo",
+        )
+        self.assertEqual(self._roster()["estudiante_ids"][0], nuevo.id)
+
+        nuevo.primer_apellido = "ZZZZ"
+        nuevo.save(update_fields=["primer_apellido"])
+        self.assertEqual(self._roster()["estudiante_ids"][-1], nuevo.id)
+
+    def test_materializacion_en_una_consulta(self):
+        from .views import _matriculas_asignacion
+
+        self._roster()
+        with self.assertNumQueries(1):
+            matriculas = _matriculas_asignacion(self.asignacion)
+            nombres = [m.estudiante.primer_apellido for m in matriculas]
+        self.assertEqual(nombres, sorted(nombres))
+
+
+def _preparar_exportacion_institucional(sufijo):
+    """Grupo de prueba con dos asignaciones activas en la misma institución."""
+    from catalogos.models import SubArea
+    from evaluaciones.models import DocenteAsignacion, SubareaCursoLectivo
+
+    datos = _crear_grupo_prueba(n_estudiantes=3, sufijo=sufijo)
+    subarea = SubArea.objects.create(nombre=f"CIENCIAS {sufijo}", es_academica=True)
+    subarea_curso = SubareaCursoLectivo.objects.create(
+        institucion=datos["institucion"],
+        curso_lectivo=datos["curso_lectivo"],
+        subarea=subarea,
+        activa=True,
+    )
+    datos["asignacion_2"] = DocenteAsignacion.objects.bulk_create([
+        DocenteAsignacion(
+            docente=datos["asignacion"].docente,
+            subarea_curso=subarea_curso,
+            curso_lectivo=datos["curso_lectivo"],
+            seccion=datos["asignacion"].seccion,
+            activo=True,
+        )
+    ])[0]
+    return datos
+
+
+class ExportacionInstitucionalTests(TestCase):
+    """Exportación institucional en segundo plano: archivo XLSX/CSV, avance y vistas."""
+
+    def setUp(self):
+        import tempfile
+
+        self._media = tempfile.TemporaryDirectory()
+        self._override = override_settings(MEDIA_ROOT=self._media.name)
+        self._override.enable()
+        self.__dict__.update(_preparar_exportacion_institucional("EXP"))
+
+    def tearDown(self):
+        self._override.disable()
+        self._media.cleanup()
+
+    def _crear(self, formato):
+        from .models import ExportacionInstitucional
+
+        return ExportacionInstitucional.objects.create(
+            institucion=self.institucion,
+            curso_lectivo=self.curso_lectivo,
+            periodo=self.periodo,
+            formato=formato,
+        )
+
+    def test_xlsx_una_hoja_por_asignacion(self):
+        import openpyxl
+
+        from .exportacion import ejecutar_exportacion
+        from .models import ExportacionInstitucional
+        from .views import _datos_resumen_general_export, _valores_resumen_general
+
+        exp = ejecutar_exportacion(self._crear(ExportacionInstitucional.XLSX).id, procesos=1)
+        self.assertEqual(exp.estado, ExportacionInstitucional.COMPLETADA, exp.error)
+        self.assertEqual((exp.procesadas, exp.total, exp.porcentaje), (2, 2, 100))
+
+        with exp.archivo.open("rb") as f:
+            wb = openpyxl.load_workbook(f, read_only=True)
+            self.assertEqual(len(wb.sheetnames), 2)
+            ws = wb[wb.sheetnames[1]]
+            filas = [list(r) for r in ws.iter_rows(min_row=3, values_only=True)]
+            wb.close()
+        has_proyecto, filas_general = _datos_resumen_general_export(self.asignacion, self.periodo.id)
+        esperado = [_valores_resumen_general(r, has_proyecto) for r in filas_general]
+        self.assertEqual(filas, [r[:2] + [float(v) for v in r[2:]] for r in esperado])
+
+    def test_csv_tabla_unica(self):
+        import csv
+
+        from .exportacion import ENCABEZADOS_CSV, ejecutar_exportacion
+        from .models import ExportacionInstitucional
+
+        exp = ejecutar_exportacion(self._crear(ExportacionInstitucional.CSV).id, procesos=1)
+        self.assertEqual(exp.estado, ExportacionInstitucional.COMPLETADA, exp.error)
+        with exp.archivo.open("rb") as f:
+            filas = list(csv.reader(f.read().decode("utf-8").splitlines()))
+        self.assertEqual(filas[0], ENCABEZADOS_CSV)
+        self.assertEqual(len(filas), 1 + 2 * 3)
+        self.assertEqual(
+            {int(r[0]) for r in filas[1:]},
+            {self.asignacion.id, self.asignacion_2.id},
+        )
+        # Solo se procesa una vez.
+        self.assertEqual(ejecutar_exportacion(exp.id, procesos=1).estado, ExportacionInstitucional.COMPLETADA)
+
+    def test_vistas_solicitud_estado_y_descarga(self):
+        from django.urls import reverse
+
+        from evaluaciones.models import PeriodoCursoLectivo
+
+        from .exportacion import ejecutar_exportacion
+        from .models import ExportacionInstitucional
+
+        user = self.asignacion.docente.usuario
+        user.is_superuser = True
+        user.save()
+        self.client.force_login(user)
+        pcl = PeriodoCursoLectivo.objects.get(
+            institucion=self.institucion, curso_lectivo=self.curso_lectivo, periodo=self.periodo
+        )
+        url = reverse("libro_docente:exportacion_institucional")
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            resp = self.client.post(url, {
+                "institucion": self.institucion.id,
+                "periodo_curso": pcl.id,
+                "formato": ExportacionInstitucional.CSV,
+            })
+        self.assertEqual(resp.status_code, 302)
+        # La solicitud web no procesa: queda para el comando.
+        self.assertEqual(len(callbacks), 0)
+        exp = ExportacionInstitucional.objects.get(institucion=self.institucion)
+        self.assertEqual(exp.estado, ExportacionInstitucional.PENDIENTE)
+
+        url_estado = reverse("libro_docente:exportacion_institucional_estado", args=[exp.id])
+        self.assertIsNone(self.client.get(url_estado).json()["url_descarga"])
+        ejecutar_exportacion(exp.id, procesos=1)
+        datos = self.client.get(url_estado).json()
+        self.assertEqual((datos["estado"], datos["porcentaje"]), (ExportacionInstitucional.COMPLETADA, 100))
+        resp = self.client.get(datos["url_descarga"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"asignacion_id", b"".join(resp.streaming_content))
+
+
+    def test_comando_retoma_exportacion_abandonada(self):
+        from datetime import timedelta
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        from .exportacion import PLAZO_RECLAMO
+        from .models import ExportacionInstitucional
+
+        ahora = timezone.now()
+        abandonada = self._crear(ExportacionInstitucional.CSV)
+        en_curso = self._crear(ExportacionInstitucional.CSV)
+        ExportacionInstitucional.objects.filter(pk=abandonada.pk).update(
+            estado=ExportacionInstitucional.PROCESANDO, reclamado_en=ahora - PLAZO_RECLAMO - timedelta(minutes=1)
+        )
+        ExportacionInstitucional.objects.filter(pk=en_curso.pk).update(
+            estado=ExportacionInstitucional.PROCESANDO, reclamado_en=ahora
+        )
+
+        out = StringIO()
+        call_command("procesar_exportaciones_institucionales", "--apply", "--procesos", "1", stdout=out)
+        self.assertIn("- Retomadas tras vencer el plazo: 1", out.getvalue())
+        abandonada.refresh_from_db()
+        en_curso.refresh_from_db()
+        self.assertEqual(abandonada.estado, ExportacionInstitucional.COMPLETADA, abandonada.error)
+        self.assertEqual(en_curso.estado, ExportacionInstitucional.PROCESANDO)
+
+    def test_comando_continuo_procesa_y_espera_nuevas(self):
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        from .models import ExportacionInstitucional
+
+        exportacion = self._crear(ExportacionInstitucional.CSV)
+        out = StringIO()
+        # La primera espera (cola vacía) corta el worker como lo haría una señal de parada.
+        with mock.patch("time.sleep", side_effect=KeyboardInterrupt) as espera:
+            call_command(
+                "procesar_exportaciones_institucionales", "--apply", "--continuo", "--procesos", "1", stdout=out
+            )
+        espera.assert_called_once()
+        exportacion.refresh_from_db()
+        self.assertEqual(exportacion.estado, ExportacionInstitucional.COMPLETADA, exportacion.error)
+        self.assertIn("- Completadas: 1", out.getvalue())
+        self.assertIn("Proceso finalizado.", out.getvalue())
+
+
+class ExportacionInstitucionalPoolTests(TransactionTestCase):
+    """El pool de procesos produce el mismo archivo que el cálculo en línea."""
+
+    def setUp(self):
+        import tempfile
+
+        self._media = tempfile.TemporaryDirectory()
+        self._override = override_settings(MEDIA_ROOT=self._media.name)
+        self._override.enable()
+
+    def tearDown(self):
+        self._override.disable()
+        self._media.cleanup()
+
+    def test_pool_igual_a_en_linea(self):
+        from .exportacion import ejecutar_exportacion
+        from .models import ExportacionInstitucional
+
+        datos = _preparar_exportacion_institucional("EXPPOOL")
+        contenidos = []
+        for procesos in (1, 2):
+            exp = ExportacionInstitucional.objects.create(
+                institucion=datos["institucion"],
+                curso_lectivo=datos["curso_lectivo"],
+                periodo=datos["periodo"],
+                formato=ExportacionInstitucional.CSV,
+            )
+            exp = ejecutar_exportacion(exp.id, procesos=procesos)
+            self.assertEqual(exp.estado, ExportacionInstitucional.COMPLETADA, exp.error)
+            with exp.archivo.open("rb") as f:
+                contenidos.append(f.read())
+        self.assertEqual(contenidos[0], contenidos[1])
@@ -19,10 +19,14 @@ from .views import (
     diagnostico_listas_general_view,
     estudiante_consulta_view,
     estudiantes_config_view,
+    exportacion_institucional_descargar_view,
+    exportacion_institucional_estado_view,
+    exportacion_institucional_view,
     centros_trabajo_view,
     horario_docente_view,
     home_docente,
     lista_clase_imprimir_view,
+    resumen_detalle_grupo_view,
     resumen_estudiante_detalle_view,
     resumen_general_export_csv,
     resumen_general_export_xlsx,
@@ -85,4 +89,20 @@ urlpatterns = [
         resumen_estudiante_detalle_view,
         name="resumen_estudiante_detalle",
     ),
+    path(
+        "asignacion/<int:asignacion_id>/resumen-evaluacion/detalle-grupo/",
+        resumen_detalle_grupo_view,
+        name="resumen_detalle_grupo",
+    ),
+    path("exportacion-institucional/", exportacion_institucional_view, name="exportacion_institucional"),
+    path(
+        "exportacion-institucional/<int:exportacion_id>/estado/",
+        exportacion_institucional_estado_view,
+        name="exportacion_institucional_estado",
+    ),
+    path(
+        "exportacion-institucional/<int:exportacion_id>/descargar/",
+        exportacion_institucional_descargar_view,
+        name="exportacion_institucional_descargar",
+    ),
 ]
@@ -8,10 +8,11 @@ import unicodedata
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import connection, transaction
 from django.db.models import Count, Prefetch, Q
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
@@ -44,17 +45,34 @@ from .models import EstudianteOcultoAsignacion
 from .models import EstudianteAdecuacionAsignacion
 from .models import EstudianteAdecuacionNoSignificativaAsignacion
 from .models import ListaEstudiantesDocente, ListaEstudiantesDocenteItem
+from .models import ExportacionInstitucional
+from .motor_asistencia import totales_asistencia
 from .services import (
+    HOME_DOCENTE_CACHE_TIMEOUT,
+    ROSTER_CACHE_TIMEOUT,
+    TIPOS_RESUMEN,
     actividad_pertenece_a_institucion,
-    calcular_resumen_evaluacion_completo,
-    calcular_resumen_componente_estudiante,
+    cache_key_home_docente,
+    cache_key_roster,
+    calcular_detalle_componentes,
     calcular_total_maximo_actividad,
     copiar_actividad_a_asignaciones,
     duplicar_actividad,
+    guardar_observaciones_masivo,
     guardar_puntajes_masivo,
+    guardar_puntajes_simples_masivo,
+    invalidar_home_docente,
+    invalidar_horario_docente,
+    invalidar_roster_asignacion,
+    invalidar_roster_curso,
+    lecciones_horario_asignacion,
     obtener_porcentaje_componente_esquema,
+    obtener_resumen_asistencia,
+    obtener_resumen_evaluacion,
     porcentaje_disponible_para_tipo,
     puede_usuario_editar_actividad,
+    recalcular_resumen_asistencia,
+    sesiones_por_periodo,
 )
 
 try:
@@ -481,7 +499,9 @@ def _nombre_corto_asignacion(asignacion):
 def _lecciones_programadas_para_fecha(asignacion, fecha_ref, dia_iso_forzado=None):
     """
     Cuenta lecciones del horario para una asignación en una fecha dada.
-    Suma todos los bloques del día para esa asignación exacta.
+    Suma todos los bloques del día para esa asignación exacta; si no hay, usa los
+    de una asignación equivalente (mismo docente/materia/grupo/centro).
+    Lee el horario semanal compilado del docente (services.obtener_horario_docente).
     """
     if not asignacion or not fecha_ref:
         return 0
@@ -499,68 +519,17 @@ def _lecciones_programadas_para_fecha(asignacion, fecha_ref, dia_iso_forzado=Non
     except (TypeError, ValueError):
         dia_forzado = None
     dia_iso = dia_forzado if dia_forzado and 1 <= dia_forzado <= 7 else dia_fecha
-    total_directo = (
-        HorarioDocenteBloque.objects.filter(
-            docente_asignacion=asignacion,
-            dia_semana=dia_iso,
-        )
-        .values("leccion_numero")
-        .distinct()
-        .count()
-    )
-    if total_directo > 0:
-        logger.info(
-            "asistencia_lecciones: directo asignacion=%s fecha=%s dia_fecha=%s dia_calculo=%s total=%s",
-            asignacion.id,
-            fecha_ref,
-            dia_fecha,
-            dia_iso,
-            total_directo,
-        )
-        return total_directo
-
-    # Fallback defensivo: si el horario quedó asociado a otra asignación
-    # equivalente (mismo docente/materia/grupo/centro), sumar esas lecciones.
-    filtros = Q(
-        docente_asignacion__docente_id=asignacion.docente_id,
-        docente_asignacion__curso_lectivo_id=asignacion.curso_lectivo_id,
-        docente_asignacion__subarea_curso__subarea_id=asignacion.subarea_curso.subarea_id,
-        dia_semana=dia_iso,
-    )
-    if asignacion.subgrupo_id:
-        filtros &= Q(docente_asignacion__subgrupo_id=asignacion.subgrupo_id)
-    else:
-        filtros &= Q(
-            docente_asignacion__seccion_id=asignacion.seccion_id,
-            docente_asignacion__subgrupo__isnull=True,
-        )
-    if asignacion.centro_trabajo_id:
-        filtros &= Q(docente_asignacion__centro_trabajo_id=asignacion.centro_trabajo_id)
-    else:
-        filtros &= Q(docente_asignacion__centro_trabajo__isnull=True)
-    total_fallback = (
-        HorarioDocenteBloque.objects.filter(filtros)
-        .values("leccion_numero")
-        .distinct()
-        .count()
-    )
-    resumen_directo = list(
-        HorarioDocenteBloque.objects.filter(docente_asignacion=asignacion)
-        .values("dia_semana")
-        .annotate(total=Count("leccion_numero", distinct=True))
-        .order_by("dia_semana")
-    )
-    logger.info(
-        "asistencia_lecciones: fallback asignacion=%s fecha=%s dia_fecha=%s dia_calculo=%s total_directo=%s total_fallback=%s resumen_directo=%s",
+    total, es_equivalente = lecciones_horario_asignacion(asignacion, dia_iso)
+    logger.debug(
+        "asistencia_lecciones: %s asignacion=%s fecha=%s dia_fecha=%s dia_calculo=%s total=%s",
+        "equivalente" if es_equivalente else "directo",
         asignacion.id,
         fecha_ref,
         dia_fecha,
         dia_iso,
-        total_directo,
-        total_fallback,
-        resumen_directo,
+        total,
     )
-    return total_fallback
+    return total
 
 
 def _formatear_cantidad_asistencia(valor):
@@ -683,46 +652,101 @@ def _normalizar_filas_estudiantes(filas):
     return normalizadas
 
 
-def _get_estudiantes(asignacion):
+_ORDEN_ROSTER = ("estudiante__primer_apellido", "estudiante__segundo_apellido", "estudiante__nombres")
+
+
+def _construir_roster(asignacion):
     """
-    Devuelve MatriculaAcademica activas del grupo de la asignación,
-    ordenadas por apellido.
+    Resuelve el roster de la asignación desde base de datos.
 
     Regla: si hay subgrupo_id (materia técnica o asignación por subgrupo),
     filtrar SOLO por subgrupo. Si solo hay seccion_id (materia académica),
     filtrar por sección completa. Nunca mezclar 9-1A y 9-1B cuando
     la asignación es a un subgrupo específico.
     """
+    roster = {
+        "base_matricula_ids": [],
+        "matricula_ids": [],
+        "estudiante_ids": [],
+        "adecuacion_ids": set(
+            EstudianteAdecuacionAsignacion.objects.filter(docente_asignacion=asignacion).values_list(
+                "estudiante_id", flat=True
+            )
+        ),
+        "adecuacion_no_sig_ids": set(
+            EstudianteAdecuacionNoSignificativaAsignacion.objects.filter(
+                docente_asignacion=asignacion
+            ).values_list("estudiante_id", flat=True)
+        ),
+    }
     filtros = {
-        "curso_lectivo": asignacion.curso_lectivo,
+        "curso_lectivo_id": asignacion.curso_lectivo_id,
         "estado": "activo",
-        "institucion": asignacion.subarea_curso.institucion,
+        "institucion_id": asignacion.subarea_curso.institucion_id,
     }
     if asignacion.subgrupo_id:
         filtros["subgrupo_id"] = asignacion.subgrupo_id
     elif asignacion.seccion_id:
         filtros["seccion_id"] = asignacion.seccion_id
     else:
-        return MatriculaAcademica.objects.none()
-    ocultos_ids = list(
-        EstudianteOcultoAsignacion.objects.filter(docente_asignacion=asignacion).values_list(
-            "estudiante_id", flat=True
-        )
-    )
+        return roster
     qs = MatriculaAcademica.objects.filter(**filtros)
     if _es_institucion_general(asignacion):
         lista = _obtener_lista_privada_docente(asignacion)
         if not lista:
-            return MatriculaAcademica.objects.none()
-        est_ids = list(lista.items.values_list("estudiante_id", flat=True))
-        if not est_ids:
-            return MatriculaAcademica.objects.none()
-        qs = qs.filter(estudiante_id__in=est_ids)
-    if ocultos_ids:
-        qs = qs.exclude(estudiante_id__in=ocultos_ids)
+            return roster
+        qs = qs.filter(estudiante_id__in=lista.items.values_list("estudiante_id", flat=True))
+    base = list(qs.order_by(*_ORDEN_ROSTER).values_list("id", "estudiante_id"))
+    ocultos_ids = set(
+        EstudianteOcultoAsignacion.objects.filter(docente_asignacion=asignacion).values_list(
+            "estudiante_id", flat=True
+        )
+    )
+    roster["base_matricula_ids"] = [mat_id for mat_id, _ in base]
+    visibles = [(mat_id, est_id) for mat_id, est_id in base if est_id not in ocultos_ids]
+    roster["matricula_ids"] = [mat_id for mat_id, _ in visibles]
+    roster["estudiante_ids"] = [est_id for _, est_id in visibles]
+    return roster
+
+
+def _roster_asignacion(asignacion):
+    """
+    Roster cacheado de la asignación: ids de matrícula/estudiante ordenados por apellido
+    (con y sin ocultos) y conjuntos de adecuación. Se invalida por versión desde signals
+    (matrículas, listas privadas, ocultos, adecuaciones y nombres de estudiantes).
+    """
+    key = cache_key_roster(asignacion)
+    roster = cache.get(key)
+    if roster is None:
+        roster = _construir_roster(asignacion)
+        cache.set(key, roster, ROSTER_CACHE_TIMEOUT)
+    return roster
+
+
+def _matriculas_por_ids(matricula_ids):
+    """Materializa matrículas (con estudiante) en el orden dado con un solo in_bulk."""
+    por_id = MatriculaAcademica.objects.select_related("estudiante").in_bulk(matricula_ids)
+    return [por_id[mat_id] for mat_id in matricula_ids if mat_id in por_id]
+
+
+def _matriculas_asignacion(asignacion):
+    """Lista ordenada de matrículas visibles de la asignación (sin ocultos)."""
+    return _matriculas_por_ids(_roster_asignacion(asignacion)["matricula_ids"])
+
+
+def _get_estudiantes(asignacion):
+    """
+    Devuelve MatriculaAcademica activas del grupo de la asignación,
+    ordenadas por apellido, sin estudiantes ocultos.
+    QuerySet por id sobre el roster cacheado (ver _construir_roster).
+    """
+    matricula_ids = _roster_asignacion(asignacion)["matricula_ids"]
+    if not matricula_ids:
+        return MatriculaAcademica.objects.none()
     return (
-        qs.select_related("estudiante")
-        .order_by("estudiante__primer_apellido", "estudiante__segundo_apellido", "estudiante__nombres")
+        MatriculaAcademica.objects.filter(id__in=matricula_ids)
+        .select_related("estudiante")
+        .order_by(*_ORDEN_ROSTER)
     )
 
 
@@ -730,44 +754,22 @@ def _get_estudiantes_base(asignacion):
     """
     Lista base oficial del grupo/subgrupo sin aplicar ocultos.
     """
-    filtros = {
-        "curso_lectivo": asignacion.curso_lectivo,
-        "estado": "activo",
-        "institucion": asignacion.subarea_curso.institucion,
-    }
-    if asignacion.subgrupo_id:
-        filtros["subgrupo_id"] = asignacion.subgrupo_id
-    elif asignacion.seccion_id:
-        filtros["seccion_id"] = asignacion.seccion_id
-    else:
+    matricula_ids = _roster_asignacion(asignacion)["base_matricula_ids"]
+    if not matricula_ids:
         return MatriculaAcademica.objects.none()
-    qs = MatriculaAcademica.objects.filter(**filtros)
-    if _es_institucion_general(asignacion):
-        lista = _obtener_lista_privada_docente(asignacion)
-        if not lista:
-            return MatriculaAcademica.objects.none()
-        qs = qs.filter(estudiante_id__in=lista.items.values_list("estudiante_id", flat=True))
     return (
-        qs
+        MatriculaAcademica.objects.filter(id__in=matricula_ids)
         .select_related("estudiante")
-        .order_by("estudiante__primer_apellido", "estudiante__segundo_apellido", "estudiante__nombres")
+        .order_by(*_ORDEN_ROSTER)
     )
 
 
 def _get_ids_adecuacion(asignacion):
-    return set(
-        EstudianteAdecuacionAsignacion.objects.filter(docente_asignacion=asignacion).values_list(
-            "estudiante_id", flat=True
-        )
-    )
+    return set(_roster_asignacion(asignacion)["adecuacion_ids"])
 
 
 def _get_ids_adecuacion_no_significativa(asignacion):
-    return set(
-        EstudianteAdecuacionNoSignificativaAsignacion.objects.filter(
-            docente_asignacion=asignacion
-        ).values_list("estudiante_id", flat=True)
-    )
+    return set(_roster_asignacion(asignacion)["adecuacion_no_sig_ids"])
 
 
 def _get_ids_adecuacion_reporte(asignacion):
@@ -842,48 +844,22 @@ def _infer_periodo(asignacion, fecha):
     return None
 
 
-def _sesiones_por_periodo(asignacion, periodo):
-    """
-    Obtiene sesiones de una asignación para un período, priorizando rango de fechas
-    del PeriodoCursoLectivo para incluir registros retroactivos válidos.
-    """
-    qs = AsistenciaSesion.objects.filter(docente_asignacion=asignacion)
-    if not periodo:
-        return qs.none()
-
-    pcl = (
-        PeriodoCursoLectivo.objects
-        .filter(
-            institucion_id=asignacion.subarea_curso.institucion_id,
-            curso_lectivo=asignacion.curso_lectivo,
-            periodo=periodo,
-        )
-        .first()
-    )
-    if pcl and pcl.fecha_inicio and pcl.fecha_fin:
-        return qs.filter(fecha__range=(pcl.fecha_inicio, pcl.fecha_fin)).order_by("fecha", "sesion_numero")
-    return qs.filter(periodo=periodo).order_by("fecha", "sesion_numero")
-
-
 def _calcular_resumen(asignacion, periodo, matriculas):
     """
     Calcula resumen de asistencia por estudiante en un período.
     Regla vigente: el período se calcula por lecciones, no por cantidad
     de sesiones.
     """
-    sesiones = _sesiones_por_periodo(asignacion, periodo)
-    sesiones = list(sesiones)
-    total_sesiones = len(sesiones)
-    sesion_ids = [s.id for s in sesiones]
-    matricula_est_ids = [m.estudiante_id for m in matriculas]
-    registros_raw = AsistenciaRegistro.objects.filter(
-        sesion_id__in=sesion_ids,
-        estudiante_id__in=matricula_est_ids,
-    )
-    registros_map = {
-        (r.estudiante_id, r.sesion_id): r
-        for r in registros_raw
-    }
+    periodo_id = getattr(periodo, "pk", periodo)
+    totales = obtener_resumen_asistencia(asignacion, periodo_id, [m.estudiante_id for m in matriculas])
+    if totales:
+        primera = next(iter(totales.values()))
+        total_sesiones = primera["total_sesiones"]
+        total_lecciones = primera["total_lecciones"]
+    else:
+        sesiones = list(sesiones_por_periodo(asignacion, periodo_id).values_list("lecciones", flat=True))
+        total_sesiones = len(sesiones)
+        total_lecciones = sum((lecc or 1) for lecc in sesiones)
 
     # Peso del componente ASISTENCIA en el esquema snapshot.
     # Se busca por código exacto "ASISTENCIA" o "ASIS", y también por
@@ -909,51 +885,8 @@ def _calcular_resumen(asignacion, periodo, matriculas):
     resultados = []
     for m in matriculas:
         est = m.estudiante
-        sesiones_est = list(sesiones)
-        total_lecciones = sum((s.lecciones or 1) for s in sesiones_est)
-
-        presentes = Decimal("0")
-        tardias_media = Decimal("0")
-        tardias_completa = Decimal("0")
-        ausentes_ai = Decimal("0")
-        ausentes_inj = Decimal("0")
-        ausentes_just = Decimal("0")
-        for s in sesiones_est:
-            lecciones = Decimal(str(s.lecciones or 1))
-            reg = registros_map.get((est.id, s.id))
-            if reg is None:
-                ausentes_inj += lecciones
-                ausentes_ai += lecciones
-                continue
-            estado = _normalizar_estado_asistencia(reg.estado)
-            try:
-                detalle = _calcular_detalle_dia_asistencia(
-                    estado=estado,
-                    lecciones_dia=lecciones,
-                    cantidad_ingresada=reg.lecciones_injustificadas,
-                    legacy_full_day_ai=True,
-                    cantidad_es_equivalente=True,
-                )
-            except ValidationError:
-                detalle = _calcular_detalle_dia_asistencia(
-                    estado=estado,
-                    lecciones_dia=lecciones,
-                    cantidad_ingresada=None,
-                    legacy_full_day_ai=True,
-                )
-            ausentes_inj += detalle["lecc_inj_equiv"]
-            presentes += detalle["presentes"]
-            tardias_media += detalle["tm_cantidad"]
-            tardias_completa += detalle["tc_cantidad"]
-            # AI y AJ deben reflejar la cantidad real capturada/interpretada en su estado.
-            # AI ya no mezcla TM/TC.
-            ai_cantidad = detalle["ai_cantidad"]
-            aj_cantidad = detalle["aj_cantidad"]
-            if ai_cantidad:
-                ausentes_ai += ai_cantidad
-            if aj_cantidad:
-                ausentes_just += aj_cantidad
-
+        t = totales[est.id]
+        ausentes_inj = t["ausentes_inj"]
         pct, pct_asistencia = _calcular_porcentajes_asistencia(total_lecciones, ausentes_inj)
         puntaje_base = _nota_mep(pct)
         # aporte_real = (asignacion_final / 5) * peso_asistencia_esquema
@@ -972,14 +905,14 @@ def _calcular_resumen(asignacion, periodo, matriculas):
 
         resultados.append({
             "estudiante": est,
-            "presentes": presentes.quantize(Decimal("0.1")),
-            "tardias_media": tardias_media.quantize(Decimal("0.1")),
-            "tardias_completa": tardias_completa.quantize(Decimal("0.1")),
+            "presentes": t["presentes"].quantize(Decimal("0.1")),
+            "tardias_media": t["tardias_media"].quantize(Decimal("0.1")),
+            "tardias_completa": t["tardias_completa"].quantize(Decimal("0.1")),
             # Cantidad real marcada de AI (sin mezclar equivalencias de TM/TC)
-            "ausentes_inj_lecciones": ausentes_ai.quantize(Decimal("0.1")),
+            "ausentes_inj_lecciones": t["ausentes_ai"].quantize(Decimal("0.1")),
             # Total equivalente injustificado (se usa para % de ausencia)
             "ausentes_inj_equiv": ausentes_inj.quantize(Decimal("0.01")),
-            "ausentes_just": ausentes_just.quantize(Decimal("0.1")),
+            "ausentes_just": t["ausentes_just"].quantize(Decimal("0.1")),
             "total_lecciones": total_lecciones,
             "pct": round(pct, 2),
             "pct_asistencia": round(pct_asistencia, 2),
@@ -1003,7 +936,7 @@ def _calcular_resumen(asignacion, periodo, matriculas):
     )
     return {
         "total_sesiones": total_sesiones,
-        "total_lecciones_periodo": sum((s.lecciones or 1) for s in sesiones),
+        "total_lecciones_periodo": total_lecciones,
         "peso_asistencia": peso_asistencia,
         "tiene_componente": comp_asistencia is not None,
         "nombre_componente": nombre_componente,
@@ -1015,6 +948,161 @@ def _calcular_resumen(asignacion, periodo, matriculas):
 #  VISTAS
 # ═══════════════════════════════════════════════════════════════════════
 
+def _datos_home_docente(profesor, centro_id=0):
+    """
+    Tarjetas del home docente (sin filtros de materia/nivel/grupo) y opciones de filtro.
+    Número fijo de consultas sin importar cuántas asignaciones tenga el docente; el
+    resultado se cachea por (profesor, institución, fecha, centro) y se invalida por
+    signals al cambiar asignaciones, bloques de horario o sesiones de asistencia.
+    """
+    hoy = timezone.localdate()
+    key = cache_key_home_docente(profesor.id, profesor.institucion_id, hoy, centro_id)
+    datos = cache.get(key)
+    if datos is not None:
+        return datos
+
+    componentes_prefetch = Prefetch(
+        "eval_scheme_snapshot__componentes_esquema",
+        queryset=EsquemaEvalComponente.objects.select_related("componente").order_by("componente__nombre"),
+    )
+    raw_qs = (
+        DocenteAsignacion.objects
+        .filter(docente=profesor, activo=True)
+        .select_related(
+            "subarea_curso__subarea",
+            "subarea_curso__institucion",
+            "curso_lectivo",
+            "seccion__nivel",
+            "subgrupo__seccion__nivel",
+            "centro_trabajo",
+            "eval_scheme_snapshot",
+        )
+        .prefetch_related(componentes_prefetch)
+    )
+    if centro_id:
+        raw_qs = raw_qs.filter(centro_trabajo_id=centro_id)
+    raw = list(raw_qs)
+
+    # Opciones de filtro (sobre el universo ya acotado por centro)
+    materias_map = {}
+    niveles_map = {}
+    grupos_map = {}
+    for a in raw:
+        subarea = a.subarea_curso.subarea
+        materias_map[subarea.id] = subarea.nombre
+        if a.subgrupo_id:
+            nivel_id = a.subgrupo.seccion.nivel_id
+            nivel_numero = a.subgrupo.seccion.nivel.numero
+            nivel_label = str(nivel_numero)
+            grupo_value = f"SUB-{a.subgrupo_id}"
+            grupo_label = str(a.subgrupo)
+        elif a.seccion_id:
+            nivel_id = a.seccion.nivel_id
+            nivel_numero = a.seccion.nivel.numero
+            nivel_label = str(nivel_numero)
+            grupo_value = f"SEC-{a.seccion_id}"
+            grupo_label = str(a.seccion)
+        else:
+            continue
+        niveles_map[nivel_id] = nivel_label
+        grupos_map[grupo_value] = grupo_label
+    materias_filtro = [
+        {"subarea_curso__subarea_id": sid, "subarea_curso__subarea__nombre": nombre}
+        for sid, nombre in sorted(materias_map.items(), key=lambda x: (x[1], x[0]))
+    ]
+    niveles_filtro = [
+        {"id": nid, "label": niveles_map[nid]}
+        for nid in sorted(niveles_map, key=lambda x: int(niveles_map[x]) if str(niveles_map[x]).isdigit() else 999)
+    ]
+    grupos_filtro = [
+        {"value": gval, "label": glabel}
+        for gval, glabel in sorted(grupos_map.items(), key=lambda x: x[1])
+    ]
+
+    def _sort_key(a):
+        if a.subgrupo_id:
+            n = a.subgrupo.seccion.nivel.numero
+            s = a.subgrupo.seccion.numero
+            l = (a.subgrupo.letra or "").upper()
+            return (n, s, l)
+        if a.seccion_id:
+            n = a.seccion.nivel.numero
+            s = a.seccion.numero
+            return (n, s, "")
+        return (999, 999, "")
+
+    raw.sort(key=lambda a: (_sort_key(a), a.subarea_curso.subarea.nombre))
+
+    # Sesiones hoy por asignación (1 query para todas)
+    sesiones_hoy_counts = dict(
+        AsistenciaSesion.objects.filter(
+            docente_asignacion_id__in=[a.id for a in raw], fecha=hoy
+        ).values("docente_asignacion_id").annotate(cnt=Count("id")).values_list("docente_asignacion_id", "cnt")
+    )
+
+    tarjetas = []
+    for a in raw:
+        componentes_raw = list(a.eval_scheme_snapshot.componentes_esquema.all()) if a.eval_scheme_snapshot_id else []
+        componentes = []
+        for c in componentes_raw:
+            cod = (c.componente.codigo or "").strip().upper()
+            if cod in ("TAR", "TAREAS", "TAREA"):
+                tipo_param = "TAREA"
+            elif cod in ("COT", "COTIDIANO"):
+                tipo_param = "COTIDIANO"
+            elif cod in ("PRU", "PRUEBA", "PRUEBAS"):
+                tipo_param = "PRUEBA"
+            elif cod in ("PRO", "PROYECTO", "PROYECTOS"):
+                tipo_param = "PROYECTO"
+            else:
+                tipo_param = None
+            componentes.append({
+                "componente": c.componente,
+                "porcentaje": c.porcentaje,
+                "tipo_param": tipo_param,
+            })
+
+        tiene_asistencia = any(
+            (c["componente"].codigo or "").upper() in ("ASISTENCIA", "ASIS") or
+            "ASISTENCIA" in (c["componente"].nombre or "").upper()
+            for c in componentes
+        )
+
+        # Etiqueta del grupo: subgrupo completo (7-1A) o sección (7-1)
+        if a.subgrupo_id:
+            grupo_label = str(a.subgrupo)  # ej. 7-1A, 8-3B
+        elif a.seccion_id:
+            grupo_label = str(a.seccion)   # ej. 7-1
+        else:
+            grupo_label = "—"
+        niveles_ids = set()
+        if a.seccion_id:
+            niveles_ids.add(a.seccion.nivel_id)
+        if a.subgrupo_id:
+            niveles_ids.add(a.subgrupo.seccion.nivel_id)
+
+        tarjetas.append({
+            "obj": a,
+            "componentes": componentes,
+            "tiene_asistencia": tiene_asistencia,
+            "sesiones_hoy": sesiones_hoy_counts.get(a.id, 0),
+            "grupo_label": grupo_label,
+            "centro_trabajo": a.centro_trabajo.nombre if a.centro_trabajo_id else "",
+            "materia_id": a.subarea_curso.subarea_id,
+            "materia_key": (a.subarea_curso.subarea.nombre or "").strip().upper(),
+            "niveles_ids": niveles_ids,
+        })
+
+    datos = {
+        "tarjetas": tarjetas,
+        "materias_filtro": materias_filtro,
+        "niveles_filtro": niveles_filtro,
+        "grupos_filtro": grupos_filtro,
+    }
+    cache.set(key, datos, HOME_DOCENTE_CACHE_TIMEOUT)
+    return datos
+
+
 @login_required
 @permission_required("libro_docente.access_libro_docente", raise_exception=True)
 def home_docente(request):
@@ -1072,97 +1160,27 @@ def home_docente(request):
         # Se desactiva "Clases de hoy" para reducir carga en home docente.
         clases_hoy = []
 
-        componentes_prefetch = Prefetch(
-            "eval_scheme_snapshot__componentes_esquema",
-            queryset=EsquemaEvalComponente.objects.select_related("componente").order_by("componente__nombre"),
-        )
-        raw_qs = (
-            DocenteAsignacion.objects
-            .filter(docente=profesor, activo=True)
-            .select_related(
-                "subarea_curso__subarea",
-                "curso_lectivo",
-                "seccion__nivel",
-                "subgrupo__seccion__nivel",
-                "centro_trabajo",
-                "eval_scheme_snapshot",
-            )
-            .prefetch_related(componentes_prefetch)
-        )
-        if es_general and centro_sel_id:
-            raw_qs = raw_qs.filter(centro_trabajo_id=centro_sel_id)
-
-        # Opciones de filtro (sobre el universo ya acotado por centro)
-        materias_filtro = list(
-            raw_qs.values("subarea_curso__subarea_id", "subarea_curso__subarea__nombre")
-            .distinct()
-            .order_by("subarea_curso__subarea__nombre")
-        )
-        niveles_map = {}
-        grupos_map = {}
-        for a in raw_qs:
-            if a.subgrupo_id:
-                nivel_id = a.subgrupo.seccion.nivel_id
-                nivel_numero = a.subgrupo.seccion.nivel.numero
-                nivel_label = str(nivel_numero)
-                grupo_value = f"SUB-{a.subgrupo_id}"
-                grupo_label = str(a.subgrupo)
-            elif a.seccion_id:
-                nivel_id = a.seccion.nivel_id
-                nivel_numero = a.seccion.nivel.numero
-                nivel_label = str(nivel_numero)
-                grupo_value = f"SEC-{a.seccion_id}"
-                grupo_label = str(a.seccion)
-            else:
-                continue
-            niveles_map[nivel_id] = nivel_label
-            grupos_map[grupo_value] = grupo_label
-        niveles_filtro = [
-            {"id": nid, "label": niveles_map[nid]}
-            for nid in sorted(niveles_map, key=lambda x: int(niveles_map[x]) if str(niveles_map[x]).isdigit() else 999)
-        ]
-        grupos_filtro = [
-            {"value": gval, "label": glabel}
-            for gval, glabel in sorted(grupos_map.items(), key=lambda x: x[1])
-        ]
+        datos_home = _datos_home_docente(profesor, centro_sel_id if es_general else 0)
+        materias_filtro = datos_home["materias_filtro"]
+        niveles_filtro = datos_home["niveles_filtro"]
+        grupos_filtro = datos_home["grupos_filtro"]
 
-        # Aplicar filtros seleccionados
+        # Aplicar filtros seleccionados (sobre las tarjetas ya armadas y ordenadas)
+        tarjetas = datos_home["tarjetas"]
         if materia_sel_id:
-            raw_qs = raw_qs.filter(subarea_curso__subarea_id=materia_sel_id)
+            tarjetas = [t for t in tarjetas if t["materia_id"] == materia_sel_id]
         if nivel_sel_id:
-            raw_qs = raw_qs.filter(
-                Q(seccion__nivel_id=nivel_sel_id) | Q(subgrupo__seccion__nivel_id=nivel_sel_id)
-            )
-        if grupo_sel.startswith("SEC-"):
+            tarjetas = [t for t in tarjetas if nivel_sel_id in t["niveles_ids"]]
+        if grupo_sel.startswith("SEC-") or grupo_sel.startswith("SUB-"):
             try:
-                raw_qs = raw_qs.filter(seccion_id=int(grupo_sel.split("-", 1)[1]))
+                grupo_id = int(grupo_sel.split("-", 1)[1])
             except (TypeError, ValueError):
-                pass
-        elif grupo_sel.startswith("SUB-"):
-            try:
-                raw_qs = raw_qs.filter(subgrupo_id=int(grupo_sel.split("-", 1)[1]))
-            except (TypeError, ValueError):
-                pass
-        raw = list(raw_qs)
-
-        def _sort_key(a):
-            if a.subgrupo_id:
-                n = a.subgrupo.seccion.nivel.numero
-                s = a.subgrupo.seccion.numero
-                l = (a.subgrupo.letra or "").upper()
-                return (n, s, l)
-            if a.seccion_id:
-                n = a.seccion.nivel.numero
-                s = a.seccion.numero
-                return (n, s, "")
-            return (999, 999, "")
-
-        raw.sort(key=lambda a: (_sort_key(a), a.subarea_curso.subarea.nombre))
-        materias_distintas = {
-            (a.subarea_curso.subarea.nombre or "").strip().upper()
-            for a in raw
-            if a.subarea_curso_id and a.subarea_curso.subarea_id
-        }
+                grupo_id = None
+            if grupo_id is not None:
+                campo = "seccion_id" if grupo_sel.startswith("SEC-") else "subgrupo_id"
+                tarjetas = [t for t in tarjetas if getattr(t["obj"], campo) == grupo_id]
+
+        materias_distintas = {t["materia_key"] for t in tarjetas}
         paleta_ui = ["#4F46E5", "#F59E0B", "#06B6D4", "#10B981", "#EC4899"]
         if materias_distintas:
             materias_ordenadas = sorted(materias_distintas)
@@ -1176,65 +1194,9 @@ def home_docente(request):
             color_por_materia = {}
             color_default = paleta_ui[0]
 
-        # Sesiones hoy por asignación (1 query para todas)
-        asignacion_ids = [a.id for a in raw]
-        sesiones_hoy_counts = dict(
-            AsistenciaSesion.objects.filter(
-                docente_asignacion_id__in=asignacion_ids, fecha=timezone.localdate()
-            ).values("docente_asignacion_id").annotate(cnt=Count("id")).values_list("docente_asignacion_id", "cnt")
-        )
-
-        hoy = timezone.localdate()
-        for a in raw:
-            componentes_raw = list(a.eval_scheme_snapshot.componentes_esquema.all()) if a.eval_scheme_snapshot_id else []
-            componentes = []
-            for c in componentes_raw:
-                cod = (c.componente.codigo or "").strip().upper()
-                if cod in ("TAR", "TAREAS", "TAREA"):
-                    tipo_param = "TAREA"
-                elif cod in ("COT", "COTIDIANO"):
-                    tipo_param = "COTIDIANO"
-                elif cod in ("PRU", "PRUEBA", "PRUEBAS"):
-                    tipo_param = "PRUEBA"
-                elif cod in ("PRO", "PROYECTO", "PROYECTOS"):
-                    tipo_param = "PROYECTO"
-                else:
-                    tipo_param = None
-                componentes.append({
-                    "componente": c.componente,
-                    "porcentaje": c.porcentaje,
-                    "tipo_param": tipo_param,
-                })
-
-            tiene_asistencia = any(
-                (c["componente"].codigo or "").upper() in ("ASISTENCIA", "ASIS") or
-                "ASISTENCIA" in (c["componente"].nombre or "").upper()
-                for c in componentes
-            )
-
-            sesiones_hoy = sesiones_hoy_counts.get(a.id, 0)
-
-            # Etiqueta del grupo: subgrupo completo (7-1A) o sección (7-1)
-            if a.subgrupo_id:
-                grupo_label = str(a.subgrupo)  # ej. 7-1A, 8-3B
-            elif a.seccion_id:
-                grupo_label = str(a.seccion)   # ej. 7-1
-            else:
-                grupo_label = "—"
-            materia_key = (a.subarea_curso.subarea.nombre or "").strip().upper()
-            color = color_por_materia.get(materia_key, color_default)
-            color_primario, color_secundario = (color, color)
-
-            asignaciones_data.append({
-                "obj": a,
-                "componentes": componentes,
-                "tiene_asistencia": tiene_asistencia,
-                "sesiones_hoy": sesiones_hoy,
-                "grupo_label": grupo_label,
-                "centro_trabajo": a.centro_trabajo.nombre if a.centro_trabajo_id else "",
-                "color_primario": color_primario,
-                "color_secundario": color_secundario,
-            })
+        for t in tarjetas:
+            color = color_por_materia.get(t["materia_key"], color_default)
+            asignaciones_data.append({**t, "color_primario": color, "color_secundario": color})
 
     can_create_asignacion = bool(
         profesor and (
@@ -1611,6 +1573,8 @@ def horario_docente_view(request):
             config.bloques.all().delete()
             if nuevos:
                 HorarioDocenteBloque.objects.bulk_create(nuevos)
+            transaction.on_commit(lambda: invalidar_horario_docente(profesor.id))
+            transaction.on_commit(lambda: invalidar_home_docente(profesor.id))
         messages.success(request, "Horario guardado correctamente.")
         next_url = reverse("libro_docente:horario_docente")
         if es_general and centro_sel_id:
@@ -2111,6 +2075,8 @@ def asignacion_estudiantes_excel_view(request, asignacion_id):
                 agregados_lista = len(nuevos_items)
                 if nuevos_items:
                     ListaEstudiantesDocenteItem.objects.bulk_create(nuevos_items)
+                    # bulk_create no emite signals: invalidar el roster del curso.
+                    invalidar_roster_curso(lista.institucion_id, lista.curso_lectivo_id)
         except ValidationError as exc:
             messages.error(request, str(exc))
             return redirect(reverse("libro_docente:asignacion_estudiantes_excel", args=[asignacion.id]))
@@ -2337,7 +2303,7 @@ def _bloques_lista_prueba_por_asignaciones(todas_asignaciones):
     adecuacion_blocks = []
     seen = set()
     for asig in todas_asignaciones:
-        matriculas = list(_get_estudiantes(asig))
+        matriculas = _matriculas_asignacion(asig)
         adec_sig = _get_ids_adecuacion(asig)
         adec_no_sig = _get_ids_adecuacion_no_significativa(asig)
         adec_reporte = adec_sig.union(adec_no_sig)
@@ -2438,7 +2404,7 @@ def lista_clase_imprimir_view(request, asignacion_id):
             orden_ids.append(est.id)
 
     for asig in todas:
-        _agregar_matriculas(list(_get_estudiantes(asig)))
+        _agregar_matriculas(_matriculas_asignacion(asig))
 
     estudiantes = [estudiantes_por_id[eid] for eid in orden_ids]
     grupo_label = " + ".join(_label_grupo_asignacion(a) for a in todas)
@@ -2609,7 +2575,7 @@ def estudiantes_config_view(request, asignacion_id):
         messages.error(request, "No tienes acceso a esta asignación.")
         return redirect("libro_docente:home")
 
-    base = list(_get_estudiantes_base(asignacion))
+    base = _matriculas_por_ids(_roster_asignacion(asignacion)["base_matricula_ids"])
     base_ids = [m.estudiante_id for m in base]
     ocultos_actuales = set(
         EstudianteOcultoAsignacion.objects.filter(
@@ -2662,6 +2628,7 @@ def estudiantes_config_view(request, asignacion_id):
                     estudiante_id=est_id,
                     defaults={"created_by": request.user},
                 )
+            transaction.on_commit(lambda: invalidar_roster_asignacion(asignacion.id))
         messages.success(request, "Configuración de estudiantes guardada.")
         return redirect(reverse("libro_docente:estudiantes_config", args=[asignacion.id]))
 
@@ -2811,7 +2778,15 @@ def asistencia_view(request, asignacion_id):
                 .first()
             )
             if sesion_del:
-                sesion_del.delete()
+                with transaction.atomic():
+                    periodo_del_id = sesion_del.periodo_id
+                    # El signal invalida el resumen de asistencia; se recalcula el período afectado.
+                    sesion_del.delete()
+                    recalcular_resumen_asistencia(
+                        asignacion,
+                        periodo_del_id,
+                        _roster_asignacion(asignacion)["estudiante_ids"],
+                    )
                 messages.success(request, f"Asistencia del {fecha.strftime('%d/%m/%Y')} eliminada correctamente.")
             else:
                 messages.warning(request, "No existe asistencia registrada para esa fecha.")
@@ -2838,7 +2813,7 @@ def asistencia_view(request, asignacion_id):
                 sesion.lecciones = lecciones
                 sesion.minuta = minuta[:1000]
                 sesion.save(update_fields=["periodo", "lecciones", "minuta", "updated_at"])
-                matriculas = _get_estudiantes(asignacion)
+                matriculas = _matriculas_asignacion(asignacion)
                 bulk_create = []
                 bulk_update = []
                 existing = {r.estudiante_id: r for r in sesion.registros.all()}
@@ -2898,6 +2873,12 @@ def asistencia_view(request, asignacion_id):
                         bulk_update,
                         ["estado", "lecciones_injustificadas", "observacion"],
                     )
+                # bulk_create/bulk_update no emiten signals: el resumen del período se recalcula aquí.
+                recalcular_resumen_asistencia(
+                    asignacion,
+                    sesion.periodo_id,
+                    [m.estudiante_id for m in matriculas],
+                )
 
             messages.success(
                 request,
@@ -2960,7 +2941,7 @@ def asistencia_view(request, asignacion_id):
             else:
                 inj_guardadas[reg.estudiante_id] = _formatear_cantidad_asistencia(inj_val)
 
-    matriculas = _get_estudiantes(asignacion)
+    matriculas = _matriculas_asignacion(asignacion)
     adec_sig = _get_ids_adecuacion(asignacion)
     adec_no_sig = _get_ids_adecuacion_no_significativa(asignacion)
     estudiantes = []
@@ -3091,7 +3072,7 @@ def detalle_estudiante_view(request, asignacion_id, estudiante_id):
     # Historial de asistencia (registros del estudiante en el período)
     historial = []
     if periodo_sel:
-        sesiones = _sesiones_por_periodo(asignacion, periodo_sel)
+        sesiones = sesiones_por_periodo(asignacion, periodo_sel)
         sesion_ids = list(sesiones.values_list("id", flat=True))
         registros = list(
             AsistenciaRegistro.objects
@@ -3171,8 +3152,7 @@ def _asignaciones_con_estudiante(asignacion_base, estudiante_id):
         qs = qs.filter(centro_trabajo__isnull=True)
     result = []
     for a in qs.order_by("subarea_curso__subarea__nombre"):
-        matriculas = _get_estudiantes(a)
-        if matriculas.filter(estudiante_id=estudiante_id).exists():
+        if estudiante_id in _roster_asignacion(a)["estudiante_ids"]:
             result.append(a)
     return result
 
@@ -3233,7 +3213,7 @@ def reporte_asistencia_estudiante_view(request, asignacion_id, estudiante_id):
         resumen_est = None
         nombre_componente = "Asistencia"
         if periodo_sel:
-            sesiones = list(_sesiones_por_periodo(a, periodo_sel))
+            sesiones = list(sesiones_por_periodo(a, periodo_sel))
             sesion_ids = [s.id for s in sesiones]
             registros = list(
                 AsistenciaRegistro.objects
@@ -3354,7 +3334,7 @@ def resumen_view(request, asignacion_id):
         "estudiantes": [],
     }
     if periodo_sel:
-        matriculas = _get_estudiantes(asignacion)
+        matriculas = _matriculas_asignacion(asignacion)
         resumen = _calcular_resumen(asignacion, periodo_sel, matriculas)
 
     plantilla = PlantillaImpresionMatricula.objects.filter(institucion_id=inst_id).first()
@@ -3415,71 +3395,49 @@ def reporte_asistencia_agrupado_view(request, asignacion_id):
     asignaciones = list(asignaciones_qs.order_by("subarea_curso__subarea__nombre"))
     asignacion_ids = [a.id for a in asignaciones]
 
-    sesiones_qs = AsistenciaSesion.objects.filter(docente_asignacion_id__in=asignacion_ids)
+    matriculas = _matriculas_asignacion(asignacion)
+    est_ids = [m.estudiante_id for m in matriculas]
+    campos = ("presentes", "tardias_media", "tardias_completa", "ausentes_ai", "ausentes_just", "ausentes_inj")
+    totales = {est_id: dict.fromkeys(campos, Decimal("0")) for est_id in est_ids}
+    total_lecciones = 0
+    total_sesiones = 0
     if periodo:
-        sesiones_qs = sesiones_qs.filter(periodo=periodo)
-    sesiones = list(sesiones_qs.order_by("fecha", "id"))
-    sesion_ids = [s.id for s in sesiones]
-
-    registros = (
-        AsistenciaRegistro.objects.filter(sesion_id__in=sesion_ids).select_related("estudiante")
-        if sesion_ids
-        else AsistenciaRegistro.objects.none()
-    )
-    registros_map = {(r.estudiante_id, r.sesion_id): r for r in registros}
+        # Un resumen persistido por materia; se suman por estudiante.
+        for a in asignaciones:
+            por_est = obtener_resumen_asistencia(a, periodo.id, est_ids)
+            if por_est:
+                primera = next(iter(por_est.values()))
+                total_lecciones += primera["total_lecciones"]
+                total_sesiones += primera["total_sesiones"]
+            for est_id, fila in por_est.items():
+                for campo in campos:
+                    totales[est_id][campo] += fila[campo]
+    else:
+        sesiones = list(
+            AsistenciaSesion.objects.filter(docente_asignacion_id__in=asignacion_ids)
+            .order_by("fecha", "id")
+            .values_list("id", "lecciones")
+        )
+        total_sesiones = len(sesiones)
+        total_lecciones = sum((lecc or 1) for _, lecc in sesiones)
+        totales.update(totales_asistencia(sesiones, est_ids))
 
-    matriculas = list(_get_estudiantes(asignacion))
     adec_sig = _get_ids_adecuacion(asignacion)
     adec_no_sig = _get_ids_adecuacion_no_significativa(asignacion)
     filas = []
     for m in matriculas:
         est = m.estudiante
-        total_lecciones = sum((s.lecciones or 1) for s in sesiones)
-        presentes = Decimal("0")
-        tm = Decimal("0")
-        tc = Decimal("0")
-        ai = Decimal("0")
-        aj = Decimal("0")
-        aus_inj_equiv = Decimal("0")
-        for s in sesiones:
-            lecciones = Decimal(str(s.lecciones or 1))
-            reg = registros_map.get((est.id, s.id))
-            if reg is None:
-                ai += lecciones
-                aus_inj_equiv += lecciones
-                continue
-            estado = _normalizar_estado_asistencia(reg.estado)
-            try:
-                detalle = _calcular_detalle_dia_asistencia(
-                    estado=estado,
-                    lecciones_dia=lecciones,
-                    cantidad_ingresada=reg.lecciones_injustificadas,
-                    legacy_full_day_ai=True,
-                    cantidad_es_equivalente=True,
-                )
-            except ValidationError:
-                detalle = _calcular_detalle_dia_asistencia(
-                    estado=estado,
-                    lecciones_dia=lecciones,
-                    cantidad_ingresada=None,
-                    legacy_full_day_ai=True,
-                )
-            presentes += detalle["presentes"]
-            tm += detalle["tm_cantidad"]
-            tc += detalle["tc_cantidad"]
-            ai += detalle["ai_cantidad"]
-            aj += detalle["aj_cantidad"]
-            aus_inj_equiv += detalle["lecc_inj_equiv"]
-
+        t = totales[est.id]
+        aus_inj_equiv = t["ausentes_inj"]
         pct_aus, pct_asis = _calcular_porcentajes_asistencia(total_lecciones, aus_inj_equiv)
         filas.append({
             "estudiante": est,
             "total_lecciones": total_lecciones,
-            "presentes": presentes.quantize(Decimal("0.1")),
-            "tm": tm.quantize(Decimal("0.1")),
-            "tc": tc.quantize(Decimal("0.1")),
-            "ai": ai.quantize(Decimal("0.1")),
-            "aj": aj.quantize(Decimal("0.1")),
+            "presentes": t["presentes"].quantize(Decimal("0.1")),
+            "tm": t["tardias_media"].quantize(Decimal("0.1")),
+            "tc": t["tardias_completa"].quantize(Decimal("0.1")),
+            "ai": t["ausentes_ai"].quantize(Decimal("0.1")),
+            "aj": t["ausentes_just"].quantize(Decimal("0.1")),
             "aus_inj_equiv": aus_inj_equiv.quantize(Decimal("0.01")),
             "pct_aus": round(pct_aus, 2),
             "pct_asis": round(pct_asis, 2),
@@ -3500,7 +3458,7 @@ def reporte_asistencia_agrupado_view(request, asignacion_id):
         "periodo": periodo,
         "asignaciones": asignaciones,
         "filas": filas,
-        "total_sesiones": len(sesiones),
+        "total_sesiones": total_sesiones,
         "plantilla": plantilla,
     })
 
@@ -4110,29 +4068,26 @@ def actividad_calificar_view(request, actividad_id):
             obs_key = f"obs_{m.estudiante_id}"
             observaciones_post[m.estudiante_id] = (request.POST.get(obs_key, "") or "").strip()
         with transaction.atomic():
-            guardados, errores = guardar_puntajes_masivo(
+            conteos, errores = guardar_puntajes_masivo(
                 actividad,
                 [m.estudiante_id for m in matriculas],
                 datos,
                 indicadores_ids={ind.id for ind in indicadores},
             )
-            for est_id, obs_text in observaciones_post.items():
-                if obs_text:
-                    ObservacionActividadEstudiante.objects.update_or_create(
-                        actividad=actividad,
-                        estudiante_id=est_id,
-                        defaults={"observacion": obs_text},
-                    )
-                else:
-                    ObservacionActividadEstudiante.objects.filter(
-                        actividad=actividad,
-                        estudiante_id=est_id,
-                    ).delete()
+            conteos_obs = guardar_observaciones_masivo(actividad, observaciones_post)
+        guardados = conteos["insertados"] + conteos["actualizados"]
+        obs_cambios = conteos_obs["insertados"] + conteos_obs["actualizados"] + conteos_obs["eliminados"]
         if errores:
             for e in errores:
                 messages.error(request, e)
         elif guardados > 0:
-            messages.success(request, f"Se guardaron {guardados} puntaje(s).")
+            messages.success(
+                request,
+                f"Se guardaron {guardados} puntaje(s): {conteos['insertados']} nuevo(s), "
+                f"{conteos['actualizados']} actualizado(s), {conteos['sin_cambios']} sin cambios.",
+            )
+        elif obs_cambios > 0:
+            messages.success(request, "Observaciones guardadas.")
         else:
             messages.info(request, "No hubo cambios que guardar.")
         return redirect(reverse("libro_docente:actividad_calificar", args=[actividad_id]))
@@ -4237,13 +4192,14 @@ def _calificar_simple(request, actividad, asignacion, matriculas):
 
     if request.method == "POST":
         errores = []
-        cambios = []
+        cambios = {}
         with transaction.atomic():
             for m in matriculas:
                 key = f"ps_{m.estudiante_id}"
                 raw = (request.POST.get(key, "") or "").strip()
                 if raw == "":
-                    cambios.append(("delete", m.estudiante_id, None))
+                    # Celda vacía: queda sin calificar
+                    cambios[m.estudiante_id] = None
                     continue
                 try:
                     puntos = Decimal(raw.replace(",", "."))
@@ -4255,26 +4211,25 @@ def _calificar_simple(request, actividad, asignacion, matriculas):
                         f"{m.estudiante}: puntaje fuera de rango (0 a {int(puntaje_total)})."
                     )
                     continue
-                cambios.append(("upsert", m.estudiante_id, puntos))
+                cambios[m.estudiante_id] = puntos
             if errores:
                 transaction.set_rollback(True)
             else:
-                for op, est_id, pts in cambios:
-                    if op == "delete":
-                        PuntajeSimple.objects.filter(actividad=actividad, estudiante_id=est_id).delete()
-                    else:
-                        PuntajeSimple.objects.update_or_create(
-                            actividad=actividad,
-                            estudiante_id=est_id,
-                            defaults={"puntos_obtenidos": pts},
-                        )
+                conteos = guardar_puntajes_simples_masivo(actividad, cambios)
         if errores:
             for e in errores[:5]:
                 messages.error(request, e)
             if len(errores) > 5:
                 messages.error(request, f"Se detectaron {len(errores)} errores de validación.")
             return redirect(reverse("libro_docente:actividad_calificar", args=[actividad.id]))
-        messages.success(request, "Puntajes guardados.")
+        if conteos["insertados"] or conteos["actualizados"]:
+            messages.success(
+                request,
+                f"Puntajes guardados: {conteos['insertados']} nuevo(s), "
+                f"{conteos['actualizados']} actualizado(s), {conteos['sin_cambios']} sin cambios.",
+            )
+        else:
+            messages.info(request, "No hubo cambios que guardar.")
         return redirect(reverse("libro_docente:actividad_calificar", args=[actividad.id]))
 
     filas, puntaje_total, porcentaje_actividad = _filas_calificacion_simple_get(actividad, asignacion, matriculas)
@@ -4415,12 +4370,12 @@ def resumen_evaluacion_view(request, asignacion_id):
     if not periodo_id and periodos_cl:
         periodo_id = periodos_cl[0].periodo_id
 
-    matriculas = _get_estudiantes(asignacion)
+    matriculas = _matriculas_asignacion(asignacion)
     filas = []
     filas_general = []
     has_proyecto = ActividadEvaluacion.PROYECTO in _tipos_habilitados_por_esquema(asignacion)
     if periodo_id:
-        filas = calcular_resumen_evaluacion_completo(asignacion, periodo_id, matriculas)
+        filas = obtener_resumen_evaluacion(asignacion, periodo_id, matriculas)
         _enriquecer_filas_resumen_con_asistencia(asignacion, periodo_id, matriculas, filas)
         filas_general = _construir_resumen_general(asignacion, periodo_id, matriculas, filas)
 
@@ -4514,6 +4469,45 @@ def _to_2_dec(valor):
     return valor.quantize(Decimal("0.01"))
 
 
+def _datos_resumen_general_export(asignacion, periodo_id):
+    """
+    (has_proyecto, filas_general) de una asignación/período para exportar.
+    Compartido por la exportación por asignación y la institucional.
+    """
+    matriculas = _matriculas_asignacion(asignacion)
+    filas = obtener_resumen_evaluacion(asignacion, periodo_id, matriculas)
+    _enriquecer_filas_resumen_con_asistencia(asignacion, periodo_id, matriculas, filas)
+    filas_general = _construir_resumen_general(asignacion, periodo_id, matriculas, filas)
+    has_proyecto = ActividadEvaluacion.PROYECTO in _tipos_habilitados_por_esquema(asignacion)
+    return has_proyecto, filas_general
+
+
+def _encabezados_resumen_general(has_proyecto):
+    # Orden fijo para carga en sistema externo: Cotidiano, Tareas, [Proyecto], Pruebas, Asistencia
+    headers = ["id", "Nombre", "Trabajo cotidiano", "Tareas"]
+    if has_proyecto:
+        headers.append("Proyecto")
+    headers.extend(["Pruebas", "Asistencia"])
+    return headers
+
+
+def _valores_resumen_general(r, has_proyecto):
+    """Fila exportable: id, nombre y aportes (Decimal a 2 decimales) en el orden de los encabezados."""
+    row = [
+        r["id"],
+        r["nombre"],
+        _to_2_dec(r["cotidiano"]["aporte"]),
+        _to_2_dec(r["tareas"]["aporte"]),
+    ]
+    if has_proyecto:
+        row.append(_to_2_dec(r["proyecto"]["aporte"]))
+    row.extend([
+        _to_2_dec(r["pruebas"]["aporte"]),
+        _to_2_dec(r["asistencia"]["aporte"]),
+    ])
+    return row
+
+
 @login_required
 @permission_required("libro_docente.access_libro_docente", raise_exception=True)
 def resumen_general_export_xlsx(request, asignacion_id):
@@ -4531,35 +4525,15 @@ def resumen_general_export_xlsx(request, asignacion_id):
         messages.error(request, "Debe seleccionar período para exportar.")
         return redirect(reverse("libro_docente:resumen_evaluacion", args=[asignacion_id]))
 
-    matriculas = _get_estudiantes(asignacion)
-    filas = calcular_resumen_evaluacion_completo(asignacion, periodo_id, matriculas)
-    _enriquecer_filas_resumen_con_asistencia(asignacion, periodo_id, matriculas, filas)
-    filas_general = _construir_resumen_general(asignacion, periodo_id, matriculas, filas)
-    has_proyecto = ActividadEvaluacion.PROYECTO in _tipos_habilitados_por_esquema(asignacion)
+    has_proyecto, filas_general = _datos_resumen_general_export(asignacion, periodo_id)
 
     wb = openpyxl.Workbook()
     ws = wb.active
     ws.title = "Resumen General"
-    # Orden fijo para carga en sistema externo: Cotidiano, Tareas, [Proyecto], Pruebas, Asistencia
-    headers = ["id", "Nombre", "Trabajo cotidiano", "Tareas"]
-    if has_proyecto:
-        headers.append("Proyecto")
-    headers.extend(["Pruebas", "Asistencia"])
-    ws.append(headers)
+    ws.append(_encabezados_resumen_general(has_proyecto))
     for r in filas_general:
-        row = [
-            r["id"],
-            r["nombre"],
-            float(_to_2_dec(r["cotidiano"]["aporte"])),
-            float(_to_2_dec(r["tareas"]["aporte"])),
-        ]
-        if has_proyecto:
-            row.append(float(_to_2_dec(r["proyecto"]["aporte"])))
-        row.extend([
-            float(_to_2_dec(r["pruebas"]["aporte"])),
-            float(_to_2_dec(r["asistencia"]["aporte"])),
-        ])
-        ws.append(row)
+        row = _valores_resumen_general(r, has_proyecto)
+        ws.append(row[:2] + [float(v) for v in row[2:]])
 
     resp = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
     resp["Content-Disposition"] = f'attachment; filename="resumen_general_{asignacion_id}_{periodo_id}.xlsx"'
@@ -4581,37 +4555,140 @@ def resumen_general_export_csv(request, asignacion_id):
         messages.error(request, "Debe seleccionar período para exportar.")
         return redirect(reverse("libro_docente:resumen_evaluacion", args=[asignacion_id]))
 
-    matriculas = _get_estudiantes(asignacion)
-    filas = calcular_resumen_evaluacion_completo(asignacion, periodo_id, matriculas)
-    _enriquecer_filas_resumen_con_asistencia(asignacion, periodo_id, matriculas, filas)
-    filas_general = _construir_resumen_general(asignacion, periodo_id, matriculas, filas)
-    has_proyecto = ActividadEvaluacion.PROYECTO in _tipos_habilitados_por_esquema(asignacion)
+    has_proyecto, filas_general = _datos_resumen_general_export(asignacion, periodo_id)
 
     resp = HttpResponse(content_type="text/csv; charset=utf-8")
     resp["Content-Disposition"] = f'attachment; filename="resumen_general_{asignacion_id}_{periodo_id}.csv"'
     writer = csv.writer(resp)
-    headers = ["id", "Nombre", "Trabajo cotidiano", "Tareas"]
-    if has_proyecto:
-        headers.append("Proyecto")
-    headers.extend(["Pruebas", "Asistencia"])
-    writer.writerow(headers)
+    writer.writerow(_encabezados_resumen_general(has_proyecto))
     for r in filas_general:
-        row = [
-            r["id"],
-            r["nombre"],
-            f"{_to_2_dec(r['cotidiano']['aporte']):.2f}",
-            f"{_to_2_dec(r['tareas']['aporte']):.2f}",
-        ]
-        if has_proyecto:
-            row.append(f"{_to_2_dec(r['proyecto']['aporte']):.2f}")
-        row.extend([
-            f"{_to_2_dec(r['pruebas']['aporte']):.2f}",
-            f"{_to_2_dec(r['asistencia']['aporte']):.2f}",
-        ])
-        writer.writerow(row)
+        row = _valores_resumen_general(r, has_proyecto)
+        writer.writerow(row[:2] + [f"{v:.2f}" for v in row[2:]])
     return resp
 
 
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  EXPORTACIÓN INSTITUCIONAL (CURSO LECTIVO + PERÍODO)
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def _institucion_exportacion(request):
+    """Institución activa; el superusuario sin institución activa puede indicarla por parámetro."""
+    inst_id = getattr(request, "institucion_activa_id", None)
+    if not inst_id and request.user.is_superuser:
+        raw = request.POST.get("institucion") or request.GET.get("institucion")
+        inst_id = int(raw) if raw and str(raw).isdigit() else None
+    return inst_id
+
+
+def _exportacion_json(exportacion):
+    return {
+        "id": exportacion.id,
+        "estado": exportacion.estado,
+        "estado_display": exportacion.get_estado_display(),
+        "total": exportacion.total,
+        "procesadas": exportacion.procesadas,
+        "porcentaje": exportacion.porcentaje,
+        "error": exportacion.error,
+        "url_descarga": (
+            reverse("libro_docente:exportacion_institucional_descargar", args=[exportacion.id])
+            if exportacion.estado == ExportacionInstitucional.COMPLETADA and exportacion.archivo
+            else None
+        ),
+    }
+
+
+@login_required
+@permission_required("libro_docente.access_exportacion_institucional", raise_exception=True)
+def exportacion_institucional_view(request):
+    """
+    Solicita la exportación del resumen general de todas las asignaciones de la
+    institución para un (curso lectivo, período) y lista las solicitudes recientes.
+    La solicitud queda PENDIENTE para el comando procesar_exportaciones_institucionales.
+    """
+    inst_id = _institucion_exportacion(request)
+    if not inst_id:
+        messages.error(request, "Debe seleccionar una institución activa.")
+        return redirect("libro_docente:home")
+
+    periodos_cl = list(
+        PeriodoCursoLectivo.objects
+        .filter(institucion_id=inst_id, activo=True)
+        .select_related("periodo", "curso_lectivo")
+        .order_by("-curso_lectivo__anio", "periodo__numero")
+    )
+
+    if request.method == "POST":
+        pcl_id = request.POST.get("periodo_curso")
+        pcl = next((p for p in periodos_cl if str(p.id) == str(pcl_id)), None)
+        formato = request.POST.get("formato") or ExportacionInstitucional.XLSX
+        if pcl is None or formato not in dict(ExportacionInstitucional.FORMATO_CHOICES):
+            messages.error(request, "Debe seleccionar período y formato válidos.")
+            return redirect(reverse("libro_docente:exportacion_institucional"))
+        exportacion = ExportacionInstitucional.objects.create(
+            institucion_id=inst_id,
+            curso_lectivo_id=pcl.curso_lectivo_id,
+            periodo_id=pcl.periodo_id,
+            formato=formato,
+            solicitado_por=request.user,
+        )
+        messages.success(request, "Exportación en cola. El archivo estará disponible al finalizar.")
+        return redirect(reverse("libro_docente:exportacion_institucional"))
+
+    exportaciones = list(
+        ExportacionInstitucional.objects
+        .filter(institucion_id=inst_id)
+        .select_related("curso_lectivo", "periodo", "solicitado_por")[:20]
+    )
+    return render(request, "libro_docente/exportacion_institucional.html", {
+        "periodos_cl": periodos_cl,
+        "formatos": ExportacionInstitucional.FORMATO_CHOICES,
+        "exportaciones": exportaciones,
+        "estados_en_curso": [ExportacionInstitucional.PENDIENTE, ExportacionInstitucional.PROCESANDO],
+    })
+
+
+def _obtener_exportacion(request, exportacion_id):
+    exportacion = get_object_or_404(ExportacionInstitucional, pk=exportacion_id)
+    inst_activa = getattr(request, "institucion_activa_id", None)
+    if not request.user.is_superuser and exportacion.institucion_id != inst_activa:
+        raise Http404
+    return exportacion
+
+
+@login_required
+@permission_required("libro_docente.access_exportacion_institucional", raise_exception=True)
+def exportacion_institucional_estado_view(request, exportacion_id):
+    """Avance de la exportación (JSON para el sondeo de la pantalla)."""
+    return JsonResponse(_exportacion_json(_obtener_exportacion(request, exportacion_id)))
+
+
+@login_required
+@permission_required("libro_docente.access_exportacion_institucional", raise_exception=True)
+def exportacion_institucional_descargar_view(request, exportacion_id):
+    exportacion = _obtener_exportacion(request, exportacion_id)
+    if exportacion.estado != ExportacionInstitucional.COMPLETADA or not exportacion.archivo:
+        messages.error(request, "La exportación aún no está disponible.")
+        return redirect(reverse("libro_docente:exportacion_institucional"))
+    return FileResponse(
+        exportacion.archivo.open("rb"),
+        as_attachment=True,
+        filename=exportacion.archivo.name.rsplit("/", 1)[-1],
+    )
+
+
+def _resumen_componente_vacio():
+    return {
+        "puntos_obtenidos": Decimal("0"),
+        "puntos_maximos": Decimal("0"),
+        "porcentaje_logro": Decimal("0"),
+        "porcentaje_componente": Decimal("0"),
+        "aporte": Decimal("0"),
+        "detalle_actividades": [],
+    }
+
+
 @login_required
 @permission_required("libro_docente.access_libro_docente", raise_exception=True)
 def resumen_estudiante_detalle_view(request, asignacion_id, estudiante_id):
@@ -4623,7 +4700,7 @@ def resumen_estudiante_detalle_view(request, asignacion_id, estudiante_id):
         messages.error(request, "No tienes acceso.")
         return redirect("libro_docente:home")
 
-    matriculas = _get_estudiantes(asignacion)
+    matriculas = _matriculas_asignacion(asignacion)
     matricula = next((m for m in matriculas if m.estudiante_id == estudiante_id), None)
     if not matricula:
         messages.error(request, "El estudiante no pertenece a este grupo.")
@@ -4644,45 +4721,14 @@ def resumen_estudiante_detalle_view(request, asignacion_id, estudiante_id):
     if not periodo_id and periodos_cl:
         periodo_id = periodos_cl[0].periodo_id
 
-    from decimal import Decimal
-    from .services import calcular_resumen_componente_estudiante
-
-    _empty_resumen = {
-        "puntos_obtenidos": Decimal("0"),
-        "puntos_maximos": Decimal("0"),
-        "porcentaje_logro": Decimal("0"),
-        "porcentaje_componente": Decimal("0"),
-        "aporte": Decimal("0"),
-        "detalle_actividades": [],
-    }
-    tareas = (
-        calcular_resumen_componente_estudiante(
-            asignacion, periodo_id, ActividadEvaluacion.TAREA, estudiante_id
-        )
-        if periodo_id
-        else _empty_resumen
-    )
-    cotidianos = (
-        calcular_resumen_componente_estudiante(
-            asignacion, periodo_id, ActividadEvaluacion.COTIDIANO, estudiante_id
-        )
-        if periodo_id
-        else _empty_resumen
-    )
-    pruebas = (
-        calcular_resumen_componente_estudiante(
-            asignacion, periodo_id, ActividadEvaluacion.PRUEBA, estudiante_id
-        )
-        if periodo_id
-        else _empty_resumen
-    )
-    proyectos = (
-        calcular_resumen_componente_estudiante(
-            asignacion, periodo_id, ActividadEvaluacion.PROYECTO, estudiante_id
-        )
-        if periodo_id
-        else _empty_resumen
-    )
+    if periodo_id:
+        detalle = calcular_detalle_componentes(asignacion, periodo_id, [estudiante_id])[estudiante_id]
+    else:
+        detalle = {t: _resumen_componente_vacio() for t in TIPOS_RESUMEN}
+    tareas = detalle[ActividadEvaluacion.TAREA]
+    cotidianos = detalle[ActividadEvaluacion.COTIDIANO]
+    pruebas = detalle[ActividadEvaluacion.PRUEBA]
+    proyectos = detalle[ActividadEvaluacion.PROYECTO]
     has_proyecto = ActividadEvaluacion.PROYECTO in _tipos_habilitados_por_esquema(asignacion)
     asistencia_fila = None
     asistencia_meta = {}
@@ -4723,3 +4769,54 @@ def resumen_estudiante_detalle_view(request, asignacion_id, estudiante_id):
         "asistencia_fila": asistencia_fila,
         "asistencia_meta": asistencia_meta,
     })
+
+
+@login_required
+@permission_required("libro_docente.access_libro_docente", raise_exception=True)
+def resumen_detalle_grupo_view(request, asignacion_id):
+    """
+    Desglose por actividad de todos los estudiantes del grupo (vista imprimible).
+    Un solo cálculo por lotes para el grupo completo.
+    """
+    asignacion = _obtener_asignacion_con_permiso(request, asignacion_id)
+    if asignacion is None:
+        messages.error(request, "No tienes acceso.")
+        return redirect("libro_docente:home")
+
+    periodo_id_raw = request.GET.get("periodo")
+    periodo_id = int(periodo_id_raw) if periodo_id_raw and str(periodo_id_raw).isdigit() else None
+    tipo = request.GET.get("tipo", "").upper()
+    if tipo not in TIPOS_EVALUACION:
+        tipo = None
+    if not periodo_id:
+        messages.error(request, "Debe seleccionar período.")
+        return redirect(reverse("libro_docente:resumen_evaluacion", args=[asignacion_id]))
+
+    matriculas = _matriculas_asignacion(asignacion)
+    detalle = calcular_detalle_componentes(
+        asignacion, periodo_id, [m.estudiante_id for m in matriculas]
+    )
+    estudiantes = []
+    for m in matriculas:
+        d = detalle.get(m.estudiante_id, {})
+        estudiantes.append({
+            "estudiante": m.estudiante,
+            "tareas": d.get(ActividadEvaluacion.TAREA),
+            "cotidianos": d.get(ActividadEvaluacion.COTIDIANO),
+            "pruebas": d.get(ActividadEvaluacion.PRUEBA),
+            "proyectos": d.get(ActividadEvaluacion.PROYECTO),
+        })
+    periodo = PeriodoCursoLectivo.objects.filter(
+        institucion_id=asignacion.subarea_curso.institucion_id,
+        curso_lectivo=asignacion.curso_lectivo,
+        periodo_id=periodo_id,
+    ).select_related("periodo").first()
+
+    return render(request, "libro_docente/resumen_detalle_grupo.html", {
+        "asignacion": asignacion,
+        "periodo_id": str(periodo_id),
+        "periodo": periodo.periodo if periodo else None,
+        "tipo": tipo,
+        "estudiantes": estudiantes,
+        "has_proyecto": ActividadEvaluacion.PROYECTO in _tipos_habilitados_por_esquema(asignacion),
+    })
@@ -7,14 +7,291 @@ Implementa la lógica completa de distribución equitativa considerando:
 - Hermanos juntos (mismo primer y segundo apellido)
 - Round-robin ponderado para distribución equitativa
 - Separación por especialidad vs sin especialidad
+- Modo optimizado: búsqueda local sobre el resultado voraz (ver motor_asignacion)
+- Buckets independientes (nivel/tipo, especialidad) resueltos en un pool de procesos
+  (solo desde comandos o con ASIGNACION_PROCESOS; la vista resuelve en serie)
 """
 
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
 from django.db import transaction
 import math
+import multiprocessing
+import os
 
+from .motor_asignacion import MODO_VORAZ, OptimizacionAsignacion, composicion_cluster, optimizar_bucket
 
-def ejecutar_asignacion_completa(institucion, curso_lectivo, nivel, usuario, simular=False):
+
+# Máximo de ids por UPDATE al aplicar la asignación.
+TAMANO_LOTE_ASIGNACION = 500
+# Por debajo de esta cantidad de estudiantes no compensa levantar el pool de buckets.
+ASIGNACION_MIN_PARALELO = 600
+
+
+def calcular_asignacion(institucion, curso_lectivo, nivel=None, optimizacion=None, procesos=None):
+    """
+    Calcula la asignación sin escribir en la base de datos.
+
+    Carga una sola vez las matrículas elegibles, las secciones y subgrupos
+    configurados (con su Seccion/Subgrupo y nivel) y el tipo de estudiante de cada
+    sección; la simulación y la aplicación usan este mismo plan. `optimizacion`
+    (OptimizacionAsignacion) elige el modo del solver; por defecto, voraz. Los
+    buckets se resuelven en `procesos` procesos (None: procesos_asignacion(), en serie
+    salvo que ASIGNACION_PROCESOS lo configure).
+
+    Returns:
+        dict: plan con las matrículas, las asignaciones {seccion_id: [matriculas]} y
+        {subgrupo_id: [matriculas]}, los mapas de Seccion/Subgrupo por id, los totales
+        y la calidad de la distribución.
+    """
+    from .models import MatriculaAcademica
+    from config_institucional.models import SeccionCursoLectivo, SubgrupoCursoLectivo
+
+    # 1. OBTENER ESTUDIANTES ELEGIBLES
+    filtros = {
+        'institucion': institucion,
+        'curso_lectivo': curso_lectivo,
+        'estado__iexact': 'activo',
+        'seccion__isnull': True,
+        'subgrupo__isnull': True
+    }
+
+    if nivel:
+        filtros['nivel'] = nivel
+
+    matriculas = list(MatriculaAcademica.objects.filter(**filtros).select_related(
+        'estudiante__sexo', 'nivel', 'especialidad'
+    ).order_by('estudiante__primer_apellido', 'estudiante__segundo_apellido', 'estudiante__nombres'))
+
+    plan = {
+        'institucion': institucion,
+        'curso_lectivo': curso_lectivo,
+        'nivel': nivel,
+        'matriculas': matriculas,
+        'asignaciones_secciones': {},
+        'asignaciones_subgrupos': {},
+        'secciones': {},
+        'subgrupos': {},
+        'hermanos_agrupados': 0,
+        'estudiantes_sin_especialidad': 0,
+        'estudiantes_con_especialidad': 0,
+        'calidad': None,
+    }
+    if not matriculas:
+        return plan
+    if optimizacion is None:
+        optimizacion = OptimizacionAsignacion()
+
+    # 2. OBTENER SECCIONES Y SUBGRUPOS DISPONIBLES
+    secciones_qs = SeccionCursoLectivo.objects.filter(
+        institucion=institucion,
+        curso_lectivo=curso_lectivo,
+        activa=True
+    ).select_related('seccion__nivel')
+    subgrupos_qs = SubgrupoCursoLectivo.objects.filter(
+        institucion=institucion,
+        curso_lectivo=curso_lectivo,
+        activa=True
+    ).select_related('subgrupo__seccion__nivel', 'especialidad_curso')
+    if nivel:
+        # Filtrar por nivel específico
+        secciones_disponibles = list(secciones_qs.filter(seccion__nivel=nivel).order_by('seccion__numero'))
+        subgrupos_disponibles = list(subgrupos_qs.filter(subgrupo__seccion__nivel=nivel).order_by('subgrupo__letra'))
+    else:
+        # Todos los niveles
+        secciones_disponibles = list(secciones_qs.order_by('seccion__nivel__numero', 'seccion__numero'))
+        subgrupos_disponibles = list(subgrupos_qs.order_by('subgrupo__seccion__nivel__numero', 'subgrupo__letra'))
+
+    plan['secciones'] = {s.seccion_id: s.seccion for s in secciones_disponibles}
+    plan['subgrupos'] = {s.subgrupo_id: s.subgrupo for s in subgrupos_disponibles}
+
+    # 3. SEPARAR POR ESPECIALIDAD Y SIN ESPECIALIDAD
+    estudiantes_sin_especialidad = []
+    estudiantes_con_especialidad = defaultdict(list)  # {especialidad_id: [matriculas]}
+
+    for matricula in matriculas:
+        if matricula.especialidad_id:
+            estudiantes_con_especialidad[matricula.especialidad_id].append(matricula)
+        else:
+            estudiantes_sin_especialidad.append(matricula)
+
+    # 4. ARMAR LOS BUCKETS INDEPENDIENTES
+    # Sin especialidad: por (nivel, tipo) → secciones; con especialidad: por
+    # (especialidad, nivel, tipo) → subgrupos.
+    buckets_secciones = []
+    if estudiantes_sin_especialidad and secciones_disponibles:
+        buckets_secciones = buckets_sin_especialidad(estudiantes_sin_especialidad, secciones_disponibles)
+    buckets_subgrupos = []
+    if estudiantes_con_especialidad and subgrupos_disponibles:
+        # Tipo de estudiante de cada sección (activa o no), para validar los subgrupos
+        tipos_seccion = dict(
+            SeccionCursoLectivo.objects.filter(
+                institucion=institucion,
+                curso_lectivo=curso_lectivo,
+            ).values_list('seccion_id', 'tipo_estudiante')
+        )
+        buckets_subgrupos = buckets_con_especialidad(
+            estudiantes_con_especialidad, subgrupos_disponibles, tipos_seccion
+        )
+
+    # 5. RESOLVER TODOS LOS BUCKETS (EN PARALELO SI CORRESPONDE) Y UNIR EN ORDEN
+    resultados = resolver_buckets(
+        buckets_secciones + buckets_subgrupos,
+        optimizacion,
+        procesos if procesos is not None else procesos_asignacion(),
+    )
+    asignaciones_secciones = defaultdict(list)
+    asignaciones_subgrupos = defaultdict(list)
+    hermanos_agrupados = 0
+    for indice, (asignaciones_bucket, hermanos_bucket) in enumerate(resultados):
+        es_seccion = indice < len(buckets_secciones)
+        for grupo_config, mats in asignaciones_bucket.items():
+            if es_seccion:
+                asignaciones_secciones[grupo_config.seccion_id].extend(mats)
+            else:
+                asignaciones_subgrupos[grupo_config.subgrupo_id].extend(mats)
+        hermanos_agrupados += hermanos_bucket
+    asignaciones_secciones = dict(asignaciones_secciones)
+    asignaciones_subgrupos = dict(asignaciones_subgrupos)
+
+    # 5.1 DIVIDIR SUBGRUPOS PARA ESTUDIANTES SIN ESPECIALIDAD SEGÚN SU SECCIÓN (p. ej. 7-1 → 7-1A, 7-1B)
+    # Para niveles sin especialidad (p. ej. 7º), si existen subgrupos configurados (sin especialidad) por sección,
+    # repartir equitativamente los alumnos ya asignados a esa sección entre dichos subgrupos
+    if asignaciones_secciones and subgrupos_disponibles:
+        subgrupos_por_seccion = defaultdict(list)
+        for s in subgrupos_disponibles:
+            # Subgrupos activos sin especialidad (niveles distintos a 10-12)
+            if s.especialidad_curso_id is None:
+                subgrupos_por_seccion[s.subgrupo.seccion_id].append(s)
+        for seccion_id, matriculas_asignadas in asignaciones_secciones.items():
+            subgrupos_seccion = subgrupos_por_seccion.get(seccion_id)
+            if not subgrupos_seccion:
+                continue
+            distribucion = dividir_matriculas_en_subgrupos(matriculas_asignadas, subgrupos_seccion)
+            for sub_conf, mats in distribucion.items():
+                asignaciones_subgrupos.setdefault(sub_conf.subgrupo_id, []).extend(mats)
+
+    plan.update({
+        'asignaciones_secciones': asignaciones_secciones,
+        'asignaciones_subgrupos': asignaciones_subgrupos,
+        'hermanos_agrupados': hermanos_agrupados,
+        'estudiantes_sin_especialidad': len(estudiantes_sin_especialidad),
+        'estudiantes_con_especialidad': sum(len(v) for v in estudiantes_con_especialidad.values()),
+        'calidad': optimizacion.resumen(),
+    })
+    return plan
+
+
+def matriculas_asignadas(plan):
+    """
+    Aplica en memoria las asignaciones del plan sobre las matrículas (sección y, si
+    corresponde, subgrupo con su sección). Retorna {matricula_id: matricula}.
+    """
+    asignadas = {}
+    for seccion_id, matriculas in plan['asignaciones_secciones'].items():
+        seccion = plan['secciones'][seccion_id]
+        for matricula in matriculas:
+            matricula.seccion = seccion
+            asignadas[matricula.id] = matricula
+    for subgrupo_id, matriculas in plan['asignaciones_subgrupos'].items():
+        subgrupo = plan['subgrupos'][subgrupo_id]
+        for matricula in matriculas:
+            matricula.subgrupo = subgrupo
+            # Asegurar coherencia: sección del subgrupo
+            matricula.seccion = subgrupo.seccion
+            asignadas[matricula.id] = matricula
+    return asignadas
+
+
+def secciones_utilizadas(plan):
+    """Ids de las secciones usadas (directas + las de los subgrupos)."""
+    ids = set(plan['asignaciones_secciones'])
+    ids.update(plan['subgrupos'][subgrupo_id].seccion_id for subgrupo_id in plan['asignaciones_subgrupos'])
+    return ids
+
+
+def _invalidar_caches_matriculas(institucion_id, curso_lectivo_id):
+    # QuerySet.update no emite post_save: se invalidan aquí el índice del comedor y los
+    # rosters docentes, que dependen de sección/subgrupo.
+    from comedor.services import invalidar_indice_comedor
+    from libro_docente.services import invalidar_roster_curso
+
+    invalidar_indice_comedor(institucion_id, curso_lectivo_id)
+    invalidar_roster_curso(institucion_id, curso_lectivo_id)
+
+
+def _version_algoritmo(plan):
+    calidad = plan.get('calidad') or {}
+    return 'v1.0' if calidad.get('modo', MODO_VORAZ) == MODO_VORAZ else 'v1.0+busqueda'
+
+
+def aplicar_asignacion(plan, usuario):
+    """
+    Guarda el plan en una transacción corta: bloquea las matrículas que siguen sin
+    grupo, las actualiza por lotes agrupadas por destino y registra una AsignacionGrupos.
+    Las matrículas que otra asignación tomó mientras se calculaba el plan se omiten.
+
+    Returns:
+        int: cantidad de matrículas asignadas.
+    """
+    from .models import MatriculaAcademica, AsignacionGrupos
+
+    asignadas = matriculas_asignadas(plan)
+    if not asignadas:
+        return 0
+
+    institucion = plan['institucion']
+    curso_lectivo = plan['curso_lectivo']
+    with transaction.atomic():
+        libres = set(
+            MatriculaAcademica.objects.select_for_update().filter(
+                id__in=list(asignadas),
+                seccion__isnull=True,
+                subgrupo__isnull=True,
+            ).values_list('id', flat=True)
+        )
+        # Un UPDATE por destino (sección, subgrupo) y lote de ids: las matrículas se
+        # concentran en pocos grupos y así no se arma un CASE por fila.
+        por_destino = defaultdict(list)
+        for matricula_id, matricula in asignadas.items():
+            if matricula_id in libres:
+                por_destino[(matricula.seccion_id, matricula.subgrupo_id)].append(matricula_id)
+        if not por_destino:
+            return 0
+        for (seccion_id, subgrupo_id), ids in por_destino.items():
+            for inicio in range(0, len(ids), TAMANO_LOTE_ASIGNACION):
+                MatriculaAcademica.objects.filter(
+                    id__in=ids[inicio:inicio + TAMANO_LOTE_ASIGNACION]
+                ).update(seccion_id=seccion_id, subgrupo_id=subgrupo_id)
+        total_asignados = len(libres)
+
+        # Crear registro de asignación
+        stats = calcular_estadisticas_completas(plan['matriculas'])
+        n_secciones = len(secciones_utilizadas(plan))
+        n_subgrupos = len(plan['asignaciones_subgrupos'])
+        AsignacionGrupos.objects.create(
+            institucion=institucion,
+            curso_lectivo=curso_lectivo,
+            nivel=plan['nivel'],
+            usuario_asignacion=usuario,
+            total_estudiantes=total_asignados,
+            total_mujeres=stats['mujeres'],
+            total_hombres=stats['hombres'],
+            total_otros=stats['otros'],
+            secciones_utilizadas=n_secciones,
+            subgrupos_utilizados=n_subgrupos,
+            hermanos_agrupados=plan['hermanos_agrupados'],
+            algoritmo_version=_version_algoritmo(plan),
+            observaciones=f"Asignación automática: {n_secciones} secciones, {n_subgrupos} subgrupos"
+        )
+        transaction.on_commit(
+            lambda: _invalidar_caches_matriculas(institucion.id, curso_lectivo.id)
+        )
+    return total_asignados
+
+
+def ejecutar_asignacion_completa(institucion, curso_lectivo, nivel, usuario, simular=False, optimizacion=None, procesos=None):
     """
     Función principal que ejecuta la asignación automática completa.
     
@@ -24,14 +301,12 @@ def ejecutar_asignacion_completa(institucion, curso_lectivo, nivel, usuario, sim
         nivel: Objeto Nivel (opcional, None para todos los niveles)
         usuario: Usuario que ejecuta la asignación
         simular: Si True, no guarda cambios, solo simula
+        optimizacion: OptimizacionAsignacion (opcional); None usa el modo voraz
+        procesos: procesos para resolver los buckets (opcional; 1 = en serie)
     
     Returns:
         dict: Resultado con estadísticas y detalles de la asignación
     """
-    from .models import MatriculaAcademica, AsignacionGrupos
-    from config_institucional.models import SeccionCursoLectivo, SubgrupoCursoLectivo
-    from catalogos.models import Seccion, Subgrupo
-    
     resultado = {
         'success': False,
         'mensaje': '',
@@ -41,186 +316,38 @@ def ejecutar_asignacion_completa(institucion, curso_lectivo, nivel, usuario, sim
     }
     
     try:
-        # 1. OBTENER ESTUDIANTES ELEGIBLES
-        filtros = {
-            'institucion': institucion,
-            'curso_lectivo': curso_lectivo,
-            'estado__iexact': 'activo',
-            'seccion__isnull': True,
-            'subgrupo__isnull': True
-        }
-        
-        if nivel:
-            filtros['nivel'] = nivel
-        
-        matriculas = list(MatriculaAcademica.objects.filter(**filtros).select_related(
-            'estudiante', 'nivel', 'especialidad'
-        ).order_by('estudiante__primer_apellido', 'estudiante__segundo_apellido', 'estudiante__nombres'))
-        
+        plan = calcular_asignacion(institucion, curso_lectivo, nivel, optimizacion, procesos)
+        matriculas = plan['matriculas']
         if not matriculas:
             resultado['mensaje'] = 'No hay estudiantes elegibles para asignar'
             return resultado
         
-        # 2. OBTENER SECCIONES Y SUBGRUPOS DISPONIBLES
-        if nivel:
-            # Filtrar por nivel específico
-            secciones_disponibles = SeccionCursoLectivo.objects.filter(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                seccion__nivel=nivel,
-                activa=True
-            ).select_related('seccion').order_by('seccion__numero')
-            
-            subgrupos_disponibles = SubgrupoCursoLectivo.objects.filter(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                subgrupo__seccion__nivel=nivel,
-                activa=True
-            ).select_related('subgrupo', 'especialidad_curso').order_by('subgrupo__letra')
+        # APLICAR ASIGNACIONES (solo si no es simulación)
+        if simular:
+            total_asignados = len(matriculas_asignadas(plan))
         else:
-            # Todos los niveles
-            secciones_disponibles = SeccionCursoLectivo.objects.filter(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                activa=True
-            ).select_related('seccion').order_by('seccion__nivel__numero', 'seccion__numero')
-            
-            subgrupos_disponibles = SubgrupoCursoLectivo.objects.filter(
-                institucion=institucion,
-                curso_lectivo=curso_lectivo,
-                activa=True
-            ).select_related('subgrupo', 'especialidad_curso').order_by('subgrupo__seccion__nivel__numero', 'subgrupo__letra')
+            total_asignados = aplicar_asignacion(plan, usuario)
         
-        # 3. SEPARAR POR ESPECIALIDAD Y SIN ESPECIALIDAD
-        estudiantes_sin_especialidad = []
-        estudiantes_con_especialidad = defaultdict(list)  # {especialidad_id: [matriculas]}
-        
-        for matricula in matriculas:
-            if matricula.especialidad:
-                estudiantes_con_especialidad[matricula.especialidad.id].append(matricula)
-            else:
-                estudiantes_sin_especialidad.append(matricula)
-        
-        # 4. PROCESAR ESTUDIANTES SIN ESPECIALIDAD
-        asignaciones_secciones = {}
-        hermanos_secciones = 0
-        if estudiantes_sin_especialidad and secciones_disponibles:
-            asignaciones_secciones, hermanos_secciones = procesar_estudiantes_sin_especialidad(
-                estudiantes_sin_especialidad, 
-                secciones_disponibles
-            )
-        
-        # 5. PROCESAR ESTUDIANTES CON ESPECIALIDAD
-        asignaciones_subgrupos = {}
-        hermanos_subgrupos = 0
-        if estudiantes_con_especialidad and subgrupos_disponibles:
-            asignaciones_subgrupos, hermanos_subgrupos = procesar_estudiantes_con_especialidad(
-                estudiantes_con_especialidad,
-                subgrupos_disponibles
-            )
-
-        # 5.1 DIVIDIR SUBGRUPOS PARA ESTUDIANTES SIN ESPECIALIDAD SEGÚN SU SECCIÓN (p. ej. 7-1 → 7-1A, 7-1B)
-        # Para niveles sin especialidad (p. ej. 7º), si existen subgrupos configurados (sin especialidad) por sección,
-        # repartir equitativamente los alumnos ya asignados a esa sección entre dichos subgrupos
-        # VALIDANDO que el tipo de estudiante de la SeccionCursoLectivo coincida
-        if asignaciones_secciones and subgrupos_disponibles:
-            for seccion_id, matriculas_asignadas in asignaciones_secciones.items():
-                # Obtener la SeccionCursoLectivo para conocer su tipo_estudiante
-                seccion_config = next(
-                    (s for s in secciones_disponibles if s.seccion.id == seccion_id), 
-                    None
-                )
-                if not seccion_config:
-                    continue
-                
-                # Subgrupos activos de esta sección y sin especialidad (niveles distintos a 10-12)
-                subgrupos_seccion = [
-                    s for s in subgrupos_disponibles
-                    if getattr(s, 'especialidad_curso_id', None) in (None,)
-                    and s.subgrupo.seccion.id == seccion_id
-                ]
-                if not subgrupos_seccion:
-                    continue
-                distribucion = dividir_matriculas_en_subgrupos(matriculas_asignadas, subgrupos_seccion)
-                for sub_conf, mats in distribucion.items():
-                    asignaciones_subgrupos.setdefault(sub_conf.subgrupo.id, []).extend(mats)
-        
-        # 6. APLICAR ASIGNACIONES (solo si no es simulación)
-        total_asignados = 0
-        if not simular:
-            with transaction.atomic():
-                # Asignar secciones
-                for seccion_id, matriculas_asignadas in asignaciones_secciones.items():
-                    seccion = Seccion.objects.get(id=seccion_id)
-                    for matricula in matriculas_asignadas:
-                        matricula.seccion = seccion
-                        matricula.save(update_fields=['seccion'])
-                        total_asignados += 1
-                
-                # Asignar subgrupos (y su sección correspondiente)
-                for subgrupo_id, matriculas_asignadas in asignaciones_subgrupos.items():
-                    subgrupo = Subgrupo.objects.get(id=subgrupo_id)
-                    for matricula in matriculas_asignadas:
-                        matricula.subgrupo = subgrupo
-                        # Asegurar coherencia: sección del subgrupo
-                        matricula.seccion = subgrupo.seccion
-                        matricula.save(update_fields=['subgrupo', 'seccion'])
-                        total_asignados += 1
-                
-                # Crear registro de asignación
-                if total_asignados > 0:
-                    stats = calcular_estadisticas_completas(matriculas)
-                    
-                    # Contar secciones utilizadas (directas + las de subgrupos)
-                    secciones_utilizadas_ids = set(asignaciones_secciones.keys())
-                    for subgrupo_id in asignaciones_subgrupos.keys():
-                        subgrupo = Subgrupo.objects.get(id=subgrupo_id)
-                        secciones_utilizadas_ids.add(subgrupo.seccion.id)
-                    
-                    AsignacionGrupos.objects.create(
-                        institucion=institucion,
-                        curso_lectivo=curso_lectivo,
-                        nivel=nivel,
-                        usuario_asignacion=usuario,
-                        total_estudiantes=total_asignados,
-                        total_mujeres=stats['mujeres'],
-                        total_hombres=stats['hombres'],
-                        total_otros=stats['otros'],
-                        secciones_utilizadas=len(secciones_utilizadas_ids),
-                        subgrupos_utilizados=len(asignaciones_subgrupos),
-                        hermanos_agrupados=hermanos_secciones + hermanos_subgrupos,
-                        observaciones=f"Asignación automática: {len(secciones_utilizadas_ids)} secciones, {len(asignaciones_subgrupos)} subgrupos"
-                    )
-        else:
-            # Simulación: solo contar
-            total_asignados = sum(len(m) for m in asignaciones_secciones.values())
-            total_asignados += sum(len(m) for m in asignaciones_subgrupos.values())
-        
-        # Contar secciones utilizadas totales (directas + las de subgrupos)
-        secciones_utilizadas_ids = set(asignaciones_secciones.keys())
-        for subgrupo_id in asignaciones_subgrupos.keys():
-            try:
-                subgrupo = Subgrupo.objects.get(id=subgrupo_id)
-                secciones_utilizadas_ids.add(subgrupo.seccion.id)
-            except Subgrupo.DoesNotExist:
-                continue
-        
-        # 7. PREPARAR RESULTADO
+        # PREPARAR RESULTADO
         resultado['success'] = True
         resultado['mensaje'] = f"{'Simulación completada' if simular else 'Asignación completada'}: {total_asignados} estudiantes asignados"
         resultado['estadisticas'] = {
             'total_estudiantes': len(matriculas),
             'total_asignados': total_asignados,
-            'secciones_utilizadas': len(secciones_utilizadas_ids),
-            'subgrupos_utilizados': len(asignaciones_subgrupos),
-            'estudiantes_sin_especialidad': len(estudiantes_sin_especialidad),
-            'estudiantes_con_especialidad': sum(len(v) for v in estudiantes_con_especialidad.values()),
-            'hermanos_agrupados': hermanos_secciones + hermanos_subgrupos
+            'secciones_utilizadas': len(secciones_utilizadas(plan)),
+            'subgrupos_utilizados': len(plan['asignaciones_subgrupos']),
+            'estudiantes_sin_especialidad': plan['estudiantes_sin_especialidad'],
+            'estudiantes_con_especialidad': plan['estudiantes_con_especialidad'],
+            'hermanos_agrupados': plan['hermanos_agrupados']
         }
         
+        # Calidad de la distribución (voraz y, si se pidió, optimizada)
+        resultado['calidad'] = plan['calidad']
+        
         # Agregar detalles de las asignaciones
         resultado['detalle_asignaciones'] = generar_detalle_asignaciones(
-            asignaciones_secciones, asignaciones_subgrupos
+            plan['asignaciones_secciones'], plan['asignaciones_subgrupos'],
+            plan['secciones'], plan['subgrupos']
         )
         
         return resultado
@@ -230,183 +357,258 @@ def ejecutar_asignacion_completa(institucion, curso_lectivo, nivel, usuario, sim
         return resultado
 
 
-def procesar_estudiantes_sin_especialidad(estudiantes, secciones_disponibles):
+def datos_estudiante(matricula):
     """
-    Procesa estudiantes sin especialidad y los asigna a secciones.
-    
-    Returns:
-        tuple: (asignaciones_dict, hermanos_count)
+    Datos planos de una matrícula para el reparto: (clave de hermanos, nombres en
+    mayúscula, género F/M/O, adecuación 0/1, ed. religiosa 0/1).
     """
+    estudiante = matricula.estudiante
+    return (
+        generar_clave_hermanos(estudiante),
+        (estudiante.nombres or '').upper(),
+        determinar_genero_key(estudiante),
+        1 if estudiante.adecuacion_id else 0,
+        1 if estudiante.ed_religiosa else 0,
+    )
+
+
+def _por_nivel_y_tipo(estudiantes):
     # Agrupar por nivel Y tipo de estudiante
     estudiantes_por_nivel_tipo = defaultdict(list)
     for matricula in estudiantes:
         tipo_est = matricula.estudiante.tipo_estudiante or 'PR'  # Default PR si no está definido
-        key = (matricula.nivel.id, tipo_est)
-        estudiantes_por_nivel_tipo[key].append(matricula)
-    
-    asignaciones_finales = defaultdict(list)
-    total_hermanos = 0
-    
-    for (nivel_id, tipo_estudiante), estudiantes_grupo in estudiantes_por_nivel_tipo.items():
+        estudiantes_por_nivel_tipo[(matricula.nivel_id, tipo_est)].append(matricula)
+    return estudiantes_por_nivel_tipo
+
+
+def buckets_sin_especialidad(estudiantes, secciones_disponibles):
+    """
+    Buckets independientes de estudiantes sin especialidad: uno por (nivel, tipo de
+    estudiante) con sus secciones compatibles.
+
+    Returns:
+        list: [(matriculas, secciones_compatibles)]
+    """
+    buckets = []
+    for (nivel_id, tipo_estudiante), estudiantes_grupo in _por_nivel_y_tipo(estudiantes).items():
         # Obtener secciones para este nivel Y tipo de estudiante
         secciones_compatibles = [
             s for s in secciones_disponibles 
             if s.seccion.nivel_id == nivel_id 
             and (s.tipo_estudiante == tipo_estudiante or s.tipo_estudiante is None)
         ]
-        
-        if not secciones_compatibles:
-            continue
-        
-        # Aplicar algoritmo de distribución
-        asignaciones_nivel, hermanos_nivel = distribuir_estudiantes_equitativamente(
-            estudiantes_grupo, 
-            secciones_compatibles, 
-            'seccion'
-        )
-        
-        # Agregar al resultado
-        for seccion_config, matriculas in asignaciones_nivel.items():
-            asignaciones_finales[seccion_config.seccion.id].extend(matriculas)
-        
-        total_hermanos += hermanos_nivel
-    
-    return dict(asignaciones_finales), total_hermanos
+        if secciones_compatibles:
+            buckets.append((estudiantes_grupo, secciones_compatibles))
+    return buckets
 
 
-def procesar_estudiantes_con_especialidad(estudiantes_por_especialidad, subgrupos_disponibles):
+def buckets_con_especialidad(estudiantes_por_especialidad, subgrupos_disponibles, tipos_seccion=None):
     """
-    Procesa estudiantes con especialidad y los asigna a subgrupos.
-    
+    Buckets independientes de estudiantes con especialidad: uno por (especialidad,
+    nivel, tipo de estudiante) con sus subgrupos compatibles.
+
+    `tipos_seccion` ({seccion_id: tipo_estudiante}) evita consultar la
+    SeccionCursoLectivo de cada subgrupo; si no se pasa se carga en una consulta.
+
     Returns:
-        tuple: (asignaciones_dict, hermanos_count)
+        list: [(matriculas, subgrupos_compatibles)]
     """
-    asignaciones_finales = defaultdict(list)
-    total_hermanos = 0
-    
+    if tipos_seccion is None and subgrupos_disponibles:
+        from config_institucional.models import SeccionCursoLectivo
+
+        tipos_seccion = dict(
+            SeccionCursoLectivo.objects.filter(
+                institucion_id=subgrupos_disponibles[0].institucion_id,
+                curso_lectivo_id=subgrupos_disponibles[0].curso_lectivo_id,
+            ).values_list('seccion_id', 'tipo_estudiante')
+        )
+
+    buckets = []
     for especialidad_ecl_id, estudiantes in estudiantes_por_especialidad.items():
         # Encontrar subgrupos que manejen esta especialidad
         subgrupos_especialidad = [
             s for s in subgrupos_disponibles 
             # IMPORTANTE: comparar por ID de EspecialidadCursoLectivo (ECL), no por Especialidad
-            if s.especialidad_curso and s.especialidad_curso_id == especialidad_ecl_id
+            if s.especialidad_curso_id and s.especialidad_curso_id == especialidad_ecl_id
         ]
-        
         if not subgrupos_especialidad:
             continue
-        
-        # Agrupar por nivel Y tipo de estudiante
-        estudiantes_por_nivel_tipo = defaultdict(list)
-        for matricula in estudiantes:
-            tipo_est = matricula.estudiante.tipo_estudiante or 'PR'  # Default PR si no está definido
-            key = (matricula.nivel.id, tipo_est)
-            estudiantes_por_nivel_tipo[key].append(matricula)
-
-        for (nivel_id, tipo_estudiante), estudiantes_grupo in estudiantes_por_nivel_tipo.items():
-            # Obtener la SeccionCursoLectivo para verificar tipo_estudiante
-            # Los subgrupos se validan contra la SeccionCursoLectivo de su sección padre
-            from config_institucional.models import SeccionCursoLectivo
-            
-            # Subgrupos de este nivel y especialidad, filtrando por tipo de estudiante de la sección
+
+        for (nivel_id, tipo_estudiante), estudiantes_grupo in _por_nivel_y_tipo(estudiantes).items():
+            # Subgrupos de este nivel y especialidad, filtrando por el tipo de estudiante
+            # de la SeccionCursoLectivo de su sección padre (sin configuración: se omite)
             subgrupos_compatibles = []
             for s in subgrupos_especialidad:
                 if s.subgrupo.seccion.nivel_id != nivel_id:
                     continue
-                # Buscar la SeccionCursoLectivo correspondiente para verificar tipo
-                try:
-                    seccion_config = SeccionCursoLectivo.objects.get(
-                        institucion=s.institucion,
-                        curso_lectivo=s.curso_lectivo,
-                        seccion=s.subgrupo.seccion
-                    )
-                    if seccion_config.tipo_estudiante == tipo_estudiante or seccion_config.tipo_estudiante is None:
-                        subgrupos_compatibles.append(s)
-                except SeccionCursoLectivo.DoesNotExist:
+                seccion_id = s.subgrupo.seccion_id
+                if seccion_id not in tipos_seccion:
                     continue
-            
-            if not subgrupos_compatibles:
-                continue
+                tipo_seccion = tipos_seccion[seccion_id]
+                if tipo_seccion == tipo_estudiante or tipo_seccion is None:
+                    subgrupos_compatibles.append(s)
+            if subgrupos_compatibles:
+                buckets.append((estudiantes_grupo, subgrupos_compatibles))
+    return buckets
 
-            # Distribuir equitativamente por subgrupo (con nuestra lógica por género/apellidos)
-            asignaciones_nivel, hermanos_nivel = distribuir_estudiantes_equitativamente(
-                estudiantes_grupo,
-                subgrupos_compatibles,
-                'subgrupo'
-            )
 
-            # Agregar al resultado con subgrupo → y luego sección se coloca al aplicar (subgrupo.seccion)
-            for subgrupo_config, matriculas in asignaciones_nivel.items():
-                asignaciones_finales[subgrupo_config.subgrupo.id].extend(matriculas)
+def procesos_asignacion():
+    """
+    Procesos por defecto para los buckets: settings.ASIGNACION_PROCESOS o 1 (en serie).
+    La vista corre dentro del worker de gunicorn, donde no conviene hacer fork de un
+    pool en cada petición; los comandos usan procesos_disponibles().
+    """
+    return getattr(settings, 'ASIGNACION_PROCESOS', None) or 1
+
+
+def procesos_disponibles():
+    """Procesos del pool para comandos: settings.ASIGNACION_PROCESOS o hasta 4 según CPUs."""
+    return getattr(settings, 'ASIGNACION_PROCESOS', None) or min(4, os.cpu_count() or 1)
+
+
+def _repartir_bucket_tarea(args):
+    return repartir_bucket(*args)
+
 
-            total_hermanos += hermanos_nivel
+def resolver_buckets(buckets, optimizacion=None, procesos=1):
+    """
+    Resuelve buckets independientes. Cada uno se pasa a datos planos
+    (datos_estudiante) y se reparte con repartir_bucket, en un pool de procesos si
+    `procesos` > 1 y hay trabajo suficiente. Los resultados se toman en el orden de
+    entrada y la semilla de cada bucket depende de sus grupos, así que el resultado
+    es el mismo en serie o en paralelo.
+
+    Returns:
+        list: [(asignaciones {grupo: [matriculas]}, hermanos_count)] en el orden de `buckets`
+    """
+    opciones = optimizacion.opciones() if optimizacion is not None else None
+    limite = optimizacion.limite() if optimizacion is not None else None
+    tareas = [
+        ([datos_estudiante(m) for m in matriculas], len(grupos), opciones, [g.id for g in grupos], limite)
+        for matriculas, grupos in buckets
+    ]
+    total_estudiantes = sum(len(matriculas) for matriculas, _ in buckets)
+    if procesos <= 1 or len(tareas) <= 1 or total_estudiantes < ASIGNACION_MIN_PARALELO:
+        resultados = [_repartir_bucket_tarea(t) for t in tareas]
+    else:
+        metodos = multiprocessing.get_all_start_methods()
+        contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        # Los buckets más grandes primero: mejor reparto entre procesos.
+        orden = sorted(range(len(tareas)), key=lambda i: -len(tareas[i][0]))
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tareas)), mp_context=contexto) as pool:
+            resultados_ordenados = list(pool.map(_repartir_bucket_tarea, [tareas[i] for i in orden]))
+        resultados = [None] * len(tareas)
+        for i, resultado in zip(orden, resultados_ordenados):
+            resultados[i] = resultado
+
+    salida = []
+    for (matriculas, grupos), resultado in zip(buckets, resultados):
+        if optimizacion is not None:
+            optimizacion.registrar(resultado['optimizacion'])
+        asignaciones = {grupo: [] for grupo in grupos}
+        for i in resultado['orden']:
+            asignaciones[grupos[resultado['grupo'][i]]].append(matriculas[i])
+        salida.append((asignaciones, resultado['hermanos']))
+    return salida
+
+
+def procesar_estudiantes_sin_especialidad(estudiantes, secciones_disponibles, optimizacion=None):
+    """
+    Procesa estudiantes sin especialidad y los asigna a secciones.
+    
+    Returns:
+        tuple: (asignaciones_dict, hermanos_count)
+    """
+    asignaciones_finales = defaultdict(list)
+    total_hermanos = 0
+    for asignaciones_nivel, hermanos_nivel in resolver_buckets(
+        buckets_sin_especialidad(estudiantes, secciones_disponibles), optimizacion
+    ):
+        for seccion_config, matriculas in asignaciones_nivel.items():
+            asignaciones_finales[seccion_config.seccion_id].extend(matriculas)
+        total_hermanos += hermanos_nivel
+    return dict(asignaciones_finales), total_hermanos
+
+
+def procesar_estudiantes_con_especialidad(estudiantes_por_especialidad, subgrupos_disponibles, tipos_seccion=None, optimizacion=None):
+    """
+    Procesa estudiantes con especialidad y los asigna a subgrupos (la sección se
+    coloca al aplicar: subgrupo.seccion).
     
+    Returns:
+        tuple: (asignaciones_dict, hermanos_count)
+    """
+    asignaciones_finales = defaultdict(list)
+    total_hermanos = 0
+    for asignaciones_nivel, hermanos_nivel in resolver_buckets(
+        buckets_con_especialidad(estudiantes_por_especialidad, subgrupos_disponibles, tipos_seccion), optimizacion
+    ):
+        for subgrupo_config, matriculas in asignaciones_nivel.items():
+            asignaciones_finales[subgrupo_config.subgrupo_id].extend(matriculas)
+        total_hermanos += hermanos_nivel
     return dict(asignaciones_finales), total_hermanos
 
 
-def distribuir_estudiantes_equitativamente(estudiantes, grupos_disponibles, tipo_grupo):
+def distribuir_estudiantes_equitativamente(estudiantes, grupos_disponibles, tipo_grupo, optimizacion=None):
     """
-    Algoritmo principal de distribución equitativa de estudiantes.
+    Algoritmo principal de distribución equitativa de estudiantes (un bucket).
     
     Args:
         estudiantes: Lista de MatriculaAcademica
         grupos_disponibles: Lista de SeccionCursoLectivo o SubgrupoCursoLectivo
         tipo_grupo: 'seccion' o 'subgrupo'
+        optimizacion: OptimizacionAsignacion (opcional) que mide el resultado voraz y,
+            en modo optimizado, lo mejora con búsqueda local por clusters
     
     Returns:
         tuple: (asignaciones_dict, hermanos_count)
     """
     if not grupos_disponibles:
         return {}, 0
+    [(asignaciones, hermanos_count)] = resolver_buckets([(estudiantes, grupos_disponibles)], optimizacion)
+    return asignaciones, hermanos_count
+
+
+def repartir_bucket(datos, num_grupos, opciones=None, clave=(), limite=None):
+    """
+    Reparto de un bucket sobre datos planos (ver datos_estudiante); no usa el ORM,
+    así que corre igual en un proceso hijo.
+
+    Voraz: mujeres → hombres → otros en orden alfabético, round-robin al elegir el
+    grupo del primer miembro de cada cluster de hermanos y el resto del cluster al
+    mismo grupo. Con `opciones` (OptimizacionAsignacion.opciones()) se mide el
+    resultado y, en modo optimizado, se mejora con búsqueda local (motor_asignacion).
+
+    Returns:
+        dict: grupo (índice de grupo por estudiante), orden (índices en el orden en
+        que se asignaron), hermanos y optimizacion (resultado de optimizar_bucket o None).
+    """
+    total_estudiantes = len(datos)
     
-    num_grupos = len(grupos_disponibles)
-    total_estudiantes = len(estudiantes)
-    
-    # 1. CALCULAR OBJETIVOS POR GÉNERO
-    generos = Counter(determinar_genero_key(e.estudiante) for e in estudiantes)
-    mujeres = generos.get('F', 0)
-    hombres = generos.get('M', 0)
-    otros = generos.get('O', 0)
-    
-    # Distribución objetivo por grupo
-    objetivos_mujeres = distribuir_objetivo(mujeres, num_grupos)
-    objetivos_hombres = distribuir_objetivo(hombres, num_grupos) 
-    objetivos_otros = distribuir_objetivo(otros, num_grupos)
-    
-    # 2. OBJETIVO DE TAMAÑO POR GRUPO (equidistribución y tope 32)
+    # 1. OBJETIVO DE TAMAÑO POR GRUPO (equidistribución y tope 32)
     objetivos_tamano = distribuir_objetivo(total_estudiantes, num_grupos)
     # Verificación de capacidad máxima por grupo (32) — si es inviable, se permitirá overflow mínimo
     capacidad_maxima = [min(32, objetivo) if total_estudiantes <= num_grupos * 32 else 32 for objetivo in objetivos_tamano]
 
-    # 3. AGRUPAR POR APELLIDOS (HERMANOS) Y PREPARAR LISTAS POR GÉNERO
+    # 2. AGRUPAR POR APELLIDOS (HERMANOS) Y PREPARAR LISTAS POR GÉNERO
     clusters_hermanos = defaultdict(list)
-    for matricula in estudiantes:
-        clave_hermanos = generar_clave_hermanos(matricula.estudiante)
-        clusters_hermanos[clave_hermanos].append(matricula)
+    for i, (clave_hermanos, *_resto) in enumerate(datos):
+        clusters_hermanos[clave_hermanos].append(i)
 
     # Listas por género, ordenadas alfabéticamente por apellidos (clave del cluster)
-    mujeres = []
-    hombres = []
-    otros = []
-    for clave, cluster in clusters_hermanos.items():
+    por_genero = {'F': [], 'M': [], 'O': []}
+    for clave_cluster, indices in clusters_hermanos.items():
         # ordenar cluster internamente por nombres para estabilidad
-        cluster_ordenado = sorted(cluster, key=lambda m: (m.estudiante.nombres or '').upper())
-        for m in cluster_ordenado:
-            genero_key = determinar_genero_key(m.estudiante)
-            if genero_key == 'F':
-                mujeres.append((clave, m))
-            elif genero_key == 'M':
-                hombres.append((clave, m))
-            else:
-                otros.append((clave, m))
-
-    mujeres.sort(key=lambda x: (x[0][0], x[0][1]))
-    hombres.sort(key=lambda x: (x[0][0], x[0][1]))
-    otros.sort(key=lambda x: (x[0][0], x[0][1]))
-
-    # 4. INICIALIZAR ASIGNACIONES Y CONTADORES
-    asignaciones = {grupo: [] for grupo in grupos_disponibles}
-    contadores_genero = {grupo: {'F': 0, 'M': 0, 'O': 0} for grupo in grupos_disponibles}
-    cluster_objetivo = {}  # mapa de clave_hermanos -> grupo elegido
+        for i in sorted(indices, key=lambda i: datos[i][1]):
+            por_genero[datos[i][2]].append((clave_cluster, i))
+    for lista in por_genero.values():
+        lista.sort(key=lambda x: x[0])
+
+    # 3. INICIALIZAR ASIGNACIONES Y CONTADORES
+    tamanos = [0] * num_grupos
+    grupo = [None] * total_estudiantes
+    orden = []
+    cluster_objetivo = {}  # mapa de clave_hermanos -> índice de grupo elegido
     rr_idx = 0  # round-robin index
 
     def elegir_grupo_para_primero_de_cluster(tamano_cluster):
@@ -416,42 +618,55 @@ def distribuir_estudiantes_equitativamente(estudiantes, grupos_disponibles, tipo
             # paso 0: <= objetivo; paso 1: <= capacidad máxima
             limite_lista = objetivos_tamano if paso == 0 else capacidad_maxima
             for intento in range(num_grupos):
-                i = (rr_idx + intento) % num_grupos
-                grupo = grupos_disponibles[i]
-                if len(asignaciones[grupo]) + tamano_cluster <= limite_lista[i]:
-                    rr_idx = (i + 1) % num_grupos
-                    return grupo
+                g = (rr_idx + intento) % num_grupos
+                if tamanos[g] + tamano_cluster <= limite_lista[g]:
+                    rr_idx = (g + 1) % num_grupos
+                    return g
         # Si no hay espacio bajo límites, seleccionar el grupo con menor carga actual
-        i_min = min(range(num_grupos), key=lambda j: len(asignaciones[grupos_disponibles[j]]))
-        grupo = grupos_disponibles[i_min]
-        rr_idx = (i_min + 1) % num_grupos
-        return grupo
-
-    def asignar_estudiante(clave, matricula):
-        # Forzar el grupo del cluster si ya existe
-        if clave in cluster_objetivo:
-            grupo = cluster_objetivo[clave]
-        else:
-            # Elegir grupo para el primer miembro del cluster
-            tamano_cluster = len(clusters_hermanos.get(clave, [matricula]))
-            grupo = elegir_grupo_para_primero_de_cluster(tamano_cluster)
-            cluster_objetivo[clave] = grupo
-        asignaciones[grupo].append(matricula)
-        genero_key = determinar_genero_key(matricula.estudiante)
-        contadores_genero[grupo][genero_key] += 1
-
-    # 5. ASIGNAR EN ORDEN: MUJERES → HOMBRES → OTROS (round-robin al elegir primer miembro de cada cluster)
-    for clave, m in mujeres:
-        asignar_estudiante(clave, m)
-    for clave, m in hombres:
-        asignar_estudiante(clave, m)
-    for clave, m in otros:
-        asignar_estudiante(clave, m)
-
-    # 6. Calcular hermanos_count (cantidad de integrantes en clusters con tamaño > 1)
-    hermanos_count = sum(len(cluster) for cluster in clusters_hermanos.values() if len(cluster) > 1)
+        g_min = min(range(num_grupos), key=lambda j: tamanos[j])
+        rr_idx = (g_min + 1) % num_grupos
+        return g_min
+
+    # 4. ASIGNAR EN ORDEN: MUJERES → HOMBRES → OTROS (round-robin al elegir primer miembro de cada cluster)
+    for genero_key in ('F', 'M', 'O'):
+        for clave_cluster, i in por_genero[genero_key]:
+            # Forzar el grupo del cluster si ya existe
+            if clave_cluster not in cluster_objetivo:
+                cluster_objetivo[clave_cluster] = elegir_grupo_para_primero_de_cluster(
+                    len(clusters_hermanos[clave_cluster])
+                )
+            g = cluster_objetivo[clave_cluster]
+            grupo[i] = g
+            tamanos[g] += 1
+            orden.append(i)
+
+    # 5. Calcular hermanos_count (cantidad de integrantes en clusters con tamaño > 1)
+    hermanos_count = sum(len(indices) for indices in clusters_hermanos.values() if len(indices) > 1)
+
+    # 6. MEDIR Y (EN MODO OPTIMIZADO) MEJORAR POR BÚSQUEDA LOCAL
+    resultado_optimizacion = None
+    if opciones is not None:
+        claves = list(clusters_hermanos)
+        composicion = [
+            composicion_cluster(
+                [datos[i][2] for i in clusters_hermanos[c]],
+                adecuacion=sum(datos[i][3] for i in clusters_hermanos[c]),
+                religion=sum(datos[i][4] for i in clusters_hermanos[c]),
+            )
+            for c in claves
+        ]
+        inicial = [cluster_objetivo[c] for c in claves]
+        resultado_optimizacion = optimizar_bucket(composicion, inicial, num_grupos, opciones, clave, limite)
+        for c, g in zip(claves, resultado_optimizacion['asignacion']):
+            for i in clusters_hermanos[c]:
+                grupo[i] = g
 
-    return asignaciones, hermanos_count
+    return {
+        'grupo': grupo,
+        'orden': orden,
+        'hermanos': hermanos_count,
+        'optimizacion': resultado_optimizacion,
+    }
 
 
 def distribuir_objetivo(total, num_grupos):
@@ -568,16 +783,24 @@ def calcular_estadisticas_completas(matriculas):
     }
 
 
-def generar_detalle_asignaciones(asignaciones_secciones, asignaciones_subgrupos):
-    """Genera un detalle legible de las asignaciones realizadas."""
+def generar_detalle_asignaciones(asignaciones_secciones, asignaciones_subgrupos, secciones=None, subgrupos=None):
+    """
+    Genera un detalle legible de las asignaciones realizadas. `secciones` y
+    `subgrupos` son mapas {id: objeto} ya cargados; si faltan se cargan en bloque.
+    """
     from catalogos.models import Seccion, Subgrupo
+
+    if secciones is None:
+        secciones = Seccion.objects.select_related('nivel').in_bulk(list(asignaciones_secciones))
+    if subgrupos is None:
+        subgrupos = Subgrupo.objects.select_related('seccion__nivel').in_bulk(list(asignaciones_subgrupos))
     
     detalles = []
     
     # Detalles de secciones
     for seccion_id, matriculas in asignaciones_secciones.items():
         try:
-            seccion = Seccion.objects.get(id=seccion_id)
+            seccion = secciones[seccion_id]
             generos = Counter(determinar_genero_key(m.estudiante) for m in matriculas)
             
             detalles.append({
@@ -588,13 +811,13 @@ def generar_detalle_asignaciones(asignaciones_secciones, asignaciones_subgrupos)
                 'hombres': generos.get('M', 0),
                 'otros': generos.get('O', 0)
             })
-        except Seccion.DoesNotExist:
+        except KeyError:
             continue
     
     # Detalles de subgrupos
     for subgrupo_id, matriculas in asignaciones_subgrupos.items():
         try:
-            subgrupo = Subgrupo.objects.get(id=subgrupo_id)
+            subgrupo = subgrupos[subgrupo_id]
             generos = Counter(determinar_genero_key(m.estudiante) for m in matriculas)
             
             detalles.append({
@@ -605,7 +828,7 @@ def generar_detalle_asignaciones(asignaciones_secciones, asignaciones_subgrupos)
                 'hombres': generos.get('M', 0),
                 'otros': generos.get('O', 0)
             })
-        except Subgrupo.DoesNotExist:
+        except KeyError:
             continue
     
     return sorted(detalles, key=lambda x: x['nombre'])
@@ -0,0 +1,327 @@
+"""
+Arnés de medición para la asignación automática de grupos.
+
+- crear_cohorte_sintetica: institución con matrículas sin grupo generadas con una
+  semilla (tamaño, proporción de mujeres, distribución de clusters de hermanos,
+  especialidades y cantidad de secciones/subgrupos configurables).
+- evaluar_plan: calidad de un plan de calcular_asignacion medida sobre los grupos
+  resultantes, independiente del solver que lo produjo.
+- medir_solver: tiempo, consultas y memoria pico de
+  ejecutar_asignacion_completa(simular=True) con un solver dado, más la calidad.
+
+Lo usan los comandos evaluar_asignacion_grupos y benchmark_asignacion_grupos y las
+pruebas; los datos se crean dentro de la transacción del llamador.
+"""
+import datetime
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .asignacion_algoritmo import (
+    calcular_asignacion,
+    determinar_genero_key,
+    ejecutar_asignacion_completa,
+    generar_clave_hermanos,
+)
+from .motor_asignacion import MODO_OPTIMIZADO, MODO_VORAZ, PRESUPUESTO_DEFECTO, OptimizacionAsignacion
+
+NIVELES_SIN_ESPECIALIDAD = (7, 8, 9)
+NIVELES_CON_ESPECIALIDAD = (10, 11)
+# Estudiantes por sección al dimensionar las secciones automáticamente.
+ESTUDIANTES_POR_SECCION = 30
+# Tamaño de cluster de hermanos → peso relativo.
+HERMANOS_DEFECTO = {1: 0.7, 2: 0.2, 3: 0.1}
+
+
+def parsear_hermanos(texto):
+    """'1:0.7,2:0.2,3:0.1' → {1: 0.7, 2: 0.2, 3: 0.1}."""
+    distribucion = {}
+    for parte in texto.split(","):
+        tamano, _, peso = parte.partition(":")
+        try:
+            tamano, peso = int(tamano), float(peso)
+        except ValueError:
+            raise ValueError(f"Distribución de hermanos inválida: {texto!r} (formato tamaño:peso,...)")
+        if tamano < 1 or peso < 0:
+            raise ValueError(f"Distribución de hermanos inválida: {texto!r}")
+        distribucion[tamano] = peso
+    if not sum(distribucion.values()):
+        raise ValueError("La distribución de hermanos debe tener algún peso positivo")
+    return distribucion
+
+
+def crear_cohorte_sintetica(
+    matriculas=2000,
+    proporcion_mujeres=0.5,
+    hermanos=None,
+    especialidades=2,
+    secciones_por_nivel=None,
+    subgrupos_por_seccion=2,
+    proporcion_religion=0.0,
+    semilla=0,
+    prefijo="SIN",
+):
+    """
+    Crea una institución con matrículas activas sin sección ni subgrupo.
+
+    El 60 % de las matrículas va a 7-9 (secciones con `subgrupos_por_seccion`
+    subgrupos sin especialidad) y el 40 % a 10-11, repartidas entre `especialidades`
+    especialidades con un subgrupo por especialidad en cada sección; sin
+    especialidades, 10-11 se tratan como 7-9. `secciones_por_nivel` None dimensiona
+    a ESTUDIANTES_POR_SECCION. Los hermanos de un cluster comparten ambos apellidos
+    y nivel (y especialidad).
+
+    Returns:
+        dict: institucion, curso_lectivo, usuario, matriculas, secciones, subgrupos
+        y la configuración usada.
+    """
+    from catalogos.models import (
+        CursoLectivo, Especialidad, Modalidad, Nacionalidad, Nivel, Seccion, Sexo, Subgrupo, TipoIdentificacion,
+    )
+    from config_institucional.models import EspecialidadCursoLectivo, SeccionCursoLectivo, SubgrupoCursoLectivo
+    from core.models import Institucion, User
+    from .models import Estudiante, MatriculaAcademica
+
+    hermanos = dict(hermanos or HERMANOS_DEFECTO)
+    if matriculas < 1:
+        raise ValueError("La cohorte debe tener al menos una matrícula")
+    if not 0 <= proporcion_mujeres <= 1 or not 0 <= proporcion_religion <= 1:
+        raise ValueError("Las proporciones deben estar entre 0 y 1")
+    rnd = random.Random(semilla)
+    sufijo = prefijo.lower()
+    hoy = timezone.localdate()
+
+    institucion = Institucion.objects.create(
+        nombre=f"COHORTE SINTETICA {prefijo}",
+        correo=f"cohorte_{sufijo}@invalid.local",
+        tipo="A",
+        fecha_inicio=hoy - datetime.timedelta(days=30),
+        fecha_fin=hoy + datetime.timedelta(days=365),
+    )
+    usuario = User.objects.create_user(email=f"cohorte_{sufijo}@invalid.local", password=None)
+    curso_lectivo = CursoLectivo.get_activo() or CursoLectivo.objects.get_or_create(
+        anio=hoy.year,
+        defaults={
+            "nombre": f"Curso Lectivo {hoy.year}",
+            "fecha_inicio": datetime.date(hoy.year, 1, 1),
+            "fecha_fin": datetime.date(hoy.year, 12, 31),
+        },
+    )[0]
+    tipo_id = (
+        TipoIdentificacion.objects.filter(nombre="OTRO").first()
+        or TipoIdentificacion.objects.create(nombre="OTRO")
+    )
+    mujer = Sexo.objects.get_or_create(codigo="F", defaults={"nombre": "Femenino"})[0]
+    hombre = Sexo.objects.get_or_create(codigo="M", defaults={"nombre": "Masculino"})[0]
+    nacionalidad, _ = Nacionalidad.objects.get_or_create(nombre="COSTARRICENSE")
+    modalidad, _ = Modalidad.objects.get_or_create(nombre="SINTETICA")
+    especialidades_curso = [
+        EspecialidadCursoLectivo.objects.create(
+            institucion=institucion,
+            curso_lectivo=curso_lectivo,
+            especialidad=Especialidad.objects.get_or_create(
+                nombre=f"ESPECIALIDAD SINTETICA {indice + 1}", defaults={"modalidad": modalidad}
+            )[0],
+        )
+        for indice in range(especialidades)
+    ]
+
+    # Cupos por nivel: 60 % en 7-9 y 40 % en 10-11.
+    numeros = NIVELES_SIN_ESPECIALIDAD + NIVELES_CON_ESPECIALIDAD
+    cupos = [matriculas * 2 // 10] * len(numeros)
+    cupos[0] += matriculas - sum(cupos)
+    letras = [chr(ord("A") + i) for i in range(26)]
+    secciones_config, subgrupos_config, filas = [], [], []
+    tamanos, pesos = list(hermanos), list(hermanos.values())
+    cluster = 0
+    for numero, cupo in zip(numeros, cupos):
+        nivel, _ = Nivel.objects.get_or_create(numero=numero, defaults={"nombre": f"{numero}°"})
+        con_especialidad = numero in NIVELES_CON_ESPECIALIDAD and especialidades_curso
+        n_secciones = secciones_por_nivel or max(1, math.ceil(cupo / ESTUDIANTES_POR_SECCION))
+        for numero_seccion in range(1, n_secciones + 1):
+            seccion, _ = Seccion.objects.get_or_create(nivel=nivel, numero=numero_seccion)
+            secciones_config.append(SeccionCursoLectivo(
+                institucion=institucion, curso_lectivo=curso_lectivo, seccion=seccion
+            ))
+            grupos = especialidades_curso if con_especialidad else [None] * subgrupos_por_seccion
+            for letra, especialidad in zip(letras, grupos):
+                subgrupo, _ = Subgrupo.objects.get_or_create(seccion=seccion, letra=letra)
+                subgrupos_config.append(SubgrupoCursoLectivo(
+                    institucion=institucion,
+                    curso_lectivo=curso_lectivo,
+                    subgrupo=subgrupo,
+                    especialidad_curso=especialidad,
+                ))
+        restantes = cupo
+        while restantes:
+            tamano = min(rnd.choices(tamanos, pesos)[0], restantes)
+            especialidad = rnd.choice(especialidades_curso) if con_especialidad else None
+            for _ in range(tamano):
+                filas.append((cluster, nivel, especialidad))
+            restantes -= tamano
+            cluster += 1
+    SeccionCursoLectivo.objects.bulk_create(secciones_config)
+    SubgrupoCursoLectivo.objects.bulk_create(subgrupos_config)
+
+    estudiantes = Estudiante.objects.bulk_create([
+        Estudiante(
+            tipo_identificacion=tipo_id,
+            identificacion=f"{prefijo}{j:07d}",
+            primer_apellido=f"APELLIDO{cluster:05d}",
+            segundo_apellido=f"SEGUNDO{cluster % 97:02d}",
+            nombres=f"EST {j}",
+            fecha_nacimiento=datetime.date(hoy.year - 14, 1, 1),
+            sexo=mujer if rnd.random() < proporcion_mujeres else hombre,
+            nacionalidad=nacionalidad,
+            ed_religiosa=rnd.random() < proporcion_religion,
+        )
+        for j, (cluster, _, _) in enumerate(filas)
+    ], batch_size=2000)
+    MatriculaAcademica.objects.bulk_create([
+        MatriculaAcademica(
+            estudiante=estudiante,
+            institucion=institucion,
+            nivel=nivel,
+            especialidad=especialidad,
+            curso_lectivo=curso_lectivo,
+            estado=MatriculaAcademica.ACTIVO,
+        )
+        for estudiante, (_, nivel, especialidad) in zip(estudiantes, filas)
+    ], batch_size=2000)
+    with connection.cursor() as cursor:
+        for modelo in (Estudiante, MatriculaAcademica, SeccionCursoLectivo, SubgrupoCursoLectivo):
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}")
+
+    return {
+        "institucion": institucion,
+        "curso_lectivo": curso_lectivo,
+        "usuario": usuario,
+        "matriculas": len(filas),
+        "secciones": len(secciones_config),
+        "subgrupos": len(subgrupos_config),
+        "configuracion": {
+            "matriculas": matriculas,
+            "proporcion_mujeres": proporcion_mujeres,
+            "hermanos": {str(t): p for t, p in sorted(hermanos.items())},
+            "especialidades": especialidades,
+            "secciones_por_nivel": secciones_por_nivel,
+            "subgrupos_por_seccion": subgrupos_por_seccion,
+            "proporcion_religion": proporcion_religion,
+            "semilla": semilla,
+        },
+    }
+
+
+def evaluar_plan(plan):
+    """
+    Calidad de un plan medida sobre los grupos del reparto: la sección para las
+    matrículas sin especialidad y el subgrupo para las de especialidad. Los grupos
+    se comparan con sus pares (mismo nivel y especialidad).
+
+    Returns:
+        dict: grupos, asignados, sin_asignar, desviación de género (suma y máximo
+        por grupo frente al promedio de sus pares), dispersión de tamaño (máxima
+        entre pares) y clusters de hermanos juntos/separados.
+    """
+    grupo_de = {}
+    for seccion_id, matriculas in plan['asignaciones_secciones'].items():
+        for matricula in matriculas:
+            grupo_de[matricula.id] = ('seccion', seccion_id)
+    for subgrupo_id, matriculas in plan['asignaciones_subgrupos'].items():
+        for matricula in matriculas:
+            if matricula.especialidad_id:
+                grupo_de[matricula.id] = ('subgrupo', subgrupo_id)
+
+    generos = defaultdict(Counter)
+    pares = defaultdict(set)
+    clusters = defaultdict(set)
+    for matricula in plan['matriculas']:
+        grupo = grupo_de.get(matricula.id)
+        if grupo is None:
+            continue
+        generos[grupo][determinar_genero_key(matricula.estudiante)] += 1
+        llave = (matricula.nivel_id, matricula.especialidad_id)
+        pares[llave].add(grupo)
+        clusters[(llave, generar_clave_hermanos(matricula.estudiante))].add((matricula.id, grupo))
+
+    desviaciones, dispersion = [], 0
+    for grupos in pares.values():
+        media = {g: sum(generos[x][g] for x in grupos) / len(grupos) for g in 'FMO'}
+        for grupo in grupos:
+            desviaciones.append(sum(abs(generos[grupo][g] - media[g]) for g in 'FMO'))
+        tamanos = [sum(generos[grupo].values()) for grupo in grupos]
+        dispersion = max(dispersion, max(tamanos) - min(tamanos))
+
+    multiples = [miembros for miembros in clusters.values() if len(miembros) > 1]
+    separados = sum(1 for miembros in multiples if len({grupo for _, grupo in miembros}) > 1)
+    return {
+        'grupos': len(generos),
+        'asignados': len(grupo_de),
+        'sin_asignar': len(plan['matriculas']) - len(grupo_de),
+        'desviacion_genero': round(sum(desviaciones), 2),
+        'desviacion_genero_max': round(max(desviaciones, default=0), 2),
+        'dispersion_tamano': dispersion,
+        'clusters_hermanos': len(multiples),
+        'hermanos_separados': separados,
+        'hermanos_juntos_pct': round(100 * (len(multiples) - separados) / len(multiples), 1) if multiples else 100.0,
+    }
+
+
+def solvers_disponibles(presupuesto_segundos=PRESUPUESTO_DEFECTO, semilla=0):
+    """Solvers medibles: nombre → fábrica de OptimizacionAsignacion (una por corrida)."""
+    return {
+        MODO_VORAZ: lambda: OptimizacionAsignacion(),
+        MODO_OPTIMIZADO: lambda: OptimizacionAsignacion(
+            modo=MODO_OPTIMIZADO, presupuesto_segundos=presupuesto_segundos, semilla=semilla
+        ),
+    }
+
+
+def medir_solver(cohorte, fabrica, repeticiones=3, procesos=None):
+    """
+    Mide ejecutar_asignacion_completa(simular=True) con el solver de `fabrica`.
+
+    El tiempo es la mediana de `repeticiones` corridas y las consultas las de la
+    última; la memoria pico (tracemalloc, solo el proceso principal) sale de una
+    corrida aparte porque el trazado la hace más lenta. La calidad se mide con
+    evaluar_plan sobre el plan de esa misma corrida.
+    """
+    argumentos = (cohorte["institucion"], cohorte["curso_lectivo"])
+    tiempos, consultas, resultado = [], 0, None
+    for _ in range(max(1, repeticiones)):
+        # El registro de consultas guarda como máximo 9000.
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            resultado = ejecutar_asignacion_completa(
+                *argumentos, None, cohorte["usuario"], simular=True, optimizacion=fabrica(), procesos=procesos
+            )
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas = len(ctx)
+
+    optimizacion = fabrica()
+    tracemalloc.start()
+    try:
+        plan = calcular_asignacion(*argumentos, optimizacion=optimizacion, procesos=procesos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "exito": bool(resultado["success"]),
+        "errores": resultado["errores"],
+        "asignados": resultado["estadisticas"].get("total_asignados", 0),
+        "tiempo_ms": round(statistics.median(tiempos), 2),
+        "tiempos_ms": [round(t, 2) for t in tiempos],
+        "consultas": consultas,
+        "memoria_pico_kb": round(pico / 1024, 1),
+        "calidad": evaluar_plan(plan),
+        "motor": optimizacion.resumen(),
+    }
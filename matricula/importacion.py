@@ -0,0 +1,503 @@
+"""
+Motor de importación masiva de estudiantes, encargados y matrículas.
+
+- leer_csv_en_bloques: lee el archivo en streaming y entrega bloques de filas
+  numeradas (1 = primera fila de datos), desde una fila dada para reanudar.
+- CatalogosImportacion: catálogos precargados en dicts; resolver una FK no hace
+  consultas.
+- ImportadorEstudiantes: por bloque precarga estudiantes, relaciones
+  institucionales, contactos, encargados y matrículas existentes por
+  identificación, y escribe con bulk_create/bulk_update en una transacción propia.
+  Si el bloque falla se reintenta fila por fila para aislar las filas con error.
+
+Cada comando convierte sus columnas al registro del motor (ver convertir_fila en
+importar_estudiantes_csv); el motor no conoce el formato del archivo.
+"""
+import csv
+import time
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EncargadoEstudiante, Estudiante, EstudianteInstitucion, MatriculaAcademica, PersonaContacto
+
+TAMANO_BLOQUE_IMPORTACION = 500
+TAMANO_LOTE_ACTUALIZACION = 100
+FORMATOS_FECHA = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y')
+VALORES_VERDADEROS = {'true', '1', 'si', 'sí', 's', 'x'}
+
+# Campos de Estudiante que la importación escribe (bulk_update solo los que cambian).
+CAMPOS_ESTUDIANTE = (
+    'tipo_estudiante', 'tipo_identificacion', 'primer_apellido', 'segundo_apellido', 'nombres',
+    'fecha_nacimiento', 'celular', 'telefono_casa', 'sexo', 'nacionalidad', 'provincia', 'canton',
+    'distrito', 'direccion_exacta', 'correo', 'adecuacion', 'numero_poliza', 'rige_poliza',
+    'vence_poliza', 'ed_religiosa', 'presenta_enfermedad', 'detalle_enfermedad',
+    'medicamento_consume', 'autoriza_derecho_imagen',
+)
+CAMPOS_CONTACTO = (
+    'tipo_identificacion', 'primer_apellido', 'segundo_apellido', 'nombres', 'celular_avisos',
+    'correo', 'lugar_trabajo', 'telefono_trabajo', 'estado_civil', 'escolaridad', 'ocupacion',
+)
+
+
+class ErrorFila(ValueError):
+    """Dato inválido en una fila; la fila se descarta y se reporta."""
+
+
+class _Rollback(Exception):
+    pass
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  LECTURA Y CONVERSIÓN DE VALORES
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def leer_csv_en_bloques(ruta, tamano_bloque=TAMANO_BLOQUE_IMPORTACION, desde_fila=1, delimitador=';', encoding='utf-8-sig'):
+    """
+    Genera bloques [(numero_fila, {columna: valor})] sin cargar el archivo completo.
+    Las columnas se recortan; las celdas vacías quedan en None. Las filas anteriores
+    a `desde_fila` se saltan sin convertirlas.
+    """
+    with open(ruta, newline='', encoding=encoding) as archivo:
+        lector = csv.reader(archivo, delimiter=delimitador)
+        columnas = [c.strip() for c in next(lector, [])]
+        filas = (
+            (numero, {c: (v.strip() or None) for c, v in zip(columnas, valores)})
+            for numero, valores in enumerate(lector, 1)
+            if numero >= desde_fila
+        )
+        while True:
+            bloque = list(islice(filas, tamano_bloque))
+            if not bloque:
+                return
+            yield bloque
+
+
+def columnas_csv(ruta, delimitador=';', encoding='utf-8-sig'):
+    """Encabezado del archivo, con los nombres recortados."""
+    with open(ruta, newline='', encoding=encoding) as archivo:
+        return [c.strip() for c in next(csv.reader(archivo, delimiter=delimitador), [])]
+
+
+def texto(valor, mayuscula=False, minuscula=False):
+    if valor is None:
+        return ''
+    valor = str(valor).strip()
+    if valor.lower() in ('nan', 'none'):
+        return ''
+    return valor.upper() if mayuscula else valor.lower() if minuscula else valor
+
+
+def booleano(valor):
+    return texto(valor, minuscula=True) in VALORES_VERDADEROS
+
+
+def fecha(valor, requerida=False):
+    """Fecha en d/m/Y, Y-m-d o d-m-Y; vacía → None (ErrorFila si es requerida)."""
+    valor = texto(valor)
+    if not valor:
+        if requerida:
+            raise ErrorFila("Fecha obligatoria vacía")
+        return None
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ErrorFila(f"Fecha inválida: {valor}")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  CATÁLOGOS PRECARGADOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+class CatalogosImportacion:
+    """
+    Catálogos de la importación en memoria: {id: objeto} por modelo, niveles por
+    número, secciones por (nivel, número) y especialidades del curso lectivo por
+    institución. Se cargan una vez por importación.
+    """
+
+    def __init__(self, curso_lectivo=None):
+        from catalogos.models import (
+            Adecuacion, Canton, Distrito, Escolaridad, EstadoCivil, Nacionalidad, Nivel, Ocupacion,
+            Parentesco, Provincia, Seccion, Sexo, TipoIdentificacion,
+        )
+        from config_institucional.models import EspecialidadCursoLectivo
+        from core.models import Institucion
+
+        self.curso_lectivo = curso_lectivo
+        self._por_id = {}
+        self._defecto = {}
+        for modelo in (
+            Adecuacion, Canton, Distrito, Escolaridad, EstadoCivil, Nacionalidad, Ocupacion,
+            Parentesco, Provincia, Sexo, TipoIdentificacion, Institucion,
+        ):
+            objetos = list(modelo.objects.order_by('pk'))
+            self._por_id[modelo.__name__] = {o.pk: o for o in objetos}
+            self._defecto[modelo.__name__] = objetos[0] if objetos else None
+        self.niveles = {n.numero: n for n in Nivel.objects.all()}
+        self.secciones = {(s.nivel_id, s.numero): s for s in Seccion.objects.all()}
+        self.especialidades = defaultdict(list)
+        if curso_lectivo is not None:
+            for ecl in EspecialidadCursoLectivo.objects.filter(
+                curso_lectivo=curso_lectivo, activa=True
+            ).select_related('especialidad'):
+                self.especialidades[ecl.institucion_id].append((ecl.especialidad.nombre.upper(), ecl))
+
+    def obtener(self, modelo, valor, requerido=True):
+        """
+        Objeto del catálogo `modelo` (nombre de la clase) con id `valor`. Vacío: el
+        primero del catálogo si es requerido, None si no. Id inexistente: ErrorFila.
+        """
+        valor = texto(valor)
+        if not valor:
+            if requerido and self._defecto[modelo] is None:
+                raise ErrorFila(f"Catálogo {modelo} vacío")
+            return self._defecto[modelo] if requerido else None
+        try:
+            return self._por_id[modelo][int(float(valor))]
+        except (KeyError, ValueError):
+            raise ErrorFila(f"{modelo} con id {valor} no existe")
+
+    def nivel(self, numero):
+        try:
+            return self.niveles[int(numero)]
+        except (KeyError, TypeError, ValueError):
+            raise ErrorFila(f"Nivel {numero} no existe")
+
+    def seccion(self, nivel, numero):
+        try:
+            return self.secciones[(nivel.id, int(numero))]
+        except (KeyError, TypeError, ValueError):
+            raise ErrorFila(f"Sección {nivel.numero}-{numero} no existe")
+
+    def especialidad(self, institucion_id, nombre):
+        """EspecialidadCursoLectivo activa de la institución por nombre (exacto o contenido)."""
+        nombre = texto(nombre, mayuscula=True)
+        candidatas = self.especialidades.get(institucion_id, [])
+        for nombre_ecl, ecl in candidatas:
+            if nombre_ecl == nombre:
+                return ecl
+        for nombre_ecl, ecl in candidatas:
+            if nombre in nombre_ecl:
+                return ecl
+        raise ErrorFila(f"Especialidad '{nombre}' no configurada en el curso lectivo")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+#  MOTOR
+# ═══════════════════════════════════════════════════════════════════════════
+
+
+def nuevo_resultado():
+    return {
+        'filas': 0,
+        'validos': 0,
+        'estudiantes_creados': 0,
+        'estudiantes_actualizados': 0,
+        'relaciones_creadas': 0,
+        'contactos_creados': 0,
+        'contactos_actualizados': 0,
+        'encargados_creados': 0,
+        'encargados_actualizados': 0,
+        'matriculas_creadas': 0,
+        'matriculas_actualizadas': 0,
+        'errores': [],
+        'ultima_fila': 0,
+        'segundos': 0.0,
+        'filas_por_segundo': 0.0,
+    }
+
+
+class ImportadorEstudiantes:
+    """
+    Importa registros ya convertidos. Cada registro es un dict con:
+
+    - fila: número de fila del archivo.
+    - institucion: Institucion de la fila.
+    - estudiante: {campo: valor} con 'identificacion' y campos de CAMPOS_ESTUDIANTE.
+    - encargado (opcional): campos de CAMPOS_CONTACTO más 'identificacion',
+      'parentesco' y 'convivencia'.
+    - matricula (opcional): 'nivel', 'seccion' y 'especialidad'.
+
+    Un estudiante nuevo (o sin institución activa) queda activo en la institución
+    de la fila; si está activo en otra, la fila se rechaza. En dry_run cada bloque
+    se escribe y se revierte, así que las restricciones de la base también se validan.
+    """
+
+    def __init__(self, curso_lectivo=None, usuario=None, tamano_bloque=TAMANO_BLOQUE_IMPORTACION,
+                 dry_run=False, al_confirmar_bloque=None):
+        self.curso_lectivo = curso_lectivo
+        self.usuario = usuario
+        self.tamano_bloque = max(1, tamano_bloque)
+        self.dry_run = dry_run
+        self.al_confirmar_bloque = al_confirmar_bloque
+        self.resultado = nuevo_resultado()
+
+    def importar(self, bloques, convertir):
+        """
+        Procesa `bloques` (p. ej. leer_csv_en_bloques) convirtiendo cada fila con
+        `convertir(numero_fila, fila)`, que retorna el registro o lanza ErrorFila.
+        `al_confirmar_bloque(primera, ultima, resultado)` se llama tras cada bloque.
+        """
+        inicio = time.perf_counter()
+        resultado = self.resultado
+        for bloque in bloques:
+            registros = []
+            for numero, fila in bloque:
+                try:
+                    registros.append(convertir(numero, fila))
+                except (ErrorFila, ValueError) as e:
+                    resultado['errores'].append((numero, str(e)))
+            self._procesar_bloque(registros)
+            resultado['filas'] += len(bloque)
+            resultado['ultima_fila'] = bloque[-1][0]
+            resultado['segundos'] = time.perf_counter() - inicio
+            if resultado['segundos']:
+                resultado['filas_por_segundo'] = resultado['filas'] / resultado['segundos']
+            if self.al_confirmar_bloque:
+                self.al_confirmar_bloque(bloque[0][0], bloque[-1][0], resultado)
+        resultado['errores'].sort()
+        return resultado
+
+    def _procesar_bloque(self, registros):
+        if not registros:
+            return
+        try:
+            conteos, rechazos = self._escribir(registros)
+        except Exception as e:
+            if len(registros) == 1:
+                self.resultado['errores'].append((registros[0]['fila'], str(e)))
+                return
+            # Una fila hizo fallar el bloque: se reintenta de a una para aislarla.
+            for registro in registros:
+                self._procesar_bloque([registro])
+            return
+        for clave, valor in conteos.items():
+            self.resultado[clave] += valor
+        self.resultado['errores'].extend(rechazos)
+
+    def _escribir(self, registros):
+        # Conteos y rechazos se suman al resultado solo si el bloque se confirma.
+        conteos, rechazos = defaultdict(int), []
+        try:
+            with transaction.atomic():
+                self._escribir_bloque(registros, conteos, rechazos)
+                if self.dry_run:
+                    raise _Rollback
+        except _Rollback:
+            pass
+        return conteos, rechazos
+
+    def _escribir_bloque(self, registros, conteos, rechazos):
+        # Identificación repetida dentro del bloque: gana la última fila (como al
+        # procesar fila por fila).
+        total = len(registros)
+        por_identificacion = {}
+        for registro in registros:
+            datos = registro['estudiante']
+            datos['identificacion'] = texto(datos['identificacion'], mayuscula=True)
+            por_identificacion[datos['identificacion']] = registro
+        registros = list(por_identificacion.values())
+
+        existentes = Estudiante.objects.in_bulk(list(por_identificacion), field_name='identificacion')
+        activas = dict(
+            EstudianteInstitucion.objects.filter(
+                estudiante_id__in=[e.id for e in existentes.values()], estado=EstudianteInstitucion.ACTIVO
+            ).values_list('estudiante_id', 'institucion_id')
+        )
+        aceptados = []
+        for registro in registros:
+            estudiante = existentes.get(registro['estudiante']['identificacion'])
+            institucion_activa = activas.get(estudiante.id) if estudiante else None
+            if institucion_activa not in (None, registro['institucion'].id):
+                rechazos.append((
+                    registro['fila'], f"El estudiante {estudiante.identificacion} está activo en otra institución"
+                ))
+                total -= 1
+                continue
+            aceptados.append(registro)
+
+        # ESTUDIANTES
+        nuevos, actualizados, campos = [], [], set()
+        for registro in aceptados:
+            datos = registro['estudiante']
+            estudiante = existentes.get(datos['identificacion'])
+            if estudiante is None:
+                estudiante = Estudiante(identificacion=datos['identificacion'])
+                _asignar(estudiante, datos, CAMPOS_ESTUDIANTE)
+                nuevos.append(estudiante)
+            else:
+                cambiados = _asignar(estudiante, datos, CAMPOS_ESTUDIANTE)
+                if cambiados:
+                    actualizados.append(estudiante)
+                    campos |= cambiados
+            registro['_estudiante'] = estudiante
+        Estudiante.objects.bulk_create(nuevos)
+        _actualizar(Estudiante, actualizados, campos)
+        conteos['estudiantes_creados'] += len(nuevos)
+        conteos['estudiantes_actualizados'] += len(actualizados)
+
+        # RELACIÓN INSTITUCIONAL ACTIVA
+        hoy = timezone.localdate()
+        relaciones = [
+            EstudianteInstitucion(
+                estudiante=r['_estudiante'],
+                institucion=r['institucion'],
+                estado=EstudianteInstitucion.ACTIVO,
+                fecha_ingreso=hoy,
+                usuario_registro=self.usuario,
+                observaciones=f'Ingreso por importación masiva el {hoy.strftime("%d/%m/%Y")}',
+            )
+            for r in aceptados if r['_estudiante'].id not in activas
+        ]
+        EstudianteInstitucion.objects.bulk_create(relaciones)
+        conteos['relaciones_creadas'] += len(relaciones)
+
+        self._escribir_encargados([r for r in aceptados if r.get('encargado')], conteos)
+        self._escribir_matriculas([r for r in aceptados if r.get('matricula')], conteos)
+        conteos['validos'] += total
+
+        # Las escrituras en bloque no emiten signals: se invalidan aquí las cachés
+        # que dependen de estudiantes, institución activa y matrículas.
+        cursos = {(r['institucion'].id, self.curso_lectivo.id) for r in aceptados
+                  if r.get('matricula') and self.curso_lectivo is not None}
+        transaction.on_commit(lambda: _invalidar_caches(cursos, bool(actualizados)))
+
+    def _escribir_encargados(self, registros, conteos):
+        if not registros:
+            return
+        claves = {(r['institucion'].id, texto(r['encargado']['identificacion'], mayuscula=True)) for r in registros}
+        contactos = {
+            (c.institucion_id, c.identificacion): c
+            for c in PersonaContacto.objects.filter(
+                institucion_id__in={i for i, _ in claves}, identificacion__in={x for _, x in claves}
+            )
+        }
+        nuevos, actualizados, campos = [], {}, set()
+        for registro in registros:
+            datos = registro['encargado']
+            clave = (registro['institucion'].id, texto(datos['identificacion'], mayuscula=True))
+            contacto = contactos.get(clave)
+            if contacto is None:
+                contacto = PersonaContacto(institucion=registro['institucion'], identificacion=clave[1])
+                contactos[clave] = contacto
+                nuevos.append(contacto)
+            cambiados = _asignar(contacto, datos, CAMPOS_CONTACTO)
+            if contacto.pk is not None and cambiados:
+                actualizados[contacto.pk] = contacto
+                campos |= cambiados
+            registro['_contacto'] = contacto
+        PersonaContacto.objects.bulk_create(nuevos)
+        _actualizar(PersonaContacto, list(actualizados.values()), campos)
+        conteos['contactos_creados'] += len(nuevos)
+        conteos['contactos_actualizados'] += len(actualizados)
+
+        estudiante_ids = [r['_estudiante'].id for r in registros]
+        vinculos = {
+            (v.estudiante_id, v.persona_contacto_id): v
+            for v in EncargadoEstudiante.objects.filter(estudiante_id__in=estudiante_ids)
+        }
+        con_principal = {e for (e, _), v in vinculos.items() if v.principal}
+        nuevos, actualizados = [], []
+        for registro in registros:
+            datos = registro['encargado']
+            estudiante_id, contacto_id = registro['_estudiante'].id, registro['_contacto'].id
+            vinculo = vinculos.get((estudiante_id, contacto_id))
+            if vinculo is None:
+                vinculo = EncargadoEstudiante(
+                    estudiante_id=estudiante_id,
+                    persona_contacto_id=contacto_id,
+                    parentesco=datos['parentesco'],
+                    convivencia=datos.get('convivencia', False),
+                    principal=estudiante_id not in con_principal,
+                )
+                con_principal.add(estudiante_id)
+                vinculos[(estudiante_id, contacto_id)] = vinculo
+                nuevos.append(vinculo)
+            elif vinculo.pk is not None and vinculo.parentesco_id != datos['parentesco'].id:
+                vinculo.parentesco = datos['parentesco']
+                actualizados.append(vinculo)
+        EncargadoEstudiante.objects.bulk_create(nuevos)
+        _actualizar(EncargadoEstudiante, actualizados, {'parentesco'})
+        conteos['encargados_creados'] += len(nuevos)
+        conteos['encargados_actualizados'] += len(actualizados)
+
+    def _escribir_matriculas(self, registros, conteos):
+        if not registros:
+            return
+        if self.curso_lectivo is None:
+            raise ErrorFila("La importación de matrículas requiere un curso lectivo")
+        existentes = {
+            m.estudiante_id: m
+            for m in MatriculaAcademica.objects.filter(
+                estudiante_id__in=[r['_estudiante'].id for r in registros],
+                curso_lectivo=self.curso_lectivo,
+                estado=MatriculaAcademica.ACTIVO,
+            )
+        }
+        nuevas, actualizadas, campos = [], [], set()
+        for registro in registros:
+            datos = registro['matricula']
+            matricula = existentes.get(registro['_estudiante'].id)
+            if matricula is None:
+                nuevas.append(MatriculaAcademica(
+                    estudiante=registro['_estudiante'],
+                    institucion=registro['institucion'],
+                    curso_lectivo=self.curso_lectivo,
+                    estado=MatriculaAcademica.ACTIVO,
+                    **datos,
+                ))
+            else:
+                cambiados = _asignar(matricula, datos, datos)
+                if cambiados:
+                    actualizadas.append(matricula)
+                    campos |= cambiados
+        MatriculaAcademica.objects.bulk_create(nuevas)
+        _actualizar(MatriculaAcademica, actualizadas, campos)
+        conteos['matriculas_creadas'] += len(nuevas)
+        conteos['matriculas_actualizadas'] += len(actualizadas)
+
+
+def _asignar(objeto, datos, campos):
+    """
+    Copia a `objeto` los `campos` presentes en `datos` y lo normaliza como save().
+    Retorna los campos cuyo valor cambió (en una fila nueva, todos los asignados).
+    """
+    presentes = [c for c in campos if c in datos]
+    atributos = [objeto._meta.get_field(c).attname for c in presentes]
+    antes = [getattr(objeto, a) for a in atributos]
+    for campo in presentes:
+        setattr(objeto, campo, datos[campo])
+    if hasattr(objeto, 'normalizar_campos'):
+        objeto.normalizar_campos()
+    return {c for c, a, v in zip(presentes, atributos, antes) if getattr(objeto, a) != v}
+
+
+def _actualizar(modelo, objetos, campos):
+    # bulk_update arma un CASE por campo y fila: solo filas y campos que cambiaron,
+    # en lotes chicos para acotar el tamaño de cada sentencia.
+    if objetos and campos:
+        modelo.objects.bulk_update(objetos, sorted(campos), batch_size=TAMANO_LOTE_ACTUALIZACION)
+
+
+def _invalidar_caches(cursos, estudiantes_actualizados):
+    from comedor.services import invalidar_indice_comedor
+    from ingreso_clases.services import invalidar_mapa_estudiantes
+    from libro_docente.services import invalidar_roster_curso, invalidar_roster_global
+
+    invalidar_mapa_estudiantes()
+    if estudiantes_actualizados:
+        # Nombres y datos de estudiantes existentes: aparecen en índices y listas de
+        # cualquier curso, no solo en los de las matrículas importadas.
+        invalidar_indice_comedor()
+        invalidar_roster_global()
+    for institucion_id, curso_lectivo_id in cursos:
+        invalidar_indice_comedor(institucion_id, curso_lectivo_id)
+        invalidar_roster_curso(institucion_id, curso_lectivo_id)
@@ -0,0 +1,155 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from catalogos.models import Seccion, Subgrupo
+from matricula.asignacion_algoritmo import (
+    aplicar_asignacion,
+    calcular_asignacion,
+    calcular_estadisticas_completas,
+    ejecutar_asignacion_completa,
+)
+from matricula.evaluacion_asignacion import crear_cohorte_sintetica
+from matricula.models import AsignacionGrupos, MatriculaAcademica
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _aplicar_anterior(plan, usuario):
+    """Ruta previa de aplicación: get() por sección/subgrupo y save() por matrícula."""
+    total_asignados = 0
+    with transaction.atomic():
+        for seccion_id, matriculas_asignadas in plan['asignaciones_secciones'].items():
+            seccion = Seccion.objects.get(id=seccion_id)
+            for matricula in matriculas_asignadas:
+                matricula.seccion = seccion
+                matricula.save(update_fields=['seccion'])
+                total_asignados += 1
+        for subgrupo_id, matriculas_asignadas in plan['asignaciones_subgrupos'].items():
+            subgrupo = Subgrupo.objects.get(id=subgrupo_id)
+            for matricula in matriculas_asignadas:
+                matricula.subgrupo = subgrupo
+                matricula.seccion = subgrupo.seccion
+                matricula.save(update_fields=['subgrupo', 'seccion'])
+                total_asignados += 1
+        if total_asignados > 0:
+            stats = calcular_estadisticas_completas(plan['matriculas'])
+            secciones_utilizadas_ids = set(plan['asignaciones_secciones'].keys())
+            for subgrupo_id in plan['asignaciones_subgrupos'].keys():
+                subgrupo = Subgrupo.objects.get(id=subgrupo_id)
+                secciones_utilizadas_ids.add(subgrupo.seccion.id)
+            AsignacionGrupos.objects.create(
+                institucion=plan['institucion'],
+                curso_lectivo=plan['curso_lectivo'],
+                nivel=plan['nivel'],
+                usuario_asignacion=usuario,
+                total_estudiantes=total_asignados,
+                total_mujeres=stats['mujeres'],
+                total_hombres=stats['hombres'],
+                total_otros=stats['otros'],
+                secciones_utilizadas=len(secciones_utilizadas_ids),
+                subgrupos_utilizados=len(plan['asignaciones_subgrupos']),
+                hermanos_agrupados=plan['hermanos_agrupados'],
+            )
+    return total_asignados
+
+
+def _estado_matriculas(institucion, curso_lectivo):
+    return sorted(
+        MatriculaAcademica.objects.filter(institucion=institucion, curso_lectivo=curso_lectivo)
+        .values_list("id", "seccion_id", "subgrupo_id")
+    )
+
+
+def _medir(funcion, repeticiones, despues=None):
+    """Mediana de `funcion`; cada repetición se revierte en un savepoint."""
+    tiempos, consultas, resultado, estado = [], 0, None, None
+    for _ in range(repeticiones):
+        try:
+            with transaction.atomic():
+                # El registro de consultas guarda como máximo 9000; la ruta anterior
+                # hace una por matrícula.
+                connection.queries_log.clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    resultado = funcion()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas = len(ctx)
+                if despues is not None:
+                    estado = despues()
+                raise _Rollback
+        except _Rollback:
+            pass
+    return statistics.median(tiempos), consultas, resultado, estado
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la asignación automática de grupos (cálculo, aplicación por lotes y "
+        "ejecución completa) contra la aplicación anterior sobre matrículas sintéticas. "
+        "Los datos creados se revierten al finalizar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--matriculas",
+            type=int,
+            default=2000,
+            help="Cantidad de matrículas sintéticas sin grupo (por defecto 2000).",
+        )
+        parser.add_argument(
+            "--repeticiones",
+            type=int,
+            default=3,
+            help="Repeticiones por variante; se reporta la mediana (por defecto 3).",
+        )
+
+    def handle(self, *args, **options):
+        n_matriculas = max(1, options["matriculas"])
+        repeticiones = max(1, options["repeticiones"])
+        self.stdout.write(self.style.WARNING("Los datos sintéticos se revierten al finalizar."))
+
+        try:
+            with transaction.atomic():
+                cohorte = crear_cohorte_sintetica(n_matriculas, prefijo="BAG")
+                institucion, curso_lectivo, usuario = (
+                    cohorte["institucion"], cohorte["curso_lectivo"], cohorte["usuario"]
+                )
+                estado = lambda: _estado_matriculas(institucion, curso_lectivo)
+
+                calculo_ms, calculo_q, plan, _ = _medir(
+                    lambda: calcular_asignacion(institucion, curso_lectivo), repeticiones
+                )
+                anterior_ms, anterior_q, _, estado_anterior = _medir(
+                    lambda: _aplicar_anterior(plan, usuario), repeticiones, estado
+                )
+                lotes_ms, lotes_q, asignados, estado_lotes = _medir(
+                    lambda: aplicar_asignacion(plan, usuario), repeticiones, estado
+                )
+                completa_ms, completa_q, resultado, _ = _medir(
+                    lambda: ejecutar_asignacion_completa(institucion, curso_lectivo, None, usuario),
+                    repeticiones,
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write("")
+        self.stdout.write("Resumen:")
+        self.stdout.write(
+            f"- Matrículas sintéticas: {n_matriculas} ({cohorte['secciones']} secciones, {cohorte['subgrupos']} subgrupos)"
+        )
+        self.stdout.write(f"- Matrículas asignadas: {asignados}")
+        self.stdout.write(f"- Cálculo del plan: {calculo_ms:.2f} ms ({calculo_q} consultas)")
+        self.stdout.write(f"- Aplicación anterior (save por matrícula): {anterior_ms:.2f} ms ({anterior_q} consultas)")
+        self.stdout.write(f"- Aplicación por lotes: {lotes_ms:.2f} ms ({lotes_q} consultas)")
+        self.stdout.write(f"- Asignación completa: {completa_ms:.2f} ms ({completa_q} consultas)")
+        if not resultado.get("success"):
+            self.stdout.write(self.style.ERROR(f"- Error: {resultado.get('errores') or resultado.get('mensaje')}"))
+        self.stdout.write(f"- Resultados coinciden: {'sí' if estado_anterior == estado_lotes else 'NO'}")
+        self.stdout.write(self.style.SUCCESS("Medición finalizada."))
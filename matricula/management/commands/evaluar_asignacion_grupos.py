@@ -0,0 +1,145 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from matricula.asignacion_algoritmo import procesos_disponibles
+from matricula.evaluacion_asignacion import (
+    HERMANOS_DEFECTO,
+    crear_cohorte_sintetica,
+    medir_solver,
+    parsear_hermanos,
+    solvers_disponibles,
+)
+from matricula.motor_asignacion import PRESUPUESTO_DEFECTO
+
+# Versión del formato JSON; subirla si cambian las claves del reporte.
+VERSION_REPORTE = 1
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Evalúa la asignación automática de grupos sobre una cohorte sintética: tiempo, "
+        "consultas, memoria pico y calidad (desviación de género, dispersión de tamaño, "
+        "hermanos juntos) de cada solver, en JSON. Los datos creados se revierten al finalizar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--matriculas", type=int, default=2000, help="Tamaño de la cohorte (por defecto 2000).")
+        parser.add_argument(
+            "--proporcion-mujeres", type=float, default=0.5, help="Proporción de mujeres, 0-1 (por defecto 0.5)."
+        )
+        parser.add_argument(
+            "--hermanos",
+            default=",".join(f"{t}:{p}" for t, p in HERMANOS_DEFECTO.items()),
+            help="Distribución de tamaños de cluster de hermanos como tamaño:peso,... (por defecto %(default)s).",
+        )
+        parser.add_argument(
+            "--especialidades", type=int, default=2, help="Especialidades en 10-11; 0 las trata como 7-9 (por defecto 2)."
+        )
+        parser.add_argument(
+            "--secciones", type=int, default=None, help="Secciones por nivel (por defecto, una cada 30 estudiantes)."
+        )
+        parser.add_argument(
+            "--subgrupos", type=int, default=2, help="Subgrupos por sección en niveles sin especialidad (por defecto 2)."
+        )
+        parser.add_argument(
+            "--proporcion-religion", type=float, default=0.0, help="Proporción con ed. religiosa, 0-1 (por defecto 0)."
+        )
+        parser.add_argument("--semilla", type=int, default=0, help="Semilla de la cohorte y del solver (por defecto 0).")
+        parser.add_argument(
+            "--solvers",
+            default="voraz,optimizado",
+            help="Solvers a medir, separados por coma (por defecto voraz,optimizado).",
+        )
+        parser.add_argument(
+            "--presupuesto",
+            type=float,
+            default=PRESUPUESTO_DEFECTO,
+            help=f"Segundos de búsqueda del modo optimizado (por defecto {PRESUPUESTO_DEFECTO}).",
+        )
+        parser.add_argument(
+            "--procesos", type=int, default=None, help="Procesos para los buckets (por defecto ASIGNACION_PROCESOS o hasta 4 según CPUs)."
+        )
+        parser.add_argument(
+            "--repeticiones", type=int, default=3, help="Repeticiones por solver; se reporta la mediana (por defecto 3)."
+        )
+        parser.add_argument("--salida", default=None, help="Archivo donde guardar el JSON (por defecto, stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            hermanos = parsear_hermanos(options["hermanos"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        disponibles = solvers_disponibles(options["presupuesto"], options["semilla"])
+        nombres = [n.strip() for n in options["solvers"].split(",") if n.strip()]
+        desconocidos = [n for n in nombres if n not in disponibles]
+        if not nombres or desconocidos:
+            raise CommandError(
+                f"Solvers no soportados: {', '.join(desconocidos) or '(ninguno)'}. "
+                f"Disponibles: {', '.join(disponibles)}"
+            )
+        procesos = options["procesos"] or procesos_disponibles()
+
+        try:
+            with transaction.atomic():
+                cohorte = crear_cohorte_sintetica(
+                    matriculas=options["matriculas"],
+                    proporcion_mujeres=options["proporcion_mujeres"],
+                    hermanos=hermanos,
+                    especialidades=max(0, options["especialidades"]),
+                    secciones_por_nivel=options["secciones"],
+                    subgrupos_por_seccion=max(0, options["subgrupos"]),
+                    proporcion_religion=options["proporcion_religion"],
+                    semilla=options["semilla"],
+                    prefijo="EAG",
+                )
+                solvers = {
+                    nombre: medir_solver(cohorte, disponibles[nombre], options["repeticiones"], procesos)
+                    for nombre in nombres
+                }
+                raise _Rollback
+        except _Rollback:
+            pass
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        reporte = {
+            "version": VERSION_REPORTE,
+            "fecha": timezone.now().isoformat(timespec="seconds"),
+            "cohorte": {
+                **cohorte["configuracion"],
+                "secciones": cohorte["secciones"],
+                "subgrupos": cohorte["subgrupos"],
+            },
+            "procesos": procesos,
+            "repeticiones": max(1, options["repeticiones"]),
+            "solvers": solvers,
+        }
+        texto = json.dumps(reporte, ensure_ascii=False, indent=2)
+        if not options["salida"]:
+            self.stdout.write(texto)
+            return
+
+        with open(options["salida"], "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+        self.stdout.write("Resumen:")
+        self.stdout.write(
+            f"- Cohorte: {cohorte['matriculas']} matrículas "
+            f"({cohorte['secciones']} secciones, {cohorte['subgrupos']} subgrupos)"
+        )
+        for nombre, medicion in solvers.items():
+            calidad = medicion["calidad"]
+            self.stdout.write(
+                f"- {nombre}: {medicion['tiempo_ms']:.2f} ms, {medicion['consultas']} consultas, "
+                f"{medicion['memoria_pico_kb']:.0f} KB; desviación de género {calidad['desviacion_genero']}, "
+                f"dispersión de tamaño {calidad['dispersion_tamano']}, "
+                f"hermanos juntos {calidad['hermanos_juntos_pct']} %"
+            )
+        self.stdout.write(f"- Reporte: {options['salida']}")
+        self.stdout.write(self.style.SUCCESS("Medición finalizada."))
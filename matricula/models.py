@@ -81,7 +81,8 @@ class PersonaContacto(models.Model):
                     'identificacion': f'Ya existe una persona de contacto con la identificación {self.identificacion} en esta institución: {contacto_existente.primer_apellido} {contacto_existente.segundo_apellido or ""} {contacto_existente.nombres}.'
                 })
 
-    def save(self, *args, **kwargs):
+    def normalizar_campos(self):
+        """Normalización de save(); las cargas masivas la llaman directamente."""
         # Normaliza strings: recorta y a MAYÚSCULA (correo se maneja aparte)
         for campo in (
             "identificacion", "primer_apellido", "segundo_apellido",
@@ -95,6 +96,8 @@ class PersonaContacto(models.Model):
         if self.correo:
             self.correo = self.correo.strip().lower()
 
+    def save(self, *args, **kwargs):
+        self.normalizar_campos()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -212,7 +215,11 @@ class Estudiante(models.Model):
                     'identificacion': f'Ya existe un estudiante con la identificación {self.identificacion}: {estudiante_existente.primer_apellido} {estudiante_existente.segundo_apellido} {estudiante_existente.nombres}.'
                 })
 
-    def save(self, *args, **kwargs):
+    def normalizar_campos(self):
+        """
+        Normalización de save(): mayúsculas, correo institucional y vencimiento de
+        póliza. Las cargas masivas (bulk_create/bulk_update) la llaman directamente.
+        """
         # Normaliza strings: recorta y MAYÚSCULAS (correo se maneja aparte)
         for campo in (
             "identificacion", "primer_apellido", "segundo_apellido",
@@ -244,6 +251,9 @@ class Estudiante(models.Model):
                 # Si es 29 de febrero en año no bisiesto, usar 28 de febrero
                 self.vence_poliza = date(vence_anio, vence_mes, 28)
 
+    def save(self, *args, **kwargs):
+        self.normalizar_campos()
+
         # Eliminar foto anterior si se está cargando una nueva
         if self.pk:  # Solo si el estudiante ya existe
             try:
@@ -0,0 +1,297 @@
+"""
+Motor de búsqueda local para la asignación automática de grupos.
+
+Parte del resultado voraz de distribuir_estudiantes_equitativamente y lo mejora
+moviendo o intercambiando clusters de hermanos completos (nunca se separan). Cada
+cluster es una fila de una matriz int64 con su composición
+[mujeres, hombres, otros, tamaño, adecuación, religión]; los totales por grupo son
+la suma de sus filas y el costo de cada grupo es la desviación ponderada de esos
+totales respecto del promedio del bucket más una penalización por sobrecupo (32).
+
+Para cada cluster se evalúan en bloque, con NumPy, todos los movimientos a otro
+grupo y todos los intercambios con clusters de otros grupos, y se aplica el mejor
+si baja el costo. Las pasadas siguen hasta no encontrar mejoras, agotar
+MAX_PASADAS o el presupuesto de tiempo. El orden de visita sale de un generador
+con semilla fija por bucket, así que con la misma semilla y sin agotar el
+presupuesto el resultado es el mismo.
+"""
+import time
+
+import numpy as np
+
+MODO_VORAZ = "voraz"
+MODO_OPTIMIZADO = "optimizado"
+MODOS = (MODO_VORAZ, MODO_OPTIMIZADO)
+
+CAPACIDAD_GRUPO = 32
+PRESUPUESTO_DEFECTO = 5.0
+# Tope del presupuesto desde la vista: gunicorn corta el worker a los 30 s, y la
+# carga de datos y la aplicación del plan también consumen tiempo de la petición.
+PRESUPUESTO_MAXIMO_WEB = 20.0
+MAX_PASADAS = 50
+
+# Pesos del costo (mismo orden de magnitud que calcular_score_asignacion: el
+# equilibrio de género manda sobre el tamaño). Adecuación y religión son opcionales.
+PESO_GENERO = 1000
+PESO_TAMANO = 200
+PESO_SOBRECUPO = 10000
+PESO_ADECUACION = 100
+PESO_RELIGION = 50
+
+# Columnas de la matriz de composición
+_F, _M, _O, _TAM, _ADE, _REL = range(6)
+_COLUMNAS = 6
+_EPS = 1e-9
+
+
+def composicion_cluster(generos, adecuacion=0, religion=0):
+    """Fila de composición de un cluster a partir de sus claves de género ('F'/'M'/'O')."""
+    fila = [0] * _COLUMNAS
+    for genero in generos:
+        fila[{"F": _F, "M": _M}.get(genero, _O)] += 1
+    fila[_TAM] = len(generos)
+    fila[_ADE] = adecuacion
+    fila[_REL] = religion
+    return fila
+
+
+class ObjetivoAsignacion:
+    """Costo de una distribución de clusters en `num_grupos` grupos."""
+
+    def __init__(self, composicion, num_grupos, equilibrar_adecuacion=False, equilibrar_religion=False):
+        self.composicion = np.asarray(composicion, dtype=np.int64).reshape(-1, _COLUMNAS)
+        self.num_grupos = num_grupos
+        self.media = self.composicion.sum(axis=0) / num_grupos
+        self.pesos = np.array([
+            PESO_GENERO, PESO_GENERO, PESO_GENERO, PESO_TAMANO,
+            PESO_ADECUACION if equilibrar_adecuacion else 0,
+            PESO_RELIGION if equilibrar_religion else 0,
+        ], dtype=np.float64)
+
+    def totales(self, asignacion):
+        totales = np.zeros((self.num_grupos, _COLUMNAS), dtype=np.int64)
+        np.add.at(totales, asignacion, self.composicion)
+        return totales
+
+    def costo_filas(self, totales):
+        """Costo de cada fila de totales (acepta cualquier cantidad de filas)."""
+        desviacion = np.abs(totales - self.media) @ self.pesos
+        sobrecupo = np.maximum(totales[..., _TAM] - CAPACIDAD_GRUPO, 0)
+        return desviacion + PESO_SOBRECUPO * sobrecupo
+
+    def costo(self, asignacion):
+        return float(self.costo_filas(self.totales(asignacion)).sum())
+
+    def metricas(self, asignacion):
+        totales = self.totales(asignacion)
+        tamanos = self.composicion[:, _TAM]
+        return {
+            "grupos": self.num_grupos,
+            "estudiantes": int(tamanos.sum()),
+            "desviacion_genero": float(np.abs(totales[:, _F:_TAM] - self.media[_F:_TAM]).sum()),
+            "dispersion_tamano": int(np.ptp(totales[:, _TAM])),
+            "sobrecupo": int(np.maximum(totales[:, _TAM] - CAPACIDAD_GRUPO, 0).sum()),
+            "hermanos_juntos": int(tamanos[tamanos > 1].sum()),
+            "dispersion_adecuacion": int(np.ptp(totales[:, _ADE])),
+            "dispersion_religion": int(np.ptp(totales[:, _REL])),
+            "costo": float(self.costo_filas(totales).sum()),
+        }
+
+
+def busqueda_local(objetivo, asignacion_inicial, semilla=0, limite=None, max_pasadas=MAX_PASADAS):
+    """
+    Mejora `asignacion_inicial` (índice de grupo por cluster) con movimientos e
+    intercambios de clusters. `limite` es un instante de time.monotonic().
+
+    Returns:
+        tuple: (asignacion, movimientos, agotado) — agotado indica que se cortó por tiempo.
+    """
+    composicion = objetivo.composicion
+    asignacion = np.array(asignacion_inicial, dtype=np.int64)
+    n_clusters = len(asignacion)
+    if n_clusters < 2 or objetivo.num_grupos < 2:
+        return asignacion, 0, False
+
+    rng = np.random.default_rng(semilla)
+    totales = objetivo.totales(asignacion)
+    costos = objetivo.costo_filas(totales)
+    movimientos = 0
+    for _ in range(max_pasadas):
+        mejoro = False
+        for c in rng.permutation(n_clusters):
+            if limite is not None and time.monotonic() > limite:
+                return asignacion, movimientos, True
+            fila = composicion[c]
+            a = asignacion[c]
+            sin_c = totales[a] - fila
+            base_a = objetivo.costo_filas(sin_c) - costos[a]
+
+            # Mover c a cada otro grupo
+            delta_mover = base_a + objetivo.costo_filas(totales + fila) - costos
+            delta_mover[a] = np.inf
+            destino = int(np.argmin(delta_mover))
+            mejor = delta_mover[destino]
+
+            # Intercambiar c con cada cluster de otro grupo
+            otros = np.flatnonzero(asignacion != a)
+            pareja = -1
+            if len(otros):
+                b = asignacion[otros]
+                delta_intercambio = (
+                    objetivo.costo_filas(sin_c + composicion[otros]) - costos[a]
+                    + objetivo.costo_filas(totales[b] - composicion[otros] + fila) - costos[b]
+                )
+                i = int(np.argmin(delta_intercambio))
+                if delta_intercambio[i] < mejor:
+                    mejor, pareja = delta_intercambio[i], int(otros[i])
+
+            if mejor >= -_EPS:
+                continue
+            if pareja >= 0:
+                destino = int(asignacion[pareja])
+                asignacion[pareja] = a
+                totales[a] += composicion[pareja]
+                totales[destino] -= composicion[pareja]
+            asignacion[c] = destino
+            totales[a] -= fila
+            totales[destino] += fila
+            costos[[a, destino]] = objetivo.costo_filas(totales[[a, destino]])
+            movimientos += 1
+            mejoro = True
+        if not mejoro:
+            break
+    return asignacion, movimientos, False
+
+
+def combinar_metricas(metricas):
+    """Suma las métricas de varios buckets (las dispersiones toman el máximo)."""
+    if not metricas:
+        return None
+    combinadas = {}
+    for clave in metricas[0]:
+        valores = [m[clave] for m in metricas]
+        combinadas[clave] = max(valores) if clave.startswith("dispersion_") else sum(valores)
+    combinadas["desviacion_genero"] = round(combinadas["desviacion_genero"], 2)
+    combinadas["costo"] = round(combinadas["costo"], 2)
+    return combinadas
+
+
+def optimizar_bucket(composicion, asignacion_inicial, num_grupos, opciones, clave=(), limite=None):
+    """
+    Mide el resultado voraz de un bucket y, si `opciones["modo"]` es optimizado, lo
+    mejora. Solo recibe y retorna datos planos, así que puede correr en un pool de
+    procesos. `clave` (enteros estables, p. ej. ids de los grupos) fija la semilla
+    del bucket; `limite` es un instante de time.monotonic().
+
+    Returns:
+        dict: asignacion (índice de grupo por cluster), voraz, optimizado (métricas),
+        movimientos, agotado y segundos de búsqueda.
+    """
+    objetivo = ObjetivoAsignacion(
+        composicion, num_grupos, opciones["equilibrar_adecuacion"], opciones["equilibrar_religion"]
+    )
+    resultado = {
+        "asignacion": list(asignacion_inicial),
+        "voraz": objetivo.metricas(asignacion_inicial),
+        "optimizado": None,
+        "movimientos": 0,
+        "agotado": False,
+        "segundos": 0.0,
+    }
+    if opciones["modo"] != MODO_OPTIMIZADO:
+        return resultado
+
+    inicio = time.monotonic()
+    asignacion, movimientos, agotado = busqueda_local(
+        objetivo, asignacion_inicial, semilla=[opciones["semilla"], *clave], limite=limite
+    )
+    resultado.update({
+        "asignacion": asignacion.tolist(),
+        "optimizado": objetivo.metricas(asignacion),
+        "movimientos": movimientos,
+        "agotado": agotado,
+        "segundos": time.monotonic() - inicio,
+    })
+    return resultado
+
+
+class OptimizacionAsignacion:
+    """
+    Opciones del solver para una corrida y acumulado de la calidad por bucket.
+    En modo voraz solo mide; en modo optimizado aplica la búsqueda local dentro de
+    un presupuesto de tiempo compartido por todos los buckets de la corrida (si los
+    buckets corren en paralelo, todos se cortan en el mismo instante).
+    """
+
+    def __init__(
+        self,
+        modo=MODO_VORAZ,
+        presupuesto_segundos=PRESUPUESTO_DEFECTO,
+        semilla=0,
+        equilibrar_adecuacion=False,
+        equilibrar_religion=False,
+    ):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de asignación no soportado: {modo}")
+        self.modo = modo
+        self.presupuesto_segundos = max(0.0, float(presupuesto_segundos))
+        self.semilla = int(semilla)
+        if self.semilla < 0:
+            raise ValueError("La semilla debe ser un entero no negativo")
+        self.equilibrar_adecuacion = equilibrar_adecuacion
+        self.equilibrar_religion = equilibrar_religion
+        self.calidad_voraz = []
+        self.calidad_optimizada = []
+        self.movimientos = 0
+        self.presupuesto_agotado = False
+        self._limite = None
+        self._segundos = 0.0
+
+    @property
+    def optimizar(self):
+        return self.modo == MODO_OPTIMIZADO
+
+    def opciones(self):
+        """Opciones como dict plano para optimizar_bucket."""
+        return {
+            "modo": self.modo,
+            "semilla": self.semilla,
+            "equilibrar_adecuacion": self.equilibrar_adecuacion,
+            "equilibrar_religion": self.equilibrar_religion,
+        }
+
+    def limite(self):
+        """Instante (time.monotonic) en que vence el presupuesto; corre desde el primer uso."""
+        if not self.optimizar:
+            return None
+        if self._limite is None:
+            self._limite = time.monotonic() + self.presupuesto_segundos
+        return self._limite
+
+    def registrar(self, resultado):
+        """Acumula el resultado de optimizar_bucket de un bucket."""
+        self.calidad_voraz.append(resultado["voraz"])
+        if resultado["optimizado"] is not None:
+            self.calidad_optimizada.append(resultado["optimizado"])
+        self.movimientos += resultado["movimientos"]
+        self.presupuesto_agotado |= resultado["agotado"]
+        self._segundos += resultado["segundos"]
+
+    def resolver(self, composicion, asignacion_inicial, num_grupos, clave=()):
+        """optimizar_bucket + registrar en este proceso. Retorna el índice de grupo por cluster."""
+        resultado = optimizar_bucket(
+            composicion, asignacion_inicial, num_grupos, self.opciones(), clave, self.limite()
+        )
+        self.registrar(resultado)
+        return resultado["asignacion"]
+
+    def resumen(self):
+        return {
+            "modo": self.modo,
+            "voraz": combinar_metricas(self.calidad_voraz),
+            "optimizado": combinar_metricas(self.calidad_optimizada) if self.optimizar else None,
+            "movimientos": self.movimientos,
+            # Suma por bucket: en paralelo puede superar el tiempo real.
+            "tiempo_busqueda_ms": round(self._segundos * 1000, 1),
+            "presupuesto_agotado": self.presupuesto_agotado,
+        }
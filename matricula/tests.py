@@ -1,3 +1,523 @@
-from django.test import TestCase
+"""
+Tests de matrícula.
+Asignación automática de grupos: plan único, aplicación por lotes, solver de
+búsqueda local y arnés de evaluación sobre cohortes sintéticas.
+"""
+import datetime
+import json
+import random
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .asignacion_algoritmo import (
+    ASIGNACION_MIN_PARALELO,
+    calcular_asignacion,
+    ejecutar_asignacion_completa,
+    procesos_asignacion,
+    resolver_buckets,
+)
+from .evaluacion_asignacion import crear_cohorte_sintetica, evaluar_plan, parsear_hermanos
+from .models import AsignacionGrupos, MatriculaAcademica
+from .motor_asignacion import (
+    MODO_OPTIMIZADO,
+    ObjetivoAsignacion,
+    OptimizacionAsignacion,
+    busqueda_local,
+    composicion_cluster,
+)
+
+
+def _crear_cohorte_prueba(n_estudiantes=8, sufijo="ASG"):
+    """
+    Institución con 7° (dos secciones, subgrupos A/B sin especialidad) y 10° (una
+    sección con un subgrupo por especialidad). Mitad de las matrículas en cada nivel.
+    """
+    from catalogos.models import (
+        CursoLectivo, Especialidad, Modalidad, Nacionalidad, Nivel, Seccion, Sexo, Subgrupo, TipoIdentificacion,
+    )
+    from config_institucional.models import EspecialidadCursoLectivo, SeccionCursoLectivo, SubgrupoCursoLectivo
+    from core.models import Institucion, User
+    from matricula.models import Estudiante
+
+    hoy = datetime.date.today()
+    user = User.objects.create_user(email=f"asignacion_{sufijo.lower()}@test.com", password="test123")
+    institucion = Institucion.objects.create(
+        nombre=f"INST {sufijo}",
+        correo=f"inst_{sufijo.lower()}@test.com",
+        tipo="A",
+        fecha_inicio=hoy - datetime.timedelta(days=30),
+        fecha_fin=hoy + datetime.timedelta(days=365),
+    )
+    curso_lectivo, _ = CursoLectivo.objects.get_or_create(
+        anio=hoy.year,
+        defaults={
+            "nombre": f"Curso Lectivo {hoy.year}",
+            "fecha_inicio": datetime.date(hoy.year, 1, 1),
+            "fecha_fin": datetime.date(hoy.year, 12, 31),
+        },
+    )
+    modalidad, _ = Modalidad.objects.get_or_create(nombre="TECNICA")
+    especialidad = EspecialidadCursoLectivo.objects.create(
+        institucion=institucion,
+        curso_lectivo=curso_lectivo,
+        especialidad=Especialidad.objects.get_or_create(nombre="INFORMATICA", defaults={"modalidad": modalidad})[0],
+    )
+    septimo, _ = Nivel.objects.get_or_create(numero=7, defaults={"nombre": "7°"})
+    decimo, _ = Nivel.objects.get_or_create(numero=10, defaults={"nombre": "10°"})
+    for nivel, numeros in ((septimo, (1, 2)), (decimo, (1,))):
+        for numero in numeros:
+            seccion, _ = Seccion.objects.get_or_create(nivel=nivel, numero=numero)
+            SeccionCursoLectivo.objects.create(institucion=institucion, curso_lectivo=curso_lectivo, seccion=seccion)
+            for letra in (("A", "B") if nivel == septimo else ("A",)):
+                SubgrupoCursoLectivo.objects.create(
+                    institucion=institucion,
+                    curso_lectivo=curso_lectivo,
+                    subgrupo=Subgrupo.objects.get_or_create(seccion=seccion, letra=letra)[0],
+                    especialidad_curso=especialidad if nivel == decimo else None,
+                )
+
+    tipo_id, _ = TipoIdentificacion.objects.get_or_create(nombre="OTRO")
+    sexos = [
+        Sexo.objects.get_or_create(codigo="F", defaults={"nombre": "Femenino"})[0],
+        Sexo.objects.get_or_create(codigo="M", defaults={"nombre": "Masculino"})[0],
+    ]
+    nacionalidad, _ = Nacionalidad.objects.get_or_create(nombre="COSTARRICENSE")
+    for i in range(n_estudiantes):
+        en_decimo = i % 2 == 1
+        est = Estudiante.objects.create(
+            tipo_identificacion=tipo_id,
+            identificacion=f"{sufijo}{i:04d}",
+            primer_apellido=f"APELLIDO{i // 2:04d}",
+            nombres=f"EST {i}",
+            fecha_nacimiento=datetime.date(hoy.year - 13, 1, 1),
+            sexo=sexos[i % 2],
+            nacionalidad=nacionalidad,
+        )
+        MatriculaAcademica.objects.create(
+            estudiante=est,
+            institucion=institucion,
+            nivel=decimo if en_decimo else septimo,
+            especialidad=especialidad if en_decimo else None,
+            curso_lectivo=curso_lectivo,
+            estado="activo",
+        )
+    return {"user": user, "institucion": institucion, "curso_lectivo": curso_lectivo}
+
+
+class AsignacionGruposTests(TestCase):
+    """La simulación y la aplicación comparten el plan; la aplicación escribe por lotes."""
+
+    def setUp(self):
+        self.__dict__.update(_crear_cohorte_prueba(n_estudiantes=8, sufijo="ASG"))
+
+    def _ejecutar(self, simular=False, institucion=None):
+        return ejecutar_asignacion_completa(
+            institucion or self.institucion, self.curso_lectivo, None, self.user, simular=simular
+        )
+
+    def test_simular_no_escribe_y_aplicar_asigna_todo(self):
+        simulado = self._ejecutar(simular=True)
+        self.assertTrue(simulado["success"], simulado)
+        self.assertEqual(simulado["estadisticas"]["total_asignados"], 8)
+        self.assertFalse(
+            MatriculaAcademica.objects.filter(institucion=self.institucion, seccion__isnull=False).exists()
+        )
+        self.assertFalse(AsignacionGrupos.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = self._ejecutar()
+        self.assertTrue(resultado["success"], resultado)
+        self.assertEqual(resultado["estadisticas"], simulado["estadisticas"])
+        self.assertEqual(resultado["detalle_asignaciones"], simulado["detalle_asignaciones"])
+
+        matriculas = MatriculaAcademica.objects.filter(institucion=self.institucion).select_related("subgrupo")
+        for matricula in matriculas:
+            self.assertIsNotNone(matricula.subgrupo_id)
+            self.assertEqual(matricula.seccion_id, matricula.subgrupo.seccion_id)
+        asignacion = AsignacionGrupos.objects.get()
+        self.assertEqual(asignacion.total_estudiantes, 8)
+        self.assertEqual(asignacion.secciones_utilizadas, 3)
+        self.assertEqual(asignacion.subgrupos_utilizados, 5)
+
+        # Ya no quedan matrículas sin grupo.
+        self.assertFalse(self._ejecutar()["success"])
+        self.assertEqual(AsignacionGrupos.objects.count(), 1)
+
+    def test_consultas_no_dependen_de_la_cantidad_de_matriculas(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        grande = _crear_cohorte_prueba(n_estudiantes=24, sufijo="ASGX")
+        with CaptureQueriesContext(connection) as pequena_ctx:
+            self._ejecutar()
+        with CaptureQueriesContext(connection) as grande_ctx:
+            resultado = self._ejecutar(institucion=grande["institucion"])
+        self.assertEqual(resultado["estadisticas"]["total_asignados"], 24)
+        self.assertEqual(len(grande_ctx), len(pequena_ctx))
+
+    def test_benchmark_revierte_los_datos(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("benchmark_asignacion_grupos", matriculas=40, repeticiones=1, stdout=out)
+        salida = out.getvalue()
+        self.assertIn("Resultados coinciden: sí", salida)
+        self.assertIn("Medición finalizada.", salida)
+        self.assertFalse(AsignacionGrupos.objects.exists())
+        self.assertEqual(MatriculaAcademica.objects.count(), 8)
+
+
+class MotorAsignacionTests(SimpleTestCase):
+    """Búsqueda local sobre clusters: nunca empeora el voraz y es determinística por semilla."""
+
+    def _cohorte(self, semilla=3, n_grupos=12):
+        rnd = random.Random(semilla)
+        composicion = []
+        for _ in range(150):
+            generos = [rnd.choice("FMM") for _ in range(rnd.choice((1, 1, 1, 2, 2, 3)))]
+            composicion.append(composicion_cluster(generos, adecuacion=int(rnd.random() < 0.1)))
+        # Inicial desequilibrado: clusters en orden, los primeros grupos llenos.
+        inicial = [min(i * n_grupos // len(composicion), n_grupos - 1) for i in range(len(composicion))]
+        inicial[:20] = [0] * 20
+        return composicion, inicial, n_grupos
+
+    def test_mejora_sin_separar_clusters(self):
+        composicion, inicial, n_grupos = self._cohorte()
+        objetivo = ObjetivoAsignacion(composicion, n_grupos, equilibrar_adecuacion=True)
+        final, movimientos, agotado = busqueda_local(objetivo, inicial, semilla=1)
+        self.assertFalse(agotado)
+        self.assertGreater(movimientos, 0)
+        self.assertLess(objetivo.costo(final), objetivo.costo(inicial))
+        antes, despues = objetivo.metricas(inicial), objetivo.metricas(final)
+        self.assertLessEqual(despues["dispersion_tamano"], antes["dispersion_tamano"])
+        self.assertEqual(despues["sobrecupo"], 0)
+        self.assertEqual(despues["estudiantes"], antes["estudiantes"])
+        self.assertEqual(despues["hermanos_juntos"], antes["hermanos_juntos"])
+
+    def test_misma_semilla_mismo_resultado(self):
+        composicion, inicial, n_grupos = self._cohorte()
+        resultados = []
+        for _ in range(2):
+            optimizacion = OptimizacionAsignacion(modo=MODO_OPTIMIZADO, semilla=42, presupuesto_segundos=30)
+            resultados.append(optimizacion.resolver(composicion, inicial, n_grupos, clave=[7, 8]))
+            self.assertIsNotNone(optimizacion.resumen()["optimizado"])
+        self.assertEqual(resultados[0], resultados[1])
+
+    def test_presupuesto_cero_conserva_el_voraz(self):
+        composicion, inicial, n_grupos = self._cohorte()
+        optimizacion = OptimizacionAsignacion(modo=MODO_OPTIMIZADO, presupuesto_segundos=0)
+        self.assertEqual(optimizacion.resolver(composicion, inicial, n_grupos), inicial)
+        resumen = optimizacion.resumen()
+        self.assertTrue(resumen["presupuesto_agotado"])
+        self.assertEqual(resumen["voraz"], resumen["optimizado"])
+
+    def test_opciones_invalidas(self):
+        with self.assertRaises(ValueError):
+            OptimizacionAsignacion(modo="exacto")
+        with self.assertRaises(ValueError):
+            OptimizacionAsignacion(semilla=-1)
+
+
+class AsignacionOptimizadaTests(TestCase):
+    """El modo optimizado reporta la calidad junto a la voraz y queda registrado al aplicar."""
+
+    def setUp(self):
+        self.__dict__.update(_crear_cohorte_prueba(n_estudiantes=12, sufijo="OPT"))
+
+    def test_modo_optimizado_reporta_ambas_calidades(self):
+        optimizacion = OptimizacionAsignacion(modo=MODO_OPTIMIZADO, semilla=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = ejecutar_asignacion_completa(
+                self.institucion, self.curso_lectivo, None, self.user, optimizacion=optimizacion
+            )
+        self.assertTrue(resultado["success"], resultado)
+        calidad = resultado["calidad"]
+        self.assertEqual(calidad["modo"], MODO_OPTIMIZADO)
+        self.assertEqual(calidad["voraz"]["estudiantes"], calidad["optimizado"]["estudiantes"])
+        self.assertLessEqual(calidad["optimizado"]["costo"], calidad["voraz"]["costo"])
+        self.assertEqual(resultado["estadisticas"]["total_asignados"], 12)
+        self.assertEqual(AsignacionGrupos.objects.get().algoritmo_version, "v1.0+busqueda")
+
+    def test_modo_voraz_por_defecto(self):
+        resultado = ejecutar_asignacion_completa(
+            self.institucion, self.curso_lectivo, None, self.user, simular=True
+        )
+        self.assertEqual(resultado["calidad"]["modo"], "voraz")
+        self.assertIsNone(resultado["calidad"]["optimizado"])
+
+
+class _Grupo:
+    def __init__(self, id):
+        self.id = id
+
+
+class _Matricula:
+    def __init__(self, id, estudiante):
+        self.id = id
+        self.estudiante = estudiante
+
+
+def _buckets_sinteticos(n_estudiantes, semilla=11):
+    """Buckets en memoria (sin ORM) con hermanos, géneros y religión al azar."""
+    from types import SimpleNamespace
+
+    rnd = random.Random(semilla)
+    matriculas = []
+    while len(matriculas) < n_estudiantes:
+        apellido = f"APELLIDO{len(matriculas):05d}"
+        for _ in range(rnd.choice((1, 1, 2, 3))):
+            estudiante = SimpleNamespace(
+                primer_apellido=apellido,
+                segundo_apellido="SEGUNDO",
+                nombres=f"EST {len(matriculas)}",
+                sexo=SimpleNamespace(nombre=rnd.choice(("FEMENINO", "MASCULINO", "MASCULINO"))),
+                adecuacion_id=None,
+                ed_religiosa=rnd.random() < 0.3,
+            )
+            matriculas.append(_Matricula(len(matriculas) + 1, estudiante))
+    buckets, inicio = [], 0
+    for indice, tamano in enumerate((n_estudiantes // 2, n_estudiantes // 3)):
+        grupos = [_Grupo(indice * 100 + g) for g in range(tamano // 30 + 1)]
+        buckets.append((matriculas[inicio:inicio + tamano], grupos))
+        inicio += tamano
+    buckets.append((matriculas[inicio:], [_Grupo(900), _Grupo(901)]))
+    return buckets
+
+
+class BucketsParalelosTests(SimpleTestCase):
+    """Los buckets en un pool de procesos dan el mismo resultado que en serie."""
+
+    def _firma(self, resultados):
+        return [
+            ({grupo.id: [m.id for m in mats] for grupo, mats in asignaciones.items()}, hermanos)
+            for asignaciones, hermanos in resultados
+        ]
+
+    def test_paralelo_igual_a_serie(self):
+        buckets = _buckets_sinteticos(ASIGNACION_MIN_PARALELO + 60)
+        firmas, resumenes = [], []
+        for procesos in (1, 2):
+            optimizacion = OptimizacionAsignacion(
+                modo=MODO_OPTIMIZADO, semilla=9, presupuesto_segundos=60, equilibrar_religion=True
+            )
+            firmas.append(self._firma(resolver_buckets(buckets, optimizacion, procesos)))
+            resumenes.append(optimizacion.resumen())
+        self.assertEqual(firmas[0], firmas[1])
+        self.assertEqual(resumenes[0]["optimizado"], resumenes[1]["optimizado"])
+        self.assertEqual(resumenes[0]["voraz"]["estudiantes"], ASIGNACION_MIN_PARALELO + 60)
+        # Cada estudiante queda en exactamente un grupo de su bucket.
+        for (matriculas, grupos), (asignaciones, _) in zip(buckets, firmas[0]):
+            self.assertEqual(sorted(i for ids in asignaciones.values() for i in ids), [m.id for m in matriculas])
+            self.assertEqual(set(asignaciones), {g.id for g in grupos})
+
+    @override_settings(ASIGNACION_PROCESOS=None)
+    def test_vista_en_serie_por_defecto(self):
+        self.assertEqual(procesos_asignacion(), 1)
+        with override_settings(ASIGNACION_PROCESOS=3):
+            self.assertEqual(procesos_asignacion(), 3)
+
+
+class EvaluacionAsignacionTests(TestCase):
+    """Cohortes sintéticas, métricas de calidad y reporte JSON del arnés."""
+
+    def test_cohorte_respeta_configuracion(self):
+        cohorte = crear_cohorte_sintetica(
+            matriculas=200,
+            proporcion_mujeres=0.8,
+            hermanos={1: 1, 3: 1},
+            especialidades=3,
+            secciones_por_nivel=2,
+            subgrupos_por_seccion=3,
+            semilla=5,
+            prefijo="TCS",
+        )
+        self.assertEqual((cohorte["matriculas"], cohorte["secciones"]), (200, 10))
+        # 7-9: 3 subgrupos por sección; 10-11: uno por especialidad.
+        self.assertEqual(cohorte["subgrupos"], 3 * 2 * 3 + 2 * 2 * 3)
+        matriculas = MatriculaAcademica.objects.filter(institucion=cohorte["institucion"])
+        self.assertEqual(matriculas.filter(seccion__isnull=True, subgrupo__isnull=True).count(), 200)
+        mujeres = matriculas.filter(estudiante__sexo__codigo="F").count()
+        self.assertTrue(140 <= mujeres <= 185, mujeres)
+        self.assertFalse(matriculas.filter(nivel__numero__lt=10, especialidad__isnull=False).exists())
+        self.assertFalse(matriculas.filter(nivel__numero__gte=10, especialidad__isnull=True).exists())
+
+    def test_evaluar_plan_mide_grupos_y_hermanos(self):
+        cohorte = crear_cohorte_sintetica(matriculas=150, hermanos={2: 1}, semilla=3, prefijo="TEP")
+        plan = calcular_asignacion(cohorte["institucion"], cohorte["curso_lectivo"], procesos=1)
+        calidad = evaluar_plan(plan)
+        self.assertEqual((calidad["asignados"], calidad["sin_asignar"]), (150, 0))
+        self.assertEqual(calidad["clusters_hermanos"], 75)
+        self.assertEqual(calidad["hermanos_separados"], 0)
+        self.assertEqual(calidad["hermanos_juntos_pct"], 100.0)
+        self.assertEqual(calidad["desviacion_genero"], plan["calidad"]["voraz"]["desviacion_genero"])
+
+    def test_comando_emite_json(self):
+        out = StringIO()
+        call_command(
+            "evaluar_asignacion_grupos",
+            matriculas=120,
+            hermanos="1:0.5,2:0.5",
+            repeticiones=1,
+            presupuesto=2,
+            procesos=1,
+            stdout=out,
+        )
+        reporte = json.loads(out.getvalue())
+        self.assertEqual(reporte["cohorte"]["matriculas"], 120)
+        self.assertEqual(set(reporte["solvers"]), {"voraz", "optimizado"})
+        for medicion in reporte["solvers"].values():
+            self.assertTrue(medicion["exito"], medicion)
+            self.assertEqual(medicion["asignados"], 120)
+            self.assertGreater(medicion["memoria_pico_kb"], 0)
+            self.assertEqual(medicion["calidad"]["hermanos_separados"], 0)
+        self.assertLessEqual(
+            reporte["solvers"]["optimizado"]["motor"]["optimizado"]["costo"],
+            reporte["solvers"]["voraz"]["motor"]["voraz"]["costo"],
+        )
+        # Los datos sintéticos se revierten.
+        self.assertFalse(MatriculaAcademica.objects.exists())
+
+    def test_parsear_hermanos_invalido(self):
+        self.assertEqual(parsear_hermanos("1:0.6,2:0.4"), {1: 0.6, 2: 0.4})
+        for texto in ("1-0.5", "0:1", "1:0"):
+            with self.assertRaises(ValueError):
+                parsear_hermanos(texto)
+
+
+def _csv_importacion(filas):
+    """CSV (;) con las columnas de importar_estudiantes_csv; `filas` son dicts parciales."""
+    from matricula.management.commands.importar_estudiantes_csv import COLUMNAS_REQUERIDAS
+
+    lineas = [";".join(COLUMNAS_REQUERIDAS)]
+    for fila in filas:
+        lineas.append(";".join(str(fila.get(c, "")) for c in COLUMNAS_REQUERIDAS))
+    return "\n".join(lineas) + "\n"
+
+
+class ImportacionEstudiantesTests(TestCase):
+    """Importación por bloques: alta, actualización, errores por fila y reanudación."""
+
+    def setUp(self):
+        from catalogos.models import Parentesco
+
+        self.__dict__.update(_crear_cohorte_prueba(n_estudiantes=0, sufijo="IMP"))
+        self.parentesco = Parentesco.objects.create(descripcion="MADRE")
+
+    def _fila(self, i, **extra):
+        fila = {
+            "institucion_id": self.institucion.id,
+            "tipo_estudiante": "PR",
+            "identificacion": f"imp{i:05d}",
+            "primer_apellido": f"apellido{i}",
+            "segundo_apellido": "segundo",
+            "nombres": f"nombre {i}",
+            "fecha_nacimiento": "15/03/2010",
+            "ed_religiosa": "true" if i % 2 else "false",
+            "Nivel que Matricula": "7 (Sétimo)",
+            "Sección": "7-1",
+            "identificacion_contacto": f"C{i // 2:05d}",
+            "primer_apellido_contacto": "contacto",
+            "nombres_contacto": f"encargado {i // 2}",
+            "id_Parentesco_contacto": self.parentesco.id,
+            "Vive con el estudiante_contacto": "true",
+        }
+        fila.update(extra)
+        return fila
+
+    def _importar(self, filas, **opciones):
+        import os
+        import tempfile
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as archivo:
+            archivo.write(_csv_importacion(filas))
+        self.addCleanup(os.remove, archivo.name)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "importar_estudiantes_csv", archivo.name, curso_lectivo=self.curso_lectivo.id, stdout=out, **opciones
+            )
+        return out.getvalue()
+
+    def test_importa_por_bloques_y_aisla_errores(self):
+        from matricula.models import EncargadoEstudiante, Estudiante, EstudianteInstitucion, PersonaContacto
+
+        filas = [self._fila(i) for i in range(7)]
+        filas[3]["Sección"] = "7-9"  # sección inexistente
+        filas[5]["sexo_id"] = 99999  # catálogo inexistente
+        filas[6].update({"Nivel que Matricula": "10", "Sección": "10-1", "Especialidad": "informatica"})
+        salida = self._importar(filas, tamano_bloque=3)
+
+        self.assertIn("Error en fila 4: Sección 7-9 no existe", salida)
+        self.assertIn("Error en fila 6: Sexo con id 99999 no existe", salida)
+        self.assertIn("Filas 7-7 confirmadas", salida)
+        estudiantes = Estudiante.objects.filter(identificacion__startswith="IMP")
+        self.assertEqual(estudiantes.count(), 5)
+        estudiante = estudiantes.get(identificacion="IMP00001")
+        self.assertEqual((estudiante.primer_apellido, estudiante.correo), ("APELLIDO1", "imp00001@est.mep.go.cr"))
+        self.assertTrue(estudiante.ed_religiosa)
+        self.assertEqual(
+            EstudianteInstitucion.objects.filter(institucion=self.institucion, estado="activo").count(), 5
+        )
+        self.assertEqual(
+            MatriculaAcademica.objects.filter(
+                institucion=self.institucion, curso_lectivo=self.curso_lectivo, seccion__numero=1
+            ).count(),
+            5,
+        )
+        self.assertEqual(
+            MatriculaAcademica.objects.get(estudiante__identificacion="IMP00006").especialidad.especialidad.nombre,
+            "INFORMATICA",
+        )
+        # Hermanos (0 y 1) comparten encargado: un contacto, dos vínculos principales.
+        self.assertEqual(PersonaContacto.objects.filter(identificacion="C00000").count(), 1)
+        self.assertEqual(EncargadoEstudiante.objects.filter(persona_contacto__identificacion="C00000", principal=True).count(), 2)
+
+    def test_reimportar_actualiza_y_reanuda(self):
+        from matricula.models import Estudiante, EstudianteInstitucion
+
+        self._importar([self._fila(i) for i in range(4)])
+        filas = [self._fila(i, nombres=f"nuevo {i}", **{"Sección": "7-2"}) for i in range(4)]
+        with mock.patch("libro_docente.services.invalidar_roster_global") as invalidar_roster:
+            salida = self._importar(filas, desde_fila=3, tamano_bloque=2)
+        # Estudiantes actualizados: sus nombres cambian en las listas de cualquier curso.
+        invalidar_roster.assert_called()
+
+        self.assertIn("Filas 3-4 confirmadas", salida)
+        self.assertEqual(
+            list(Estudiante.objects.filter(identificacion__startswith="IMP").order_by("identificacion")
+                 .values_list("nombres", flat=True)),
+            ["NOMBRE 0", "NOMBRE 1", "NUEVO 2", "NUEVO 3"],
+        )
+        matriculas = MatriculaAcademica.objects.filter(institucion=self.institucion, curso_lectivo=self.curso_lectivo)
+        self.assertEqual(matriculas.count(), 4)
+        self.assertEqual(matriculas.filter(seccion__numero=2).count(), 2)
+        self.assertEqual(EstudianteInstitucion.objects.filter(institucion=self.institucion).count(), 4)
+
+    def test_dry_run_no_escribe(self):
+        from matricula.models import Estudiante
+
+        salida = self._importar([self._fila(i) for i in range(3)], dry_run=True)
+        self.assertIn("MODO DRY-RUN", salida)
+        self.assertIn("Filas válidas: 3", salida)
+        self.assertFalse(Estudiante.objects.filter(identificacion__startswith="IMP").exists())
+
+    def test_rechaza_activos_en_otra_institucion_y_aisla_fallos_de_bloque(self):
+        from matricula.models import Estudiante
+
+        otra = _crear_cohorte_prueba(n_estudiantes=0, sufijo="OTR")["institucion"]
+        self._importar([self._fila(0, institucion_id=otra.id)])
+        filas = [self._fila(i) for i in range(3)]
+        filas[2]["identificacion"] = "X" * 25  # excede el campo: falla el bloque completo
+        salida = self._importar(filas)
+
+        self.assertIn("Error en fila 1: El estudiante IMP00000 está activo en otra institución", salida)
+        self.assertIn("Error en fila 3:", salida)
+        self.assertTrue(Estudiante.objects.filter(identificacion="IMP00001").exists())
+        self.assertFalse(MatriculaAcademica.objects.filter(estudiante__identificacion="IMP00000",
+                                                           institucion=self.institucion).exists())
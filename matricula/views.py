@@ -15,6 +15,7 @@ from django.db.models import Count, Q, Value
 from django.db.models.functions import Coalesce
 from catalogos.models import CursoLectivo, Nivel, Seccion, Subgrupo, Especialidad
 from core.models import Institucion
+from core.qr import QR_CARNE, precalentar_qr, qr_base64 as qr_a_base64
 from .models import (
     EncargadoEstudiante,
     Estudiante,
@@ -25,9 +26,6 @@ from .models import (
 from dal import autocomplete
 import json
 import io
-import qrcode
-from io import BytesIO
-import base64
 
 try:
     import openpyxl
@@ -698,21 +696,8 @@ def pas_estudiante(request):
         if not matricula:
             return HttpResponse('No existe matrícula activa para este estudiante y curso lectivo', status=404)
 
-        # Generar código QR con la identificación del estudiante
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=1,
-        )
-        qr.add_data(estudiante.identificacion)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir QR a base64
-        buffered = BytesIO()
-        qr_img.save(buffered, format="PNG")
-        qr_base64 = base64.b64encode(buffered.getvalue()).decode()
+        # Código QR con la identificación del estudiante (caché de QR compartida)
+        qr_base64 = qr_a_base64(estudiante.identificacion, **QR_CARNE)
 
         # Encargado principal
         contacto_principal = (
@@ -802,22 +787,10 @@ def pas_seccion(request):
             return HttpResponse(f'No se encontraron estudiantes en {grupo_nombre}', status=404)
 
         # Preparar datos para cada estudiante
+        precalentar_qr([m.estudiante.identificacion for m in matriculas], **QR_CARNE)
         estudiantes_data = []
         for matricula in matriculas:
-            # Generar código QR
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=1,
-            )
-            qr.add_data(matricula.estudiante.identificacion)
-            qr.make(fit=True)
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            buffered = BytesIO()
-            qr_img.save(buffered, format="PNG")
-            qr_base64 = base64.b64encode(buffered.getvalue()).decode()
+            qr_base64 = qr_a_base64(matricula.estudiante.identificacion, **QR_CARNE)
 
             # Encargado principal
             contacto_principal = (
@@ -1395,8 +1368,10 @@ def asignacion_grupos(request):
     from catalogos.models import CursoLectivo, Nivel
     from core.models import Institucion
     from .models import AsignacionGrupos
+    from .motor_asignacion import PRESUPUESTO_MAXIMO_WEB
     
     context = {
+        'presupuesto_maximo': int(PRESUPUESTO_MAXIMO_WEB),
         'instituciones': Institucion.objects.all().order_by('nombre') if request.user.is_superuser else [],
         'cursos_lectivos': CursoLectivo.objects.all().order_by('-anio'),
         'niveles': Nivel.objects.all().order_by('numero'),
@@ -1445,6 +1420,22 @@ def ejecutar_asignacion_grupos(request):
         curso_lectivo = CursoLectivo.objects.get(id=curso_lectivo_id)
         nivel = Nivel.objects.get(id=nivel_id) if nivel_id else None
         
+        # Modo del solver: voraz (rápido) u optimizado (búsqueda local con presupuesto)
+        from .motor_asignacion import (
+            MODO_VORAZ, PRESUPUESTO_DEFECTO, PRESUPUESTO_MAXIMO_WEB, OptimizacionAsignacion
+        )
+        try:
+            presupuesto = float(request.POST.get('presupuesto_segundos') or PRESUPUESTO_DEFECTO)
+            optimizacion = OptimizacionAsignacion(
+                modo=request.POST.get('modo') or MODO_VORAZ,
+                presupuesto_segundos=min(PRESUPUESTO_MAXIMO_WEB, presupuesto),
+                semilla=int(request.POST.get('semilla') or 0),
+                equilibrar_adecuacion=request.POST.get('equilibrar_adecuacion') in ('on', 'true'),
+                equilibrar_religion=request.POST.get('equilibrar_religion') in ('on', 'true'),
+            )
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': f'Parámetros del solver inválidos: {e}'})
+        
         # Ejecutar algoritmo
         from .asignacion_algoritmo import ejecutar_asignacion_completa
         resultado = ejecutar_asignacion_completa(
@@ -1452,7 +1443,8 @@ def ejecutar_asignacion_grupos(request):
             curso_lectivo=curso_lectivo,
             nivel=nivel,
             usuario=request.user,
-            simular=simular
+            simular=simular,
+            optimizacion=optimizacion
         )
         # Normalizar respuesta de error para el frontend
         if not resultado.get('success'):
@@ -3,6 +3,12 @@ ASGI config for sis_colegio project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Sobre ASGI el stream de ocupación del comedor (comedor:ocupacion_stream) mantiene
+abiertas las conexiones SSE sin ocupar un worker por navegador. Para usarlo se sirve
+esa ruta (o toda la aplicación) con un servidor ASGI, p. ej.
+``gunicorn sis_colegio.asgi:application -k uvicorn.workers.UvicornWorker``; bajo
+WSGI la vista responde una foto por petición y el navegador se reconecta.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """